@@ -21,8 +21,8 @@ class TestCaptureAPI(APIBaseTest):
         super().setUp()
         self.client = Client()
 
-    @patch("ee.kafka_client.client._KafkaProducer.produce")
-    def test_produce_to_kafka(self, kafka_produce):
+    @patch("ee.kafka_client.client.TestKafkaProducer.send", return_value=None)
+    def test_produce_to_kafka(self, kafka_send):
         response = self.client.post(
             "/track/",
             {
@@ -37,18 +37,18 @@ class TestCaptureAPI(APIBaseTest):
         )
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(kafka_produce.call_count, 2)
-
-        kafka_produce_call1 = kafka_produce.call_args_list[0].kwargs
-        kafka_produce_call2 = kafka_produce.call_args_list[1].kwargs
+        self.assertEqual(kafka_send.call_count, 2)
 
         # Make sure we're producing to the correct topic
-        self.assertEqual(kafka_produce_call1["topic"], KAFKA_EVENTS_PLUGIN_INGESTION)
-        self.assertEqual(kafka_produce_call2["topic"], KAFKA_EVENTS_PLUGIN_INGESTION)
+        self.assertEqual(kafka_send.call_args_list[0].args[0], KAFKA_EVENTS_PLUGIN_INGESTION)
+        self.assertEqual(kafka_send.call_args_list[1].args[0], KAFKA_EVENTS_PLUGIN_INGESTION)
+
+        kafka_send_call1 = {"data": json.loads(kafka_send.call_args_list[0].kwargs["value"])}
+        kafka_send_call2 = {"data": json.loads(kafka_send.call_args_list[1].kwargs["value"])}
 
         # Make sure we're producing the right data
-        event1_data = json.loads(kafka_produce_call1["data"]["data"])
-        event2_data = json.loads(kafka_produce_call2["data"]["data"])
+        event1_data = json.loads(kafka_send_call1["data"]["data"])
+        event2_data = json.loads(kafka_send_call2["data"]["data"])
 
         self.assertEqual(event1_data["event"], "event1")
         self.assertEqual(event2_data["event"], "event2")
@@ -57,26 +57,26 @@ class TestCaptureAPI(APIBaseTest):
         self.assertEqual(event2_data["properties"]["distinct_id"], "id2")
 
         # Make sure we're producing data correctly in the way the plugin server expects
-        self.assertEquals(type(kafka_produce_call1["data"]["distinct_id"]), str)
-        self.assertEquals(type(kafka_produce_call2["data"]["distinct_id"]), str)
+        self.assertEquals(type(kafka_send_call1["data"]["distinct_id"]), str)
+        self.assertEquals(type(kafka_send_call2["data"]["distinct_id"]), str)
 
-        self.assertIn(type(kafka_produce_call1["data"]["ip"]), [str, type(None)])
-        self.assertIn(type(kafka_produce_call2["data"]["ip"]), [str, type(None)])
+        self.assertIn(type(kafka_send_call1["data"]["ip"]), [str, type(None)])
+        self.assertIn(type(kafka_send_call2["data"]["ip"]), [str, type(None)])
 
-        self.assertEquals(type(kafka_produce_call1["data"]["site_url"]), str)
-        self.assertEquals(type(kafka_produce_call2["data"]["site_url"]), str)
+        self.assertEquals(type(kafka_send_call1["data"]["site_url"]), str)
+        self.assertEquals(type(kafka_send_call2["data"]["site_url"]), str)
 
-        self.assertEquals(type(kafka_produce_call1["data"]["team_id"]), int)
-        self.assertEquals(type(kafka_produce_call2["data"]["team_id"]), int)
+        self.assertEquals(type(kafka_send_call1["data"]["team_id"]), int)
+        self.assertEquals(type(kafka_send_call2["data"]["team_id"]), int)
 
-        self.assertEquals(type(kafka_produce_call1["data"]["sent_at"]), str)
-        self.assertEquals(type(kafka_produce_call2["data"]["sent_at"]), str)
+        self.assertEquals(type(kafka_send_call1["data"]["sent_at"]), str)
+        self.assertEquals(type(kafka_send_call2["data"]["sent_at"]), str)
 
         self.assertEquals(type(event1_data["properties"]), dict)
         self.assertEquals(type(event2_data["properties"]), dict)
 
-        self.assertEquals(type(kafka_produce_call1["data"]["uuid"]), str)
-        self.assertEquals(type(kafka_produce_call2["data"]["uuid"]), str)
+        self.assertEquals(type(kafka_send_call1["data"]["uuid"]), str)
+        self.assertEquals(type(kafka_send_call2["data"]["uuid"]), str)
 
     @patch("posthog.api.utils.get_event_ingestion_context_for_token", side_effect=mocked_get_ingest_context_from_token)
     @patch("posthog.api.capture.log_event_to_dead_letter_queue")
@@ -131,8 +131,8 @@ class TestCaptureAPI(APIBaseTest):
         self.assertEqual(team, None)
         self.assertEqual(db_error, "Exception('test exception')")
 
-    @patch("ee.kafka_client.client._KafkaProducer.produce")
-    def test_capture_event_with_uuid_in_payload(self, kafka_produce):
+    @patch("ee.kafka_client.client.TestKafkaProducer.send", return_value=None)
+    def test_capture_event_with_uuid_in_payload(self, kafka_send):
         response = self.client.post(
             "/track/",
             {
@@ -151,15 +151,15 @@ class TestCaptureAPI(APIBaseTest):
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
-        kafka_produce_call = kafka_produce.call_args_list[0].kwargs
-        event_data = json.loads(kafka_produce_call["data"]["data"])
+        kafka_send_call = {"data": json.loads(kafka_send.call_args_list[0].kwargs["value"])}
+        event_data = json.loads(kafka_send_call["data"]["data"])
 
         self.assertEqual(event_data["event"], "event1")
-        self.assertEqual(kafka_produce_call["data"]["uuid"], "017d37c1-f285-0000-0e8b-e02d131925dc")
+        self.assertEqual(kafka_send_call["data"]["uuid"], "017d37c1-f285-0000-0e8b-e02d131925dc")
 
-    @patch("ee.kafka_client.client._KafkaProducer.produce")
-    def test_kafka_connection_error(self, kafka_produce):
-        kafka_produce.side_effect = NoBrokersAvailable()
+    @patch("ee.kafka_client.client.TestKafkaProducer.send", return_value=None)
+    def test_kafka_connection_error(self, kafka_send):
+        kafka_send.side_effect = NoBrokersAvailable()
         response = self.client.post(
             "/capture/",
             {
@@ -178,5 +178,6 @@ class TestCaptureAPI(APIBaseTest):
                 "code": "server_error",
                 "detail": "Unable to store event. Please try again. If you are the owner of this app you can check the logs for further details.",
                 "attr": None,
+                "failed_event_uuids": [json.loads(kafka_send.call_args[1]["value"])["uuid"]],
             },
         )
@@ -0,0 +1,56 @@
+# isort: skip_file
+# Needs to be first to set up django environment
+from .helpers import *
+from datetime import timedelta
+
+from ee.clickhouse.models.event import bulk_insert_events
+from ee.clickhouse.models.person import bulk_insert_person_distinct_ids, bulk_insert_persons
+from posthog.client import sync_execute
+from posthog.models import Person
+
+BENCHMARK_TEAM_ID = 999_999
+
+
+class BulkInsertSuite:
+    """
+    Throughput of writing events, persons and distinct IDs straight to ClickHouse, as test fixtures and demo data do.
+
+    Like `FeatureFlagSuite`, this runs against the local test database rather than the pre-filled node. Rows are
+    written to a team ID no real team uses and deleted again afterwards.
+    """
+
+    timeout = 600.0
+    version = "v001"
+    params = [10_000, 100_000, 1_000_000]
+    param_names = ["row_count"]
+
+    def setup(self, row_count):
+        start = now() - timedelta(days=30)
+        self.persons = [
+            Person(team_id=BENCHMARK_TEAM_ID, properties={"email": f"{index}@posthog.com", "plan": index % 3})
+            for index in range(row_count // 10)
+        ]
+        self.distinct_ids = [
+            (f"person-{index}", person.uuid, BENCHMARK_TEAM_ID) for index, person in enumerate(self.persons)
+        ]
+        self.events = [
+            {
+                "event": "$pageview" if index % 4 else "$autocapture",
+                "team_id": BENCHMARK_TEAM_ID,
+                "distinct_id": f"person-{index % max(len(self.persons), 1)}",
+                "timestamp": start + timedelta(seconds=index),
+                "properties": {"$current_url": f"https://posthog.com/{index % 50}", "$browser": "Chrome"},
+            }
+            for index in range(row_count)
+        ]
+
+    def teardown(self, row_count):
+        for table in ["events", "person", "person_distinct_id2"]:
+            sync_execute(f"ALTER TABLE {table} DELETE WHERE team_id = %(team_id)s", {"team_id": BENCHMARK_TEAM_ID})
+
+    def time_bulk_insert_events(self, row_count):
+        bulk_insert_events(self.events)
+
+    def time_bulk_insert_persons(self, row_count):
+        bulk_insert_persons(self.persons)
+        bulk_insert_person_distinct_ids(self.distinct_ids)
@@ -0,0 +1,49 @@
+# isort: skip_file
+# Needs to be first to set up django environment
+from .helpers import *
+from ee.clickhouse.models.element import chain_to_element_dicts, elements_to_string, parse_elements_chain
+from posthog.models import Element
+
+
+def _elements_chain(index):
+    return elements_to_string(
+        [
+            Element(
+                tag_name="button",
+                attr_class=["btn", "btn-primary", f"btn-{index}"],
+                text=f"Save ✓ {index}",
+                attributes={"attr__data-attr": f"save-button-{index}", "attr__style": "margin: 0; color: red;"},
+                nth_child=2,
+                nth_of_type=1,
+            ),
+            Element(tag_name="div", attr_class=["ant-modal-footer"], nth_child=1, nth_of_type=1),
+            Element(tag_name="div", attr_class=["ant-modal-content"], attr_id="modal", nth_child=1, nth_of_type=1),
+            Element(tag_name="a", href=f"/insights/{index}", nth_child=0, nth_of_type=0),
+            Element(tag_name="body", nth_child=2, nth_of_type=1),
+        ]
+    )
+
+
+class ElementsChainSuite:
+    """
+    CPU cost of turning `elements_chain` strings into serialized elements, as event lists do for every row.
+
+    `distinct_chains` controls how often chains repeat within a page of 500 events, from all identical to all distinct.
+    Doesn't need ClickHouse or Postgres.
+    """
+
+    version = "v001"
+    params = [1, 50, 500]
+    param_names = ["distinct_chains"]
+
+    def setup(self, distinct_chains):
+        self.chains = [_elements_chain(index % distinct_chains) for index in range(500)]
+
+    def time_chain_to_element_dicts_cold(self, distinct_chains):
+        parse_elements_chain.cache_clear()
+        for chain in self.chains:
+            chain_to_element_dicts(chain)
+
+    def time_chain_to_element_dicts_cached(self, distinct_chains):
+        for chain in self.chains:
+            chain_to_element_dicts(chain)
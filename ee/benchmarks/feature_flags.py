@@ -0,0 +1,63 @@
+# isort: skip_file
+# Needs to be first to set up django environment
+from .helpers import *
+from posthog.models import FeatureFlag, GroupTypeMapping, Organization, Person, Team, User
+from posthog.models.feature_flag import clear_team_feature_flags_cache, get_overridden_feature_flags
+from posthog.models.group import Group
+
+
+class FeatureFlagSuite:
+    """
+    Latency of evaluating all of a team's flags for one distinct_id, as /decide does, by number of flags.
+
+    A quarter of the flags have no properties, half filter on person properties and a quarter on group properties.
+    Unlike `QuerySuite`, this runs against the local Postgres test database and creates its own data.
+    """
+
+    timeout = 600.0
+    version = "v001"
+    params = [1, 10, 40, 100]
+    param_names = ["flag_count"]
+
+    def setup(self, flag_count):
+        self.organization = Organization.objects.create(name="feature flag benchmarks")
+        self.team = Team.objects.create(organization=self.organization, api_token=f"benchmark-{flag_count}")
+        user = User.objects.create_and_join(self.organization, f"flags-{flag_count}@posthog.com", None)
+
+        GroupTypeMapping.objects.create(team=self.team, group_type="organization", group_type_index=0)
+        Group.objects.create(
+            team=self.team, group_type_index=0, group_key="PostHog", group_properties={"plan": "scale"}, version=1
+        )
+        Person.objects.create(
+            team=self.team, distinct_ids=["distinct_id"], properties={"email": "tim@posthog.com", "realm": "cloud"}
+        )
+
+        for index in range(flag_count):
+            if index % 4 == 0:
+                filters = {"groups": [{"rollout_percentage": 50}]}
+            elif index % 4 == 3:
+                filters = {
+                    "aggregation_group_type_index": 0,
+                    "groups": [
+                        {"properties": [{"key": "plan", "value": "scale", "type": "group", "group_type_index": 0}]}
+                    ],
+                }
+            else:
+                filters = {
+                    "groups": [
+                        {"properties": [{"key": "email", "value": "posthog.com", "operator": "icontains"}]},
+                        {"properties": [{"key": "realm", "value": "hosted"}], "rollout_percentage": 20},
+                    ]
+                }
+            FeatureFlag.objects.create(team=self.team, key=f"flag-{index}", created_by=user, filters=filters)
+
+    def teardown(self, flag_count):
+        self.organization.delete()
+        User.objects.filter(email=f"flags-{flag_count}@posthog.com").delete()
+
+    def time_decide_flags_cold(self, flag_count):
+        clear_team_feature_flags_cache()
+        get_overridden_feature_flags(self.team.pk, "distinct_id", {"organization": "PostHog"})
+
+    def time_decide_flags_cached(self, flag_count):
+        get_overridden_feature_flags(self.team.pk, "distinct_id", {"organization": "PostHog"})
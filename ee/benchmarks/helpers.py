@@ -23,12 +23,12 @@ get_column = lambda rows, index: [row[index] for row in rows]
 
 def run_query(fn, *args):
     uuid = str(UUIDT())
-    client._request_information = {"kind": "benchmark", "id": f"{uuid}::${fn.__name__}"}
+    token = client._request_information.set({"kind": "benchmark", "id": f"{uuid}::${fn.__name__}"})
     try:
         fn(*args)
         return get_clickhouse_query_stats(uuid)
     finally:
-        client._request_information = None
+        client._request_information.reset(token)
 
 
 def get_clickhouse_query_stats(uuid):
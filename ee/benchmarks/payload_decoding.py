@@ -0,0 +1,70 @@
+# isort: skip_file
+# Needs to be first to set up django environment
+from .helpers import *
+import base64
+import gzip
+import json
+
+import lzstring
+
+from posthog.payload_decoding import decode_payload
+
+
+def _sdk_event(index):
+    return {
+        "event": "$autocapture" if index % 3 else "$pageview",
+        "properties": {
+            "$os": "Mac OS X",
+            "$browser": "Chrome",
+            "$device_type": "Desktop",
+            "$current_url": f"https://app.posthog.com/insights?insight=TRENDS&index={index}",
+            "$host": "app.posthog.com",
+            "$pathname": "/insights",
+            "$browser_version": 96,
+            "$screen_height": 1117,
+            "$screen_width": 1728,
+            "$lib": "web",
+            "$lib_version": "1.17.8",
+            "$insert_id": f"insert-{index}",
+            "$time": 1640000000.123 + index,
+            "distinct_id": "17c4a4fd1d4e-0cd6e4db8b0ea4-1c306851-1fa400-17c4a4fd1d5a60",
+            "$device_id": "17c4a4fd1d4e-0cd6e4db8b0ea4-1c306851-1fa400-17c4a4fd1d5a60",
+            "$event_type": "click",
+            "$ce_version": 1,
+            "$elements": [
+                {"tag_name": "button", "$el_text": "Save ✓", "classes": ["btn", "btn-primary"], "nth_child": 2},
+                {"tag_name": "div", "classes": ["ant-modal-footer"], "nth_child": 1, "nth_of_type": 1},
+            ],
+            "token": "phc_benchmarktoken",
+            "$session_id": "17dd7b7c1e1a4e-0e0c8b4f8c2b5b-1c306851-1fa400-17dd7b7c1e2a0f",
+            "$window_id": "17dd7b7c1e3b4f-0a0d6e3f0b64c4-1c306851-1fa400-17dd7b7c1e46e2",
+        },
+        "timestamp": "2021-12-20T12:00:00.000Z",
+    }
+
+
+class PayloadDecodingSuite:
+    """
+    CPU cost of decoding capture request bodies, by encoding and by number of events in the batch.
+
+    Payloads mimic what posthog-js sends: `gzip-js` and `lz64` bodies for /e/ and /batch/, and base64 `data` params
+    from older clients. Doesn't need ClickHouse or Postgres.
+    """
+
+    version = "v001"
+    params = [["json", "base64", "gzip-js", "lz64"], [1, 50, 500]]
+    param_names = ["compression", "event_count"]
+
+    def setup(self, compression, event_count):
+        body = json.dumps([_sdk_event(index) for index in range(event_count)])
+        if compression == "base64":
+            self.data, self.compression = base64.b64encode(body.encode()), ""
+        elif compression == "gzip-js":
+            self.data, self.compression = gzip.compress(body.encode()), "gzip-js"
+        elif compression == "lz64":
+            self.data, self.compression = lzstring.LZString().compressToBase64(body).encode(), "lz64"
+        else:
+            self.data, self.compression = body.encode(), ""
+
+    def time_decode_payload(self, compression, event_count):
+        decode_payload(self.data, self.compression)
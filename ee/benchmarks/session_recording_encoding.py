@@ -0,0 +1,67 @@
+# isort: skip_file
+# Needs to be first to set up django environment
+from .helpers import *
+import json
+import random
+
+from posthog.helpers.session_recording import (
+    COMPRESSION_GZIP_BASE64,
+    COMPRESSION_UTF8_GZIP_BASE64,
+    compress_to_string,
+    decompress,
+)
+
+
+def _node(rng, node_id, depth):
+    children = [] if depth == 0 else [_node(rng, node_id * 10 + index, depth - 1) for index in range(rng.randint(1, 4))]
+    return {
+        "type": 2,
+        "tagName": rng.choice(["div", "span", "button", "a", "li", "svg"]),
+        "attributes": {"class": f"ant-btn ant-btn-primary css-{rng.randint(0, 9999)}", "data-attr": "save-insight"},
+        "childNodes": children,
+        "id": node_id,
+    }
+
+
+def _sample_recording(event_count):
+    """A full snapshot followed by mouse moves, scrolls, inputs and DOM mutations, roughly like posthog-js sends."""
+    rng = random.Random(0)
+    events = [{"type": 2, "timestamp": 1_640_000_000_000, "data": {"node": _node(rng, 1, 5)}}]
+    for index in range(event_count):
+        source = rng.choice([0, 1, 1, 1, 2, 3, 5])
+        data = {"source": source}
+        if source == 1:
+            data["positions"] = [{"x": rng.randint(0, 1800), "y": rng.randint(0, 1100), "id": 42, "timeOffset": -50}]
+        elif source == 0:
+            data["adds"] = [{"parentId": 4, "nextId": None, "node": _node(rng, index, 1)}]
+            data["texts"] = [{"id": index, "value": "Saved insight “Weekly active users” 🎉"}]
+        elif source == 5:
+            data["text"] = "hello@posthog.com"
+        events.append({"type": 3, "timestamp": 1_640_000_000_000 + index * 50, "data": data})
+    return json.dumps(events)
+
+
+class SessionRecordingEncodingSuite:
+    """
+    Size and CPU cost of session recording chunk encodings, on synthetic recordings of a given number of events.
+    Doesn't need ClickHouse or Postgres.
+    """
+
+    version = "v001"
+    params = [[COMPRESSION_GZIP_BASE64, COMPRESSION_UTF8_GZIP_BASE64], [100, 2000]]
+    param_names = ["compression", "event_count"]
+
+    def setup(self, compression, event_count):
+        self.json_string = _sample_recording(event_count)
+        self.compressed = compress_to_string(self.json_string, compression)
+
+    def time_compress(self, compression, event_count):
+        compress_to_string(self.json_string, compression)
+
+    def time_decompress(self, compression, event_count):
+        decompress(self.compressed, compression)
+
+    def track_compressed_bytes(self, compression, event_count):
+        return len(self.compressed)
+
+    track_compressed_bytes.unit = "bytes"  # type: ignore
@@ -0,0 +1,45 @@
+# isort: skip_file
+# Needs to be first to set up django environment
+from .helpers import *
+from datetime import datetime, timedelta
+
+from ee.clickhouse.queries.trends.breakdown import ClickhouseTrendsBreakdown
+from ee.clickhouse.queries.trends.clickhouse_trends import ClickhouseTrends
+from posthog.models import Filter, Team
+from posthog.queries.base import convert_to_comparison
+
+
+class TrendsFormattingSuite:
+    """
+    CPU cost of turning a breakdown trend's query result into its API response, by number of breakdown values, for a
+    year of daily data points. Nothing is queried: the result rows are generated up front.
+    """
+
+    version = "v001"
+    params = [10, 100, 500]
+    param_names = ["breakdown_values"]
+
+    def setup(self, breakdown_values):
+        self.team = Team(id=1, name="benchmark")
+        self.filter = Filter(
+            data={
+                "events": [{"id": "$pageview", "name": "$pageview", "type": "events", "order": 0}],
+                "breakdown": "$browser",
+                "date_from": "2021-01-01",
+                "date_to": "2021-12-31",
+                "display": "ActionsLineGraphCumulative",
+            }
+        )
+        self.entity = self.filter.entities[0]
+        dates = [datetime(2021, 1, 1) + timedelta(days=day) for day in range(365)]
+        self.result = [
+            (dates, [(day * value) % 97 for day in range(365)], f"browser-{value}") for value in range(breakdown_values)
+        ]
+
+    def time_format_breakdown_result(self, breakdown_values):
+        trends = ClickhouseTrends()
+        parse_function = ClickhouseTrendsBreakdown(self.entity, self.filter, self.team)._parse_trend_result(
+            self.filter, self.entity
+        )
+        serialized = trends._handle_cumulative(trends._format_serialized(self.entity, parse_function(self.result)))
+        convert_to_comparison(serialized, self.filter, "current")
@@ -1,20 +1,29 @@
 import re
-from collections import defaultdict
+from collections import Counter, defaultdict
+from dataclasses import dataclass
 from datetime import timedelta
 from typing import Dict, Generator, List, Optional, Set, Tuple
 
 import structlog
+from statshog.defaults.django import statsd
 
 from ee.clickhouse.materialized_columns.columns import (
+    MATERIALIZED_COLUMN_PREFIXES,
+    ColumnName,
     backfill_materialized_columns,
+    drop_materialized_column,
     get_materialized_columns,
     materialize,
+    trim_and_extract_property,
 )
 from ee.clickhouse.materialized_columns.util import instance_memoize
+from ee.clickhouse.replication.utils import clickhouse_is_replicated
 from ee.clickhouse.sql.person import GET_PERSON_PROPERTIES_COUNT
 from ee.settings import (
     MATERIALIZE_COLUMNS_ANALYSIS_PERIOD_HOURS,
     MATERIALIZE_COLUMNS_BACKFILL_PERIOD_DAYS,
+    MATERIALIZE_COLUMNS_DROP_UNUSED,
+    MATERIALIZE_COLUMNS_DROP_UNUSED_MIN_ANALYSIS_HOURS,
     MATERIALIZE_COLUMNS_MAX_AT_ONCE,
     MATERIALIZE_COLUMNS_MINIMUM_QUERY_TIME,
 )
@@ -23,11 +32,44 @@ from posthog.models.filters.mixins.utils import cached_property
 from posthog.models.property import PropertyName, TableWithProperties
 from posthog.models.property_definition import PropertyDefinition
 from posthog.models.team import Team
+from posthog.settings import CLICKHOUSE_CLUSTER, CLICKHOUSE_DATABASE, UPDATE_CACHED_DASHBOARD_ITEMS_INTERVAL_SECONDS
 
 Suggestion = Tuple[TableWithProperties, PropertyName, int]
 
 logger = structlog.get_logger(__name__)
 
+# Matches `JSONExtract*(column, 'property', ...)`, `JSONHas(column, 'property')`, `visitParamExtract*(...)` and
+# `has(JSONExtractKeys(column), 'property')`, capturing the (optionally table-qualified) column and the property
+_STRING_LITERAL = r"'((?:[^'\\]|\\.)*)'"
+_JSON_FUNCTION_ACCESS = r"(?:JSONExtract\w*|JSONHas|visitParamExtract\w*)\(\s*((?:\w+\.)?\w+)\s*,\s*" + _STRING_LITERAL
+_JSON_KEYS_ACCESS = r"has\(\s*JSONExtractKeys\(\s*((?:\w+\.)?\w+)\s*\)\s*,\s*" + _STRING_LITERAL
+PROPERTY_ACCESS_REGEX = re.compile(f"{_JSON_FUNCTION_ACCESS}|{_JSON_KEYS_ACCESS}")
+_ESCAPE_SEQUENCE_REGEX = re.compile(r"\\(.)")
+
+# How the JSON columns are referred to in queries, where the column alone tells which table's properties are read
+PERSON_PROPERTIES_COLUMNS = {"person_props", "person_properties", "person.properties"}
+GROUP_PROPERTIES_COLUMN_REGEX = re.compile(r"^(?:\w+\.)?group_properties(?:_\d+)?$|^groups\.\w+$")
+EVENT_PROPERTIES_COLUMNS = {"events.properties", "e.properties"}
+
+# Rows read to estimate what share of the JSON column a materialized property would take up
+SIZE_ESTIMATE_SAMPLE_ROWS = 100_000
+
+PROPERTIES_COLUMN: Dict[TableWithProperties, str] = {
+    "events": "properties",
+    "person": "properties",
+    "groups": "group_properties",
+}
+
+
+def _table_of_column(column: str) -> Optional[TableWithProperties]:
+    if column in PERSON_PROPERTIES_COLUMNS:
+        return "person"
+    if GROUP_PROPERTIES_COLUMN_REGEX.match(column):
+        return "groups"
+    if column in EVENT_PROPERTIES_COLUMNS:
+        return "events"
+    return None
+
 
 class TeamManager:
     @instance_memoize
@@ -39,12 +81,27 @@ class TeamManager:
     def event_properties(self, team_id: str) -> Set[str]:
         return set(PropertyDefinition.objects.filter(team_id=team_id).values_list("name", flat=True))
 
+    @instance_memoize
+    def group_properties(self, team_id: str) -> Set[str]:
+        rows = sync_execute(
+            "SELECT DISTINCT arrayJoin(JSONExtractKeys(group_properties)) FROM groups WHERE team_id = %(team_id)s",
+            {"team_id": team_id},
+        )
+        return set(name for name, in rows)
+
 
 class Query:
-    def __init__(self, query_string: str, query_time_ms: float, min_query_time=MATERIALIZE_COLUMNS_MINIMUM_QUERY_TIME):
+    def __init__(
+        self,
+        query_string: str,
+        query_time_ms: float,
+        min_query_time=MATERIALIZE_COLUMNS_MINIMUM_QUERY_TIME,
+        read_bytes: int = 0,
+    ):
         self.query_string = query_string
         self.query_time_ms = query_time_ms
         self.min_query_time = min_query_time
+        self.read_bytes = read_bytes
 
     @property
     def cost(self) -> int:
@@ -60,19 +117,37 @@ class Query:
         return matches[0] if matches else None
 
     @cached_property
-    def _all_properties(self) -> List[PropertyName]:
-        return re.findall(r"JSONExtract\w+\(\S+, '([^']+)'\)", self.query_string)
+    def _all_properties(self) -> List[Tuple[str, PropertyName]]:
+        "Returns `(column, property)` for each distinct property access, in order of appearance"
+        accesses: Dict[Tuple[str, PropertyName], None] = {}
+        for match in PROPERTY_ACCESS_REGEX.finditer(self.query_string):
+            column = match.group(1) or match.group(3)
+            property = _ESCAPE_SEQUENCE_REGEX.sub(r"\1", match.group(2) if match.group(1) else match.group(4))
+            accesses[(column, property)] = None
+        return list(accesses)
 
     def properties(self, team_manager: TeamManager) -> Generator[Tuple[TableWithProperties, PropertyName], None, None]:
-        # Reverse-engineer whether a property is an "event" or "person" property by getting their event definitions.
-        # :KLUDGE: Note that the same property will be found on both tables if both are used.
-        person_props = team_manager.person_properties(self.team_id)
-        event_props = team_manager.event_properties(self.team_id)
-        for property in self._all_properties:
-            if property in person_props:
-                yield "person", property
-            if property in event_props:
-                yield "events", property
+        # Where the column doesn't tell, reverse-engineer whether a property is an "event" or "person" property by
+        # getting their event definitions.
+        # :KLUDGE: Note that the same property will then be found on both tables if both are used.
+        known_properties: Dict[TableWithProperties, Set[str]] = {
+            "events": team_manager.event_properties(self.team_id),
+            "person": team_manager.person_properties(self.team_id),
+        }
+        found: Dict[Tuple[TableWithProperties, PropertyName], None] = {}
+        for column, property in self._all_properties:
+            table = _table_of_column(column)
+            if table == "groups":
+                if property in team_manager.group_properties(self.team_id):
+                    found[("groups", property)] = None
+            elif table is not None:
+                if property in known_properties[table]:
+                    found[(table, property)] = None
+            else:
+                for table in ("person", "events"):
+                    if property in known_properties[table]:
+                        found[(table, property)] = None
+        yield from found
 
 
 def get_queries(since_hours_ago: int, min_query_time: int) -> List[Query]:
@@ -82,7 +157,8 @@ def get_queries(since_hours_ago: int, min_query_time: int) -> List[Query]:
         f"""
         SELECT
             query,
-            query_duration_ms
+            query_duration_ms,
+            read_bytes
         FROM system.query_log
         WHERE
             query NOT LIKE '%%query_log%%'
@@ -95,29 +171,234 @@ def get_queries(since_hours_ago: int, min_query_time: int) -> List[Query]:
         """,
         {"since": since_hours_ago, "min_query_time": min_query_time},
     )
-    return [Query(query, query_duration_ms, min_query_time) for query, query_duration_ms in raw_queries]
+    return [
+        Query(query, query_duration_ms, min_query_time, read_bytes)
+        for query, query_duration_ms, read_bytes in raw_queries
+    ]
+
+
+def _data_table(table: TableWithProperties) -> str:
+    return "sharded_events" if clickhouse_is_replicated() and table == "events" else table
+
+
+def _properties_column_share(table: TableWithProperties) -> float:
+    "Returns the share of the table's compressed bytes taken up by its JSON properties column"
+    [(properties_bytes, total_bytes)] = sync_execute(
+        """
+        SELECT sumIf(data_compressed_bytes, name = %(column)s), sum(data_compressed_bytes)
+        FROM system.columns
+        WHERE database = %(database)s AND table = %(table)s
+        """,
+        {"database": CLICKHOUSE_DATABASE, "table": _data_table(table), "column": PROPERTIES_COLUMN[table]},
+    )
+    return properties_bytes / total_bytes if total_bytes else 0.0
+
+
+def _materialized_size_ratio(table: TableWithProperties, property: PropertyName) -> float:
+    "Returns the estimated size of a column materializing `property`, relative to the JSON column"
+    column = PROPERTIES_COLUMN[table]
+    [(property_bytes, properties_bytes)] = sync_execute(
+        f"""
+        SELECT sum(length({trim_and_extract_property(table)})), sum(length({column}))
+        FROM (SELECT {column} FROM {table} LIMIT %(limit)s)
+        """,
+        {"property": property, "limit": SIZE_ESTIMATE_SAMPLE_ROWS},
+    )
+    return property_bytes / properties_bytes if properties_bytes else 1.0
+
+
+def simulate_bytes_saved(
+    table: TableWithProperties, property: PropertyName, bytes_read: float, properties_column_share: float
+) -> int:
+    """
+    Estimates how many bytes queries that read `bytes_read` bytes while extracting `property` would have saved by
+    reading a materialized column instead of the JSON properties column.
+    """
+    return int(bytes_read * properties_column_share * (1 - _materialized_size_ratio(table, property)))
 
 
 def analyze(queries: List[Query]) -> List[Suggestion]:
     """
     Analyzes query history to find which properties could get materialized.
 
-    Returns an ordered list of suggestions by cost.
+    Returns an ordered list of suggestions by estimated bytes saved, then by cost.
     """
 
     team_manager = TeamManager()
     costs: defaultdict = defaultdict(int)
+    bytes_read: defaultdict = defaultdict(float)
 
     for query in queries:
         if not query.is_valid:
             continue
 
-        for table, property in query.properties(team_manager):
+        properties = list(query.properties(team_manager))
+        properties_per_table = Counter(table for table, _ in properties)
+        for table, property in properties:
             costs[(table, property)] += query.cost
+            # Bytes read are split evenly between the properties a query extracts from the same table
+            bytes_read[(table, property)] += query.read_bytes / properties_per_table[table]
 
-    return [
-        (table, property_name, cost) for (table, property_name), cost in sorted(costs.items(), key=lambda kv: -kv[1])
+    properties_column_shares = {table: _properties_column_share(table) for table, _ in bytes_read}
+    bytes_saved = {
+        (table, property): simulate_bytes_saved(
+            table, property, bytes_read[(table, property)], properties_column_shares[table]
+        )
+        if bytes_read[(table, property)] > 0
+        else 0
+        for table, property in costs
+    }
+    suggestions = sorted(costs.items(), key=lambda kv: (-bytes_saved[kv[0]], -kv[1]))
+    for (table, property_name), cost in suggestions:
+        logger.info(
+            f"Materialization candidate. table={table}, property_name={property_name}, cost={cost}, "
+            f"estimated_bytes_saved={bytes_saved[(table, property_name)]}"
+        )
+    return [(table, property_name, cost) for (table, property_name), cost in suggestions]
+
+
+@dataclass
+class MaterializedColumnUsage:
+    table: TableWithProperties
+    property_name: PropertyName
+    column_name: ColumnName
+    queries_reading_column: int
+    total_duration_ms_reading_column: int
+    queries_extracting_property: int
+    total_duration_ms_extracting_property: int
+
+    @property
+    def is_referenced(self) -> bool:
+        return self.queries_reading_column > 0 or self.queries_extracting_property > 0
+
+    @property
+    def is_droppable(self) -> bool:
+        # Columns set up by migrations are relied on by name
+        return self.column_name.startswith(MATERIALIZED_COLUMN_PREFIXES[self.table])
+
+    @property
+    def speedup(self) -> Optional[float]:
+        "How many times faster queries reading the column were on average than ones extracting it from JSON"
+        if not self.queries_reading_column or not self.queries_extracting_property:
+            return None
+        average_reading_column = self.total_duration_ms_reading_column / self.queries_reading_column
+        average_extracting_property = self.total_duration_ms_extracting_property / self.queries_extracting_property
+        return average_extracting_property / average_reading_column if average_reading_column else None
+
+
+def get_materialized_column_usage(since_hours_ago: int) -> List[MaterializedColumnUsage]:
+    """
+    Counts the queries since the cutoff that read each materialized column, and the ones that extracted the same
+    property from JSON instead, e.g. because they ran before the column existed. Every query but inserts counts,
+    whether it came from a request, a Celery task (e.g. a dashboard refresh) or elsewhere, on any replica.
+    """
+    columns = [
+        (table, property_name, column_name)
+        for table in PROPERTIES_COLUMN
+        for property_name, column_name in get_materialized_columns(table, use_cache=False).items()
     ]
+    if not columns:
+        return []
+
+    rows = sync_execute(
+        """
+        SELECT
+            column_index,
+            countIf(reads_column),
+            sumIf(query_duration_ms, reads_column),
+            countIf(NOT reads_column AND position(query, property_literal) > 0),
+            sumIf(query_duration_ms, NOT reads_column AND position(query, property_literal) > 0)
+        FROM (
+            SELECT
+                query,
+                query_duration_ms,
+                column_index,
+                property_literal,
+                position(query, column_reference) > 0 AS reads_column
+            FROM clusterAllReplicas(%(cluster)s, system, query_log)
+            ARRAY JOIN
+                arrayEnumerate(%(column_references)s) AS column_index,
+                %(column_references)s AS column_reference,
+                %(property_literals)s AS property_literal
+            WHERE
+                query NOT LIKE '%%query_log%%'
+                AND query NOT LIKE '%%INSERT%%'
+                AND type = 'QueryFinish'
+                AND query_start_time > now() - toIntervalHour(%(since)s)
+        )
+        GROUP BY column_index
+        """,
+        {
+            "since": since_hours_ago,
+            "cluster": CLICKHOUSE_CLUSTER,
+            # Materialized columns are always quoted in queries, see `get_property_string_expr`
+            "column_references": [f'"{column_name}"' for _, _, column_name in columns],
+            "property_literals": [
+                "'" + property_name.replace("\\", "\\\\").replace("'", "\\'") + "'" for _, property_name, _ in columns
+            ],
+        },
+    )
+    counts = {column_index: row for column_index, *row in rows}
+    usage = []
+    for index, (table, property_name, column_name) in enumerate(columns):
+        reading_column, reading_column_ms, extracting_property, extracting_property_ms = counts.get(index + 1, (0,) * 4)
+        usage.append(
+            MaterializedColumnUsage(
+                table=table,
+                property_name=property_name,
+                column_name=column_name,
+                queries_reading_column=reading_column,
+                total_duration_ms_reading_column=reading_column_ms,
+                queries_extracting_property=extracting_property,
+                total_duration_ms_extracting_property=extracting_property_ms,
+            )
+        )
+    return usage
+
+
+def report_materialized_column_usage(usage: List[MaterializedColumnUsage]) -> None:
+    "Logs whether queries got faster after materializing each column"
+    for column in usage:
+        speedup = column.speedup
+        logger.info(
+            f"Materialized column usage. table={column.table}, property_name={column.property_name}, "
+            f"column_name={column.column_name}, queries_reading_column={column.queries_reading_column}, "
+            f"queries_extracting_property={column.queries_extracting_property}, speedup={speedup}"
+        )
+        if speedup is not None:
+            statsd.gauge(
+                "materialized_column_speedup",
+                speedup,
+                tags={"table": column.table, "property_name": column.property_name},
+            )
+
+
+def drop_unused_materialized_columns(
+    usage: List[MaterializedColumnUsage], analyzed_hours: int, dry_run: bool = False
+) -> List[ColumnName]:
+    """
+    Drops columns created by this module that no query referenced during the `analyzed_hours` that `usage` covers,
+    returning their names. Nothing is dropped if that period is too short to have seen every periodic query.
+    """
+    minimum_hours = max(
+        MATERIALIZE_COLUMNS_DROP_UNUSED_MIN_ANALYSIS_HOURS, UPDATE_CACHED_DASHBOARD_ITEMS_INTERVAL_SECONDS / 3600
+    )
+    if analyzed_hours < minimum_hours:
+        logger.warning(
+            f"Not dropping unused materialized columns, usage must be analyzed over at least {minimum_hours} hours. "
+            f"analyzed_hours={analyzed_hours}"
+        )
+        return []
+
+    unused = [column for column in usage if column.is_droppable and not column.is_referenced]
+    for column in unused:
+        logger.info(
+            f"{'Would drop' if dry_run else 'Dropping'} unused materialized column. table={column.table}, "
+            f"property_name={column.property_name}, column_name={column.column_name}"
+        )
+        if not dry_run:
+            drop_materialized_column(column.table, column.column_name)
+    return [column.column_name for column in unused]
 
 
 def materialize_properties_task(
@@ -126,13 +407,19 @@ def materialize_properties_task(
     maximum: int = MATERIALIZE_COLUMNS_MAX_AT_ONCE,
     min_query_time: int = MATERIALIZE_COLUMNS_MINIMUM_QUERY_TIME,
     backfill_period_days: int = MATERIALIZE_COLUMNS_BACKFILL_PERIOD_DAYS,
+    drop_unused: bool = MATERIALIZE_COLUMNS_DROP_UNUSED,
     dry_run: bool = False,
 ) -> None:
     """
-    Creates materialized columns for event and person properties based off of slow queries
+    Creates materialized columns for event, person and group properties based off of slow queries, after reporting
+    how existing materialized columns are used and dropping unused ones if `drop_unused` is set.
     """
 
     if columns_to_materialize is None:
+        usage = get_materialized_column_usage(time_to_analyze_hours)
+        report_materialized_column_usage(usage)
+        drop_unused_materialized_columns(usage, time_to_analyze_hours, dry_run=dry_run or not drop_unused)
+
         columns_to_materialize = analyze(get_queries(time_to_analyze_hours, min_query_time))
     result = []
     for suggestion in columns_to_materialize:
@@ -148,6 +435,7 @@ def materialize_properties_task(
     properties: Dict[TableWithProperties, List[PropertyName]] = {
         "events": [],
         "person": [],
+        "groups": [],
     }
     for table, property_name, cost in result[:maximum]:
         logger.info(f"Materializing column. table={table}, property_name={property_name}, cost={cost}")
@@ -160,3 +448,4 @@ def materialize_properties_task(
         logger.info(f"Starting backfill for new materialized columns. period_days={backfill_period_days}")
         backfill_materialized_columns("events", properties["events"], timedelta(days=backfill_period_days))
         backfill_materialized_columns("person", properties["person"], timedelta(days=backfill_period_days))
+        backfill_materialized_columns("groups", properties["groups"], timedelta(days=backfill_period_days))
@@ -18,6 +18,10 @@ ColumnName = str
 TablesWithMaterializedColumns = Union[TableWithProperties, Literal["session_recording_events"]]
 
 TRIM_AND_EXTRACT_PROPERTY = trim_quotes_expr("JSONExtractRaw(properties, %(property)s)")
+TRIM_AND_EXTRACT_GROUP_PROPERTY = trim_quotes_expr("JSONExtractRaw(group_properties, %(property)s)")
+
+# Prefixes of the columns created by `materialize`, as opposed to ones named by migrations
+MATERIALIZED_COLUMN_PREFIXES: Dict[TableWithProperties, str] = {"events": "mat_", "person": "pmat_", "groups": "gmat_"}
 
 
 @cache_for(timedelta(minutes=15))
@@ -48,6 +52,7 @@ def materialize(table: TableWithProperties, property: PropertyName, column_name=
     column_name = column_name or materialized_column_name(table, property)
     # :TRICKY: On cloud, we ON CLUSTER updates to events/sharded_events but not to persons. Why? ¯\_(ツ)_/¯
     execute_on_cluster = f"ON CLUSTER '{CLICKHOUSE_CLUSTER}'" if table == "events" else ""
+    property_expression = trim_and_extract_property(table)
 
     if clickhouse_is_replicated() and table == "events":
         sync_execute(
@@ -55,7 +60,7 @@ def materialize(table: TableWithProperties, property: PropertyName, column_name=
             ALTER TABLE sharded_{table}
             {execute_on_cluster}
             ADD COLUMN IF NOT EXISTS
-            {column_name} VARCHAR MATERIALIZED {TRIM_AND_EXTRACT_PROPERTY}
+            {column_name} VARCHAR MATERIALIZED {property_expression}
         """,
             {"property": property},
         )
@@ -73,7 +78,7 @@ def materialize(table: TableWithProperties, property: PropertyName, column_name=
             ALTER TABLE {table}
             {execute_on_cluster}
             ADD COLUMN IF NOT EXISTS
-            {column_name} VARCHAR MATERIALIZED {TRIM_AND_EXTRACT_PROPERTY}
+            {column_name} VARCHAR MATERIALIZED {property_expression}
         """,
             {"property": property},
         )
@@ -84,6 +89,17 @@ def materialize(table: TableWithProperties, property: PropertyName, column_name=
     )
 
 
+def drop_materialized_column(table: TableWithProperties, column_name: ColumnName) -> None:
+    # :TRICKY: On cloud, we ON CLUSTER updates to events/sharded_events but not to persons. Why? ¯\_(ツ)_/¯
+    execute_on_cluster = f"ON CLUSTER '{CLICKHOUSE_CLUSTER}'" if table == "events" else ""
+
+    if clickhouse_is_replicated() and table == "events":
+        sync_execute(f"ALTER TABLE {table} {execute_on_cluster} DROP COLUMN IF EXISTS {column_name}")
+        sync_execute(f"ALTER TABLE sharded_{table} {execute_on_cluster} DROP COLUMN IF EXISTS {column_name}")
+    else:
+        sync_execute(f"ALTER TABLE {table} {execute_on_cluster} DROP COLUMN IF EXISTS {column_name}")
+
+
 def backfill_materialized_columns(
     table: TableWithProperties, properties: List[PropertyName], backfill_period: timedelta, test_settings=None
 ) -> None:
@@ -111,7 +127,7 @@ def backfill_materialized_columns(
             ALTER TABLE {updated_table}
             {execute_on_cluster}
             MODIFY COLUMN
-            {materialized_columns[property]} VARCHAR DEFAULT {TRIM_AND_EXTRACT_PROPERTY}
+            {materialized_columns[property]} VARCHAR DEFAULT {trim_and_extract_property(table)}
             """,
             {"property": property},
             settings=test_settings,
@@ -137,7 +153,7 @@ def backfill_materialized_columns(
 def materialized_column_name(table: TableWithProperties, property: PropertyName) -> str:
     "Returns a sanitized and unique column name to use for materialized column"
 
-    prefix = "mat_" if table == "events" else "pmat_"
+    prefix = MATERIALIZED_COLUMN_PREFIXES[table]
     property_str = re.sub("[^0-9a-zA-Z$]", "_", property)
 
     existing_materialized_columns = set(get_materialized_columns(table, use_cache=False).values())
@@ -151,3 +167,7 @@ def materialized_column_name(table: TableWithProperties, property: PropertyName)
 
 def extract_property(comment: str) -> PropertyName:
     return comment.split("::", 1)[1]
+
+
+def trim_and_extract_property(table: TableWithProperties) -> str:
+    return TRIM_AND_EXTRACT_GROUP_PROPERTY if table == "groups" else TRIM_AND_EXTRACT_PROPERTY
@@ -1,4 +1,10 @@
-from ee.clickhouse.materialized_columns.analyze import Query, TeamManager
+from ee.clickhouse.materialized_columns.analyze import (
+    MaterializedColumnUsage,
+    Query,
+    TeamManager,
+    drop_unused_materialized_columns,
+)
+from ee.clickhouse.models.group import create_group
 from ee.clickhouse.sql.clickhouse import trim_quotes_expr
 from ee.clickhouse.util import ClickhouseTestMixin
 from posthog.models import Person, PropertyDefinition
@@ -58,3 +64,51 @@ class TestMaterializedColumnsAnalyze(ClickhouseTestMixin, BaseTest):
             f"SELECT JSONExtractString(properties, '$unknown_prop') FROM events WHERE team_id = {self.team.pk}", 0
         )
         self.assertEqual(list(query_with_unknown_property.properties(TeamManager())), [])
+
+    def test_query_class_reads_tables_from_columns(self):
+        create_group(team_id=self.team.pk, group_type_index=0, group_key="org:5", properties={"plan": "scale"})
+
+        query = Query(
+            f"""
+            SELECT JSONExtractString(person_props, 'person_prop'), has(JSONExtractKeys(group_properties_0), 'plan')
+            FROM events
+            WHERE team_id = {self.team.pk}
+              AND JSONHas(e.properties, 'event_prop')
+              AND JSONHas(person_props, 'person_prop')
+              AND JSONHas(person_props, 'event_prop')
+            """,
+            4000,
+        )
+
+        self.assertEqual(
+            list(query.properties(TeamManager())),
+            [("person", "person_prop"), ("groups", "plan"), ("events", "event_prop")],
+        )
+
+    def test_materialized_column_usage(self):
+        usage = MaterializedColumnUsage(
+            table="events",
+            property_name="$browser",
+            column_name="mat_$browser",
+            queries_reading_column=2,
+            total_duration_ms_reading_column=2000,
+            queries_extracting_property=1,
+            total_duration_ms_extracting_property=5000,
+        )
+        self.assertTrue(usage.is_referenced)
+        self.assertTrue(usage.is_droppable)
+        self.assertEqual(usage.speedup, 5.0)
+
+        unused_migration_column = MaterializedColumnUsage("events", "$group_0", "$group_0", 0, 0, 0, 0)
+        self.assertFalse(unused_migration_column.is_referenced)
+        self.assertFalse(unused_migration_column.is_droppable)
+        self.assertIsNone(unused_migration_column.speedup)
+
+    def test_drop_unused_materialized_columns_needs_a_long_enough_analysis(self):
+        usage = [
+            MaterializedColumnUsage("events", "$browser", "mat_$browser", 0, 0, 0, 0),
+            MaterializedColumnUsage("events", "$os", "mat_$os", 1, 100, 0, 0),
+        ]
+
+        self.assertEqual(drop_unused_materialized_columns(usage, analyzed_hours=1, dry_run=True), [])
+        self.assertEqual(drop_unused_materialized_columns(usage, analyzed_hours=7 * 24, dry_run=True), ["mat_$browser"])
@@ -4,6 +4,7 @@ from django.urls.base import resolve
 from loginas.utils import is_impersonated_session
 
 from posthog.internal_metrics import incr
+from posthog.queries.query_metadata import query_metadata_scope
 
 
 class CHQueries(object):
@@ -21,18 +22,23 @@ class CHQueries(object):
 
         route = resolve(request.path)
         route_id = f"{route.route} ({route.func.__name__})"
-        client._request_information = {
-            "save": (request.user.pk and (request.user.is_staff or is_impersonated_session(request) or settings.DEBUG)),
-            "user_id": request.user.pk,
-            "kind": "request",
-            "id": route_id,
-        }
-
-        response: HttpResponse = self.get_response(request)
+        token = client._request_information.set(
+            {
+                "save": (
+                    request.user.pk and (request.user.is_staff or is_impersonated_session(request) or settings.DEBUG)
+                ),
+                "user_id": request.user.pk,
+                "kind": "request",
+                "id": route_id,
+            }
+        )
+
+        with query_metadata_scope("request"):
+            response: HttpResponse = self.get_response(request)
 
         if "api/" in route_id and "capture" not in route_id:
             incr("http_api_request_response", tags={"id": route_id, "status_code": response.status_code})
 
-        client._request_information = None
+        client._request_information.reset(token)
 
         return response
@@ -0,0 +1,5 @@
+from infi.clickhouse_orm import migrations
+
+from ee.clickhouse.sql.person import PERSON_DISTINCT_ID_SNAPSHOT_TABLE_SQL
+
+operations = [migrations.RunSQL(PERSON_DISTINCT_ID_SNAPSHOT_TABLE_SQL())]
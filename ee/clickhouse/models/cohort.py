@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional, Tuple, Union
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 
 import structlog
 from dateutil import parser
@@ -15,6 +15,8 @@ from ee.clickhouse.sql.cohort import (
     GET_DISTINCT_ID_BY_ENTITY_SQL,
     GET_PERSON_ID_BY_ENTITY_COUNT_SQL,
     GET_PERSON_ID_BY_PRECALCULATED_COHORT_ID,
+    GET_PERSON_IDS_CHANGED_SINCE_SQL,
+    GET_PERSON_IDS_WITH_EVENTS_SINCE_SQL,
     GET_STATIC_COHORTPEOPLE_BY_PERSON_UUID,
     INSERT_PEOPLE_MATCHING_COHORT_ID_SQL,
     REMOVE_PEOPLE_NOT_MATCHING_COHORT_ID_SQL,
@@ -25,16 +27,20 @@ from ee.clickhouse.sql.person import (
     INSERT_PERSON_STATIC_COHORT,
     PERSON_STATIC_COHORT_TABLE,
 )
-from posthog.client import sync_execute
+from posthog.client import sync_execute, sync_execute_iter
 from posthog.constants import PropertyOperatorType
-from posthog.models import Action, Cohort, Filter, Team
+from posthog.models import Cohort, Filter, Team
 from posthog.models.action.util import format_action_filter
-from posthog.models.property import Property, PropertyGroup
+from posthog.models.property import BehavioralPropertyType, Property, PropertyGroup
 from posthog.queries.person_distinct_id_query import get_team_distinct_ids_query
+from posthog.queries.query_metadata import get_action, get_cohort
 
 # temporary marker to denote when cohortpeople table started being populated
 TEMP_PRECALCULATED_MARKER = parser.parse("2021-06-07T15:00:00+00:00")
 
+# Person and event rows can become queryable a while after the time they're stamped with
+INCREMENTAL_RECALCULATION_OVERLAP = timedelta(minutes=10)
+
 logger = structlog.get_logger(__name__)
 
 
@@ -119,7 +125,7 @@ def get_properties_cohort_subquery(cohort: Cohort, cohort_group: Dict, group_idx
     for idx, prop in enumerate(filter.property_groups.flat):
         if prop.type == "cohort":
             try:
-                prop_cohort: Cohort = Cohort.objects.get(pk=prop.value, team_id=cohort.team_id)
+                prop_cohort: Cohort = get_cohort(prop.value, cohort.team_id)
             except Cohort.DoesNotExist:
                 return "0 = 14", {}
             if prop_cohort.pk == cohort.pk:
@@ -201,7 +207,7 @@ def get_entity_query(
     if event_id:
         return f"event = %({f'event_{group_idx}'})s", {f"event_{group_idx}": event_id}
     elif action_id:
-        action = Action.objects.get(pk=action_id, team_id=team_id)
+        action = get_action(action_id, team_id)
         action_filter_query, action_params = format_action_filter(
             team_id=team_id, action=action, prepend="_{}_action".format(group_idx)
         )
@@ -287,13 +293,15 @@ def format_cohort_subquery(
     return person_query, params
 
 
-def get_person_ids_by_cohort_id(team: Team, cohort_id: int, limit: Optional[int] = None, offset: Optional[int] = None):
+def _format_cohort_person_ids_filter(team: Team, cohort_id: int) -> Tuple[str, Dict[str, Any]]:
     from ee.clickhouse.models.property import parse_prop_grouped_clauses
 
     filters = Filter(data={"properties": [{"key": "id", "value": cohort_id, "type": "cohort"}],})
-    filter_query, filter_params = parse_prop_grouped_clauses(
-        team_id=team.pk, property_group=filters.property_groups, table_name="pdi"
-    )
+    return parse_prop_grouped_clauses(team_id=team.pk, property_group=filters.property_groups, table_name="pdi")
+
+
+def get_person_ids_by_cohort_id(team: Team, cohort_id: int, limit: Optional[int] = None, offset: Optional[int] = None):
+    filter_query, filter_params = _format_cohort_person_ids_filter(team, cohort_id)
 
     results = sync_execute(
         GET_PERSON_IDS_BY_FILTER.format(
@@ -309,6 +317,21 @@ def get_person_ids_by_cohort_id(team: Team, cohort_id: int, limit: Optional[int]
     return [str(row[0]) for row in results]
 
 
+def iter_person_ids_by_cohort_id(team: Team, cohort_id: int, block_size: int) -> Iterator[List[str]]:
+    "Streams all of the cohort's person uuids in blocks of at most `block_size`, reading the result only once."
+    filter_query, filter_params = _format_cohort_person_ids_filter(team, cohort_id)
+
+    query = GET_PERSON_IDS_BY_FILTER.format(
+        distinct_query=filter_query,
+        query="",
+        GET_TEAM_PERSON_DISTINCT_IDS=get_team_distinct_ids_query(team.pk),
+        offset="",
+        limit="",
+    )
+    for block in sync_execute_iter(query, {**filter_params, "team_id": team.pk}, block_size=block_size):
+        yield [str(row[0]) for row in block]
+
+
 def insert_static_cohort(person_uuids: List[Optional[uuid.UUID]], cohort_id: int, team: Team):
     persons = (
         {
@@ -340,7 +363,54 @@ def recalculate_cohortpeople_with_new_query(cohort: Cohort) -> Optional[int]:
     return count
 
 
-def recalculate_cohortpeople(cohort: Cohort) -> Optional[int]:
+def _can_slide_time_window(prop: Property) -> bool:
+    # Matching can only start with a new event and only stop as old events leave the time window
+    if prop.type != "behavioral" or prop.negation:
+        return False
+    if prop.value == BehavioralPropertyType.PERFORMED_EVENT:
+        return True
+    return prop.value == BehavioralPropertyType.PERFORMED_EVENT_MULTIPLE and prop.operator in ("gt", "gte")
+
+
+def get_changed_person_ids_query(cohort: Cohort) -> Optional[str]:
+    """
+    Returns a query for the persons that may have joined or left `cohort` since `%(since)s`, or None if the cohort
+    has to be recalculated in full.
+
+    Membership of a cohort filtering only on person properties can only change when the person's row does. With
+    COHORT_SLIDING_WINDOW_ENABLED, cohorts also filtering on events performed in a time window additionally look at
+    persons with new events. Persons that stop matching because their events fall out of the window are left to
+    the next full recalculation.
+    """
+    properties = cohort.properties.flat
+    if not properties or cohort.is_static:
+        return None
+    if all(prop.type == "person" for prop in properties):
+        return GET_PERSON_IDS_CHANGED_SINCE_SQL
+    if any(str(group.get("count")) == "0" for group in cohort.groups):
+        # Legacy "performed event 0 times" groups match persons who did *not* perform the event
+        return None
+    if settings.COHORT_SLIDING_WINDOW_ENABLED and all(
+        prop.type == "person" or _can_slide_time_window(prop) for prop in properties
+    ):
+        events_query = GET_PERSON_IDS_WITH_EVENTS_SINCE_SQL.format(
+            GET_TEAM_PERSON_DISTINCT_IDS=get_team_distinct_ids_query(cohort.team_id)
+        )
+        return f"{GET_PERSON_IDS_CHANGED_SINCE_SQL} UNION ALL {events_query}"
+    return None
+
+
+def get_incremental_recalculation_start(cohort: Cohort) -> Optional[datetime]:
+    """
+    Returns the time changes need to be looked at from, or None if the previous calculation can't be built on.
+    `last_calculation` is when the previous calculation started, so changes made while it ran are looked at again.
+    """
+    if cohort.last_calculation is None or cohort.errors_calculating:
+        return None
+    return cohort.last_calculation - INCREMENTAL_RECALCULATION_OVERLAP
+
+
+def recalculate_cohortpeople(cohort: Cohort, *, incremental: bool = False) -> Optional[int]:
 
     # use the new query if
     # 1: testing
@@ -353,26 +423,38 @@ def recalculate_cohortpeople(cohort: Cohort) -> Optional[int]:
         cohort, 0, custom_match_field="id", using_new_query=should_use_new_query
     )
 
+    changed_person_ids_query = get_changed_person_ids_query(cohort) if incremental else None
+    since = get_incremental_recalculation_start(cohort) if changed_person_ids_query else None
+    person_id_filter = lambda column: f"AND {column} IN ({changed_person_ids_query})" if since is not None else ""
+    if since is not None:
+        cohort_params = {**cohort_params, "since": since.strftime("%Y-%m-%d %H:%M:%S")}
+
     before_count = sync_execute(GET_COHORT_SIZE_SQL, {"cohort_id": cohort.pk, "team_id": cohort.team_id})
     logger.info(
         "Recalculating cohortpeople starting",
         team_id=cohort.team_id,
         cohort_id=cohort.pk,
         size_before=before_count[0][0],
+        changed_since=since,
     )
 
     cohort_filter = GET_PERSON_IDS_BY_FILTER.format(
-        distinct_query="AND " + cohort_filter,
+        distinct_query=f"{person_id_filter('id')} AND ({cohort_filter})",
         query="",
         offset="",
         limit="",
         GET_TEAM_PERSON_DISTINCT_IDS=get_team_distinct_ids_query(cohort.team_id),
     )
 
-    insert_cohortpeople_sql = INSERT_PEOPLE_MATCHING_COHORT_ID_SQL.format(cohort_filter=cohort_filter)
+    insert_cohortpeople_sql = INSERT_PEOPLE_MATCHING_COHORT_ID_SQL.format(
+        cohort_filter=cohort_filter, person_id_filter=person_id_filter("id")
+    )
     sync_execute(insert_cohortpeople_sql, {**cohort_params, "cohort_id": cohort.pk, "team_id": cohort.team_id})
 
-    remove_cohortpeople_sql = REMOVE_PEOPLE_NOT_MATCHING_COHORT_ID_SQL.format(cohort_filter=cohort_filter)
+    # When recalculating incrementally, the filter above only returns changed persons, so only they can be removed
+    remove_cohortpeople_sql = REMOVE_PEOPLE_NOT_MATCHING_COHORT_ID_SQL.format(
+        cohort_filter=cohort_filter, person_id_filter=person_id_filter("person_id")
+    )
     sync_execute(remove_cohortpeople_sql, {**cohort_params, "cohort_id": cohort.pk, "team_id": cohort.team_id})
 
     count_result = sync_execute(GET_COHORT_SIZE_SQL, {"cohort_id": cohort.pk, "team_id": cohort.team_id})
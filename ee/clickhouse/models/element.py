@@ -1,5 +1,6 @@
 import re
-from typing import List
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
 
 from posthog.models.element import Element
 
@@ -12,6 +13,9 @@ split_chain_regex = re.compile(r'(?:[^\s;"]|"(?:\\.|[^"])*")+')
 # Needs a regex because classes can have : too
 split_class_attributes = re.compile(r"(.*?)($|:([a-zA-Z\-\_0-9]*=.*))")
 
+# The same chains show up over and over again in event lists and correlation results
+ELEMENTS_CHAIN_CACHE_SIZE = 10_000
+
 
 def _escape(input: str) -> str:
     return input.replace('"', r"\"")
@@ -41,34 +45,88 @@ def elements_to_string(elements: List[Element],) -> str:
     return ";".join(ret)
 
 
+class ParsedElement:
+    """
+    Lightweight stand-in for an `Element` parsed out of an elements chain. Instances are cached and shared between
+    callers, so treat them as read-only.
+    """
+
+    __slots__ = ("text", "tag_name", "attr_class", "href", "attr_id", "nth_child", "nth_of_type", "attributes", "order")
+
+    def __init__(self, order: int):
+        self.text: Optional[str] = None
+        self.tag_name: Optional[str] = None
+        self.attr_class: Optional[List[str]] = None
+        self.href: Optional[str] = None
+        self.attr_id: Optional[str] = None
+        self.nth_child: Optional[int] = None
+        self.nth_of_type: Optional[int] = None
+        self.attributes: Dict[str, str] = {}
+        self.order = order
+
+    def to_dict(self, include_event: bool = False) -> Dict[str, Any]:
+        """
+        Same output as `ElementSerializer(element).data` for the equivalent `Element`. `include_event` adds the always
+        empty `event` field that `ee.clickhouse.models.event.ElementSerializer` outputs as well.
+        """
+        element: Dict[str, Any] = {"event": None} if include_event else {}
+        element.update(
+            text=self.text,
+            tag_name=self.tag_name,
+            attr_class=list(self.attr_class) if self.attr_class is not None else None,
+            href=self.href,
+            attr_id=self.attr_id,
+            nth_child=self.nth_child,
+            nth_of_type=self.nth_of_type,
+            attributes=dict(self.attributes),
+            order=self.order,
+        )
+        return element
+
+
+def _parse_element(el_string: str, order: int) -> ParsedElement:
+    element = ParsedElement(order)
+
+    if ":" in el_string or "\n" in el_string:
+        tag_and_classes, _, attributes = split_class_attributes.search(el_string).groups()  # type: ignore
+    else:
+        # Neither attributes nor a line break for the regex to trip over, so skip the regexes entirely
+        tag_and_classes, attributes = el_string, None
+
+    if tag_and_classes:
+        tag_and_class = tag_and_classes.split(".", 1)
+        element.tag_name = tag_and_class[0]
+        if len(tag_and_class) > 1:
+            element.attr_class = [cl for cl in tag_and_class[1].split(".") if cl != ""]
+
+    if attributes:
+        for match in parse_attributes_regex.finditer(attributes):
+            key, value = match.group("key", "value")
+            if key == "href":
+                element.href = value
+            elif key == "nth-child":
+                element.nth_child = int(value)
+            elif key == "nth-of-type":
+                element.nth_of_type = int(value)
+            elif key == "text":
+                element.text = value
+            elif key == "attr_id":
+                element.attr_id = value
+            elif key:
+                element.attributes[key] = value
+
+    return element
+
+
+@lru_cache(maxsize=ELEMENTS_CHAIN_CACHE_SIZE)
+def parse_elements_chain(chain: str) -> Tuple[ParsedElement, ...]:
+    return tuple(_parse_element(el_string, idx) for idx, el_string in enumerate(split_chain_regex.findall(chain)))
+
+
+def chain_to_element_dicts(chain: str, include_event: bool = False) -> List[Dict[str, Any]]:
+    "Serialized elements of a chain, equivalent to `ElementSerializer(chain_to_elements(chain), many=True).data`."
+    return [element.to_dict(include_event) for element in parse_elements_chain(chain)]
+
+
 def chain_to_elements(chain: str) -> List[Element]:
-    elements = []
-    for idx, el_string in enumerate(re.findall(split_chain_regex, chain)):
-        el_string_split = re.findall(split_class_attributes, el_string)[0]
-        attributes = re.finditer(parse_attributes_regex, el_string_split[2]) if len(el_string_split) > 2 else []
-
-        element = Element(order=idx)
-
-        if el_string_split[0]:
-            tag_and_class = el_string_split[0].split(".", 1)
-            element.tag_name = tag_and_class[0]
-            if len(tag_and_class) > 1:
-                element.attr_class = [cl for cl in tag_and_class[1].split(".") if cl != ""]
-
-        for ii in attributes:
-            item = ii.groupdict()
-            if item["key"] == "href":
-                element.href = item["value"]
-            elif item["key"] == "nth-child":
-                element.nth_child = int(item["value"])
-            elif item["key"] == "nth-of-type":
-                element.nth_of_type = int(item["value"])
-            elif item["key"] == "text":
-                element.text = item["value"]
-            elif item["key"] == "attr_id":
-                element.attr_id = item["value"]
-            elif item["key"]:
-                element.attributes[item["key"]] = item["value"]
-
-        elements.append(element)
-    return elements
+    return [Element(**element.to_dict()) for element in parse_elements_chain(chain)]
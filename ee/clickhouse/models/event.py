@@ -1,17 +1,17 @@
 import json
 import uuid
-from typing import Any, Dict, List, Optional, Tuple, Union
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
 
 import pytz
 from dateutil.parser import isoparse
 from django.utils import timezone
 from rest_framework import serializers
 
-from ee.clickhouse.models.element import chain_to_elements, elements_to_string
+from ee.clickhouse.models.element import chain_to_element_dicts, elements_to_string
 from ee.clickhouse.sql.events import BULK_INSERT_EVENT_SQL, GET_EVENTS_BY_TEAM_SQL, INSERT_EVENT_SQL
 from ee.kafka_client.client import ClickhouseProducer
 from ee.kafka_client.topics import KAFKA_EVENTS_JSON
-from posthog.client import query_with_columns, sync_execute
+from posthog.client import INSERT_BLOCK_SIZE, iter_query_with_columns, sync_execute, sync_insert_columnar
 from posthog.models.element import Element
 from posthog.models.person import Person
 from posthog.models.team import Team
@@ -71,66 +71,111 @@ def bulk_create_events(events: List[Dict[str, Any]], person_mapping: Optional[Di
     """
     if not TEST:
         raise Exception("This function is only meant for setting up tests")
-    inserts = []
-    params: Dict[str, Any] = {}
-    for index, event in enumerate(events):
-        timestamp = event.get("timestamp")
-        if not timestamp:
-            timestamp = timezone.now()
-        # clickhouse specific formatting
-        if isinstance(timestamp, str):
-            timestamp = isoparse(timestamp)
-        else:
-            timestamp = timestamp.astimezone(pytz.utc)
-
-        timestamp = timestamp.strftime("%Y-%m-%d %H:%M:%S.%f")
-
-        elements_chain = ""
-        if event.get("elements") and len(event["elements"]) > 0:
-            elements_chain = elements_to_string(elements=event.get("elements"))  # type: ignore
-
-        inserts.append(
-            "(%(uuid_{i})s, %(event_{i})s, %(properties_{i})s, %(timestamp_{i})s, %(team_id_{i})s, %(distinct_id_{i})s, %(elements_chain_{i})s, %(person_id_{i})s, %(person_properties_{i})s, %(group0_properties_{i})s, %(group1_properties_{i})s, %(group2_properties_{i})s, %(group3_properties_{i})s, %(group4_properties_{i})s, %(created_at_{i})s, now(), 0)".format(
-                i=index
+    bulk_insert_events(events, person_mapping, flush=False)
+
+
+def bulk_insert_events(
+    events: Iterable[Dict[str, Any]],
+    person_mapping: Optional[Dict[str, Person]] = None,
+    block_size: int = INSERT_BLOCK_SIZE,
+    flush: bool = True,
+) -> int:
+    """
+    Writes events straight to the events table as typed column blocks, bypassing Kafka. Events are dicts in the
+    format `bulk_create_events` takes, and are sent every `block_size` events, so a generator of events is never held
+    in memory all at once. Returns the number of events inserted.
+    """
+    inserted_at = timezone.now()
+    inserted = 0
+    columns = _empty_event_columns()
+    for event in events:
+        _append_event(columns, event, person_mapping, inserted_at)
+        if len(columns[0]) >= block_size:
+            inserted += sync_insert_columnar(
+                BULK_INSERT_EVENT_SQL(), columns, block_size=block_size, flush=flush and inserted == 0
             )
+            columns = _empty_event_columns()
+    if columns[0]:
+        inserted += sync_insert_columnar(
+            BULK_INSERT_EVENT_SQL(), columns, block_size=block_size, flush=flush and inserted == 0
         )
+    return inserted
+
+
+def _empty_event_columns() -> List[List[Any]]:
+    return [[] for _ in range(17)]
+
+
+def _append_event(
+    columns: List[List[Any]],
+    event: Dict[str, Any],
+    person_mapping: Optional[Dict[str, Person]],
+    inserted_at: timezone.datetime,
+) -> None:
+    (
+        uuids,
+        event_names,
+        properties,
+        timestamps,
+        team_ids,
+        distinct_ids,
+        elements_chains,
+        person_ids,
+        person_properties,
+        *group_properties,
+        created_ats,
+        inserted_ats,
+        offsets,
+    ) = columns
+    timestamp = _to_utc_datetime(event.get("timestamp") or timezone.now())
 
-        #  use person properties mapping to populate person properties in given event
-        if person_mapping and person_mapping.get(event["distinct_id"]):
-            person_properties = person_mapping[event["distinct_id"]].properties
-            person_id = person_mapping[event["distinct_id"]].uuid
-
-            event = {
-                **event,
-                "person_properties": {**person_properties, **event.get("person_properties", {})},
-                "person_id": person_id,
-            }
+    elements_chain = ""
+    if event.get("elements") and len(event["elements"]) > 0:
+        elements_chain = elements_to_string(elements=event["elements"])
 
+    #  use person properties mapping to populate person properties in given event
+    if person_mapping and person_mapping.get(event["distinct_id"]):
+        person = person_mapping[event["distinct_id"]]
         event = {
-            "uuid": str(event["event_uuid"]) if event.get("event_uuid") else str(uuid.uuid4()),
-            "event": event["event"],
-            "properties": json.dumps(event["properties"]) if event.get("properties") else "{}",
-            "timestamp": timestamp,
-            "team_id": event["team"].pk if event.get("team") else event["team_id"],
-            "distinct_id": str(event["distinct_id"]),
-            "elements_chain": elements_chain,
-            "created_at": timestamp,
-            "person_id": event["person_id"] if event.get("person_id") else "00000000-0000-0000-0000-000000000000",
-            "person_properties": json.dumps(event["person_properties"]) if event.get("person_properties") else "{}",
-            "group0_properties": json.dumps(event["group0_properties"]) if event.get("group0_properties") else "{}",
-            "group1_properties": json.dumps(event["group1_properties"]) if event.get("group1_properties") else "{}",
-            "group2_properties": json.dumps(event["group2_properties"]) if event.get("group2_properties") else "{}",
-            "group3_properties": json.dumps(event["group3_properties"]) if event.get("group3_properties") else "{}",
-            "group4_properties": json.dumps(event["group4_properties"]) if event.get("group4_properties") else "{}",
+            **event,
+            "person_properties": {**person.properties, **event.get("person_properties", {})},
+            "person_id": person.uuid,
         }
 
-        params = {**params, **{"{}_{}".format(key, index): value for key, value in event.items()}}
-    sync_execute(BULK_INSERT_EVENT_SQL() + ", ".join(inserts), params, flush=False)
+    uuids.append(_to_uuid(event["event_uuid"]) if event.get("event_uuid") else uuid.uuid4())
+    event_names.append(event["event"])
+    properties.append(json.dumps(event["properties"]) if event.get("properties") else "{}")
+    timestamps.append(timestamp)
+    team_ids.append(event["team"].pk if event.get("team") else event["team_id"])
+    distinct_ids.append(str(event["distinct_id"]))
+    elements_chains.append(elements_chain)
+    person_ids.append(_to_uuid(event["person_id"]) if event.get("person_id") else _NULL_UUID)
+    person_properties.append(json.dumps(event["person_properties"]) if event.get("person_properties") else "{}")
+    for index, group_column in enumerate(group_properties):
+        group_key = f"group{index}_properties"
+        group_column.append(json.dumps(event[group_key]) if event.get(group_key) else "{}")
+    created_ats.append(timestamp)
+    inserted_ats.append(inserted_at)
+    offsets.append(0)
+
+
+_NULL_UUID = uuid.UUID(int=0)
+
+
+def _to_uuid(value: Union[uuid.UUID, str]) -> uuid.UUID:
+    return value if isinstance(value, uuid.UUID) else uuid.UUID(str(value))
+
+
+def _to_utc_datetime(timestamp: Union[timezone.datetime, str]) -> timezone.datetime:
+    # Matches the string formatting `create_event` does: offsets in timestamp strings are dropped, not converted
+    if isinstance(timestamp, str):
+        return isoparse(timestamp).replace(tzinfo=pytz.utc)
+    return timestamp.astimezone(pytz.utc)
 
 
 def get_events_by_team(team_id: Union[str, int]):
 
-    events = query_with_columns(GET_EVENTS_BY_TEAM_SQL, {"team_id": str(team_id)})
+    events = iter_query_with_columns(GET_EVENTS_BY_TEAM_SQL, {"team_id": str(team_id)})
     return ClickhouseEventSerializer(events, many=True, context={"elements": None, "people": None}).data
 
 
@@ -200,7 +245,7 @@ class ClickhouseEventSerializer(serializers.Serializer):
     def get_elements(self, event):
         if not event["elements_chain"]:
             return []
-        return ElementSerializer(chain_to_elements(event["elements_chain"]), many=True).data
+        return chain_to_element_dicts(event["elements_chain"], include_event=True)
 
     def get_elements_chain(self, event):
         return event["elements_chain"]
@@ -1,7 +1,7 @@
 import datetime
 import json
 from contextlib import ExitStack
-from typing import Dict, List, Optional, Union
+from typing import Dict, List, Optional, Sequence, Tuple, Union
 from uuid import UUID
 
 from django.db.models.query import QuerySet
@@ -11,6 +11,7 @@ from django.utils.timezone import now
 from rest_framework import serializers
 
 from ee.clickhouse.sql.person import (
+    BULK_INSERT_PERSON_DISTINCT_ID,
     BULK_INSERT_PERSON_DISTINCT_ID2,
     DELETE_PERSON_BY_ID,
     DELETE_PERSON_EVENTS_BY_ID,
@@ -21,7 +22,7 @@ from ee.clickhouse.sql.person import (
 )
 from ee.kafka_client.client import ClickhouseProducer
 from ee.kafka_client.topics import KAFKA_PERSON, KAFKA_PERSON_DISTINCT_ID, KAFKA_PERSON_UNIQUE_ID
-from posthog.client import sync_execute
+from posthog.client import INSERT_BLOCK_SIZE, sync_execute, sync_insert_columnar
 from posthog.models.person import Person, PersonDistinctId
 from posthog.models.team import Team
 from posthog.models.utils import UUIDT
@@ -67,7 +68,6 @@ if TEST:
 
         inserted = Person.objects.bulk_create(persons)
 
-        person_inserts = []
         distinct_ids = []
         distinct_id_inserts = []
         for index, person in enumerate(inserted):
@@ -75,22 +75,64 @@ if TEST:
                 distinct_ids.append(
                     PersonDistinctId(person_id=person.pk, distinct_id=distinct_id, team_id=person.team_id)
                 )
-                distinct_id_inserts.append(f"('{distinct_id}', '{person.uuid}', {person.team_id}, 0, 0, now(), 0, 0)")
+                distinct_id_inserts.append((distinct_id, person.uuid, person.team_id))
                 person_mapping[distinct_id] = person
 
-            created_at = now().strftime("%Y-%m-%d %H:%M:%S.%f")
-            timestamp = now().strftime("%Y-%m-%d %H:%M:%S")
-            person_inserts.append(
-                f"('{person.uuid}', '{created_at}', {person.team_id}, '{json.dumps(person.properties)}', {'1' if person.is_identified else '0'}, '{timestamp}', 0, 0)"
-            )
-
         PersonDistinctId.objects.bulk_create(distinct_ids)
-        sync_execute(INSERT_PERSON_BULK_SQL + ", ".join(person_inserts), flush=False)
-        sync_execute(BULK_INSERT_PERSON_DISTINCT_ID2 + ", ".join(distinct_id_inserts), flush=False)
+        bulk_insert_persons(inserted, flush=False)
+        bulk_insert_person_distinct_ids(distinct_id_inserts, flush=False)
 
         return person_mapping
 
 
+def bulk_insert_persons(persons: Sequence[Person], block_size: int = INSERT_BLOCK_SIZE, flush: bool = True) -> int:
+    "Writes persons straight to ClickHouse as typed column blocks, bypassing Kafka. Returns the number inserted."
+    timestamp = now()
+    columns = [
+        [person.uuid if isinstance(person.uuid, UUID) else UUID(str(person.uuid)) for person in persons],
+        [timestamp] * len(persons),
+        [person.team_id for person in persons],
+        [json.dumps(person.properties) for person in persons],
+        [1 if person.is_identified else 0 for person in persons],
+        [timestamp] * len(persons),
+        [0] * len(persons),
+        [0] * len(persons),
+    ]
+    return sync_insert_columnar(INSERT_PERSON_BULK_SQL, columns, block_size=block_size, flush=flush)
+
+
+def bulk_insert_person_distinct_ids(
+    distinct_ids: Sequence[Tuple[str, Union[UUID, str], int]], block_size: int = INSERT_BLOCK_SIZE, flush: bool = True
+) -> int:
+    """
+    Writes `(distinct_id, person_uuid, team_id)` mappings straight to ClickHouse as typed column blocks, bypassing
+    Kafka. Like `create_person_distinct_id`, they go to both person_distinct_id2 and the legacy person_distinct_id,
+    which queries still read until the 0003_fill_person_distinct_id2 async migration is complete. Returns the number
+    inserted.
+    """
+    timestamp = now()
+    distinct_id_column = [str(distinct_id) for distinct_id, _, _ in distinct_ids]
+    person_id_column = [
+        person_id if isinstance(person_id, UUID) else UUID(str(person_id)) for _, person_id, _ in distinct_ids
+    ]
+    team_id_column = [team_id for _, _, team_id in distinct_ids]
+    zeros = [0] * len(distinct_ids)
+    timestamps = [timestamp] * len(distinct_ids)
+
+    sync_insert_columnar(
+        BULK_INSERT_PERSON_DISTINCT_ID,
+        [distinct_id_column, person_id_column, team_id_column, [1] * len(distinct_ids), timestamps, zeros],
+        block_size=block_size,
+        flush=flush,
+    )
+    return sync_insert_columnar(
+        BULK_INSERT_PERSON_DISTINCT_ID2,
+        [distinct_id_column, person_id_column, team_id_column, zeros, zeros, timestamps, zeros, zeros],
+        block_size=block_size,
+        flush=False,
+    )
+
+
 def create_person(
     team_id: int,
     uuid: Optional[str] = None,
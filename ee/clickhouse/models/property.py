@@ -15,7 +15,7 @@ from typing import (
 from clickhouse_driver.util.escape import escape_param
 from rest_framework import exceptions
 
-from ee.clickhouse.materialized_columns.columns import TableWithProperties, get_materialized_columns
+from ee.clickhouse.materialized_columns.columns import TableWithProperties
 from ee.clickhouse.models.cohort import (
     format_cohort_subquery,
     format_filter_query,
@@ -40,6 +40,7 @@ from posthog.models.property import (
 )
 from posthog.models.utils import PersonPropertiesMode
 from posthog.queries.person_distinct_id_query import get_team_distinct_ids_query
+from posthog.queries.query_metadata import get_cohort, get_materialized_columns
 from posthog.utils import is_valid_regex
 
 # Property Groups Example:
@@ -148,7 +149,7 @@ def parse_prop_clauses(
     for idx, prop in enumerate(filters):
         if prop.type == "cohort":
             try:
-                cohort = Cohort.objects.get(pk=prop.value)
+                cohort = get_cohort(prop.value)
             except Cohort.DoesNotExist:
                 final.append(
                     f"{property_operator} 0 = 13"
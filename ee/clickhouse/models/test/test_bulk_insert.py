@@ -0,0 +1,138 @@
+from datetime import datetime
+from unittest.mock import patch
+from uuid import UUID, uuid4
+
+import pytz
+
+from ee.clickhouse.models.event import bulk_insert_events
+from ee.clickhouse.models.person import bulk_insert_person_distinct_ids, bulk_insert_persons
+from ee.clickhouse.util import ClickhouseTestMixin
+from posthog.client import sync_execute
+from posthog.models import Person
+from posthog.test.base import BaseTest
+
+
+class TestBulkInsert(ClickhouseTestMixin, BaseTest):
+    def test_bulk_insert_events(self):
+        person = Person(team_id=self.team.pk, properties={"email": "tim@posthog.com"})
+        event_uuid = uuid4()
+
+        inserted = bulk_insert_events(
+            [
+                {
+                    "event_uuid": event_uuid,
+                    "event": "$pageview",
+                    "team": self.team,
+                    "distinct_id": "person",
+                    "timestamp": "2022-01-01T12:00:00.123456",
+                    "properties": {"$browser": "Chrome"},
+                },
+                {"event": "$autocapture", "team_id": self.team.pk, "distinct_id": 2, "timestamp": "2022-01-02"},
+                {
+                    "event": "$pageleave",
+                    "team_id": self.team.pk,
+                    "distinct_id": "person",
+                    "timestamp": datetime(2022, 1, 3, tzinfo=pytz.utc),
+                    "group0_properties": {"industry": "finance"},
+                },
+            ],
+            person_mapping={"person": person},
+            block_size=2,
+        )
+
+        self.assertEqual(inserted, 3)
+        rows = sync_execute(
+            """
+            SELECT uuid, event, properties, timestamp, distinct_id, person_id, person_properties, group0_properties
+            FROM events WHERE team_id = %(team_id)s ORDER BY timestamp
+            """,
+            {"team_id": self.team.pk},
+        )
+        self.assertEqual(
+            rows,
+            [
+                (
+                    event_uuid,
+                    "$pageview",
+                    '{"$browser": "Chrome"}',
+                    datetime(2022, 1, 1, 12, 0, 0, 123456, tzinfo=pytz.utc),
+                    "person",
+                    person.uuid,
+                    '{"email": "tim@posthog.com"}',
+                    "{}",
+                ),
+                (
+                    rows[1][0],
+                    "$autocapture",
+                    "{}",
+                    datetime(2022, 1, 2, tzinfo=pytz.utc),
+                    "2",
+                    UUID(int=0),
+                    "{}",
+                    "{}",
+                ),
+                (
+                    rows[2][0],
+                    "$pageleave",
+                    "{}",
+                    datetime(2022, 1, 3, tzinfo=pytz.utc),
+                    "person",
+                    person.uuid,
+                    '{"email": "tim@posthog.com"}',
+                    '{"industry": "finance"}',
+                ),
+            ],
+        )
+
+    def test_bulk_insert_persons_and_distinct_ids(self):
+        persons = [
+            Person(team_id=self.team.pk, properties={"index": index}, is_identified=index % 2 == 0)
+            for index in range(5)
+        ]
+
+        self.assertEqual(bulk_insert_persons(persons, block_size=2), 5)
+        self.assertEqual(
+            bulk_insert_person_distinct_ids(
+                [(f"distinct-{index}", person.uuid, self.team.pk) for index, person in enumerate(persons)], block_size=2
+            ),
+            5,
+        )
+
+        self.assertEqual(
+            sync_execute(
+                "SELECT id, properties, is_identified FROM person WHERE team_id = %(team_id)s ORDER BY properties",
+                {"team_id": self.team.pk},
+            ),
+            [(person.uuid, f'{{"index": {index}}}', int(index % 2 == 0)) for index, person in enumerate(persons)],
+        )
+        self.assertEqual(
+            sync_execute(
+                """
+                SELECT distinct_id, person_id FROM person_distinct_id2
+                WHERE team_id = %(team_id)s ORDER BY distinct_id
+                """,
+                {"team_id": self.team.pk},
+            ),
+            [(f"distinct-{index}", person.uuid) for index, person in enumerate(persons)],
+        )
+        self.assertEqual(
+            sync_execute(
+                """
+                SELECT distinct_id, person_id FROM person_distinct_id
+                WHERE team_id = %(team_id)s ORDER BY distinct_id
+                """,
+                {"team_id": self.team.pk},
+            ),
+            [(f"distinct-{index}", person.uuid) for index, person in enumerate(persons)],
+        )
+
+    def test_bulk_insert_events_sends_a_block_every_block_size_events(self):
+        events = ({"event": "$pageview", "team_id": self.team.pk, "distinct_id": index} for index in range(5))
+
+        with patch(
+            "ee.clickhouse.models.event.sync_insert_columnar", side_effect=lambda _, columns, **kwargs: len(columns[0])
+        ) as insert:
+            self.assertEqual(bulk_insert_events(events, block_size=2), 5)
+
+        self.assertEqual([len(call.args[1][0]) for call in insert.call_args_list], [2, 2, 1])
+        self.assertEqual([call.kwargs["flush"] for call in insert.call_args_list], [True, False, False])
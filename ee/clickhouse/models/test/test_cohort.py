@@ -1,17 +1,21 @@
 from datetime import datetime, timedelta
+from typing import List
 from unittest.mock import patch
 
 from django.utils import timezone
 from freezegun import freeze_time
 
 from ee.clickhouse.models.cohort import (
+    INCREMENTAL_RECALCULATION_OVERLAP,
     format_filter_query,
+    get_changed_person_ids_query,
     get_person_ids_by_cohort_id,
     recalculate_cohortpeople,
     recalculate_cohortpeople_with_new_query,
 )
 from ee.clickhouse.models.person import create_person, create_person_distinct_id
 from ee.clickhouse.models.property import parse_prop_grouped_clauses
+from ee.clickhouse.sql.cohort import GET_COHORTPEOPLE_BY_COHORT_ID
 from ee.clickhouse.util import ClickhouseTestMixin
 from posthog.client import sync_execute
 from posthog.models.action import Action
@@ -46,6 +50,13 @@ def _create_person(**kwargs) -> Person:
     return Person(id=person, uuid=person)
 
 
+def _get_cohortpeople(cohort: Cohort) -> List[str]:
+    return [
+        str(row[0])
+        for row in sync_execute(GET_COHORTPEOPLE_BY_COHORT_ID, {"team_id": cohort.team_id, "cohort_id": cohort.pk})
+    ]
+
+
 class TestCohort(ClickhouseTestMixin, BaseTest):
     def test_prop_cohort_basic(self):
 
@@ -890,3 +901,81 @@ class TestCohort(ClickhouseTestMixin, BaseTest):
         new_count = recalculate_cohortpeople_with_new_query(cohort2)
 
         self.assertEqual(count, new_count)
+
+    def test_incremental_recalculation_only_reevaluates_changed_persons(self):
+        with freeze_time((datetime.now() - timedelta(days=3)).strftime("%Y-%m-%d")):
+            p1 = Person.objects.create(team_id=self.team.pk, distinct_ids=["1"], properties={"foo": "bar"})
+            p2 = Person.objects.create(team_id=self.team.pk, distinct_ids=["2"], properties={"foo": "bar"})
+
+        cohort = Cohort.objects.create(
+            team=self.team, groups=[{"properties": [{"key": "foo", "value": "bar", "type": "person"}]}], name="cohort",
+        )
+        cohort.calculate_people_ch(pending_version=0)
+        self.assertCountEqual(_get_cohortpeople(cohort), [str(p1.uuid), str(p2.uuid)])
+
+        # Simulate p1 having been missed, which an incremental recalculation won't notice as p1 hasn't changed
+        sync_execute(
+            "INSERT INTO cohortpeople SELECT %(person_id)s, %(cohort_id)s, %(team_id)s, -1",
+            {"person_id": str(p1.uuid), "cohort_id": cohort.pk, "team_id": self.team.pk},
+        )
+        p2.properties = {"foo": "baz"}
+        p2.save()
+
+        cohort.calculate_people_ch(pending_version=1, incremental=True)
+        self.assertEqual(_get_cohortpeople(cohort), [])
+
+        with self.settings(COHORT_FULL_RECALCULATION_EVERY_N_RUNS=2):
+            cohort.calculate_people_ch(pending_version=2, incremental=True)
+        self.assertEqual(_get_cohortpeople(cohort), [str(p1.uuid)])
+
+    def test_incremental_recalculation_picks_up_changes_made_during_a_slow_calculation(self):
+        with freeze_time("2022-01-01 12:00:00") as frozen_time:
+            person = Person.objects.create(team_id=self.team.pk, distinct_ids=["1"], properties={"foo": "bar"})
+            cohort = Cohort.objects.create(
+                team=self.team,
+                groups=[{"properties": [{"key": "foo", "value": "bar", "type": "person"}]}],
+                name="cohort",
+            )
+            cohort.calculate_people_ch(pending_version=0)
+            frozen_time.tick(timedelta(hours=1))
+
+            def slow_recalculation(cohort, **kwargs):
+                count = recalculate_cohortpeople(cohort, **kwargs)
+                # The person changes after the calculation has read them, well before it finishes
+                frozen_time.tick(timedelta(minutes=1))
+                person.properties = {"foo": "baz"}
+                person.save()
+                frozen_time.tick(INCREMENTAL_RECALCULATION_OVERLAP * 3)
+                return count
+
+            with patch("ee.clickhouse.models.cohort.recalculate_cohortpeople", side_effect=slow_recalculation):
+                cohort.calculate_people_ch(pending_version=1, incremental=True)
+            self.assertEqual(_get_cohortpeople(cohort), [str(person.uuid)])
+
+            frozen_time.tick(timedelta(minutes=1))
+            cohort.calculate_people_ch(pending_version=2, incremental=True)
+            self.assertEqual(_get_cohortpeople(cohort), [])
+
+    def test_incremental_recalculation_eligibility(self):
+        person_cohort = Cohort.objects.create(
+            team=self.team, groups=[{"properties": [{"key": "foo", "value": "bar", "type": "person"}]}],
+        )
+        nested_cohort = Cohort.objects.create(
+            team=self.team, groups=[{"properties": [{"key": "id", "value": person_cohort.pk, "type": "cohort"}]}],
+        )
+        performed_event_cohort = Cohort.objects.create(team=self.team, groups=[{"event_id": "$pageview", "days": 7}])
+        did_not_perform_event_cohort = Cohort.objects.create(
+            team=self.team, groups=[{"event_id": "$pageview", "days": 7, "count": 0, "count_operator": "eq"}]
+        )
+        performed_event_at_most_cohort = Cohort.objects.create(
+            team=self.team, groups=[{"event_id": "$pageview", "days": 7, "count": 3, "count_operator": "lte"}]
+        )
+
+        self.assertIsNotNone(get_changed_person_ids_query(person_cohort))
+        self.assertIsNone(get_changed_person_ids_query(nested_cohort))
+        self.assertIsNone(get_changed_person_ids_query(performed_event_cohort))
+
+        with self.settings(COHORT_SLIDING_WINDOW_ENABLED=True):
+            self.assertIn("FROM events", get_changed_person_ids_query(performed_event_cohort) or "")
+            self.assertIsNone(get_changed_person_ids_query(did_not_perform_event_cohort))
+            self.assertIsNone(get_changed_person_ids_query(performed_event_at_most_cohort))
@@ -1,4 +1,4 @@
-from ee.clickhouse.models.element import chain_to_elements, elements_to_string
+from ee.clickhouse.models.element import chain_to_element_dicts, chain_to_elements, elements_to_string
 from ee.clickhouse.util import ClickhouseTestMixin
 from posthog.models import Element
 from posthog.test.base import BaseTest
@@ -77,3 +77,33 @@ class TestClickhouseElement(ClickhouseTestMixin, BaseTest):
         self.assertEqual(elements[0].tag_name, "a")
         self.assertEqual(elements[0].href, "/a-url")
         self.assertEqual(elements[0].attr_class, ["small", "xy:z"])
+
+    def test_chain_to_element_dicts_matches_serializer(self):
+        from ee.clickhouse.models.event import ElementSerializer as ClickhouseElementSerializer
+        from posthog.api.element import ElementSerializer
+
+        chain = ";".join(
+            [
+                r'a.small:data-attr="a \" that; b"href="/a-url"nth-child="1"nth-of-type="0"text="x"',
+                'button.btn.btn-primary:attr_id="save"nth-child="0"nth-of-type="0"',
+                "a........small",
+                "div",
+            ]
+        )
+        elements = chain_to_elements(chain)
+
+        self.assertEqual(chain_to_element_dicts(chain), ElementSerializer(elements, many=True).data)
+        self.assertEqual(
+            chain_to_element_dicts(chain, include_event=True), ClickhouseElementSerializer(elements, many=True).data
+        )
+
+    def test_parsed_chains_are_not_shared_between_callers(self):
+        chain = 'a.small:href="/a-url"prop="value"'
+
+        first = chain_to_element_dicts(chain)
+        first[0]["attr_class"].append("large")
+        first[0]["attributes"]["prop"] = "changed"
+
+        self.assertEqual(chain_to_element_dicts(chain)[0]["attr_class"], ["small"])
+        self.assertEqual(chain_to_element_dicts(chain)[0]["attributes"], {"prop": "value"})
+        self.assertEqual(chain_to_elements(chain)[0].attributes, {"prop": "value"})
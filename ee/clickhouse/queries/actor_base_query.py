@@ -13,16 +13,17 @@ from typing import (
     cast,
 )
 
+from django.db.models import Prefetch
 from django.db.models.query import QuerySet
 
-from posthog.client import sync_execute
+from posthog.client import sync_execute, sync_execute_iter
 from posthog.constants import INSIGHT_FUNNELS, INSIGHT_PATHS, INSIGHT_TRENDS
 from posthog.models import Entity, Filter, Team
 from posthog.models.filters.mixins.utils import cached_property
 from posthog.models.filters.retention_filter import RetentionFilter
 from posthog.models.filters.stickiness_filter import StickinessFilter
 from posthog.models.group import Group
-from posthog.models.person import Person
+from posthog.models.person import Person, PersonDistinctId
 
 
 class EventInfoForRecording(TypedDict):
@@ -58,6 +59,8 @@ class SerializedGroup(CommonAttributes):
 
 SerializedActor = Union[SerializedGroup, SerializedPerson]
 
+SERIALIZED_PERSON_FIELDS = ("id", "team_id", "uuid", "created_at", "properties", "is_identified")
+
 
 class ActorBaseQuery:
     aggregating_by_groups = False
@@ -92,11 +95,16 @@ class ActorBaseQuery:
     ) -> Tuple[Union[QuerySet[Person], QuerySet[Group]], Union[List[SerializedGroup], List[SerializedPerson]]]:
         """ Get actors in data model and dict formats. Builds query and executes """
         query, params = self.actor_query()
-        raw_result = sync_execute(query, params)
-        actors, serialized_actors = self.get_actors_from_result(raw_result)
 
         if hasattr(self._filter, "include_recordings") and self._filter.include_recordings and self._filter.insight in [INSIGHT_PATHS, INSIGHT_TRENDS, INSIGHT_FUNNELS]:  # type: ignore
+            raw_result = sync_execute(query, params)
+            actors, serialized_actors = self.get_actors_from_result(raw_result)
             serialized_actors = self.add_matched_recordings_to_serialized_actors(serialized_actors, raw_result)
+        else:
+            # Only the actor ids are needed, so avoid holding every row (with its matching events) in memory at once
+            actors, serialized_actors = self.get_actors_from_result(
+                (row[0],) for block in sync_execute_iter(query, params) for row in block
+            )
 
         return actors, serialized_actors
 
@@ -182,8 +190,23 @@ def get_groups(
 
 
 def get_people(team_id: int, people_ids: List[Any]) -> Tuple[QuerySet[Person], List[SerializedPerson]]:
-    """ Get people from raw SQL results in data model and dict formats """
-    persons: QuerySet[Person] = Person.objects.filter(team_id=team_id, uuid__in=people_ids)
+    """
+    Get people from raw SQL results in data model and dict formats. People and their distinct_ids are fetched in two
+    queries however many people there are, and only with the fields that get serialized.
+    """
+    persons: QuerySet[Person] = (
+        Person.objects.filter(team_id=team_id, uuid__in=people_ids)
+        .only(*SERIALIZED_PERSON_FIELDS)
+        .prefetch_related(
+            Prefetch(
+                "persondistinctid_set",
+                queryset=PersonDistinctId.objects.filter(team_id=team_id)
+                .only("person_id", "distinct_id")
+                .order_by("id"),
+                to_attr="distinct_ids_cache",
+            )
+        )
+    )
     return persons, serialize_people(persons)
 
 
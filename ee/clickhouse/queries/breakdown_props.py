@@ -20,6 +20,7 @@ from posthog.models.team import Team
 from posthog.models.utils import PersonPropertiesMode
 from posthog.queries.person_distinct_id_query import get_team_distinct_ids_query
 from posthog.queries.person_query import PersonQuery
+from posthog.queries.query_metadata import get_cohort
 from posthog.queries.util import parse_timestamps
 
 ALL_USERS_COHORT_ID = 0
@@ -181,4 +182,4 @@ def get_breakdown_cohort_name(cohort_id: int) -> str:
     if cohort_id == ALL_USERS_COHORT_ID:
         return "all users"
     else:
-        return Cohort.objects.get(pk=cohort_id).name
+        return get_cohort(cohort_id).name
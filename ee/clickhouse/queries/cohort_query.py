@@ -6,10 +6,10 @@ from ee.clickhouse.models.property import prop_filter_json_extract
 from ee.clickhouse.queries.event_query import EnterpriseEventQuery
 from posthog.constants import PropertyOperatorType
 from posthog.models import Filter, Team
-from posthog.models.action import Action
 from posthog.models.cohort import Cohort
 from posthog.models.filters.mixins.utils import cached_property
 from posthog.models.property import BehavioralPropertyType, OperatorInterval, Property, PropertyGroup, PropertyName
+from posthog.queries.query_metadata import get_action, get_cohort
 
 Relative_Date = Tuple[int, OperatorInterval]
 Event = Tuple[str, Union[str, int]]
@@ -81,7 +81,7 @@ def convert_to_entity_params(events: List[Event]) -> Tuple[List, List]:
                 {"id": event_val, "name": event_val, "order": idx, "type": event_type,}
             )
         elif event_type == "actions":
-            action = Action.objects.get(id=event_val)
+            action = get_action(event_val)
             res_actions.append(
                 {"id": event_val, "name": action.name, "order": idx, "type": event_type,}
             )
@@ -218,7 +218,7 @@ class CohortQuery(EnterpriseEventQuery):
                         negation_value = not current_negation if negate_group else current_negation
                         if prop.type in ["cohort", "precalculated-cohort"]:
                             try:
-                                prop_cohort: Cohort = Cohort.objects.get(pk=prop.value, team_id=team_id)
+                                prop_cohort: Cohort = get_cohort(prop.value, team_id)
                                 if prop_cohort.is_static:
                                     new_property_group_list.append(
                                         PropertyGroup(
@@ -778,7 +778,7 @@ class CohortQuery(EnterpriseEventQuery):
         return res, params
 
     def _add_action(self, action_id: int) -> None:
-        action = Action.objects.get(id=action_id)
+        action = get_action(action_id)
         for step in action.steps.all():
             self._events.append(step.event)
 
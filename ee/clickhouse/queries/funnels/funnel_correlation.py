@@ -13,8 +13,7 @@ from typing import (
 
 from rest_framework.exceptions import ValidationError
 
-from ee.clickhouse.models.element import chain_to_elements
-from ee.clickhouse.models.event import ElementSerializer
+from ee.clickhouse.models.element import chain_to_element_dicts
 from ee.clickhouse.models.property import get_property_string_expr
 from ee.clickhouse.queries.column_optimizer import EnterpriseColumnOptimizer
 from ee.clickhouse.queries.funnels.utils import get_funnel_order_actor_class
@@ -802,7 +801,7 @@ class FunnelCorrelation:
             return EventDefinition(
                 event=event,
                 properties={self.AUTOCAPTURE_EVENT_TYPE: event_type},
-                elements=cast(list, ElementSerializer(chain_to_elements(elements_chain), many=True).data),
+                elements=chain_to_element_dicts(elements_chain, include_event=True),
             )
 
         return EventDefinition(event=event, properties={}, elements=[])
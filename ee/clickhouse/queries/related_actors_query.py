@@ -13,9 +13,9 @@ from ee.clickhouse.queries.actor_base_query import (
 )
 from posthog.client import sync_execute
 from posthog.models.filters.utils import validate_group_type_index
-from posthog.models.group_type_mapping import GroupTypeMapping
 from posthog.models.property import GroupTypeIndex
 from posthog.queries.person_distinct_id_query import get_team_distinct_ids_query
+from posthog.queries.query_metadata import get_group_type_mappings
 
 
 class RelatedActorsQuery:
@@ -35,7 +35,7 @@ class RelatedActorsQuery:
     def run(self) -> List[SerializedActor]:
         results: List[SerializedActor] = []
         results.extend(self._query_related_people())
-        for group_type_mapping in GroupTypeMapping.objects.filter(team_id=self.team_id):
+        for group_type_mapping in get_group_type_mappings(self.team_id):
             results.extend(self._query_related_groups(group_type_mapping.group_type_index))
         return results
 
@@ -11,9 +11,10 @@ from posthog.constants import (
     RetentionQueryType,
 )
 from posthog.models import Entity
-from posthog.models.action.util import Action, format_action_filter
+from posthog.models.action.util import format_action_filter
 from posthog.models.filters.retention_filter import RetentionFilter
 from posthog.models.team import Team
+from posthog.queries.query_metadata import get_action
 from posthog.queries.util import get_trunc_func_ch
 
 
@@ -179,7 +180,7 @@ class RetentionEventsQuery(EnterpriseEventQuery):
     def _get_entity_query(self, entity: Entity):
         prepend = self._event_query_type
         if entity.type == TREND_FILTER_TYPE_ACTIONS:
-            action = Action.objects.get(pk=entity.id)
+            action = get_action(entity.id)
             action_query, params = format_action_filter(
                 team_id=self._team_id, action=action, prepend=prepend, use_loop=False
             )
@@ -0,0 +1,23 @@
+from ee.clickhouse.queries.actor_base_query import get_people
+from posthog.models import Person
+from posthog.test.base import BaseTest
+
+
+class TestGetPeople(BaseTest):
+    def test_people_are_serialized_in_a_constant_number_of_queries(self):
+        people = [
+            Person.objects.create(
+                team=self.team, distinct_ids=[f"anonymous-{index}", f"user-{index}"], properties={"index": index}
+            )
+            for index in range(20)
+        ]
+        Person.objects.create(team=self.team, distinct_ids=["someone-else"])
+
+        with self.assertNumQueries(2):
+            actors, serialized_people = get_people(self.team.pk, [person.uuid for person in people])
+            self.assertEqual(len(actors), 20)
+
+        self.assertEqual(
+            sorted((person["properties"]["index"], person["distinct_ids"]) for person in serialized_people),
+            [(index, [f"anonymous-{index}", f"user-{index}"]) for index in range(20)],
+        )
@@ -10,3 +10,69 @@ def test_person_distinct_id_query(db, snapshot):
 
     # Reset for other tests
     person_distinct_id_query.using_new_table = True
+
+
+def _distinct_id_mapping(query):
+    from posthog.client import sync_execute
+
+    return sorted((distinct_id, str(person_id)) for distinct_id, person_id in sync_execute(query))
+
+
+def test_person_distinct_id_snapshot(db, team, mocker):
+    from uuid import uuid4
+
+    from ee.clickhouse.models.person import create_person_distinct_id
+
+    mocker.patch.object(person_distinct_id_query, "PERSON_DISTINCT_ID_SNAPSHOT_ENABLED", True)
+    first_person, second_person = str(uuid4()), str(uuid4())
+    create_person_distinct_id(team.pk, "1", first_person)
+    create_person_distinct_id(team.pk, "2", first_person)
+
+    assert "person_distinct_id_snapshot" not in person_distinct_id_query.get_team_distinct_ids_query(
+        team.pk, allow_snapshot=True
+    )
+
+    person_distinct_id_query.refresh_person_distinct_id_snapshot(team.pk)
+    # Changes after the refresh are picked up from person_distinct_id2
+    create_person_distinct_id(team.pk, "2", second_person, version=1)
+    create_person_distinct_id(team.pk, "3", second_person)
+
+    snapshot_query = person_distinct_id_query.get_team_distinct_ids_query(team.pk, allow_snapshot=True)
+    assert "person_distinct_id_snapshot" in snapshot_query
+    assert "person_distinct_id_snapshot" not in person_distinct_id_query.get_team_distinct_ids_query(team.pk)
+    assert _distinct_id_mapping(snapshot_query) == [
+        ("1", first_person),
+        ("2", second_person),
+        ("3", second_person),
+    ]
+    assert _distinct_id_mapping(snapshot_query) == _distinct_id_mapping(
+        person_distinct_id_query.get_team_distinct_ids_query(team.pk)
+    )
+
+    mocker.patch.object(person_distinct_id_query, "PERSON_DISTINCT_ID_SNAPSHOT_MAX_AGE_SECONDS", -1)
+    assert "person_distinct_id_snapshot" not in person_distinct_id_query.get_team_distinct_ids_query(
+        team.pk, allow_snapshot=True
+    )
+
+
+def test_person_distinct_id_snapshots_are_only_kept_for_active_teams(db, team, mocker):
+    from datetime import datetime, timedelta
+
+    from freezegun import freeze_time
+
+    from posthog.redis import get_client
+
+    mocker.patch.object(person_distinct_id_query, "PERSON_DISTINCT_ID_SNAPSHOT_ENABLED", True)
+    get_client().delete(person_distinct_id_query.SNAPSHOT_ACTIVE_TEAMS_KEY)
+    assert person_distinct_id_query.get_active_snapshot_team_ids() == []
+
+    start = datetime(2022, 1, 1)
+    with freeze_time(start):
+        person_distinct_id_query.get_team_distinct_ids_query(team.pk)
+        assert person_distinct_id_query.get_active_snapshot_team_ids() == []
+
+        person_distinct_id_query.get_team_distinct_ids_query(team.pk, allow_snapshot=True)
+        assert person_distinct_id_query.get_active_snapshot_team_ids() == [team.pk]
+
+    with freeze_time(start + person_distinct_id_query.SNAPSHOT_ACTIVE_TEAM_PERIOD + timedelta(minutes=1)):
+        assert person_distinct_id_query.get_active_snapshot_team_ids() == []
@@ -1,3 +1,4 @@
+import urllib.parse
 from datetime import datetime
 from uuid import uuid4
 
@@ -6,11 +7,14 @@ from freezegun.api import freeze_time
 
 from ee.clickhouse.models.event import create_event
 from ee.clickhouse.queries.breakdown_props import _parse_breakdown_cohorts
+from ee.clickhouse.queries.trends.util import PersonsUrlEncoder, TrendResultFormatter, parse_response
 from posthog.client import sync_execute
 from posthog.models.action import Action
 from posthog.models.action_step import ActionStep
 from posthog.models.cohort import Cohort
+from posthog.models.filters import Filter
 from posthog.queries.util import get_earliest_timestamp
+from posthog.utils import encode_get_request_params
 
 
 def _create_event(**kwargs):
@@ -45,3 +49,34 @@ def test_parse_breakdown_cohort_query(db, team):
     queries, params = _parse_breakdown_cohorts([cohort1])
     assert len(queries) == 1
     sync_execute(queries[0], params)
+
+
+def test_trend_result_formatter_shares_dates_between_series():
+    filter = Filter(data={"interval": "day"})
+    dates = [datetime(2021, 1, 1), datetime(2021, 1, 2)]
+    formatter = TrendResultFormatter(filter)
+
+    first = formatter.parse_response((dates, [1, 2], "a"), {"breakdown_value": "a"})
+    second = formatter.parse_response((list(dates), [3, 4], "b"), {"breakdown_value": "b"})
+
+    assert first == {
+        "data": [1.0, 2.0],
+        "count": 3.0,
+        "labels": ["1-Jan-2021", "2-Jan-2021"],
+        "days": ["2021-01-01", "2021-01-02"],
+        "breakdown_value": "a",
+    }
+    assert first == parse_response((dates, [1, 2], "a"), filter, {"breakdown_value": "a"})
+    assert second["days"] is first["days"] and second["labels"] is first["labels"]
+
+
+def test_persons_url_encoder_matches_encoding_every_url():
+    filter = Filter(data={"events": [{"id": "$pageview"}], "date_from": "-7d", "properties": [{"key": "$browser"}]})
+    encoder = PersonsUrlEncoder(filter, 2)
+
+    for extra_params in [
+        {"entity_id": "$pageview", "date_from": "2021-01-01", "date_to": "2021-01-01"},
+        {"entity_id": "$pageview", "date_from": None, "date_to": "2021-01-02", "breakdown_value": ["a", 1]},
+    ]:
+        parsed_params = encode_get_request_params({**filter.to_params(), **extra_params})
+        assert encoder.url(extra_params) == f"api/projects/2/actions/people/?{urllib.parse.urlencode(parsed_params)}"
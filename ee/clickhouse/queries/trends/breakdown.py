@@ -1,4 +1,3 @@
-import urllib.parse
 from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 
 from ee.clickhouse.models.property import get_property_string_expr, parse_prop_grouped_clauses
@@ -10,7 +9,13 @@ from ee.clickhouse.queries.breakdown_props import (
 )
 from ee.clickhouse.queries.column_optimizer import EnterpriseColumnOptimizer
 from ee.clickhouse.queries.groups_join_query import GroupsJoinQuery
-from ee.clickhouse.queries.trends.util import enumerate_time_range, get_active_user_params, parse_response, process_math
+from ee.clickhouse.queries.trends.util import (
+    PersonsUrlEncoder,
+    TrendResultFormatter,
+    enumerate_time_range,
+    get_active_user_params,
+    process_math,
+)
 from ee.clickhouse.sql.events import EVENT_JOIN_PERSON_SQL
 from ee.clickhouse.sql.trends.breakdown import (
     BREAKDOWN_ACTIVE_USER_CONDITIONS_SQL,
@@ -38,7 +43,6 @@ from posthog.models.utils import PersonPropertiesMode
 from posthog.queries.person_distinct_id_query import get_team_distinct_ids_query
 from posthog.queries.person_query import PersonQuery
 from posthog.queries.util import date_from_clause, get_time_diff, get_trunc_func_ch, parse_timestamps, start_of_week_fix
-from posthog.utils import encode_get_request_params
 
 
 class ClickhouseTrendsBreakdown:
@@ -240,24 +244,20 @@ class ClickhouseTrendsBreakdown:
         self, filter: Filter, entity: Entity, additional_values: Dict[str, Any]
     ) -> Callable:
         def _parse(result: List) -> List:
+            persons_url_encoder = PersonsUrlEncoder(filter, self.team_id)
             parsed_results = []
             for idx, stats in enumerate(result):
                 result_descriptors = self._breakdown_result_descriptors(stats[1], filter, entity)
-                filter_params = filter.to_params()
                 extra_params = {
                     "entity_id": entity.id,
                     "entity_type": entity.type,
                     "breakdown_value": result_descriptors["breakdown_value"],
                     "breakdown_type": filter.breakdown_type or "event",
                 }
-                parsed_params: Dict[str, str] = encode_get_request_params({**filter_params, **extra_params})
                 parsed_result = {
                     "aggregated_value": stats[0],
-                    "filter": filter_params,
-                    "persons": {
-                        "filter": extra_params,
-                        "url": f"api/projects/{self.team_id}/actions/people/?{urllib.parse.urlencode(parsed_params)}",
-                    },
+                    "filter": persons_url_encoder.filter_params,
+                    "persons": {"filter": extra_params, "url": persons_url_encoder.url(extra_params)},
                     **result_descriptors,
                     **additional_values,
                 }
@@ -269,29 +269,43 @@ class ClickhouseTrendsBreakdown:
 
     def _parse_trend_result(self, filter: Filter, entity: Entity) -> Callable:
         def _parse(result: List) -> List:
+            formatter = TrendResultFormatter(filter)
+            persons_url_encoder = PersonsUrlEncoder(filter, self.team_id)
+            filter_dict = filter.to_dict()
             parsed_results = []
             for idx, stats in enumerate(result):
                 result_descriptors = self._breakdown_result_descriptors(stats[2], filter, entity)
-                parsed_result = parse_response(stats, filter, additional_values=result_descriptors)
+                parsed_result = formatter.parse_response(stats, additional_values=result_descriptors)
                 parsed_result.update(
                     {
                         "persons_urls": self._get_persons_url(
-                            filter, entity, self.team_id, parsed_result["days"], result_descriptors["breakdown_value"]
+                            filter,
+                            entity,
+                            self.team_id,
+                            parsed_result["days"],
+                            result_descriptors["breakdown_value"],
+                            persons_url_encoder,
                         )
                     }
                 )
                 parsed_results.append(parsed_result)
-                parsed_result.update({"filter": filter.to_dict()})
+                parsed_result.update({"filter": filter_dict})
             return sorted(parsed_results, key=lambda x: 0 if x.get("breakdown_value") != "all" else 1)
 
         return _parse
 
     def _get_persons_url(
-        self, filter: Filter, entity: Entity, team_id: int, dates: List[str], breakdown_value: Union[str, int]
+        self,
+        filter: Filter,
+        entity: Entity,
+        team_id: int,
+        dates: List[str],
+        breakdown_value: Union[str, int],
+        persons_url_encoder: Optional[PersonsUrlEncoder] = None,
     ) -> List[Dict[str, Any]]:
+        persons_url_encoder = persons_url_encoder or PersonsUrlEncoder(filter, team_id)
         persons_url = []
         for date in dates:
-            filter_params = filter.to_params()
             extra_params = {
                 "entity_id": entity.id,
                 "entity_type": entity.type,
@@ -301,13 +315,7 @@ class ClickhouseTrendsBreakdown:
                 "breakdown_value": breakdown_value,
                 "breakdown_type": filter.breakdown_type or "event",
             }
-            parsed_params: Dict[str, str] = encode_get_request_params({**filter_params, **extra_params})
-            persons_url.append(
-                {
-                    "filter": extra_params,
-                    "url": f"api/projects/{team_id}/actions/people/?{urllib.parse.urlencode(parsed_params)}",
-                }
-            )
+            persons_url.append({"filter": extra_params, "url": persons_url_encoder.url(extra_params)})
         return persons_url
 
     def _breakdown_result_descriptors(self, breakdown_value, filter: Filter, entity: Entity):
@@ -1,7 +1,5 @@
-import copy
-import threading
-from itertools import accumulate
-from typing import Any, Callable, Dict, List, Tuple, Union, cast
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 from django.db.models.query import Prefetch
 from django.utils import timezone
@@ -10,6 +8,7 @@ from ee.clickhouse.queries.trends.breakdown import ClickhouseTrendsBreakdown
 from ee.clickhouse.queries.trends.formula import ClickhouseTrendsFormula
 from ee.clickhouse.queries.trends.lifecycle import ClickhouseLifecycle
 from ee.clickhouse.queries.trends.total_volume import ClickhouseTrendsTotalVolume
+from ee.clickhouse.queries.trends.util import cumulative_sum
 from posthog.client import sync_execute
 from posthog.constants import TREND_FILTER_TYPE_ACTIONS, TRENDS_CUMULATIVE, TRENDS_LIFECYCLE
 from posthog.models.action import Action
@@ -17,7 +16,8 @@ from posthog.models.action_step import ActionStep
 from posthog.models.entity import Entity
 from posthog.models.filters import Filter
 from posthog.models.team import Team
-from posthog.queries.base import handle_compare
+from posthog.queries.base import convert_to_comparison, determine_compared_filter
+from posthog.queries.query_pool import run_in_parallel
 from posthog.utils import relative_date_parse
 
 
@@ -46,52 +46,7 @@ class ClickhouseTrends(ClickhouseTrendsTotalVolume, ClickhouseLifecycle, Clickho
         sql, params, parse_function = self._get_sql_for_entity(filter, entity, team)
 
         result = sync_execute(sql, params)
-
-        result = parse_function(result)
-        serialized_data = self._format_serialized(entity, result)
-
-        if filter.display == TRENDS_CUMULATIVE:
-            serialized_data = self._handle_cumulative(serialized_data)
-        return serialized_data
-
-    def _run_query_for_threading(self, result: List, index: int, sql, params):
-        result[index] = sync_execute(sql, params)
-
-    def _run_parallel(self, filter: Filter, team: Team) -> List[Dict[str, Any]]:
-        result: List[Union[None, List[Dict[str, Any]]]] = [None] * len(filter.entities)
-        parse_functions: List[Union[None, Callable]] = [None] * len(filter.entities)
-        jobs = []
-
-        for entity in filter.entities:
-            sql, params, parse_function = self._get_sql_for_entity(filter, entity, team)
-            parse_functions[entity.index] = parse_function
-            thread = threading.Thread(target=self._run_query_for_threading, args=(result, entity.index, sql, params),)
-            jobs.append(thread)
-
-        # Start the threads (i.e. calculate the random number lists)
-        for j in jobs:
-            j.start()
-
-        # Ensure all of the threads have finished
-        for j in jobs:
-            j.join()
-
-        # Parse results for each thread
-        for entity in filter.entities:
-            serialized_data = cast(List[Callable], parse_functions)[entity.index](result[entity.index])
-            serialized_data = self._format_serialized(entity, serialized_data)
-
-            if filter.display == TRENDS_CUMULATIVE:
-                serialized_data = self._handle_cumulative(serialized_data)
-            result[entity.index] = serialized_data
-
-        # flatten results
-        flat_results: List[Dict[str, Any]] = []
-        for item in result:
-            for flat in cast(List[Dict[str, Any]], item):
-                flat_results.append(flat)
-
-        return flat_results
+        return self._parse_entity_query(filter, entity, parse_function, result)
 
     def run(self, filter: Filter, team: Team, *args, **kwargs) -> List[Dict[str, Any]]:
         actions = Action.objects.filter(team_id=team.pk).order_by("-id")
@@ -101,45 +56,66 @@ class ClickhouseTrends(ClickhouseTrendsTotalVolume, ClickhouseLifecycle, Clickho
 
         filter = self._set_default_dates(filter, team)
 
-        if filter.formula:
-            return handle_compare(filter, self._run_formula_query, team)
-
-        for entity in filter.entities:
-            if entity.type == TREND_FILTER_TYPE_ACTIONS:
-                try:
-                    entity.name = actions.get(id=entity.id).name
-                except Action.DoesNotExist:
-                    return []
-
-        if len(filter.entities) == 1 or filter.compare:
-            result = []
+        if not filter.formula:
             for entity in filter.entities:
-                result.extend(handle_compare(filter, self._run_query, team, entity=entity))
+                if entity.type == TREND_FILTER_TYPE_ACTIONS:
+                    try:
+                        entity.name = actions.get(id=entity.id).name
+                    except Action.DoesNotExist:
+                        return []
+
+        periods: List[Tuple[Filter, Optional[str]]] = [(filter, None)]
+        if filter.compare:
+            periods = [(filter, "current"), (determine_compared_filter(filter), "previous")]
+
+        # Queries for every entity and compare period are planned here, then executed side by side in the query pool
+        queries: List[Tuple[Filter, Optional[str], str, Dict, Callable]] = []
+        if filter.formula:
+            for period_filter, label in periods:
+                sql, params, parse_function = self._get_formula_query(period_filter, team)
+                queries.append((period_filter, label, sql, params, parse_function))
         else:
-            result = self._run_parallel(filter, team)
-
-        return result
+            for entity in filter.entities:
+                for period_filter, label in periods:
+                    sql, params, parse_function = self._get_sql_for_entity(period_filter, entity, team)
+                    queries.append(
+                        (
+                            period_filter,
+                            label,
+                            sql,
+                            params,
+                            partial(self._parse_entity_query, period_filter, entity, parse_function),
+                        )
+                    )
+
+        results = run_in_parallel(team.pk, [partial(sync_execute, sql, params) for _, _, sql, params, _ in queries])
+
+        serialized_data: List[Dict[str, Any]] = []
+        for (period_filter, label, _, _, parse_function), result in zip(queries, results):
+            parsed = parse_function(result)
+            if label is not None:
+                parsed = convert_to_comparison(parsed, period_filter, label)
+            serialized_data.extend(parsed)
+        return serialized_data
 
-    def _format_serialized(self, entity: Entity, result: List[Dict[str, Any]]):
-        serialized_data = []
-
-        serialized: Dict[str, Any] = {
-            "action": entity.to_dict(),
-            "label": entity.name,
-            "count": 0,
-            "data": [],
-            "labels": [],
-            "days": [],
-        }
-
-        for queried_metric in result:
-            serialized_copy = copy.deepcopy(serialized)
-            serialized_copy.update(queried_metric)
-            serialized_data.append(serialized_copy)
+    def _parse_entity_query(
+        self, filter: Filter, entity: Entity, parse_function: Callable, result: List
+    ) -> List[Dict[str, Any]]:
+        serialized_data = self._format_serialized(entity, parse_function(result))
 
+        if filter.display == TRENDS_CUMULATIVE:
+            serialized_data = self._handle_cumulative(serialized_data)
         return serialized_data
 
+    def _format_serialized(self, entity: Entity, result: List[Dict[str, Any]]):
+        # Series share the entity's dict rather than each getting a deep copy of it
+        action = entity.to_dict()
+        return [
+            {"action": action, "label": entity.name, "count": 0, "data": [], "labels": [], "days": [], **queried_metric}
+            for queried_metric in result
+        ]
+
     def _handle_cumulative(self, entity_metrics: List) -> List[Dict[str, Any]]:
         for metrics in entity_metrics:
-            metrics.update(data=list(accumulate(metrics["data"])))
+            metrics.update(data=cumulative_sum(metrics["data"]))
         return entity_metrics
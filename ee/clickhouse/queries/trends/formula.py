@@ -1,9 +1,8 @@
 import math
-from itertools import accumulate
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, List, Tuple
 
 from ee.clickhouse.queries.breakdown_props import get_breakdown_cohort_name
-from ee.clickhouse.queries.trends.util import parse_response
+from ee.clickhouse.queries.trends.util import TrendResultFormatter, cumulative_sum
 from ee.clickhouse.sql.clickhouse import trim_quotes_expr
 from posthog.client import sync_execute
 from posthog.constants import NON_TIME_SERIES_DISPLAY_TYPES, TRENDS_CUMULATIVE
@@ -13,6 +12,10 @@ from posthog.models.team import Team
 
 class ClickhouseTrendsFormula:
     def _run_formula_query(self, filter: Filter, team: Team):
+        sql, params, parse_function = self._get_formula_query(filter, team)
+        return parse_function(sync_execute(sql, params))
+
+    def _get_formula_query(self, filter: Filter, team: Team) -> Tuple[str, Dict[str, Any], Callable]:
         letters = [chr(65 + i) for i in range(0, len(filter.entities))]
         queries = []
         params: Dict[str, Any] = {}
@@ -66,7 +69,11 @@ class ClickhouseTrendsFormula:
                 [" CROSS JOIN ({}) as sub_{}".format(query, letters[i + 1]) for i, query in enumerate(queries[1:])]
             ),
         )
-        result = sync_execute(sql, params)
+        return sql, params, lambda result: self._parse_formula_result(filter, result)
+
+    def _parse_formula_result(self, filter: Filter, result: List) -> List[Dict[str, Any]]:
+        is_aggregate = filter.display in NON_TIME_SERIES_DISPLAY_TYPES
+        formatter = TrendResultFormatter(filter)
         response = []
         for item in result:
             additional_values: Dict[str, Any] = {
@@ -80,9 +87,9 @@ class ClickhouseTrendsFormula:
                     round(number, 2) if not math.isnan(number) and not math.isinf(number) else 0.0 for number in item[1]
                 ]
                 if filter.display == TRENDS_CUMULATIVE:
-                    additional_values["data"] = list(accumulate(additional_values["data"]))
+                    additional_values["data"] = cumulative_sum(additional_values["data"])
             additional_values["count"] = float(sum(additional_values["data"]))
-            response.append(parse_response(item, filter, additional_values=additional_values))
+            response.append(formatter.parse_response(item, additional_values=additional_values))
         return response
 
     def _label(self, filter: Filter, item: List) -> str:
@@ -7,7 +7,7 @@ from rest_framework.request import Request
 from ee.clickhouse.models.entity import get_entity_filtering_params
 from ee.clickhouse.models.person import get_persons_by_uuids
 from ee.clickhouse.queries.event_query import EnterpriseEventQuery
-from ee.clickhouse.queries.trends.util import parse_response
+from ee.clickhouse.queries.trends.util import TrendResultFormatter
 from ee.clickhouse.sql.trends.lifecycle import LIFECYCLE_PEOPLE_SQL, LIFECYCLE_SQL
 from posthog.client import sync_execute
 from posthog.models.entity import Entity
@@ -40,11 +40,12 @@ class ClickhouseLifecycle:
 
     def _parse_result(self, filter: Filter, entity: Entity, team: Team) -> Callable:
         def _parse(result: List) -> List:
+            formatter = TrendResultFormatter(filter)
             res = []
             for val in result:
                 label = "{} - {}".format(entity.name, val[2])
                 additional_values = {"label": label, "status": val[2]}
-                parsed_result = parse_response(val, filter, additional_values=additional_values)
+                parsed_result = formatter.parse_response(val, additional_values=additional_values)
                 res.append(parsed_result)
 
             return res
@@ -8,12 +8,12 @@ from ee.clickhouse.queries.actor_base_query import ActorBaseQuery
 from ee.clickhouse.queries.trends.trend_event_query import TrendsEventQuery
 from ee.clickhouse.sql.person import GET_ACTORS_FROM_EVENT_QUERY
 from posthog.constants import NON_TIME_SERIES_DISPLAY_TYPES, TRENDS_CUMULATIVE, PropertyOperatorType
-from posthog.models.cohort import Cohort
 from posthog.models.entity import Entity
 from posthog.models.filters import Filter
 from posthog.models.filters.mixins.utils import cached_property
 from posthog.models.property import Property
 from posthog.models.team import Team
+from posthog.queries.query_metadata import get_cohort
 
 
 def _handle_date_interval(filter: Filter) -> Filter:
@@ -54,7 +54,7 @@ class ClickhouseTrendsActors(ActorBaseQuery):
 
     def actor_query(self, limit_actors: Optional[bool] = True) -> Tuple[str, Dict]:
         if self._filter.breakdown_type == "cohort" and self._filter.breakdown_value != "all":
-            cohort = Cohort.objects.get(pk=self._filter.breakdown_value, team_id=self._team.pk)
+            cohort = get_cohort(self._filter.breakdown_value, self._team.pk)
             self._filter = self._filter.with_data(
                 {
                     "properties": self._filter.property_groups.combine_properties(
@@ -1,8 +1,13 @@
 import urllib.parse
-from typing import Any, Callable, Dict, List, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 from ee.clickhouse.queries.trends.trend_event_query import TrendsEventQuery
-from ee.clickhouse.queries.trends.util import enumerate_time_range, parse_response, process_math
+from ee.clickhouse.queries.trends.util import (
+    PersonsUrlEncoder,
+    TrendResultFormatter,
+    enumerate_time_range,
+    process_math,
+)
 from ee.clickhouse.sql.events import NULL_SQL
 from ee.clickhouse.sql.trends.volume import (
     ACTIVE_USER_SQL,
@@ -98,15 +103,22 @@ class ClickhouseTrendsTotalVolume:
 
     def _parse_total_volume_result(self, filter: Filter, entity: Entity, team: Team) -> Callable:
         def _parse(result: List) -> List:
+            formatter = TrendResultFormatter(filter)
+            persons_url_encoder = PersonsUrlEncoder(filter, team.pk)
+            filter_dict = filter.to_dict()
             parsed_results = []
             for _, stats in enumerate(result):
-                parsed_result = parse_response(stats, filter)
+                parsed_result = formatter.parse_response(stats)
                 parsed_result.update(
-                    {"persons_urls": self._get_persons_url(filter, entity, team.pk, parsed_result["days"])}
+                    {
+                        "persons_urls": self._get_persons_url(
+                            filter, entity, team.pk, parsed_result["days"], persons_url_encoder
+                        )
+                    }
                 )
                 parsed_results.append(parsed_result)
 
-                parsed_result.update({"filter": filter.to_dict()})
+                parsed_result.update({"filter": filter_dict})
             return parsed_results
 
         return _parse
@@ -135,10 +147,17 @@ class ClickhouseTrendsTotalVolume:
 
         return _parse
 
-    def _get_persons_url(self, filter: Filter, entity: Entity, team_id: int, dates: List[str]) -> List[Dict[str, Any]]:
+    def _get_persons_url(
+        self,
+        filter: Filter,
+        entity: Entity,
+        team_id: int,
+        dates: List[str],
+        persons_url_encoder: Optional[PersonsUrlEncoder] = None,
+    ) -> List[Dict[str, Any]]:
+        persons_url_encoder = persons_url_encoder or PersonsUrlEncoder(filter, team_id)
         persons_url = []
         for date in dates:
-            filter_params = filter.to_params()
             extra_params = {
                 "entity_id": entity.id,
                 "entity_type": entity.type,
@@ -146,12 +165,5 @@ class ClickhouseTrendsTotalVolume:
                 "date_from": filter.date_from if filter.display == TRENDS_CUMULATIVE else date,
                 "date_to": date,
             }
-
-            parsed_params: Dict[str, str] = encode_get_request_params({**filter_params, **extra_params})
-            persons_url.append(
-                {
-                    "filter": extra_params,
-                    "url": f"api/projects/{team_id}/actions/people/?{urllib.parse.urlencode(parsed_params)}",
-                }
-            )
+            persons_url.append({"filter": extra_params, "url": persons_url_encoder.url(extra_params)})
         return persons_url
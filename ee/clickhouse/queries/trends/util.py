@@ -1,6 +1,8 @@
+import urllib.parse
 from datetime import timedelta
 from typing import Any, Dict, List, Optional, Tuple, Union
 
+import numpy as np
 from rest_framework.exceptions import ValidationError
 
 from ee.clickhouse.models.property import get_property_string_expr
@@ -11,6 +13,7 @@ from posthog.models.filters import Filter, PathFilter
 from posthog.models.filters.utils import validate_group_type_index
 from posthog.models.team import Team
 from posthog.queries.util import format_ch_timestamp, get_earliest_timestamp
+from posthog.utils import encode_get_request_params
 
 MATH_FUNCTIONS = {
     "sum": "sum",
@@ -55,16 +58,70 @@ def process_math(
 
 
 def parse_response(stats: Dict, filter: Filter, additional_values: Dict = {}) -> Dict[str, Any]:
-    counts = stats[1]
-    labels = [item.strftime("%-d-%b-%Y{}".format(" %H:%M" if filter.interval == "hour" else "")) for item in stats[0]]
-    days = [item.strftime("%Y-%m-%d{}".format(" %H:%M:%S" if filter.interval == "hour" else "")) for item in stats[0]]
-    return {
-        "data": [float(c) for c in counts],
-        "count": float(sum(counts)),
-        "labels": labels,
-        "days": days,
-        **additional_values,
-    }
+    return TrendResultFormatter(filter).parse_response(stats, additional_values)
+
+
+class TrendResultFormatter:
+    """
+    Formats the series of one query. Series over the same dates, e.g. every value of a breakdown, share one `labels`
+    and one `days` list, which are only formatted once.
+    """
+
+    def __init__(self, filter: Filter):
+        self.filter = filter
+        self._formatted_dates: Dict[Tuple, Tuple[List[str], List[str]]] = {}
+
+    def parse_response(self, stats: Dict, additional_values: Dict = {}) -> Dict[str, Any]:
+        counts = stats[1]
+        labels, days = self._format_dates(tuple(stats[0]))
+        return {
+            "data": np.asarray(counts, dtype=np.float64).tolist(),
+            "count": float(sum(counts)),
+            "labels": labels,
+            "days": days,
+            **additional_values,
+        }
+
+    def _format_dates(self, dates: Tuple) -> Tuple[List[str], List[str]]:
+        if dates not in self._formatted_dates:
+            hourly = self.filter.interval == "hour"
+            label_format = "%-d-%b-%Y{}".format(" %H:%M" if hourly else "")
+            day_format = "%Y-%m-%d{}".format(" %H:%M:%S" if hourly else "")
+            self._formatted_dates[dates] = (
+                [item.strftime(label_format) for item in dates],
+                [item.strftime(day_format) for item in dates],
+            )
+        return self._formatted_dates[dates]
+
+
+class PersonsUrlEncoder:
+    """
+    Builds the `actions/people` URLs for a filter's data points. The filter's own params are encoded once rather than
+    for every data point, with URLs identical to encoding `{**filter.to_params(), **extra_params}` each time.
+    """
+
+    def __init__(self, filter: Filter, team_id: int):
+        self.team_id = team_id
+        self.filter_params = filter.to_params()
+        self.encoded_filter_params = encode_get_request_params(self.filter_params)
+        self._key_orders: Dict[Tuple[str, ...], List[str]] = {}
+
+    def url(self, extra_params: Dict[str, Any]) -> str:
+        extra_keys = tuple(extra_params)
+        if extra_keys not in self._key_orders:
+            self._key_orders[extra_keys] = list({**self.filter_params, **extra_params})
+
+        encoded_extra_params = encode_get_request_params(extra_params)
+        params = {}
+        for key in self._key_orders[extra_keys]:
+            encoded = encoded_extra_params if key in extra_params else self.encoded_filter_params
+            if key in encoded:
+                params[key] = encoded[key]
+        return f"api/projects/{self.team_id}/actions/people/?{urllib.parse.urlencode(params)}"
+
+
+def cumulative_sum(data: List[float]) -> List[float]:
+    return np.cumsum(np.asarray(data, dtype=np.float64)).tolist()
 
 
 def get_active_user_params(filter: Union[Filter, PathFilter], entity: Entity, team_id: int) -> Dict[str, Any]:
@@ -32,6 +32,7 @@ JOIN (
     SELECT id, argMax(properties, person._timestamp) as properties, sum(is_deleted) as is_deleted FROM person WHERE team_id = %(team_id)s GROUP BY id
 ) as person ON (person.id = cohortpeople.person_id)
 WHERE cohort_id = %(cohort_id)s
+{person_id_filter}
 AND
     (
         person.is_deleted = 1 OR NOT person_id IN ({cohort_filter})
@@ -61,6 +62,19 @@ INSERT INTO cohortpeople
     WHERE (cohortpeople.person_id = '00000000-0000-0000-0000-000000000000' OR sign = 0)
     AND person.is_deleted = 0
     AND id IN ({cohort_filter})
+    {person_id_filter}
+"""
+
+# Persons whose rows were written since the last recalculation, i.e. which were created, updated or deleted
+GET_PERSON_IDS_CHANGED_SINCE_SQL = """
+SELECT id FROM person WHERE team_id = %(team_id)s AND _timestamp > %(since)s
+"""
+
+# Only reads event partitions since the last recalculation
+GET_PERSON_IDS_WITH_EVENTS_SINCE_SQL = """
+SELECT pdi.person_id FROM events
+INNER JOIN ({GET_TEAM_PERSON_DISTINCT_IDS}) AS pdi ON events.distinct_id = pdi.distinct_id
+WHERE team_id = %(team_id)s AND timestamp > %(since)s
 """
 
 GET_DISTINCT_ID_BY_ENTITY_SQL = """
@@ -345,4 +345,4 @@ GET_CUSTOM_EVENTS = """
 SELECT DISTINCT event FROM events where team_id = %(team_id)s AND event NOT IN ['$autocapture', '$pageview', '$identify', '$pageleave', '$screen']
 """
 
-GET_EVENTS_VOLUME = "SELECT event, count(1) as count FROM events WHERE team_id = %(team_id)s AND timestamp > %(timestamp)s GROUP BY event ORDER BY count DESC"
+GET_EVENTS_VOLUME_FOR_TEAMS = "SELECT team_id, event, count(1) as count FROM events WHERE team_id IN %(team_ids)s AND timestamp > %(timestamp)s GROUP BY team_id, event"
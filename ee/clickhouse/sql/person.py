@@ -1,7 +1,12 @@
 from ee.clickhouse.sql.clickhouse import KAFKA_COLUMNS, STORAGE_POLICY, kafka_engine
 from ee.clickhouse.sql.table_engines import CollapsingMergeTree, ReplacingMergeTree
 from ee.kafka_client.topics import KAFKA_PERSON, KAFKA_PERSON_DISTINCT_ID, KAFKA_PERSON_UNIQUE_ID
-from posthog.settings import CLICKHOUSE_CLUSTER, CLICKHOUSE_DATABASE
+from posthog.settings import (
+    CLICKHOUSE_CLUSTER,
+    CLICKHOUSE_DATABASE,
+    PERSON_DISTINCT_ID_SNAPSHOT_MAX_AGE_SECONDS,
+    PERSON_DISTINCT_ID_SNAPSHOT_REFRESH_INTERVAL_SECONDS,
+)
 
 TRUNCATE_PERSON_TABLE_SQL = f"TRUNCATE TABLE IF EXISTS person ON CLUSTER '{CLICKHOUSE_CLUSTER}'"
 
@@ -11,6 +16,9 @@ TRUNCATE_PERSON_DISTINCT_ID_TABLE_SQL = f"TRUNCATE TABLE IF EXISTS person_distin
 TRUNCATE_PERSON_DISTINCT_ID2_TABLE_SQL = (
     f"TRUNCATE TABLE IF EXISTS person_distinct_id2 ON CLUSTER '{CLICKHOUSE_CLUSTER}'"
 )
+TRUNCATE_PERSON_DISTINCT_ID_SNAPSHOT_TABLE_SQL = (
+    f"TRUNCATE TABLE IF EXISTS person_distinct_id_snapshot ON CLUSTER '{CLICKHOUSE_CLUSTER}'"
+)
 
 PERSONS_TABLE = "person"
 
@@ -208,6 +216,33 @@ FROM {database}.kafka_{table_name}
     table_name=PERSON_DISTINCT_ID2_TABLE, cluster=CLICKHOUSE_CLUSTER, database=CLICKHOUSE_DATABASE,
 )
 
+#
+# person_distinct_id_snapshot: periodically refreshed copy of each team's live distinct_id -> person_id mapping,
+# deduplicated once at refresh time instead of in every query joining persons
+#
+
+PERSON_DISTINCT_ID_SNAPSHOT_TABLE = "person_distinct_id_snapshot"
+
+# snapshot_version is the unix timestamp of the refresh. Queries only read the latest version of a team's snapshot,
+# older ones expire on their own once no query can be reading them anymore.
+PERSON_DISTINCT_ID_SNAPSHOT_TABLE_SQL = lambda: """
+CREATE TABLE IF NOT EXISTS {table_name} ON CLUSTER '{cluster}'
+(
+    team_id Int64,
+    snapshot_version Int64,
+    distinct_id VARCHAR,
+    person_id UUID
+) ENGINE = {engine}
+ORDER BY (team_id, snapshot_version, distinct_id)
+TTL toDateTime(snapshot_version) + INTERVAL {ttl_seconds} SECOND
+SETTINGS index_granularity = 512
+""".format(
+    table_name=PERSON_DISTINCT_ID_SNAPSHOT_TABLE,
+    cluster=CLICKHOUSE_CLUSTER,
+    ttl_seconds=PERSON_DISTINCT_ID_SNAPSHOT_MAX_AGE_SECONDS + PERSON_DISTINCT_ID_SNAPSHOT_REFRESH_INTERVAL_SECONDS,
+    engine=ReplacingMergeTree(PERSON_DISTINCT_ID_SNAPSHOT_TABLE, ver="snapshot_version"),
+)
+
 #
 # Static Cohort
 #
@@ -271,6 +306,39 @@ GROUP BY distinct_id
 HAVING argMax(is_deleted, version) = 0
 """
 
+INSERT_PERSON_DISTINCT_ID_SNAPSHOT_SQL = """
+INSERT INTO person_distinct_id_snapshot (team_id, snapshot_version, distinct_id, person_id)
+SELECT %(team_id)s, %(snapshot_version)s, distinct_id, person_id
+FROM ({GET_TEAM_PERSON_DISTINCT_IDS_NEW_TABLE})
+""".format(
+    GET_TEAM_PERSON_DISTINCT_IDS_NEW_TABLE=GET_TEAM_PERSON_DISTINCT_IDS_NEW_TABLE
+)
+
+# Same result as GET_TEAM_PERSON_DISTINCT_IDS_NEW_TABLE: distinct_ids changed since the snapshot's watermark are
+# resolved from person_distinct_id2, all others come straight from the snapshot
+GET_TEAM_PERSON_DISTINCT_IDS_FROM_SNAPSHOT = """
+SELECT distinct_id, person_id
+FROM person_distinct_id_snapshot
+WHERE team_id = %(team_id)s
+  AND snapshot_version = %(snapshot_version)s
+  AND distinct_id NOT IN (
+    SELECT distinct_id
+    FROM person_distinct_id2
+    WHERE team_id = %(team_id)s AND _timestamp > toDateTime(%(watermark)s)
+  )
+UNION ALL
+SELECT distinct_id, argMax(person_id, version) as person_id
+FROM person_distinct_id2
+WHERE team_id = %(team_id)s
+  AND distinct_id IN (
+    SELECT distinct_id
+    FROM person_distinct_id2
+    WHERE team_id = %(team_id)s AND _timestamp > toDateTime(%(watermark)s)
+  )
+GROUP BY distinct_id
+HAVING argMax(is_deleted, version) = 0
+"""
+
 GET_PERSON_IDS_BY_FILTER = """
 SELECT DISTINCT p.id
 FROM ({latest_person_sql}) AS p
@@ -303,6 +371,10 @@ INSERT_PERSON_DISTINCT_ID2 = """
 INSERT INTO person_distinct_id2 (distinct_id, person_id, team_id, is_deleted, version, _timestamp, _offset, _partition) SELECT %(distinct_id)s, %(person_id)s, %(team_id)s, 0, %(version)s, now(), 0, 0 VALUES
 """
 
+BULK_INSERT_PERSON_DISTINCT_ID = """
+INSERT INTO person_distinct_id (distinct_id, person_id, team_id, _sign, _timestamp, _offset) VALUES
+"""
+
 BULK_INSERT_PERSON_DISTINCT_ID2 = """
 INSERT INTO person_distinct_id2 (distinct_id, person_id, team_id, is_deleted, version, _timestamp, _offset, _partition) VALUES
 """
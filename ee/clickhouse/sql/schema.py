@@ -30,6 +30,7 @@ CREATE_TABLE_QUERIES = [
     PERSON_DISTINCT_ID2_TABLE_SQL,
     KAFKA_PERSON_DISTINCT_ID2_TABLE_SQL,
     PERSON_DISTINCT_ID2_MV_SQL,
+    PERSON_DISTINCT_ID_SNAPSHOT_TABLE_SQL,
     KAFKA_PLUGIN_LOG_ENTRIES_TABLE_SQL,
     PLUGIN_LOG_ENTRIES_TABLE_SQL,
     PLUGIN_LOG_ENTRIES_TABLE_MV_SQL,
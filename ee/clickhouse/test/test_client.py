@@ -1,14 +1,28 @@
 import datetime
+import time
 from unittest.mock import patch
+from uuid import UUID
 
 import fakeredis
+import numpy as np
 from clickhouse_driver.errors import ServerException
 from django.test import TestCase
 from freezegun import freeze_time
 
 from ee.clickhouse.util import ClickhouseTestMixin
 from posthog import client
-from posthog.client import CACHE_TTL, _deserialize, _key_hash, cache_sync_execute, sync_execute
+from posthog.client import (
+    CACHE_KEY_VERSION,
+    CACHE_TTL,
+    _deserialize,
+    _key_hash,
+    _serialize,
+    cache_sync_execute,
+    query_with_columns,
+    sync_execute,
+    sync_execute_columnar,
+    sync_execute_iter,
+)
 
 
 class ClickhouseClientTestCase(TestCase, ClickhouseTestMixin):
@@ -48,6 +62,95 @@ class ClickhouseClientTestCase(TestCase, ClickhouseTestMixin):
             exists = self.redis_client.exists(_key_hash(query, args=args))
             self.assertFalse(exists)
 
+    def test_cache_keeps_types(self):
+        query = "SELECT toDateTime('2021-01-01 00:00:00', 'UTC'), toUUID('01795392-cc00-0003-7dc7-67a694604d72')"
+        res = cache_sync_execute(query, redis_client=self.redis_client)
+        res_cached = cache_sync_execute(query, redis_client=self.redis_client)
+
+        self.assertEqual(res_cached, res)
+        self.assertIsInstance(res_cached[0], tuple)
+        self.assertEqual(res_cached[0][0], datetime.datetime(2021, 1, 1, tzinfo=datetime.timezone.utc))
+        self.assertEqual(res_cached[0][1], UUID("01795392-cc00-0003-7dc7-67a694604d72"))
+
+    @patch("posthog.client.sync_execute")
+    def test_cache_coalesces_concurrent_misses(self, sync_execute_mock):
+        query = "select 1"
+        key = _key_hash(query, args=None)
+        # Another worker is already running the query
+        self.redis_client.set(key + b":lock", 1)
+
+        def other_worker_finishes(seconds):
+            self.redis_client.set(key, _serialize([(1,)], fresh_until=time.time() + CACHE_TTL))
+
+        with patch("posthog.client.time.sleep", side_effect=other_worker_finishes):
+            res = cache_sync_execute(query, redis_client=self.redis_client)
+
+        self.assertEqual(res, [(1,)])
+        sync_execute_mock.assert_not_called()
+
+    @patch("posthog.client.sync_execute")
+    def test_cache_runs_query_when_coalesced_worker_fails(self, sync_execute_mock):
+        sync_execute_mock.return_value = [(2,)]
+        query = "select 2"
+        self.redis_client.set(_key_hash(query, args=None) + b":lock", 1)
+
+        def other_worker_fails(seconds):
+            self.redis_client.delete(_key_hash(query, args=None) + b":lock")
+
+        with patch("posthog.client.time.sleep", side_effect=other_worker_fails):
+            res = cache_sync_execute(query, redis_client=self.redis_client)
+
+        self.assertEqual(res, [(2,)])
+        sync_execute_mock.assert_called_once()
+
+    @patch("posthog.client.sync_execute")
+    def test_cache_serves_stale_while_revalidating(self, sync_execute_mock):
+        query = "select 1"
+        key = _key_hash(query, args=None)
+        start = datetime.datetime.fromisoformat("2020-01-01 12:00:00")
+        sync_execute_mock.return_value = [(1,)]
+        with freeze_time(start.isoformat()):
+            cache_sync_execute(query, redis_client=self.redis_client, ttl=CACHE_TTL, stale_ttl=600)
+
+        sync_execute_mock.return_value = [(2,)]
+        with freeze_time(start + datetime.timedelta(seconds=CACHE_TTL + 10)):
+            # Another worker is refreshing, so we get the stale result
+            self.redis_client.set(key + b":lock", 1)
+            self.assertEqual(cache_sync_execute(query, redis_client=self.redis_client, stale_ttl=600), [(1,)])
+            self.assertEqual(sync_execute_mock.call_count, 1)
+
+            # Nobody is refreshing, so we do
+            self.redis_client.delete(key + b":lock")
+            self.assertEqual(cache_sync_execute(query, redis_client=self.redis_client, stale_ttl=600), [(2,)])
+            self.assertEqual(sync_execute_mock.call_count, 2)
+
+    @patch("posthog.client.sync_execute")
+    def test_cache_treats_undecodable_entries_as_a_miss(self, sync_execute_mock):
+        sync_execute_mock.return_value = [(1,)]
+        query = "select 1"
+        self.redis_client.set(_key_hash(query, args=None), b"not a pickle")
+
+        self.assertEqual(cache_sync_execute(query, redis_client=self.redis_client), [(1,)])
+        sync_execute_mock.assert_called_once()
+        self.assertEqual(_deserialize(self.redis_client.get(_key_hash(query, args=None))), [(1,)])
+
+    def test_cache_keys_are_versioned(self):
+        self.assertTrue(_key_hash("select 1", args=None).startswith(CACHE_KEY_VERSION))
+
+    @patch("posthog.client.sync_execute")
+    def test_cache_does_not_release_a_lock_taken_by_another_worker(self, sync_execute_mock):
+        query = "select 1"
+        lock_key = _key_hash(query, args=None) + b":lock"
+
+        def lock_expires_and_another_worker_takes_it(*args, **kwargs):
+            self.redis_client.set(lock_key, b"other-worker")
+            return [(1,)]
+
+        sync_execute_mock.side_effect = lock_expires_and_another_worker_takes_it
+        cache_sync_execute(query, redis_client=self.redis_client)
+
+        self.assertEqual(self.redis_client.get(lock_key), b"other-worker")
+
     def test_async_query_client(self):
         query = "SELECT 1+1"
         team_id = 2
@@ -57,6 +160,32 @@ class ClickhouseClientTestCase(TestCase, ClickhouseTestMixin):
         self.assertTrue(result.complete)
         self.assertEqual(result.results, [[2]])
 
+    def test_async_query_client_stores_results_apart_from_status(self):
+        query = "SELECT 3+3"
+        team_id = 2
+        query_id = client.enqueue_execute_with_progress(team_id, query, bypass_celery=True)
+
+        redis_client = client.redis.get_client()
+        status = client.QueryStatus.from_json(redis_client.get(client.generate_redis_results_key(query_id)))  # type: ignore
+        self.assertTrue(status.complete)
+        self.assertIsNone(status.results)
+        self.assertEqual(status.estimated_time_remaining, 0)
+        self.assertEqual(client.get_status_or_results(team_id, query_id).results, [[6]])
+
+    def test_async_query_client_reads_results_stored_with_legacy_status(self):
+        team_id = 2
+        redis_client = client.redis.get_client()
+        legacy_status = client.QueryStatus(team_id, complete=True, results=[[4]])
+        redis_client.set(client.generate_redis_results_key("legacy_query"), legacy_status.to_json())  # type: ignore
+
+        result = client.get_status_or_results(team_id, "legacy_query")
+        self.assertFalse(result.error)
+        self.assertEqual(result.results, [[4]])
+
+    def test_estimate_time_remaining(self):
+        self.assertEqual(client._estimate_time_remaining(num_rows=250, total_rows=1000, elapsed=1), 3)
+        self.assertIsNone(client._estimate_time_remaining(num_rows=0, total_rows=1000, elapsed=1))
+
     def test_async_query_client_errors(self):
         query = "SELECT WOW SUCH DATA FROM NOWHERE THIS WILL CERTAINLY WORK"
         team_id = 2
@@ -145,13 +274,16 @@ class ClickhouseClientTestCase(TestCase, ClickhouseTestMixin):
         # First add in the request information that should be added to the sql.
         # We check this to make sure it is not removed by the comment stripping
         with self.capture_select_queries() as sqls:
-            client._request_information = {"kind": "request", "id": "1"}
-            sync_execute(
-                query="""
-                    -- this request returns 1
-                    SELECT 1
-                """
-            )
+            token = client._request_information.set({"kind": "request", "id": "1"})
+            try:
+                sync_execute(
+                    query="""
+                        -- this request returns 1
+                        SELECT 1
+                    """
+                )
+            finally:
+                client._request_information.reset(token)
             self.assertEqual(len(sqls), 1)
             first_query = sqls[0]
             self.assertIn(f"SELECT 1", first_query)
@@ -160,3 +292,74 @@ class ClickhouseClientTestCase(TestCase, ClickhouseTestMixin):
             # Make sure it still includes the "annotation" comment that includes
             # request routing information for debugging purposes
             self.assertIn("/* request:1 */", first_query)
+
+    def test_client_strips_comments_from_template_only(self):
+        query = """
+            -- the template comment is stripped
+            SELECT %(value)s
+        """
+        with self.capture_select_queries() as sqls:
+            result = sync_execute(query, {"value": "-- but values are left alone"})
+
+        self.assertEqual(result, [("-- but values are left alone",)])
+        self.assertNotIn("the template comment", sqls[0])
+
+    def test_sync_execute_iter_streams_blocks(self):
+        blocks = list(sync_execute_iter("SELECT number FROM numbers(25)", block_size=10))
+
+        self.assertEqual([len(block) for block in blocks], [10, 10, 5])
+        self.assertEqual([row for block in blocks for row in block], sync_execute("SELECT number FROM numbers(25)"))
+
+    def test_sync_execute_iter_with_column_types(self):
+        blocks = sync_execute_iter("SELECT number AS n FROM numbers(3)", with_column_types=True)
+
+        self.assertEqual(next(blocks), [("n", "UInt64")])
+        self.assertEqual(list(blocks), [[(0,), (1,), (2,)]])
+
+    @patch("clickhouse_driver.Client.disconnect")
+    def test_sync_execute_iter_disconnects_when_closed_early(self, disconnect_mock):
+        blocks = sync_execute_iter("SELECT number FROM numbers(25)", block_size=10)
+        next(blocks)
+        blocks.close()
+
+        disconnect_mock.assert_called_once()
+
+    @patch("clickhouse_driver.Client.disconnect")
+    def test_sync_execute_iter_keeps_connection_when_exhausted(self, disconnect_mock):
+        list(sync_execute_iter("SELECT number FROM numbers(25)", block_size=10))
+
+        disconnect_mock.assert_not_called()
+
+    @patch("posthog.client.timing")
+    def test_sync_execute_iter_does_not_time_the_consumer(self, timing_mock):
+        with patch("posthog.client.perf_counter", side_effect=range(1000)):
+            for _block in sync_execute_iter("SELECT number FROM numbers(25)", block_size=10):
+                pass
+
+        execution_times = [
+            call.args[1] for call in timing_mock.call_args_list if call.args[0] == "clickhouse_sync_execution_time"
+        ]
+        # Three blocks and the final empty fetch, each of which takes one tick of the patched clock
+        self.assertEqual(execution_times, [4 * 1000.0])
+
+    def test_query_with_columns(self):
+        result = query_with_columns(
+            "SELECT number AS n, ['a', 'b'] AS letters, 1 AS removed FROM numbers(2)", columns_to_remove=["removed"]
+        )
+
+        self.assertEqual(result, [{"n": 0, "letters": "a, b"}, {"n": 1, "letters": "a, b"}])
+
+    def test_sync_execute_columnar(self):
+        columns = sync_execute_columnar("SELECT number AS n, toString(number) AS s, [number] AS a FROM numbers(3)")
+
+        self.assertEqual(list(columns.keys()), ["n", "s", "a"])
+        self.assertEqual(columns["n"].dtype, np.uint64)
+        self.assertEqual(columns["n"].tolist(), [0, 1, 2])
+        self.assertEqual(columns["s"].tolist(), ["0", "1", "2"])
+        self.assertEqual(columns["a"].shape, (3,))
+        self.assertEqual(columns["a"].tolist(), [[0], [1], [2]])
+
+    def test_sync_execute_columnar_empty_result(self):
+        columns = sync_execute_columnar("SELECT number AS n FROM numbers(0)")
+
+        self.assertEqual(columns["n"].tolist(), [])
@@ -41,13 +41,23 @@ class ClickhouseTestMixin(QueryMatchingTest):
         def get_client():
             with original_get_client() as client:
                 original_client_execute = client.execute
+                original_client_execute_iter = client.execute_iter
 
-                def execute_wrapper(query, *args, **kwargs):
+                def capture(query):
                     if sqlparse.format(query, strip_comments=True).strip().startswith(query_prefixes):
                         queries.append(query)
+
+                def execute_wrapper(query, *args, **kwargs):
+                    capture(query)
                     return original_client_execute(query, *args, **kwargs)
 
-                with patch.object(client, "execute", wraps=execute_wrapper) as _:
+                def execute_iter_wrapper(query, *args, **kwargs):
+                    capture(query)
+                    return original_client_execute_iter(query, *args, **kwargs)
+
+                with patch.object(client, "execute", wraps=execute_wrapper) as _, patch.object(
+                    client, "execute_iter", wraps=execute_iter_wrapper
+                ) as _:
                     yield client
 
         with patch("posthog.client.ch_pool.get_client", wraps=get_client) as _:
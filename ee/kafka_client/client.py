@@ -1,6 +1,9 @@
 import json
+import threading
+import time
 from enum import Enum
-from typing import Any, Callable, Dict, Optional
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import kafka.errors
 from kafka import KafkaConsumer as KC
@@ -10,9 +13,16 @@ from structlog import get_logger
 from ee.kafka_client import helper
 from ee.settings import KAFKA_ENABLED
 from posthog.client import async_execute, sync_execute
+from posthog.internal_metrics import gauge, incr, timing
 from posthog.settings import (
     KAFKA_BASE64_KEYS,
     KAFKA_HOSTS,
+    KAFKA_PRODUCER_BATCH_SIZE,
+    KAFKA_PRODUCER_BUFFER_MEMORY,
+    KAFKA_PRODUCER_LINGER_MS,
+    KAFKA_PRODUCER_MAX_BLOCK_MS,
+    KAFKA_PRODUCER_MAX_IN_FLIGHT_MESSAGES,
+    KAFKA_PRODUCER_METRICS_INTERVAL_SECONDS,
     KAFKA_SASL_MECHANISM,
     KAFKA_SASL_PASSWORD,
     KAFKA_SASL_USER,
@@ -26,6 +36,10 @@ KAFKA_PRODUCER_RETRIES = 5
 logger = get_logger(__file__)
 
 
+class KafkaProducerOverloadedError(Exception):
+    """Raised instead of blocking when the producer already has too many messages waiting on delivery."""
+
+
 class TestKafkaProducer:
     def __init__(self):
         pass
@@ -81,19 +95,36 @@ def _sasl_params():
 
 
 class _KafkaProducer:
-    def __init__(self, test=TEST):
+    def __init__(self, test=TEST, max_in_flight_messages=KAFKA_PRODUCER_MAX_IN_FLIGHT_MESSAGES):
+        producer_config = {
+            "retries": KAFKA_PRODUCER_RETRIES,
+            "linger_ms": KAFKA_PRODUCER_LINGER_MS,
+            "batch_size": KAFKA_PRODUCER_BATCH_SIZE,
+            "buffer_memory": KAFKA_PRODUCER_BUFFER_MEMORY,
+            "max_block_ms": KAFKA_PRODUCER_MAX_BLOCK_MS,
+        }
         if test:
             self.producer = TestKafkaProducer()
         elif KAFKA_BASE64_KEYS:
-            self.producer = helper.get_kafka_producer(retries=KAFKA_PRODUCER_RETRIES, value_serializer=lambda d: d)
+            self.producer = helper.get_kafka_producer(value_serializer=lambda d: d, **producer_config)
         else:
             self.producer = KP(
-                retries=KAFKA_PRODUCER_RETRIES,
                 bootstrap_servers=KAFKA_HOSTS,
                 security_protocol=KAFKA_SECURITY_PROTOCOL or _KafkaSecurityProtocol.PLAINTEXT,
+                **producer_config,
                 **_sasl_params(),
             )
 
+        self.max_in_flight_messages = max_in_flight_messages
+        # Delivery callbacks run on the producer's I/O thread, so all counters are guarded by this lock
+        self._lock = threading.Lock()
+        self.in_flight_messages = 0
+        self.in_flight_bytes = 0
+        self._delivered_count = 0
+        self._delivery_latency_total_ms = 0.0
+        self._delivery_latency_max_ms = 0.0
+        self._last_metrics_report = time.monotonic()
+
     @staticmethod
     def json_serializer(d):
         b = json.dumps(d).encode("utf-8")
@@ -103,9 +134,103 @@ class _KafkaProducer:
         if not value_serializer:
             value_serializer = self.json_serializer
         b = value_serializer(data)
-        if key is not None:
-            key = key.encode("utf-8")
-        self.producer.send(topic, value=b, key=key)
+
+        with self._lock:
+            if self.in_flight_messages >= self.max_in_flight_messages:
+                overloaded = True
+            else:
+                overloaded = False
+                self.in_flight_messages += 1
+                self.in_flight_bytes += len(b)
+        if overloaded:
+            incr("kafka_producer_messages_shed", tags={"topic": topic, "reason": "in_flight_limit"})
+            raise KafkaProducerOverloadedError(f"Kafka producer has {self.in_flight_messages} messages in flight")
+
+        future = self._send(topic, b, key, time.monotonic())
+        self._maybe_report_metrics()
+        return future
+
+    def _send(self, topic: str, value: bytes, key: Optional[str], sent_at: float):
+        "Sends a message whose in-flight slot is already reserved, releasing the slot once it's delivered or failed."
+        try:
+            future = self.producer.send(topic, value=value, key=key.encode("utf-8") if key is not None else None)
+        except kafka.errors.KafkaTimeoutError:
+            # The producer's own buffer stayed full for `max_block_ms`
+            self._on_delivery(len(value), sent_at, None)
+            incr("kafka_producer_messages_shed", tags={"topic": topic, "reason": "buffer_full"})
+            raise
+        except Exception:
+            self._on_delivery(len(value), sent_at, None)
+            raise
+
+        if future is None:
+            self._on_delivery(len(value), sent_at, None)
+        else:
+            future.add_both(partial(self._on_delivery, len(value), sent_at))
+        return future
+
+    def _on_delivery(self, size: int, sent_at: float, result: Any) -> None:
+        latency_ms = (time.monotonic() - sent_at) * 1000
+        with self._lock:
+            self.in_flight_messages -= 1
+            self.in_flight_bytes -= size
+            if result is not None and not isinstance(result, Exception):
+                self._delivered_count += 1
+                self._delivery_latency_total_ms += latency_ms
+                self._delivery_latency_max_ms = max(self._delivery_latency_max_ms, latency_ms)
+
+    def _maybe_report_metrics(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_metrics_report < KAFKA_PRODUCER_METRICS_INTERVAL_SECONDS:
+                return
+            # Reset before reporting: internal metrics are produced through this same producer
+            self._last_metrics_report = now
+            in_flight_messages, in_flight_bytes = self.in_flight_messages, self.in_flight_bytes
+            delivered_count, latency_total_ms, latency_max_ms = (
+                self._delivered_count,
+                self._delivery_latency_total_ms,
+                self._delivery_latency_max_ms,
+            )
+            self._delivered_count, self._delivery_latency_total_ms, self._delivery_latency_max_ms = 0, 0.0, 0.0
+
+        gauge("kafka_producer_in_flight_messages", in_flight_messages)
+        gauge("kafka_producer_in_flight_bytes", in_flight_bytes)
+        if delivered_count:
+            timing("kafka_producer_delivery_latency", latency_total_ms / delivered_count)
+            timing("kafka_producer_delivery_latency_max", latency_max_ms)
+
+    def produce_batch(self, topic: str, messages: List[Tuple[bytes, Optional[str]]]) -> List[Tuple[int, Exception]]:
+        """
+        Sends every `(value, key)` pair in `messages`, with values already serialized, without flushing in between so
+        the producer can pack them into as few record batches as it can. In-flight slots are reserved for the whole
+        batch at once, and a failure to send one message does not stop the rest from being sent.
+
+        Returns `(index, error)` pairs for the messages that could not be produced.
+        """
+        with self._lock:
+            accepted = max(0, min(len(messages), self.max_in_flight_messages - self.in_flight_messages))
+            self.in_flight_messages += accepted
+            self.in_flight_bytes += sum(len(value) for value, _ in messages[:accepted])
+
+        failures: List[Tuple[int, Exception]] = []
+        sent_at = time.monotonic()
+        for index, (value, key) in enumerate(messages[:accepted]):
+            try:
+                self._send(topic, value, key, sent_at)
+            except Exception as e:
+                failures.append((index, e))
+
+        if accepted < len(messages):
+            shed = len(messages) - accepted
+            incr("kafka_producer_messages_shed", shed, tags={"topic": topic, "reason": "in_flight_limit"})
+            overloaded = KafkaProducerOverloadedError(
+                f"Kafka producer has {self.in_flight_messages} messages in flight"
+            )
+            failures.extend((index, overloaded) for index in range(accepted, len(messages)))
+
+        self._maybe_report_metrics()
+        return failures
 
     def close(self):
         self.producer.flush()
@@ -0,0 +1,332 @@
+"""
+Append-only on-disk queue used by the capture endpoint to hold on to events while Kafka is unavailable.
+
+Each process appends to its own `.open` segment file, one JSON message per line. Segments are sealed (renamed to
+`.log`) once they grow too large or too old, and a background drainer thread replays sealed segments into Kafka at a
+bounded rate. Segment names start with a nanosecond timestamp so sealed segments are drained oldest first.
+
+Replayed messages are only removed from disk once Kafka has acknowledged them. Delivery is at least once: when some
+acknowledgements fail, the rest of the segment is kept, including messages that did get delivered, and those
+duplicates are collapsed on event uuid downstream.
+
+All processes sharing the directory share its `max_bytes` budget: disk usage is measured across the whole directory.
+"""
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sentry_sdk.api import capture_exception
+from statshog.defaults.django import statsd
+from structlog import get_logger
+
+from posthog.settings import (
+    CAPTURE_SPILL_QUEUE_DELIVERY_TIMEOUT_SECONDS,
+    CAPTURE_SPILL_QUEUE_DIR,
+    CAPTURE_SPILL_QUEUE_DRAIN_RATE_PER_SECOND,
+    CAPTURE_SPILL_QUEUE_ENABLED,
+    CAPTURE_SPILL_QUEUE_FSYNC_INTERVAL_MS,
+    CAPTURE_SPILL_QUEUE_MAX_BYTES,
+    CAPTURE_SPILL_QUEUE_SEGMENT_MAX_AGE_SECONDS,
+    CAPTURE_SPILL_QUEUE_SEGMENT_MAX_BYTES,
+)
+
+logger = get_logger(__name__)
+
+OPEN_SUFFIX = ".open"
+SEALED_SUFFIX = ".log"
+DRAINING_SUFFIX = ".draining"
+
+# How stale this process's view of the directory's disk usage may get before appending measures it again
+DISK_USAGE_REFRESH_SECONDS = 1.0
+
+# (topic, data, key)
+SpilledMessage = Tuple[str, Dict, Optional[str]]
+# Produces a message, returning a future to wait on for its delivery, or None if there's nothing to wait on
+ProduceFunction = Callable[[str, Dict, Optional[str]], Any]
+
+
+class SpillQueueFullError(Exception):
+    """Raised when appending would take the spill queue over its disk budget."""
+
+
+def _pid_is_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class SpillQueue:
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int = CAPTURE_SPILL_QUEUE_MAX_BYTES,
+        segment_max_bytes: int = CAPTURE_SPILL_QUEUE_SEGMENT_MAX_BYTES,
+        segment_max_age_seconds: float = CAPTURE_SPILL_QUEUE_SEGMENT_MAX_AGE_SECONDS,
+        fsync_interval_ms: int = CAPTURE_SPILL_QUEUE_FSYNC_INTERVAL_MS,
+        delivery_timeout_seconds: float = CAPTURE_SPILL_QUEUE_DELIVERY_TIMEOUT_SECONDS,
+    ):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.segment_max_bytes = segment_max_bytes
+        self.segment_max_age_seconds = segment_max_age_seconds
+        self.fsync_interval_seconds = fsync_interval_ms / 1000
+        self.delivery_timeout_seconds = delivery_timeout_seconds
+
+        self._lock = threading.Lock()
+        self._segment = None
+        self._segment_path: Optional[str] = None
+        self._segment_bytes = 0
+        self._segment_opened_at = 0.0
+        self._sequence = 0
+        self._dirty = False
+        self._last_fsync = time.monotonic()
+        self.disk_usage = 0
+        self._disk_usage_measured_at = 0.0
+        self._refresh_disk_usage()
+
+    def append(self, topic: str, messages: List[Tuple[bytes, Optional[str]]]) -> None:
+        """
+        Appends `(value, key)` messages for `topic`, where each value is a JSON-serialized message. Values are written
+        as they are rather than re-encoded. Data reaches disk within `fsync_interval_ms`.
+        """
+        prefix = b'{"topic": ' + json.dumps(topic).encode("utf-8") + b', "key": '
+        payload = b"".join(
+            prefix + json.dumps(key).encode("utf-8") + b', "data": ' + value + b"}\n" for value, key in messages
+        )
+        with self._lock:
+            if time.monotonic() - self._disk_usage_measured_at >= DISK_USAGE_REFRESH_SECONDS:
+                self._refresh_disk_usage()
+            if self.disk_usage + len(payload) > self.max_bytes:
+                raise SpillQueueFullError(f"Spill queue at {self.directory} is full ({self.disk_usage} bytes)")
+
+            if self._segment is None or self._segment_bytes >= self.segment_max_bytes:
+                self._rotate()
+
+            self._segment.write(payload)  # type: ignore
+            self._segment.flush()  # type: ignore
+            self._segment_bytes += len(payload)
+            self.disk_usage += len(payload)
+            self._dirty = True
+            if time.monotonic() - self._last_fsync >= self.fsync_interval_seconds:
+                self._fsync()
+
+    def sync(self) -> None:
+        with self._lock:
+            if self._dirty:
+                self._fsync()
+
+    def seal_if_stale(self) -> None:
+        with self._lock:
+            segment_age = time.monotonic() - self._segment_opened_at
+            if self._segment is not None and segment_age >= self.segment_max_age_seconds:
+                self._seal()
+
+    def close(self) -> None:
+        with self._lock:
+            self._seal()
+
+    def recover_orphaned_segments(self) -> None:
+        """Seals segments left open or half-drained by processes that have since died."""
+        for name in os.listdir(self.directory):
+            if not (name.endswith(OPEN_SUFFIX) or name.endswith(DRAINING_SUFFIX)):
+                continue
+            stem, _, pid = name.rsplit(".", 1)[0].rpartition("-")
+            if pid.isdigit() and int(pid) != os.getpid() and not _pid_is_alive(int(pid)):
+                try:
+                    os.rename(os.path.join(self.directory, name), os.path.join(self.directory, stem + SEALED_SUFFIX))
+                except FileNotFoundError:
+                    pass  # Another process recovered it first
+
+    def drain(self, produce: ProduceFunction, max_messages: int) -> int:
+        """
+        Replays up to `max_messages` from sealed segments, oldest first, stopping at the first failure to produce or to
+        be acknowledged within `delivery_timeout_seconds`. Anything claimed but not acknowledged is written back as a
+        sealed segment. Returns the number of messages replayed.
+        """
+        drained = 0
+        for name in self._sealed_segments():
+            if drained >= max_messages:
+                break
+            claimed_path = self._claim(name)
+            if claimed_path is None:
+                continue
+
+            messages = self._read_segment(claimed_path)
+            futures = []
+            failed = False
+            for topic, data, key in messages[: max_messages - drained]:
+                try:
+                    futures.append(produce(topic, data, key))
+                except Exception as e:
+                    logger.warning("spill_queue_drain_failed", error=str(e))
+                    failed = True
+                    break
+
+            replayed = self._wait_for_delivery(futures)
+            failed = failed or replayed < len(futures)
+            drained += replayed
+
+            if replayed < len(messages):
+                self._write_back(name, messages[replayed:])
+            os.remove(claimed_path)
+            if failed:
+                break
+
+        with self._lock:
+            self._refresh_disk_usage()
+        return drained
+
+    def _wait_for_delivery(self, futures: List[Any]) -> int:
+        "Returns how many of `futures`, in order, were delivered before the first failure or timeout."
+        deadline = time.monotonic() + self.delivery_timeout_seconds
+        for index, future in enumerate(futures):
+            if future is None:
+                continue
+            try:
+                future.get(timeout=max(deadline - time.monotonic(), 0))
+            except Exception as e:
+                logger.warning("spill_queue_delivery_failed", error=str(e))
+                return index
+        return len(futures)
+
+    def _sealed_segments(self) -> List[str]:
+        return sorted(name for name in os.listdir(self.directory) if name.endswith(SEALED_SUFFIX))
+
+    def _claim(self, name: str) -> Optional[str]:
+        stem = name[: -len(SEALED_SUFFIX)]
+        claimed_path = os.path.join(self.directory, f"{stem}-{os.getpid()}{DRAINING_SUFFIX}")
+        try:
+            os.rename(os.path.join(self.directory, name), claimed_path)
+        except FileNotFoundError:
+            return None  # Another process claimed it first
+        return claimed_path
+
+    def _read_segment(self, path: str) -> List[SpilledMessage]:
+        messages: List[SpilledMessage] = []
+        with open(path, "rb") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A torn write from a crash mid-append, nothing after it on this line is recoverable
+                    statsd.incr("capture_spill_queue_corrupt_record")
+                    continue
+                messages.append((record["topic"], record["data"], record["key"]))
+        return messages
+
+    def _write_back(self, name: str, messages: List[SpilledMessage]) -> None:
+        # Keeps the original timestamp prefix so the remainder is still drained before newer segments
+        stem = name[: -len(SEALED_SUFFIX)]
+        temporary_path = os.path.join(self.directory, f"{stem}r-{os.getpid()}{OPEN_SUFFIX}")
+        with open(temporary_path, "wb") as f:
+            for topic, data, key in messages:
+                f.write(json.dumps({"topic": topic, "key": key, "data": data}).encode("utf-8") + b"\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.rename(temporary_path, os.path.join(self.directory, f"{stem}r{SEALED_SUFFIX}"))
+
+    def _rotate(self) -> None:
+        self._seal()
+        self._sequence += 1
+        stem = f"{time.time_ns():020d}-{self._sequence:06d}-{os.getpid()}"
+        self._segment_path = os.path.join(self.directory, stem + OPEN_SUFFIX)
+        self._segment = open(self._segment_path, "ab")
+        self._segment_bytes = 0
+        self._segment_opened_at = time.monotonic()
+
+    def _seal(self) -> None:
+        if self._segment is None:
+            return
+        self._fsync()
+        self._segment.close()
+        path = self._segment_path
+        assert path is not None
+        os.rename(path, path[: -len(OPEN_SUFFIX)].rpartition("-")[0] + SEALED_SUFFIX)
+        self._segment = None
+        self._segment_path = None
+
+    def _fsync(self) -> None:
+        if self._segment is not None:
+            self._segment.flush()
+            os.fsync(self._segment.fileno())
+        self._dirty = False
+        self._last_fsync = time.monotonic()
+
+    def _refresh_disk_usage(self) -> None:
+        self.disk_usage = self._measure_disk_usage()
+        self._disk_usage_measured_at = time.monotonic()
+
+    def _measure_disk_usage(self) -> int:
+        total = 0
+        for entry in os.scandir(self.directory):
+            try:
+                total += entry.stat().st_size
+            except FileNotFoundError:
+                pass
+        return total
+
+
+class SpillQueueDrainer(threading.Thread):
+    def __init__(
+        self,
+        queue: SpillQueue,
+        produce: ProduceFunction,
+        rate_per_second: int = CAPTURE_SPILL_QUEUE_DRAIN_RATE_PER_SECOND,
+        interval_seconds: float = 1.0,
+    ):
+        super().__init__(name="capture-spill-queue-drainer", daemon=True)
+        self.queue = queue
+        self.produce = produce
+        self.rate_per_second = rate_per_second
+        self.interval_seconds = interval_seconds
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self._stopped.wait(self.interval_seconds):
+            self.tick()
+
+    def tick(self) -> None:
+        try:
+            self.queue.sync()
+            self.queue.seal_if_stale()
+            self.queue.recover_orphaned_segments()
+            drained = self.queue.drain(self.produce, max_messages=int(self.rate_per_second * self.interval_seconds))
+            if drained:
+                statsd.incr("capture_spill_queue_drained", count=drained)
+            statsd.gauge("capture_spill_queue_bytes", self.queue.disk_usage)
+        except Exception as e:
+            capture_exception(e)
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+
+_spill_queue: Optional[SpillQueue] = None
+_spill_queue_lock = threading.Lock()
+
+
+def _produce_spilled_message(topic: str, data: Dict, key: Optional[str]) -> Any:
+    from ee.kafka_client.client import KafkaProducer
+
+    return KafkaProducer().produce(topic=topic, data=data, key=key)
+
+
+def get_spill_queue() -> Optional[SpillQueue]:
+    """Returns this process's spill queue, starting its drainer on first use, or None if spilling is disabled."""
+    global _spill_queue
+
+    if not CAPTURE_SPILL_QUEUE_ENABLED:
+        return None
+
+    with _spill_queue_lock:
+        if _spill_queue is None:
+            _spill_queue = SpillQueue(CAPTURE_SPILL_QUEUE_DIR)
+            SpillQueueDrainer(_spill_queue, _produce_spilled_message).start()
+    return _spill_queue
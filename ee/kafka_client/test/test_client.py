@@ -2,8 +2,9 @@ from unittest.mock import patch
 
 import kafka
 from django.test import TestCase
+from kafka.future import Future
 
-from ee.kafka_client.client import _KafkaProducer, build_kafka_consumer
+from ee.kafka_client.client import KafkaProducerOverloadedError, _KafkaProducer, build_kafka_consumer
 
 
 class KafkaClientTestCase(TestCase):
@@ -20,6 +21,48 @@ class KafkaClientTestCase(TestCase):
         msg = next(consumer)
         self.assertEqual(msg, "message 1 from test_topic topic")
 
+    def test_kafka_produce_batch(self):
+        producer = _KafkaProducer(test=True)
+
+        with patch.object(producer.producer, "send", side_effect=[None, ValueError("unsendable"), None]) as send:
+            failures = producer.produce_batch(
+                topic=self.topic, messages=[(b"one", "key1"), (b"two", "key2"), (b"three", None)]
+            )
+
+        self.assertEqual(len(failures), 1)
+        self.assertEqual(failures[0][0], 1)
+        self.assertIsInstance(failures[0][1], ValueError)
+        self.assertEqual(send.call_args_list[0].kwargs, {"value": b"one", "key": b"key1"})
+        self.assertEqual(send.call_args_list[2].kwargs, {"value": b"three", "key": None})
+        self.assertEqual(producer.in_flight_messages, 0)
+
+    def test_kafka_produce_batch_sheds_what_does_not_fit_in_flight(self):
+        producer = _KafkaProducer(test=True, max_in_flight_messages=2)
+
+        with patch.object(producer.producer, "send", side_effect=[Future(), Future()]) as send:
+            failures = producer.produce_batch(topic=self.topic, messages=[(b"one", None), (b"two", None), (b"3", None)])
+
+        self.assertEqual(send.call_count, 2)
+        self.assertEqual([index for index, _ in failures], [2])
+        self.assertIsInstance(failures[0][1], KafkaProducerOverloadedError)
+        self.assertEqual(producer.in_flight_bytes, 6)
+
+    def test_kafka_produce_sheds_load_when_too_many_messages_in_flight(self):
+        producer = _KafkaProducer(test=True, max_in_flight_messages=2)
+        futures = [Future(), Future()]
+        with patch.object(producer.producer, "send", side_effect=futures):
+            producer.produce(topic=self.topic, data=self.payload)
+            producer.produce(topic=self.topic, data=self.payload)
+            self.assertEqual(producer.in_flight_messages, 2)
+
+            with self.assertRaises(KafkaProducerOverloadedError):
+                producer.produce(topic=self.topic, data=self.payload)
+
+        futures[0].success("metadata")
+        futures[1].failure(kafka.errors.KafkaTimeoutError())
+        self.assertEqual(producer.in_flight_messages, 0)
+        self.assertEqual(producer.in_flight_bytes, 0)
+
     def test_kafka_produce(self):
         producer = _KafkaProducer(test=False)
         producer.produce(topic=self.topic, data=self.payload)
@@ -0,0 +1,86 @@
+import json
+import os
+import tempfile
+from unittest.mock import MagicMock, patch
+
+from django.test import SimpleTestCase
+
+from ee.kafka_client.spill_queue import SEALED_SUFFIX, SpillQueue, SpillQueueFullError
+
+
+def _message(data):
+    return json.dumps(data).encode("utf-8")
+
+
+class SpillQueueTestCase(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.queue = SpillQueue(self.directory.name, max_bytes=10_000, segment_max_bytes=200, fsync_interval_ms=0)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _sealed_segments(self):
+        return [name for name in os.listdir(self.directory.name) if name.endswith(SEALED_SUFFIX)]
+
+    def test_drains_sealed_segments_in_order(self):
+        for i in range(5):
+            self.queue.append("events", [(_message({"event": f"event{i}"}), f"key{i}")])
+        self.queue.close()
+        self.assertGreater(len(self._sealed_segments()), 1)
+
+        produce = MagicMock()
+        drained = self.queue.drain(produce, max_messages=100)
+
+        self.assertEqual(drained, 5)
+        self.assertEqual(
+            [call.args for call in produce.call_args_list],
+            [("events", {"event": f"event{i}"}, f"key{i}") for i in range(5)],
+        )
+        self.assertEqual(self._sealed_segments(), [])
+        self.assertEqual(self.queue.disk_usage, 0)
+
+    def test_drain_respects_rate_and_keeps_remainder(self):
+        self.queue.append("events", [(_message({"event": f"event{i}"}), None) for i in range(4)])
+        self.queue.close()
+
+        produce = MagicMock()
+        self.assertEqual(self.queue.drain(produce, max_messages=3), 3)
+        self.assertEqual(self.queue.drain(produce, max_messages=3), 1)
+        self.assertEqual([call.args[1]["event"] for call in produce.call_args_list], [f"event{i}" for i in range(4)])
+
+    def test_drain_stops_at_first_failure(self):
+        self.queue.append("events", [(_message({"event": f"event{i}"}), None) for i in range(3)])
+        self.queue.close()
+
+        produce = MagicMock(side_effect=[None, Exception("broker down")])
+        self.assertEqual(self.queue.drain(produce, max_messages=10), 1)
+
+        produce = MagicMock()
+        self.assertEqual(self.queue.drain(produce, max_messages=10), 2)
+        self.assertEqual([call.args[1]["event"] for call in produce.call_args_list], ["event1", "event2"])
+
+    def test_append_refuses_to_exceed_disk_budget(self):
+        with self.assertRaises(SpillQueueFullError):
+            self.queue.append("events", [(_message({"event": "x" * 20_000}), None)])
+
+    def test_drain_keeps_messages_kafka_did_not_acknowledge(self):
+        self.queue.append("events", [(_message({"event": f"event{i}"}), None) for i in range(3)])
+        self.queue.close()
+
+        delivered, failed = MagicMock(), MagicMock()
+        failed.get.side_effect = Exception("delivery timed out")
+        produce = MagicMock(side_effect=[delivered, failed, delivered])
+        self.assertEqual(self.queue.drain(produce, max_messages=10), 1)
+
+        produce = MagicMock(return_value=None)
+        self.assertEqual(self.queue.drain(produce, max_messages=10), 2)
+        self.assertEqual([call.args[1]["event"] for call in produce.call_args_list], ["event1", "event2"])
+
+    def test_processes_sharing_a_directory_share_its_budget(self):
+        other_queue = SpillQueue(self.directory.name, max_bytes=10_000, fsync_interval_ms=0)
+        other_queue.append("events", [(_message({"event": "x" * 9_000}), None)])
+
+        with patch("ee.kafka_client.spill_queue.DISK_USAGE_REFRESH_SECONDS", 0):
+            with self.assertRaises(SpillQueueFullError):
+                self.queue.append("events", [(_message({"event": "x" * 2_000}), None)])
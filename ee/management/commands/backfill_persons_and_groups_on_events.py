@@ -150,11 +150,11 @@ def run_backfill(options):
     print_and_execute_query(PERSON_DISTINCT_IDS_DICTIONARY_SQL, "PERSON_DISTINCT_IDS_DICTIONARY_SQL", dry_run)
     print_and_execute_query(PERSONS_DICTIONARY_SQL, "PERSONS_DICTIONARY_SQL", dry_run)
 
-    client._request_information = {"kind": "backfill", "id": backfill_query_id}
+    token = client._request_information.set({"kind": "backfill", "id": backfill_query_id})
     print_and_execute_query(
         BACKFILL_SQL, "BACKFILL_SQL", dry_run, 0, {"team_id": options["team_id"], "id": backfill_query_id}
     )
-    client._request_information = None
+    client._request_information.reset(token)
 
     if dry_run or settings.TEST:
         return
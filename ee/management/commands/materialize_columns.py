@@ -6,6 +6,7 @@ from ee.clickhouse.materialized_columns.analyze import logger, materialize_prope
 from posthog.settings import (
     MATERIALIZE_COLUMNS_ANALYSIS_PERIOD_HOURS,
     MATERIALIZE_COLUMNS_BACKFILL_PERIOD_DAYS,
+    MATERIALIZE_COLUMNS_DROP_UNUSED,
     MATERIALIZE_COLUMNS_MAX_AT_ONCE,
     MATERIALIZE_COLUMNS_MINIMUM_QUERY_TIME,
 )
@@ -19,7 +20,11 @@ class Command(BaseCommand):
 
         parser.add_argument("--property", help="Property to materialize. Skips analysis.")
         parser.add_argument(
-            "--property-table", type=str, default="events", choices=["events", "person"], help="Table of --property"
+            "--property-table",
+            type=str,
+            default="events",
+            choices=["events", "person", "groups"],
+            help="Table of --property",
         )
         parser.add_argument(
             "--backfill-period",
@@ -40,6 +45,11 @@ class Command(BaseCommand):
             default=MATERIALIZE_COLUMNS_ANALYSIS_PERIOD_HOURS,
             help="How long of a time period to analyze. Same as MATERIALIZE_COLUMNS_ANALYSIS_PERIOD_HOURS env variable.",
         )
+        parser.add_argument(
+            "--drop-unused",
+            action="store_true",
+            help="Drop materialized columns that no query used during the analysis period. Same as MATERIALIZE_COLUMNS_DROP_UNUSED env variable.",
+        )
         parser.add_argument(
             "--max-columns",
             type=int,
@@ -67,5 +77,6 @@ class Command(BaseCommand):
                 maximum=options["max_columns"],
                 min_query_time=options["min_query_time"],
                 backfill_period_days=options["backfill_period"],
+                drop_unused=options["drop_unused"] or MATERIALIZE_COLUMNS_DROP_UNUSED,
                 dry_run=options["dry_run"],
             )
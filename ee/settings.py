@@ -6,6 +6,7 @@ from typing import Dict, List
 
 from ee.kafka_client.topics import KAFKA_EVENTS_PLUGIN_INGESTION as DEFAULT_KAFKA_EVENTS_PLUGIN_INGESTION
 from posthog.settings import AUTHENTICATION_BACKENDS, SITE_URL, TEST, get_from_env
+from posthog.settings.utils import str_to_bool
 
 # Zapier REST hooks
 HOOK_EVENTS: Dict[str, str] = {
@@ -60,6 +61,13 @@ MATERIALIZE_COLUMNS_ANALYSIS_PERIOD_HOURS = get_from_env(
 MATERIALIZE_COLUMNS_BACKFILL_PERIOD_DAYS = get_from_env("MATERIALIZE_COLUMNS_BACKFILL_PERIOD_DAYS", 90, type_cast=int)
 # Maximum number of columns to materialize at once. Avoids running into resource bottlenecks (storage + ingest + backfilling).
 MATERIALIZE_COLUMNS_MAX_AT_ONCE = get_from_env("MATERIALIZE_COLUMNS_MAX_AT_ONCE", 10, type_cast=int)
+# Whether to drop materialized columns that no query used during the analysis period, rather than just report them
+MATERIALIZE_COLUMNS_DROP_UNUSED = get_from_env("MATERIALIZE_COLUMNS_DROP_UNUSED", False, type_cast=str_to_bool)
+# Columns are only dropped if their usage was analyzed over at least this many hours. Dashboards keep being refreshed in
+# the background for a week after they were last viewed, so a shorter period can miss the only queries using a column
+MATERIALIZE_COLUMNS_DROP_UNUSED_MIN_ANALYSIS_HOURS = get_from_env(
+    "MATERIALIZE_COLUMNS_DROP_UNUSED_MIN_ANALYSIS_HOURS", 7 * 24, type_cast=int
+)
 
 # Topic to write events to between clickhouse
 KAFKA_EVENTS_PLUGIN_INGESTION_TOPIC: str = os.getenv(
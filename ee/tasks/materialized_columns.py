@@ -1,6 +1,6 @@
 from celery.utils.log import get_task_logger
 
-from ee.clickhouse.materialized_columns.columns import TRIM_AND_EXTRACT_PROPERTY, ColumnName, get_materialized_columns
+from ee.clickhouse.materialized_columns.columns import ColumnName, get_materialized_columns, trim_and_extract_property
 from ee.clickhouse.replication.utils import clickhouse_is_replicated
 from posthog.client import sync_execute
 from posthog.settings import CLICKHOUSE_CLUSTER, CLICKHOUSE_DATABASE
@@ -24,14 +24,14 @@ def mark_all_materialized() -> None:
             ALTER TABLE {updated_table}
             {execute_on_cluster}
             MODIFY COLUMN
-            {column_name} VARCHAR MATERIALIZED {TRIM_AND_EXTRACT_PROPERTY}
+            {column_name} VARCHAR MATERIALIZED {trim_and_extract_property(table)}
             """,
             {"property": property_name},
         )
 
 
 def get_materialized_columns_with_default_expression():
-    for table in ["events", "person"]:
+    for table in ["events", "person", "groups"]:
         materialized_columns = get_materialized_columns(table, use_cache=False)
         for property_name, column_name in materialized_columns.items():
             if is_default_expression(table, column_name):
@@ -2,8 +2,9 @@ import hashlib
 import json
 import re
 from datetime import datetime
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
+import structlog
 from dateutil import parser
 from django.conf import settings
 from django.http import JsonResponse
@@ -15,6 +16,7 @@ from sentry_sdk.api import capture_exception
 from statshog.defaults.django import statsd
 
 from ee.kafka_client.client import KafkaProducer
+from ee.kafka_client.spill_queue import get_spill_queue
 from ee.kafka_client.topics import KAFKA_DEAD_LETTER_QUEUE
 from ee.settings import KAFKA_EVENTS_PLUGIN_INGESTION_TOPIC
 from posthog.api.utils import (
@@ -30,6 +32,8 @@ from posthog.models.feature_flag import get_overridden_feature_flags
 from posthog.models.utils import UUIDT
 from posthog.utils import cors_response, get_ip_address
 
+logger = structlog.get_logger(__name__)
+
 
 def parse_kafka_event_data(
     distinct_id: str,
@@ -67,6 +71,51 @@ def log_event(data: Dict, event_name: str, partition_key: str) -> None:
         raise e
 
 
+def log_event_batch(kafka_events: List[Tuple[bytes, str]]) -> List[Tuple[int, Exception]]:
+    """
+    Produces a whole batch of already-serialized `(message, partition_key)` pairs in one go.
+    Returns `(index, error)` pairs for the events that could not be produced.
+    """
+    failures = KafkaProducer().produce_batch(topic=KAFKA_EVENTS_PLUGIN_INGESTION_TOPIC, messages=kafka_events)
+
+    produced_count = len(kafka_events) - len(failures)
+    if produced_count:
+        statsd.incr("posthog_cloud_plugin_server_ingestion", count=produced_count)
+    if failures:
+        statsd.incr("capture_endpoint_log_event_error", count=len(failures))
+        logger.warning(
+            "capture_batch_produce_failed",
+            topic=KAFKA_EVENTS_PLUGIN_INGESTION_TOPIC,
+            failed_count=len(failures),
+            batch_size=len(kafka_events),
+            error=str(failures[0][1]),
+        )
+
+    return failures
+
+
+def spill_failed_events(
+    kafka_events: List[Tuple[bytes, str]], failures: List[Tuple[int, Exception]]
+) -> List[Tuple[int, Exception]]:
+    """
+    Writes events Kafka couldn't take to the local spill queue, to be replayed once it recovers.
+    Returns the failures that couldn't be spilled either.
+    """
+    spill_queue = get_spill_queue()
+    if spill_queue is None:
+        return failures
+
+    try:
+        spill_queue.append(KAFKA_EVENTS_PLUGIN_INGESTION_TOPIC, [kafka_events[index] for index, _ in failures])
+    except Exception as e:
+        capture_exception(e)
+        statsd.incr("capture_spill_queue_append_error")
+        return failures
+
+    statsd.incr("capture_events_spilled", count=len(failures))
+    return []
+
+
 def log_event_to_dead_letter_queue(
     raw_payload: Dict,
     event_name: str,
@@ -211,6 +260,10 @@ def get_event(request):
     site_url = request.build_absolute_uri("/")[:-1]
 
     ip = None if not ingestion_context or ingestion_context.anonymize_ips else get_ip_address(request)
+    # Each message is serialized exactly once, here, and handed to the producer as bytes
+    kafka_events: List[Tuple[bytes, str]] = []
+    event_uuids: List[str] = []
+    partition_keys: Dict[str, str] = {}
     for event in events:
         event_uuid = UUIDT()
         distinct_id = get_distinct_id(event)
@@ -249,24 +302,53 @@ def get_event(request):
             )
             continue
 
+        # Batches from server-side SDKs usually share a handful of distinct_ids, so hash each one only once
+        partition_key = partition_keys.get(distinct_id)
+        if partition_key is None:
+            partition_key = get_partition_key(ingestion_context.team_id, distinct_id)  # type: ignore
+            partition_keys[distinct_id] = partition_key
+
+        kafka_event = parse_kafka_event_data(
+            distinct_id=distinct_id,
+            ip=ip,
+            site_url=site_url,
+            data=event,
+            team_id=ingestion_context.team_id,  # type: ignore
+            now=now,
+            sent_at=sent_at,
+            event_uuid=event_uuid,
+        )
+        kafka_events.append((json.dumps(kafka_event).encode("utf-8"), partition_key))
+        event_uuids.append(kafka_event["uuid"])
+
+    failures: List[Tuple[int, Exception]] = []
+    if kafka_events:
         try:
-            capture_internal(event, distinct_id, ip, site_url, now, sent_at, ingestion_context.team_id, event_uuid)  # type: ignore
+            failures = log_event_batch(kafka_events)
         except Exception as e:
-            timer.stop()
-            capture_exception(e, {"data": data})
-            statsd.incr(
-                "posthog_cloud_raw_endpoint_failure", tags={"endpoint": "capture",},
-            )
-            return cors_response(
-                request,
-                generate_exception_response(
-                    "capture",
-                    "Unable to store event. Please try again. If you are the owner of this app you can check the logs for further details.",
-                    code="server_error",
-                    type="server_error",
-                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                ),
-            )
+            failures = [(index, e) for index in range(len(kafka_events))]
+        if failures:
+            failures = spill_failed_events(kafka_events, failures)
+
+    if failures:
+        timer.stop()
+        capture_exception(failures[0][1], {"data": data, "failed_events_count": len(failures)})
+        statsd.incr(
+            "posthog_cloud_raw_endpoint_failure", tags={"endpoint": "capture",},
+        )
+        # The rest of the batch was stored. Events are deduplicated on uuid, so clients that send uuids can retry
+        # safely, and the failed uuids let them retry only those events.
+        return cors_response(
+            request,
+            generate_exception_response(
+                "capture",
+                "Unable to store event. Please try again. If you are the owner of this app you can check the logs for further details.",
+                code="server_error",
+                type="server_error",
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                extra={"failed_event_uuids": [event_uuids[index] for index, _ in failures]},
+            ),
+        )
 
     timer.stop()
     statsd.incr(
@@ -317,5 +399,8 @@ def capture_internal(event, distinct_id, ip, site_url, now, sent_at, team_id, ev
         sent_at=sent_at,
         event_uuid=event_uuid,
     )
-    partition_key = hashlib.sha256(f"{team_id}:{distinct_id}".encode()).hexdigest()
-    log_event(parsed_event, event["event"], partition_key=partition_key)
+    log_event(parsed_event, event["event"], partition_key=get_partition_key(team_id, distinct_id))
+
+
+def get_partition_key(team_id: Optional[int], distinct_id: str) -> str:
+    return hashlib.sha256(f"{team_id}:{distinct_id}".encode()).hexdigest()
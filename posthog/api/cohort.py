@@ -26,7 +26,7 @@ from posthog.api.person import get_funnel_actor_class, should_paginate
 from posthog.api.routing import StructuredViewSetMixin
 from posthog.api.shared import UserBasicSerializer
 from posthog.api.utils import get_target_entity
-from posthog.client import sync_execute
+from posthog.client import sync_execute, sync_execute_iter
 from posthog.constants import (
     CSV_EXPORT_LIMIT,
     INSIGHT_FUNNELS,
@@ -214,8 +214,7 @@ class CohortViewSet(StructuredViewSetMixin, viewsets.ModelViewSet):
 
         query, params = PersonQuery(filter, team.pk, cohort=cohort).get_query()
 
-        raw_result = sync_execute(query, params)
-        actor_ids = [row[0] for row in raw_result]
+        actor_ids = [row[0] for block in sync_execute_iter(query, params) for row in block]
         actors, serialized_actors = get_people(team.pk, actor_ids)
 
         _should_paginate = should_paginate(actors, filter.limit)
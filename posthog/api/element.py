@@ -2,7 +2,7 @@ from rest_framework import authentication, request, response, serializers, views
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 
-from ee.clickhouse.models.element import chain_to_elements
+from ee.clickhouse.models.element import chain_to_element_dicts
 from ee.clickhouse.models.property import parse_prop_grouped_clauses
 from ee.clickhouse.sql.element import GET_ELEMENTS, GET_VALUES
 from posthog.api.routing import StructuredViewSetMixin
@@ -58,11 +58,7 @@ class ElementViewSet(StructuredViewSetMixin, viewsets.ModelViewSet):
         )
         return response.Response(
             [
-                {
-                    "count": elements[1],
-                    "hash": None,
-                    "elements": [ElementSerializer(element).data for element in chain_to_elements(elements[0])],
-                }
+                {"count": elements[1], "hash": None, "elements": chain_to_element_dicts(elements[0])}
                 for elements in result
             ]
         )
@@ -1,4 +1,5 @@
 import dataclasses
+import re
 from typing import Any, Union
 
 from rest_framework import exceptions, request, response, serializers, viewsets
@@ -18,6 +19,8 @@ from posthog.permissions import ProjectMembershipNecessaryPermissions, TeamMembe
 from posthog.utils import format_query_params_absolute_url
 
 DEFAULT_RECORDING_CHUNK_LIMIT = 20  # Should be tuned to find the best value
+# Pages after the first continue from the resolved offset, so the next url mustn't seek again
+TIME_OFFSET_REGEX = re.compile(r"(?<=[?&])time_offset_ms=\d*&?|&time_offset_ms=\d*$")
 
 
 class SessionRecordingMetadataSerializer(serializers.Serializer):
@@ -52,10 +55,13 @@ class SessionRecordingViewSet(StructuredViewSetMixin, viewsets.GenericViewSet):
     def _get_session_recording_list(self, filter):
         return ClickhouseSessionRecordingList(filter=filter, team=self.team).run()
 
-    def _get_session_recording_snapshots(self, request, session_recording_id, limit, offset):
-        return ClickhouseSessionRecording(
+    def _get_session_recording_snapshots(self, request, session_recording_id, limit, offset, time_offset_ms=None):
+        session_recording = ClickhouseSessionRecording(
             request=request, team=self.team, session_recording_id=session_recording_id
-        ).get_snapshots(limit, offset)
+        )
+        if time_offset_ms is not None:
+            offset = session_recording.get_snapshots_offset_for_time_offset(time_offset_ms)
+        return session_recording.get_snapshots(limit, offset), offset
 
     def _get_session_recording_meta_data(self, request, session_recording_id):
         return ClickhouseSessionRecording(
@@ -158,9 +164,13 @@ class SessionRecordingViewSet(StructuredViewSetMixin, viewsets.GenericViewSet):
         filter = Filter(request=request)
         limit = filter.limit if filter.limit else DEFAULT_RECORDING_CHUNK_LIMIT
         offset = filter.offset if filter.offset else 0
+        # Lets the player start from any point in the recording without loading every chunk before it
+        time_offset_ms = request.GET.get("time_offset_ms")
+        if time_offset_ms and not re.fullmatch(r"[0-9]+", time_offset_ms):
+            raise serializers.ValidationError({"time_offset_ms": "Must be a non-negative integer."})
 
-        session_recording_snapshot_data = self._get_session_recording_snapshots(
-            request, session_recording_id, limit, offset
+        session_recording_snapshot_data, offset = self._get_session_recording_snapshots(
+            request, session_recording_id, limit, offset, int(time_offset_ms) if time_offset_ms else None
         )
 
         if session_recording_snapshot_data.snapshot_data_by_window_id == {}:
@@ -170,6 +180,8 @@ class SessionRecordingViewSet(StructuredViewSetMixin, viewsets.GenericViewSet):
             if session_recording_snapshot_data.has_next
             else None
         )
+        if next_url:
+            next_url = TIME_OFFSET_REGEX.sub("", next_url)
 
         return response.Response(
             {
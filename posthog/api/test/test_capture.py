@@ -1,6 +1,7 @@
 import base64
 import gzip
 import json
+import tempfile
 from datetime import datetime, timedelta
 from datetime import timezone as tz
 from typing import Any, Dict, List, Union
@@ -11,8 +12,10 @@ import lzstring
 from django.test.client import Client
 from django.utils import timezone
 from freezegun import freeze_time
+from kafka.errors import NoBrokersAvailable
 from rest_framework import status
 
+from ee.kafka_client.spill_queue import SpillQueue, _produce_spilled_message
 from posthog.api.test.mock_sentry import mock_sentry_context_for_tagging
 from posthog.models import Person, PersonalAPIKey
 from posthog.models.feature_flag import FeatureFlag, FeatureFlagOverride
@@ -45,7 +48,7 @@ class TestCapture(BaseTest):
         return json.loads(base64.b64decode(data))
 
     def _to_arguments(self, patch_process_event_with_plugins: Any) -> dict:
-        args = patch_process_event_with_plugins.call_args[1]["data"]
+        args = json.loads(patch_process_event_with_plugins.call_args[1]["value"])
 
         return {
             "distinct_id": args["distinct_id"],
@@ -57,8 +60,8 @@ class TestCapture(BaseTest):
             "sent_at": args["sent_at"],
         }
 
-    @patch("ee.kafka_client.client._KafkaProducer.produce")
-    def test_capture_event(self, kafka_produce):
+    @patch("ee.kafka_client.client.TestKafkaProducer.send", return_value=None)
+    def test_capture_event(self, kafka_send):
         data = {
             "event": "$autocapture",
             "properties": {
@@ -75,7 +78,7 @@ class TestCapture(BaseTest):
             with self.assertNumQueries(1):
                 response = self.client.get("/e/?data=%s" % quote(self._to_json(data)), HTTP_ORIGIN="https://localhost",)
         self.assertEqual(response.get("access-control-allow-origin"), "https://localhost")
-        arguments = self._to_arguments(kafka_produce)
+        arguments = self._to_arguments(kafka_send)
         arguments.pop("now")  # can't compare fakedate
         arguments.pop("sent_at")  # can't compare fakedate
         self.assertDictEqual(
@@ -90,7 +93,7 @@ class TestCapture(BaseTest):
         )
 
     @patch("posthog.api.capture.configure_scope")
-    @patch("ee.kafka_client.client._KafkaProducer.produce", MagicMock())
+    @patch("ee.kafka_client.client.TestKafkaProducer.send", MagicMock(return_value=None))
     def test_capture_event_adds_library_to_sentry(self, patched_scope):
         mock_set_tag = mock_sentry_context_for_tagging(patched_scope)
 
@@ -115,7 +118,7 @@ class TestCapture(BaseTest):
         mock_set_tag.assert_has_calls([call("library", "web"), call("library.version", "1.14.1")])
 
     @patch("posthog.api.capture.configure_scope")
-    @patch("ee.kafka_client.client._KafkaProducer.produce", MagicMock())
+    @patch("ee.kafka_client.client.TestKafkaProducer.send", MagicMock(return_value=None))
     def test_capture_event_adds_unknown_to_sentry_when_no_properties_sent(self, patched_scope):
         mock_set_tag = mock_sentry_context_for_tagging(patched_scope)
 
@@ -137,8 +140,8 @@ class TestCapture(BaseTest):
 
         mock_set_tag.assert_has_calls([call("library", "unknown"), call("library.version", "unknown")])
 
-    @patch("ee.kafka_client.client._KafkaProducer.produce")
-    def test_personal_api_key(self, kafka_produce):
+    @patch("ee.kafka_client.client.TestKafkaProducer.send", return_value=None)
+    def test_personal_api_key(self, kafka_send):
         key = PersonalAPIKey(label="X", user=self.user)
         key.save()
         data = {
@@ -158,7 +161,7 @@ class TestCapture(BaseTest):
             with self.assertNumQueries(5):
                 response = self.client.get("/e/?data=%s" % quote(self._to_json(data)), HTTP_ORIGIN="https://localhost",)
         self.assertEqual(response.get("access-control-allow-origin"), "https://localhost")
-        arguments = self._to_arguments(kafka_produce)
+        arguments = self._to_arguments(kafka_send)
         arguments.pop("now")  # can't compare fakedate
         arguments.pop("sent_at")  # can't compare fakedate
         self.assertDictEqual(
@@ -172,8 +175,8 @@ class TestCapture(BaseTest):
             },
         )
 
-    @patch("ee.kafka_client.client._KafkaProducer.produce")
-    def test_personal_api_key_from_batch_request(self, kafka_produce):
+    @patch("ee.kafka_client.client.TestKafkaProducer.send", return_value=None)
+    def test_personal_api_key_from_batch_request(self, kafka_send):
         # Originally issue POSTHOG-2P8
         key = PersonalAPIKey(label="X", user=self.user)
         key.save()
@@ -195,7 +198,7 @@ class TestCapture(BaseTest):
         response = self.client.get("/e/?data=%s" % quote(self._to_json(data)))
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
-        arguments = self._to_arguments(kafka_produce)
+        arguments = self._to_arguments(kafka_send)
         arguments.pop("now")  # can't compare fakedate
         arguments.pop("sent_at")  # can't compare fakedate
         self.assertDictEqual(
@@ -221,8 +224,8 @@ class TestCapture(BaseTest):
             },
         )
 
-    @patch("ee.kafka_client.client._KafkaProducer.produce")
-    def test_multiple_events(self, kafka_produce):
+    @patch("ee.kafka_client.client.TestKafkaProducer.send", return_value=None)
+    def test_multiple_events(self, kafka_send):
         self.client.post(
             "/track/",
             data={
@@ -235,10 +238,10 @@ class TestCapture(BaseTest):
                 "api_key": self.team.api_token,
             },
         )
-        self.assertEqual(kafka_produce.call_count, 2)
+        self.assertEqual(kafka_send.call_count, 2)
 
-    @patch("ee.kafka_client.client._KafkaProducer.produce")
-    def test_emojis_in_text(self, kafka_produce):
+    @patch("ee.kafka_client.client.TestKafkaProducer.send", return_value=None)
+    def test_emojis_in_text(self, kafka_send):
         self.team.api_token = "xp9qT2VLY76JJg"
         self.team.save()
 
@@ -249,13 +252,13 @@ class TestCapture(BaseTest):
                 "data": "eyJldmVudCI6ICIkd2ViX2V2ZW50IiwicHJvcGVydGllcyI6IHsiJG9zIjogIk1hYyBPUyBYIiwiJGJyb3dzZXIiOiAiQ2hyb21lIiwiJHJlZmVycmVyIjogImh0dHBzOi8vYXBwLmhpYmVybHkuY29tL2xvZ2luP25leHQ9LyIsIiRyZWZlcnJpbmdfZG9tYWluIjogImFwcC5oaWJlcmx5LmNvbSIsIiRjdXJyZW50X3VybCI6ICJodHRwczovL2FwcC5oaWJlcmx5LmNvbS8iLCIkYnJvd3Nlcl92ZXJzaW9uIjogNzksIiRzY3JlZW5faGVpZ2h0IjogMjE2MCwiJHNjcmVlbl93aWR0aCI6IDM4NDAsInBoX2xpYiI6ICJ3ZWIiLCIkbGliX3ZlcnNpb24iOiAiMi4zMy4xIiwiJGluc2VydF9pZCI6ICJnNGFoZXFtejVrY3AwZ2QyIiwidGltZSI6IDE1ODA0MTAzNjguMjY1LCJkaXN0aW5jdF9pZCI6IDYzLCIkZGV2aWNlX2lkIjogIjE2ZmQ1MmRkMDQ1NTMyLTA1YmNhOTRkOWI3OWFiLTM5NjM3YzBlLTFhZWFhMC0xNmZkNTJkZDA0NjQxZCIsIiRpbml0aWFsX3JlZmVycmVyIjogIiRkaXJlY3QiLCIkaW5pdGlhbF9yZWZlcnJpbmdfZG9tYWluIjogIiRkaXJlY3QiLCIkdXNlcl9pZCI6IDYzLCIkZXZlbnRfdHlwZSI6ICJjbGljayIsIiRjZV92ZXJzaW9uIjogMSwiJGhvc3QiOiAiYXBwLmhpYmVybHkuY29tIiwiJHBhdGhuYW1lIjogIi8iLCIkZWxlbWVudHMiOiBbCiAgICB7InRhZ19uYW1lIjogImJ1dHRvbiIsIiRlbF90ZXh0IjogIu2gve2yuyBXcml0aW5nIGNvZGUiLCJjbGFzc2VzIjogWwogICAgImJ0biIsCiAgICAiYnRuLXNlY29uZGFyeSIKXSwiYXR0cl9fY2xhc3MiOiAiYnRuIGJ0bi1zZWNvbmRhcnkiLCJhdHRyX19zdHlsZSI6ICJjdXJzb3I6IHBvaW50ZXI7IG1hcmdpbi1yaWdodDogOHB4OyBtYXJnaW4tYm90dG9tOiAxcmVtOyIsIm50aF9jaGlsZCI6IDIsIm50aF9vZl90eXBlIjogMX0sCiAgICB7InRhZ19uYW1lIjogImRpdiIsIm50aF9jaGlsZCI6IDEsIm50aF9vZl90eXBlIjogMX0sCiAgICB7InRhZ19uYW1lIjogImRpdiIsImNsYXNzZXMiOiBbCiAgICAiZmVlZGJhY2stc3RlcCIsCiAgICAiZmVlZGJhY2stc3RlcC1zZWxlY3RlZCIKXSwiYXR0cl9fY2xhc3MiOiAiZmVlZGJhY2stc3RlcCBmZWVkYmFjay1zdGVwLXNlbGVjdGVkIiwibnRoX2NoaWxkIjogMiwibnRoX29mX3R5cGUiOiAxfSwKICAgIHsidGFnX25hbWUiOiAiZGl2IiwiY2xhc3NlcyI6IFsKICAgICJnaXZlLWZlZWRiYWNrIgpdLCJhdHRyX19jbGFzcyI6ICJnaXZlLWZlZWRiYWNrIiwiYXR0cl9fc3R5bGUiOiAid2lkdGg6IDkwJTsgbWFyZ2luOiAwcHggYXV0bzsgZm9udC1zaXplOiAxNXB4OyBwb3NpdGlvbjogcmVsYXRpdmU7IiwibnRoX2NoaWxkIjogMSwibnRoX29mX3R5cGUiOiAxfSwKICAgIHsidGFnX25hbWUiOiAiZGl2IiwiYXR0cl9fc3R5bGUiOiAib3ZlcmZsb3c6IGhpZGRlbjsiLCJudGhfY2hpbGQiOiAxLCJudGhfb2ZfdHlwZSI6IDF9LAogICAgeyJ0YWdfbmFtZSI6ICJkaXYiLCJjbGFzc2VzIjogWwogICAgIm1vZGFsLWJvZHkiCl0sImF0dHJfX2NsYXNzIjogIm1vZGFsLWJvZHkiLCJhdHRyX19zdHlsZSI6ICJmb250LXNpemU6IDE1cHg7IiwibnRoX2NoaWxkIjogMiwibnRoX29mX3R5cGUiOiAyfSwKICAgIHsidGFnX25hbWUiOiAiZGl2IiwiY2xhc3NlcyI6IFsKICAgICJtb2RhbC1jb250ZW50IgpdLCJhdHRyX19jbGFzcyI6ICJtb2RhbC1jb250ZW50IiwibnRoX2NoaWxkIjogMSwibnRoX29mX3R5cGUiOiAxfSwKICAgIHsidGFnX25hbWUiOiAiZGl2IiwiY2xhc3NlcyI6IFsKICAgICJtb2RhbC1kaWFsb2ciLAogICAgIm1vZGFsLWxnIgpdLCJhdHRyX19jbGFzcyI6ICJtb2RhbC1kaWFsb2cgbW9kYWwtbGciLCJhdHRyX19yb2xlIjogImRvY3VtZW50IiwibnRoX2NoaWxkIjogMSwibnRoX29mX3R5cGUiOiAxfSwKICAgIHsidGFnX25hbWUiOiAiZGl2IiwiY2xhc3NlcyI6IFsKICAgICJtb2RhbCIsCiAgICAiZmFkZSIsCiAgICAic2hvdyIKXSwiYXR0cl9fY2xhc3MiOiAibW9kYWwgZmFkZSBzaG93IiwiYXR0cl9fc3R5bGUiOiAiZGlzcGxheTogYmxvY2s7IiwibnRoX2NoaWxkIjogMiwibnRoX29mX3R5cGUiOiAyfSwKICAgIHsidGFnX25hbWUiOiAiZGl2IiwibnRoX2NoaWxkIjogMSwibnRoX29mX3R5cGUiOiAxfSwKICAgIHsidGFnX25hbWUiOiAiZGl2IiwibnRoX2NoaWxkIjogMSwibnRoX29mX3R5cGUiOiAxfSwKICAgIHsidGFnX25hbWUiOiAiZGl2IiwiY2xhc3NlcyI6IFsKICAgICJrLXBvcnRsZXRfX2JvZHkiLAogICAgIiIKXSwiYXR0cl9fY2xhc3MiOiAiay1wb3J0bGV0X19ib2R5ICIsImF0dHJfX3N0eWxlIjogInBhZGRpbmc6IDBweDsiLCJudGhfY2hpbGQiOiAyLCJudGhfb2ZfdHlwZSI6IDJ9LAogICAgeyJ0YWdfbmFtZSI6ICJkaXYiLCJjbGFzc2VzIjogWwogICAgImstcG9ydGxldCIsCiAgICAiay1wb3J0bGV0LS1oZWlnaHQtZmx1aWQiCl0sImF0dHJfX2NsYXNzIjogImstcG9ydGxldCBrLXBvcnRsZXQtLWhlaWdodC1mbHVpZCIsIm50aF9jaGlsZCI6IDEsIm50aF9vZl90eXBlIjogMX0sCiAgICB7InRhZ19uYW1lIjogImRpdiIsImNsYXNzZXMiOiBbCiAgICAiY29sLWxnLTYiCl0sImF0dHJfX2NsYXNzIjogImNvbC1sZy02IiwibnRoX2NoaWxkIjogMSwibnRoX29mX3R5cGUiOiAxfSwKICAgIHsidGFnX25hbWUiOiAiZGl2IiwiY2xhc3NlcyI6IFsKICAgICJyb3ciCl0sImF0dHJfX2NsYXNzIjogInJvdyIsIm50aF9jaGlsZCI6IDEsIm50aF9vZl90eXBlIjogMX0sCiAgICB7InRhZ19uYW1lIjogImRpdiIsImF0dHJfX3N0eWxlIjogInBhZGRpbmc6IDQwcHggMzBweCAwcHg7IGJhY2tncm91bmQtY29sb3I6IHJnYigyMzksIDIzOSwgMjQ1KTsgbWFyZ2luLXRvcDogLTQwcHg7IG1pbi1oZWlnaHQ6IGNhbGMoMTAwdmggLSA0MHB4KTsiLCJudGhfY2hpbGQiOiAyLCJudGhfb2ZfdHlwZSI6IDJ9LAogICAgeyJ0YWdfbmFtZSI6ICJkaXYiLCJhdHRyX19zdHlsZSI6ICJtYXJnaW4tdG9wOiAwcHg7IiwibnRoX2NoaWxkIjogMiwibnRoX29mX3R5cGUiOiAyfSwKICAgIHsidGFnX25hbWUiOiAiZGl2IiwiY2xhc3NlcyI6IFsKICAgICJBcHAiCl0sImF0dHJfX2NsYXNzIjogIkFwcCIsImF0dHJfX3N0eWxlIjogImNvbG9yOiByZ2IoNTIsIDYxLCA2Mik7IiwibnRoX2NoaWxkIjogMSwibnRoX29mX3R5cGUiOiAxfSwKICAgIHsidGFnX25hbWUiOiAiZGl2IiwiYXR0cl9faWQiOiAicm9vdCIsIm50aF9jaGlsZCI6IDEsIm50aF9vZl90eXBlIjogMX0sCiAgICB7InRhZ19uYW1lIjogImJvZHkiLCJudGhfY2hpbGQiOiAyLCJudGhfb2ZfdHlwZSI6IDF9Cl0sInRva2VuIjogInhwOXFUMlZMWTc2SkpnIn19"
             },
         )
-        properties = json.loads(kafka_produce.call_args[1]["data"]["data"])["properties"]
+        properties = json.loads(json.loads(kafka_send.call_args[1]["value"])["data"])["properties"]
         self.assertEqual(
             properties["$elements"][0]["$el_text"], "💻 Writing code",
         )
 
-    @patch("ee.kafka_client.client._KafkaProducer.produce")
-    def test_js_gzip(self, kafka_produce):
+    @patch("ee.kafka_client.client.TestKafkaProducer.send", return_value=None)
+    def test_js_gzip(self, kafka_send):
         self.team.api_token = "rnEnwNvmHphTu5rFG4gWDDs49t00Vk50tDOeDdedMb4"
         self.team.save()
 
@@ -265,16 +268,16 @@ class TestCapture(BaseTest):
             content_type="text/plain",
         )
 
-        self.assertEqual(kafka_produce.call_count, 1)
+        self.assertEqual(kafka_send.call_count, 1)
 
-        data = json.loads(kafka_produce.call_args[1]["data"]["data"])
+        data = json.loads(json.loads(kafka_send.call_args[1]["value"])["data"])
         self.assertEqual(data["event"], "my-event")
         self.assertEqual(
             data["properties"]["prop"], "💻 Writing code",
         )
 
-    @patch("ee.kafka_client.client._KafkaProducer.produce")
-    def test_js_gzip_with_no_content_type(self, kafka_produce):
+    @patch("ee.kafka_client.client.TestKafkaProducer.send", return_value=None)
+    def test_js_gzip_with_no_content_type(self, kafka_send):
         "IE11 sometimes does not send content_type"
 
         self.team.api_token = "rnEnwNvmHphTu5rFG4gWDDs49t00Vk50tDOeDdedMb4"
@@ -286,16 +289,16 @@ class TestCapture(BaseTest):
             content_type="",
         )
 
-        self.assertEqual(kafka_produce.call_count, 1)
+        self.assertEqual(kafka_send.call_count, 1)
 
-        data = json.loads(kafka_produce.call_args[1]["data"]["data"])
+        data = json.loads(json.loads(kafka_send.call_args[1]["value"])["data"])
         self.assertEqual(data["event"], "my-event")
         self.assertEqual(
             data["properties"]["prop"], "💻 Writing code",
         )
 
-    @patch("ee.kafka_client.client._KafkaProducer.produce")
-    def test_invalid_gzip(self, kafka_produce):
+    @patch("ee.kafka_client.client.TestKafkaProducer.send", return_value=None)
+    def test_invalid_gzip(self, kafka_send):
         self.team.api_token = "rnEnwNvmHphTu5rFG4gWDDs49t00Vk50tDOeDdedMb4"
         self.team.save()
 
@@ -311,10 +314,10 @@ class TestCapture(BaseTest):
                 code="invalid_payload",
             ),
         )
-        self.assertEqual(kafka_produce.call_count, 0)
+        self.assertEqual(kafka_send.call_count, 0)
 
-    @patch("ee.kafka_client.client._KafkaProducer.produce")
-    def test_invalid_lz64(self, kafka_produce):
+    @patch("ee.kafka_client.client.TestKafkaProducer.send", return_value=None)
+    def test_invalid_lz64(self, kafka_send):
         self.team.api_token = "rnEnwNvmHphTu5rFG4gWDDs49t00Vk50tDOeDdedMb4"
         self.team.save()
 
@@ -327,21 +330,21 @@ class TestCapture(BaseTest):
                 "Malformed request data: Failed to decompress data.", code="invalid_payload",
             ),
         )
-        self.assertEqual(kafka_produce.call_count, 0)
+        self.assertEqual(kafka_send.call_count, 0)
 
-    @patch("ee.kafka_client.client._KafkaProducer.produce")
-    def test_incorrect_padding(self, kafka_produce):
+    @patch("ee.kafka_client.client.TestKafkaProducer.send", return_value=None)
+    def test_incorrect_padding(self, kafka_send):
         response = self.client.get(
             "/e/?data=eyJldmVudCI6IndoYXRldmVmciIsInByb3BlcnRpZXMiOnsidG9rZW4iOiJ0b2tlbjEyMyIsImRpc3RpbmN0X2lkIjoiYXNkZiJ9fQ",
             content_type="application/json",
             HTTP_REFERER="https://localhost",
         )
         self.assertEqual(response.json()["status"], 1)
-        data = json.loads(kafka_produce.call_args[1]["data"]["data"])
+        data = json.loads(json.loads(kafka_send.call_args[1]["value"])["data"])
         self.assertEqual(data["event"], "whatevefr")
 
-    @patch("ee.kafka_client.client._KafkaProducer.produce")
-    def test_empty_request_returns_an_error(self, kafka_produce):
+    @patch("ee.kafka_client.client.TestKafkaProducer.send", return_value=None)
+    def test_empty_request_returns_an_error(self, kafka_send):
         """
         Empty requests that fail silently cause confusion as to whether they were successful or not.
         """
@@ -349,20 +352,20 @@ class TestCapture(BaseTest):
         # Empty GET
         response = self.client.get("/e/?data=", content_type="application/json", HTTP_ORIGIN="https://localhost",)
         self.assertEqual(response.status_code, 400)
-        self.assertEqual(kafka_produce.call_count, 0)
+        self.assertEqual(kafka_send.call_count, 0)
 
         # Empty POST
         response = self.client.post("/e/", {}, content_type="application/json", HTTP_ORIGIN="https://localhost",)
         self.assertEqual(response.status_code, 400)
-        self.assertEqual(kafka_produce.call_count, 0)
+        self.assertEqual(kafka_send.call_count, 0)
 
-    @patch("ee.kafka_client.client._KafkaProducer.produce")
-    def test_batch(self, kafka_produce):
+    @patch("ee.kafka_client.client.TestKafkaProducer.send", return_value=None)
+    def test_batch(self, kafka_send):
         data = {"type": "capture", "event": "user signed up", "distinct_id": "2"}
         response = self.client.post(
             "/batch/", data={"api_key": self.team.api_token, "batch": [data]}, content_type="application/json",
         )
-        arguments = self._to_arguments(kafka_produce)
+        arguments = self._to_arguments(kafka_send)
         arguments.pop("now")  # can't compare fakedate
         arguments.pop("sent_at")  # can't compare fakedate
         self.assertDictEqual(
@@ -376,8 +379,8 @@ class TestCapture(BaseTest):
             },
         )
 
-    @patch("ee.kafka_client.client._KafkaProducer.produce")
-    def test_batch_with_invalid_event(self, kafka_produce):
+    @patch("ee.kafka_client.client.TestKafkaProducer.send", return_value=None)
+    def test_batch_with_invalid_event(self, kafka_send):
         data = [
             {"type": "capture", "event": "event1", "distinct_id": "2"},
             {"type": "capture", "event": "event2"},  # invalid
@@ -391,13 +394,67 @@ class TestCapture(BaseTest):
 
         # We should return a 200 but not process the invalid event
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(kafka_produce.call_count, 4)
+        self.assertEqual(kafka_send.call_count, 4)
 
-        events_processed = [json.loads(call.kwargs["data"]["data"])["event"] for call in kafka_produce.call_args_list]
+        events_processed = [
+            json.loads(json.loads(call.kwargs["value"])["data"])["event"] for call in kafka_send.call_args_list
+        ]
         self.assertEqual(events_processed, ["event1", "event3", "event4", "event5"])  # event2 not processed
 
-    @patch("ee.kafka_client.client._KafkaProducer.produce")
-    def test_batch_gzip_header(self, kafka_produce):
+    @patch("ee.kafka_client.client.TestKafkaProducer.send", return_value=None)
+    def test_batch_with_produce_failure(self, kafka_send):
+        kafka_send.side_effect = [None, Exception("broker unavailable"), None]
+        data = [
+            {"type": "capture", "event": "event1", "distinct_id": "2"},
+            {"type": "capture", "event": "event2", "distinct_id": "2"},
+            {"type": "capture", "event": "event3", "distinct_id": "3"},
+        ]
+        response = self.client.post(
+            "/batch/", data={"api_key": self.team.api_token, "batch": data}, content_type="application/json",
+        )
+
+        # One failed event fails the request, but the rest of the batch is still produced
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(kafka_send.call_count, 3)
+
+        partition_keys = [call.kwargs["key"] for call in kafka_send.call_args_list]
+        self.assertEqual(partition_keys[0], partition_keys[1])
+        self.assertNotEqual(partition_keys[0], partition_keys[2])
+
+        # Only the event that wasn't stored is reported, so that's all a client needs to retry
+        produced_uuids = [json.loads(call.kwargs["value"])["uuid"] for call in kafka_send.call_args_list]
+        self.assertEqual(response.json()["failed_event_uuids"], [produced_uuids[1]])
+
+    @patch("ee.kafka_client.client.TestKafkaProducer.send", return_value=None)
+    def test_events_spilled_while_kafka_is_down_are_replayed(self, kafka_send):
+        data = [
+            {"type": "capture", "event": "event1", "distinct_id": "2"},
+            {"type": "capture", "event": "event2", "distinct_id": "3"},
+        ]
+        with tempfile.TemporaryDirectory() as directory, patch(
+            "ee.kafka_client.spill_queue.CAPTURE_SPILL_QUEUE_ENABLED", True
+        ), patch("ee.kafka_client.spill_queue._spill_queue", SpillQueue(directory)) as spill_queue:
+            kafka_send.side_effect = NoBrokersAvailable()
+            response = self.client.post(
+                "/batch/", data={"api_key": self.team.api_token, "batch": data}, content_type="application/json",
+            )
+
+            # Spilled events are as good as stored
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            spilled_messages = [(call.kwargs["value"], call.kwargs["key"]) for call in kafka_send.call_args_list]
+
+            kafka_send.reset_mock(side_effect=True)
+            spill_queue.close()
+            self.assertEqual(spill_queue.drain(_produce_spilled_message, max_messages=10), 2)
+
+        replayed_messages = [(call.kwargs["value"], call.kwargs["key"]) for call in kafka_send.call_args_list]
+        self.assertEqual(replayed_messages, spilled_messages)
+        self.assertEqual(
+            [json.loads(json.loads(value)["data"])["event"] for value, _ in replayed_messages], ["event1", "event2"]
+        )
+
+    @patch("ee.kafka_client.client.TestKafkaProducer.send", return_value=None)
+    def test_batch_gzip_header(self, kafka_send):
         data = {
             "api_key": self.team.api_token,
             "batch": [{"type": "capture", "event": "user signed up", "distinct_id": "2",}],
@@ -411,7 +468,7 @@ class TestCapture(BaseTest):
             HTTP_CONTENT_ENCODING="gzip",
         )
 
-        arguments = self._to_arguments(kafka_produce)
+        arguments = self._to_arguments(kafka_send)
         arguments.pop("now")  # can't compare fakedate
         arguments.pop("sent_at")  # can't compare fakedate
         self.assertDictEqual(
@@ -425,8 +482,8 @@ class TestCapture(BaseTest):
             },
         )
 
-    @patch("ee.kafka_client.client._KafkaProducer.produce")
-    def test_batch_gzip_param(self, kafka_produce):
+    @patch("ee.kafka_client.client.TestKafkaProducer.send", return_value=None)
+    def test_batch_gzip_param(self, kafka_send):
         data = {
             "api_key": self.team.api_token,
             "batch": [{"type": "capture", "event": "user signed up", "distinct_id": "2"}],
@@ -439,7 +496,7 @@ class TestCapture(BaseTest):
             content_type="application/json",
         )
 
-        arguments = self._to_arguments(kafka_produce)
+        arguments = self._to_arguments(kafka_send)
         arguments.pop("now")  # can't compare fakedate
         arguments.pop("sent_at")  # can't compare fakedate
         self.assertDictEqual(
@@ -453,8 +510,8 @@ class TestCapture(BaseTest):
             },
         )
 
-    @patch("ee.kafka_client.client._KafkaProducer.produce")
-    def test_batch_lzstring(self, kafka_produce):
+    @patch("ee.kafka_client.client.TestKafkaProducer.send", return_value=None)
+    def test_batch_lzstring(self, kafka_send):
         data = {
             "api_key": self.team.api_token,
             "batch": [{"type": "capture", "event": "user signed up", "distinct_id": "2"}],
@@ -468,7 +525,7 @@ class TestCapture(BaseTest):
             HTTP_CONTENT_ENCODING="lz64",
         )
 
-        arguments = self._to_arguments(kafka_produce)
+        arguments = self._to_arguments(kafka_send)
         arguments.pop("now")  # can't compare fakedate
         arguments.pop("sent_at")  # can't compare fakedate
         self.assertDictEqual(
@@ -482,8 +539,8 @@ class TestCapture(BaseTest):
             },
         )
 
-    @patch("ee.kafka_client.client._KafkaProducer.produce")
-    def test_lz64_with_emoji(self, kafka_produce):
+    @patch("ee.kafka_client.client.TestKafkaProducer.send", return_value=None)
+    def test_lz64_with_emoji(self, kafka_send):
         self.team.api_token = "KZZZeIpycLH-tKobLBET2NOg7wgJF2KqDL5yWU_7tZw"
         self.team.save()
         response = self.client.post(
@@ -493,7 +550,7 @@ class TestCapture(BaseTest):
             HTTP_CONTENT_ENCODING="lz64",
         )
         self.assertEqual(response.status_code, 200)
-        arguments = self._to_arguments(kafka_produce)
+        arguments = self._to_arguments(kafka_send)
         self.assertEqual(arguments["data"]["event"], "🤓")
 
     def test_batch_incorrect_token(self):
@@ -550,8 +607,8 @@ class TestCapture(BaseTest):
         self.assertEqual(statsd_incr_first_call.args[0], "invalid_event")
         self.assertEqual(statsd_incr_first_call.kwargs, {"tags": {"error": "missing_distinct_id"}})
 
-    @patch("ee.kafka_client.client._KafkaProducer.produce")
-    def test_engage(self, kafka_produce):
+    @patch("ee.kafka_client.client.TestKafkaProducer.send", return_value=None)
+    def test_engage(self, kafka_send):
         response = self.client.get(
             "/engage/?data=%s"
             % quote(
@@ -568,7 +625,7 @@ class TestCapture(BaseTest):
             content_type="application/json",
             HTTP_ORIGIN="https://localhost",
         )
-        arguments = self._to_arguments(kafka_produce)
+        arguments = self._to_arguments(kafka_send)
         self.assertEqual(arguments["data"]["event"], "$identify")
         arguments.pop("now")  # can't compare fakedate
         arguments.pop("sent_at")  # can't compare fakedate
@@ -578,8 +635,8 @@ class TestCapture(BaseTest):
             {"distinct_id": "3", "ip": "127.0.0.1", "site_url": "http://testserver", "team_id": self.team.pk,},
         )
 
-    @patch("ee.kafka_client.client._KafkaProducer.produce")
-    def test_python_library(self, kafka_produce):
+    @patch("ee.kafka_client.client.TestKafkaProducer.send", return_value=None)
+    def test_python_library(self, kafka_send):
         self.client.post(
             "/track/",
             data={
@@ -587,11 +644,11 @@ class TestCapture(BaseTest):
                 "api_key": self.team.api_token,  # main difference in this test
             },
         )
-        arguments = self._to_arguments(kafka_produce)
+        arguments = self._to_arguments(kafka_send)
         self.assertEqual(arguments["team_id"], self.team.pk)
 
-    @patch("ee.kafka_client.client._KafkaProducer.produce")
-    def test_base64_decode_variations(self, kafka_produce):
+    @patch("ee.kafka_client.client.TestKafkaProducer.send", return_value=None)
+    def test_base64_decode_variations(self, kafka_send):
         base64 = "eyJldmVudCI6IiRwYWdldmlldyIsInByb3BlcnRpZXMiOnsiZGlzdGluY3RfaWQiOiJlZWVlZWVlZ8+lZWVlZWUifX0="
         dict = self._dict_from_b64(base64)
         self.assertDictEqual(
@@ -602,7 +659,7 @@ class TestCapture(BaseTest):
         self.client.post(
             "/track/", data={"data": base64, "api_key": self.team.api_token,},  # main difference in this test
         )
-        arguments = self._to_arguments(kafka_produce)
+        arguments = self._to_arguments(kafka_send)
         self.assertEqual(arguments["team_id"], self.team.pk)
         self.assertEqual(arguments["distinct_id"], "eeeeeeegϥeeeee")
 
@@ -611,12 +668,12 @@ class TestCapture(BaseTest):
             "/track/",
             data={"data": base64.replace("+", " "), "api_key": self.team.api_token,},  # main difference in this test
         )
-        arguments = self._to_arguments(kafka_produce)
+        arguments = self._to_arguments(kafka_send)
         self.assertEqual(arguments["team_id"], self.team.pk)
         self.assertEqual(arguments["distinct_id"], "eeeeeeegϥeeeee")
 
-    @patch("ee.kafka_client.client._KafkaProducer.produce")
-    def test_js_library_underscore_sent_at(self, kafka_produce):
+    @patch("ee.kafka_client.client.TestKafkaProducer.send", return_value=None)
+    def test_js_library_underscore_sent_at(self, kafka_send):
         now = timezone.now()
         tomorrow = now + timedelta(days=1, hours=2)
         tomorrow_sent_at = now + timedelta(days=1, hours=2, minutes=10)
@@ -633,7 +690,7 @@ class TestCapture(BaseTest):
             HTTP_ORIGIN="https://localhost",
         )
 
-        arguments = self._to_arguments(kafka_produce)
+        arguments = self._to_arguments(kafka_send)
 
         # right time sent as sent_at to process_event
 
@@ -644,8 +701,8 @@ class TestCapture(BaseTest):
         self.assertLess(abs(timediff), 1)
         self.assertEqual(arguments["data"]["timestamp"], tomorrow.isoformat())
 
-    @patch("ee.kafka_client.client._KafkaProducer.produce")
-    def test_long_distinct_id(self, kafka_produce):
+    @patch("ee.kafka_client.client.TestKafkaProducer.send", return_value=None)
+    def test_long_distinct_id(self, kafka_send):
         now = timezone.now()
         tomorrow = now + timedelta(days=1, hours=2)
         tomorrow_sent_at = now + timedelta(days=1, hours=2, minutes=10)
@@ -661,11 +718,11 @@ class TestCapture(BaseTest):
             content_type="application/json",
             HTTP_ORIGIN="https://localhost",
         )
-        arguments = self._to_arguments(kafka_produce)
+        arguments = self._to_arguments(kafka_send)
         self.assertEqual(len(arguments["distinct_id"]), 200)
 
-    @patch("ee.kafka_client.client._KafkaProducer.produce")
-    def test_sent_at_field(self, kafka_produce):
+    @patch("ee.kafka_client.client.TestKafkaProducer.send", return_value=None)
+    def test_sent_at_field(self, kafka_send):
         now = timezone.now()
         tomorrow = now + timedelta(days=1, hours=2)
         tomorrow_sent_at = now + timedelta(days=1, hours=2, minutes=10)
@@ -681,7 +738,7 @@ class TestCapture(BaseTest):
             },
         )
 
-        arguments = self._to_arguments(kafka_produce)
+        arguments = self._to_arguments(kafka_send)
         sent_at = datetime.fromisoformat(arguments["sent_at"])
         # right time sent as sent_at to process_event
         timediff = sent_at.timestamp() - tomorrow_sent_at.timestamp()
@@ -760,8 +817,8 @@ class TestCapture(BaseTest):
         self.assertEqual(statsd_incr_first_call.args[0], "invalid_event")
         self.assertEqual(statsd_incr_first_call.kwargs, {"tags": {"error": "missing_event_name"}})
 
-    @patch("ee.kafka_client.client._KafkaProducer.produce")
-    def test_add_feature_flags_if_missing(self, kafka_produce) -> None:
+    @patch("ee.kafka_client.client.TestKafkaProducer.send", return_value=None)
+    def test_add_feature_flags_if_missing(self, kafka_send) -> None:
         self.assertListEqual(self.team.event_properties_numerical, [])
         FeatureFlag.objects.create(team=self.team, created_by=self.user, key="test-ff", rollout_percentage=100)
         self.client.post(
@@ -771,11 +828,11 @@ class TestCapture(BaseTest):
                 "api_key": self.team.api_token,
             },
         )
-        arguments = self._to_arguments(kafka_produce)
+        arguments = self._to_arguments(kafka_send)
         self.assertEqual(arguments["data"]["properties"]["$active_feature_flags"], ["test-ff"])
 
-    @patch("ee.kafka_client.client._KafkaProducer.produce")
-    def test_add_feature_flags_with_overrides_if_missing(self, kafka_produce) -> None:
+    @patch("ee.kafka_client.client.TestKafkaProducer.send", return_value=None)
+    def test_add_feature_flags_with_overrides_if_missing(self, kafka_send) -> None:
         feature_flag_instance = FeatureFlag.objects.create(
             team=self.team, created_by=self.user, key="test-ff", rollout_percentage=0
         )
@@ -794,7 +851,7 @@ class TestCapture(BaseTest):
                 "api_key": self.team.api_token,
             },
         )
-        arguments = self._to_arguments(kafka_produce)
+        arguments = self._to_arguments(kafka_send)
         self.assertEqual(arguments["data"]["properties"]["$feature/test-ff"], True)
         self.assertEqual(arguments["data"]["properties"]["$active_feature_flags"], ["test-ff"])
 
@@ -176,14 +176,14 @@ class TestDecide(BaseTest):
             created_by=self.user,
         )
 
-        with self.assertNumQueries(5):
+        with self.assertNumQueries(4):
             response = self._post_decide()
             self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIn("default-flag", response.json()["featureFlags"])
         self.assertIn("beta-feature", response.json()["featureFlags"])
         self.assertIn("filer-by-property-2", response.json()["featureFlags"])
 
-        with self.assertNumQueries(5):
+        with self.assertNumQueries(2):
             response = self._post_decide({"token": self.team.api_token, "distinct_id": "another_id"})
             self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.json()["featureFlags"], ["default-flag"])
@@ -226,7 +226,7 @@ class TestDecide(BaseTest):
             self.assertIn("beta-feature", response.json()["featureFlags"])
             self.assertIn("default-flag", response.json()["featureFlags"])
 
-        with self.assertNumQueries(3):
+        with self.assertNumQueries(1):
             response = self._post_decide(api_version=2)
             self.assertTrue(response.json()["featureFlags"]["beta-feature"])
             self.assertTrue(response.json()["featureFlags"]["default-flag"])
@@ -234,7 +234,7 @@ class TestDecide(BaseTest):
                 "first-variant", response.json()["featureFlags"]["multivariate-flag"]
             )  # assigned by distinct_id hash
 
-        with self.assertNumQueries(3):
+        with self.assertNumQueries(1):
             response = self._post_decide(api_version=2, distinct_id="other_id")
             self.assertTrue(response.json()["featureFlags"]["beta-feature"])
             self.assertTrue(response.json()["featureFlags"]["default-flag"])
@@ -288,7 +288,7 @@ class TestDecide(BaseTest):
                 (response.json()["featureFlags"]).get("default-flag")
             )  # User still receives the default flag
 
-        with self.assertNumQueries(4):
+        with self.assertNumQueries(2):
             response = self._post_decide(api_version=2, distinct_id="example_id")
             self.assertIsNotNone(
                 response.json()["featureFlags"]["multivariate-flag"]
@@ -391,7 +391,7 @@ class TestDecide(BaseTest):
             team=self.team, user=self.user, feature_flag=ff_3, override_value="third-variant",
         )
 
-        with self.assertNumQueries(3):
+        with self.assertNumQueries(4):
             response = self._post_decide(api_version=1, distinct_id=str(self.user.distinct_id))
             self.assertEqual(response.status_code, status.HTTP_200_OK)
             self.assertEqual(
@@ -404,7 +404,7 @@ class TestDecide(BaseTest):
                 ],
             )
 
-        with self.assertNumQueries(3):
+        with self.assertNumQueries(2):
             response = self._post_decide(api_version=2, distinct_id=str(self.user.distinct_id))
             feature_flags_for_canonical_distinct_id = response.json()["featureFlags"]
             self.assertEqual(
@@ -417,7 +417,7 @@ class TestDecide(BaseTest):
                 },
             )
         # Ensure we get the same response from both of the user's distinct_ids
-        with self.assertNumQueries(3):
+        with self.assertNumQueries(2):
             response_non_canonical_distinct_id = self._post_decide(
                 api_version=2, distinct_id="not-canonical-distinct-id"
             )
@@ -425,7 +425,7 @@ class TestDecide(BaseTest):
                 response_non_canonical_distinct_id.json()["featureFlags"], feature_flags_for_canonical_distinct_id,
             )
 
-        with self.assertNumQueries(3):
+        with self.assertNumQueries(2):
             response = self._post_decide(api_version=2, distinct_id="user-with-no-overriden-flags")
             self.assertEqual(
                 response.json()["featureFlags"],
@@ -459,7 +459,7 @@ class TestDecide(BaseTest):
             response = self._post_decide(api_version=2, distinct_id="example_id")
             self.assertEqual(response.json()["featureFlags"], {})
 
-        with self.assertNumQueries(4):
+        with self.assertNumQueries(1):
             response = self._post_decide(api_version=2, distinct_id="example_id", groups={"organization": "foo"})
             self.assertEqual(response.json()["featureFlags"], {"groups-flag": True})
 
@@ -292,6 +292,34 @@ def factory_test_session_recordings_api(session_recording_event_factory):
 
                     next_url = response_data["result"]["next"]
 
+        def test_get_snapshots_from_time_offset(self):
+            chunked_session_id = "chunk_id"
+
+            with freeze_time("2020-09-13T12:26:40.000Z"):
+                start_time = now()
+                for minute in range(30):
+                    # A full snapshot every 10 minutes
+                    self.create_chunked_snapshots(
+                        2, "user", chunked_session_id, start_time + relativedelta(minutes=minute), minute % 10 == 0,
+                    )
+
+                url = f"/api/projects/{self.team.id}/session_recordings/{chunked_session_id}/snapshots"
+                response = self.client.get(f"{url}?time_offset_ms={25 * 60 * 1000}&limit=5")
+                response_data = response.json()
+
+                snapshots = response_data["result"]["snapshot_data_by_window_id"][""]
+                self.assertEqual(len(snapshots), 10)
+                self.assertEqual(snapshots[0]["type"], 2)
+                self.assertEqual(snapshots[2]["type"], 3)
+                self.assertEqual(response_data["result"]["next"], f"http://testserver{url}?limit=5&offset=25")
+
+        def test_get_snapshots_with_invalid_time_offset(self):
+            url = f"/api/projects/{self.team.id}/session_recordings/chunk_id/snapshots"
+            response = self.client.get(f"{url}?time_offset_ms=soon")
+
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(response.json()["attr"], "time_offset_ms")
+
         def test_get_metadata_for_chunked_session_recording(self):
 
             with freeze_time("2020-09-13T12:26:40.000Z"):
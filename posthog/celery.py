@@ -131,20 +131,27 @@ def setup_periodic_tasks(sender: Celery, **kwargs):
             name="calculate event property usage",
         )
 
+    if settings.PERSON_DISTINCT_ID_SNAPSHOT_ENABLED:
+        sender.add_periodic_task(
+            settings.PERSON_DISTINCT_ID_SNAPSHOT_REFRESH_INTERVAL_SECONDS,
+            refresh_person_distinct_id_snapshots.s(),
+            name="refresh person distinct id snapshots",
+        )
+
 
 # Set up clickhouse query instrumentation
 @task_prerun.connect
 def set_up_instrumentation(task_id, task, **kwargs):
     from posthog import client
 
-    client._request_information = {"kind": "celery", "id": task.name}
+    client._request_information.set({"kind": "celery", "id": task.name})
 
 
 @task_postrun.connect
 def teardown_instrumentation(task_id, task, **kwargs):
     from posthog import client
 
-    client._request_information = None
+    client._request_information.set(None)
 
 
 @app.task(ignore_result=True)
@@ -366,6 +373,13 @@ def calculate_event_property_usage():
     calculate_event_property_usage()
 
 
+@app.task(ignore_result=True)
+def refresh_person_distinct_id_snapshots():
+    from posthog.tasks.refresh_person_distinct_id_snapshots import refresh_person_distinct_id_snapshots
+
+    refresh_person_distinct_id_snapshots()
+
+
 @app.task(ignore_result=True)
 def calculate_billing_daily_usage():
     try:
@@ -1,12 +1,28 @@
 import asyncio
 import hashlib
 import json
+import pickle
+import secrets
 import time
 import types
+from contextlib import contextmanager
+from contextvars import ContextVar
 from dataclasses import dataclass
+from itertools import islice
 from time import perf_counter
-from typing import Any, Dict, List, Optional, Tuple, Union, cast
+from typing import (
+    Any,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+    cast,
+)
 
+import numpy as np
 import sqlparse
 from aioch import Client
 from asgiref.sync import async_to_sync
@@ -36,7 +52,7 @@ from posthog.settings import (
     CLICKHOUSE_VERIFY,
     TEST,
 )
-from posthog.timer import get_timer_thread
+from posthog.timer import TimerTask, get_timer_thread
 from posthog.utils import get_safe_cache
 
 InsertParams = Union[list, tuple, types.GeneratorType]
@@ -44,10 +60,42 @@ NonInsertParams = Dict[str, Any]
 QueryArgs = Optional[Union[InsertParams, NonInsertParams]]
 
 CACHE_TTL = 60  # seconds
+CACHE_STALE_TTL = 0  # seconds a result may still be served after CACHE_TTL while one worker refreshes it
+CACHE_LOCK_TTL = 300  # seconds, upper bound on how long a crashed worker can hold a query's refresh lock
+CACHE_COALESCE_WAIT = 30  # seconds to wait on another worker running the same query before running it ourselves
+CACHE_COALESCE_POLL_INTERVAL = 0.05  # seconds
+# Bumped whenever the layout of cached entries changes, so workers on different versions never read each other's
+# entries
+CACHE_KEY_VERSION = b"v2:"
+
+# Only deletes the lock if we still hold it, so a worker whose query outlived CACHE_LOCK_TTL can't release the lock
+# another worker has since taken
+RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
 SLOW_QUERY_THRESHOLD_MS = 15000
 QUERY_TIMEOUT_THREAD = get_timer_thread("posthog.client", SLOW_QUERY_THRESHOLD_MS)
-
-_request_information: Optional[Dict] = None
+STREAMING_BLOCK_SIZE = 10_000  # rows
+INSERT_BLOCK_SIZE = 100_000  # rows
+
+_NUMPY_DTYPES = {
+    "Int8": np.int8,
+    "Int16": np.int16,
+    "Int32": np.int32,
+    "Int64": np.int64,
+    "UInt8": np.uint8,
+    "UInt16": np.uint16,
+    "UInt32": np.uint32,
+    "UInt64": np.uint64,
+    "Float32": np.float32,
+    "Float64": np.float64,
+}
+
+# Context-scoped, so threads started with a copy of the caller's context (e.g. the query pool) tag their queries too
+_request_information: ContextVar[Optional[Dict]] = ContextVar("_request_information", default=None)
 
 
 def default_client():
@@ -122,78 +170,296 @@ else:
         return sync_execute(query, args, settings=settings, with_column_types=with_column_types)
 
 
-def cache_sync_execute(query, args=None, redis_client=None, ttl=CACHE_TTL, settings=None, with_column_types=False):
+def cache_sync_execute(
+    query,
+    args=None,
+    redis_client=None,
+    ttl=CACHE_TTL,
+    settings=None,
+    with_column_types=False,
+    stale_ttl=CACHE_STALE_TTL,
+):
+    """
+    Runs `query` through a Redis result cache shared by all workers.
+
+    Results are fresh for `ttl` seconds and then served stale for up to `stale_ttl` more while a single worker
+    refreshes them. Concurrent misses are coalesced: one worker takes a lock keyed on the query hash and runs the
+    query while the others wait for its result, instead of all sending the same query to ClickHouse.
+    """
     if not redis_client:
         redis_client = redis.get_client()
     key = _key_hash(query, args)
-    if redis_client.exists(key):
-        result = _deserialize(redis_client.get(key))
-        return result
+    lock_key = key + b":lock"
+
+    cached = redis_client.get(key)
+    entry = _deserialize_entry(cached) if cached is not None else None
+    if entry is not None:
+        fresh_until, result = entry
+        if time.time() < fresh_until:
+            incr("clickhouse_query_cache_hit")
+            return result
+        lock_token = _acquire_lock(redis_client, lock_key)
+        if lock_token is None:
+            # Stale, but another worker is already refreshing it
+            incr("clickhouse_query_cache_hit", tags={"stale": True})
+            return result
     else:
+        lock_token = _acquire_lock(redis_client, lock_key)
+        if lock_token is None:
+            result = _wait_for_result(redis_client, key, lock_key)
+            if result is not None:
+                incr("clickhouse_query_cache_coalesced")
+                return result
+            # The worker running the query failed or timed out, so run it ourselves
+
+    incr("clickhouse_query_cache_miss")
+    try:
         result = sync_execute(query, args, settings=settings, with_column_types=with_column_types)
-        redis_client.set(key, _serialize(result), ex=ttl)
-        return result
+        redis_client.set(key, _serialize(result, fresh_until=time.time() + ttl), ex=ttl + stale_ttl)
+    finally:
+        if lock_token is not None:
+            _release_lock(redis_client, lock_key, lock_token)
+    return result
 
 
-def sync_execute(query, args=None, settings=None, with_column_types=False, flush=True):
-    if TEST and flush:
-        try:
-            from posthog.test.base import flush_persons_and_events
+def _acquire_lock(redis_client, lock_key: bytes) -> Optional[bytes]:
+    """Returns the token identifying our hold on the lock, or None if another worker holds it."""
+    token = secrets.token_hex(16).encode("utf-8")
+    if redis_client.set(lock_key, token, nx=True, ex=CACHE_LOCK_TTL):
+        return token
+    return None
 
-            flush_persons_and_events()
-        except ModuleNotFoundError:  # when we run plugin server tests it tries to run above, ignore
-            pass
 
-    with ch_pool.get_client() as client:
-        start_time = perf_counter()
+def _release_lock(redis_client, lock_key: bytes, token: bytes) -> None:
+    redis_client.eval(RELEASE_LOCK_SCRIPT, 1, lock_key, token)
 
-        prepared_sql, prepared_args, tags = _prepare_query(client=client, query=query, args=args)
 
-        timeout_task = QUERY_TIMEOUT_THREAD.schedule(_notify_of_slow_query_failure, tags)
+def _wait_for_result(redis_client, key: bytes, lock_key: bytes) -> Optional[Any]:
+    deadline = time.monotonic() + CACHE_COALESCE_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(CACHE_COALESCE_POLL_INTERVAL)
+        cached = redis_client.get(key)
+        entry = _deserialize_entry(cached) if cached is not None else None
+        if entry is not None:
+            return entry[1]
+        if not redis_client.exists(lock_key):
+            return None
+    return None
 
-        try:
+
+def sync_execute(query, args=None, settings=None, with_column_types=False, flush=True, columnar=False):
+    if TEST and flush:
+        _flush_test_data()
+
+    with ch_pool.get_client() as client:
+        with _track_execution(client, query, args) as (prepared_sql, prepared_args):
             result = client.execute(
-                prepared_sql, params=prepared_args, settings=settings, with_column_types=with_column_types
+                prepared_sql,
+                params=prepared_args,
+                settings=settings,
+                with_column_types=with_column_types,
+                columnar=columnar,
             )
-        except Exception as err:
-            err = wrap_query_error(err)
-            tags["failed"] = True
-            tags["reason"] = type(err).__name__
-            incr("clickhouse_sync_execution_failure", tags=tags)
+    return result
 
-            raise err
+
+def sync_execute_iter(
+    query, args=None, settings=None, with_column_types=False, block_size=STREAMING_BLOCK_SIZE
+) -> Iterator[List]:
+    """
+    Like `sync_execute`, but streams the result as lists of at most `block_size` rows, so callers only ever hold one
+    block in memory. With `with_column_types`, the first item yielded is the list of column types.
+
+    The pooled connection is held until the generator is exhausted or closed. Execution time and the slow query
+    notification only count time spent fetching blocks, not time the caller spends on them in between.
+    """
+    if TEST:
+        _flush_test_data()
+
+    clock = _ExecutionClock()
+    with ch_pool.get_client() as client:
+        with _track_execution(client, query, args, clock=clock) as (prepared_sql, prepared_args):
+            rows = client.execute_iter(
+                prepared_sql,
+                params=prepared_args,
+                settings={"max_block_size": block_size, **(settings or {})},
+                with_column_types=with_column_types,
+            )
+            exhausted = False
+            try:
+                if with_column_types:
+                    column_types = next(rows)
+                    with clock.paused():
+                        yield column_types
+                while True:
+                    block = list(islice(rows, block_size))
+                    if not block:
+                        exhausted = True
+                        break
+                    with clock.paused():
+                        yield block
+            finally:
+                if not exhausted:
+                    # The rest of the result is still on its way, so the connection can't be handed back to the pool
+                    # as is. Disconnecting cancels the query, and the pool reconnects on next use.
+                    client.disconnect()
+
+
+def sync_execute_columnar(query, args=None, settings=None) -> Dict[str, np.ndarray]:
+    """
+    Returns the result as one NumPy array per column, keyed by column name. Numeric columns get a matching dtype and
+    everything else is an object array, which avoids building a Python tuple per row.
+    """
+    columns, types = sync_execute(query, args, settings=settings, with_column_types=True, columnar=True)
+    return {
+        name: _to_numpy_column(columns[index] if columns else (), type_name)
+        for index, (name, type_name) in enumerate(types)
+    }
+
+
+def sync_insert_columnar(
+    query: str, columns: Sequence[Sequence[Any]], block_size: int = INSERT_BLOCK_SIZE, flush: bool = True
+) -> int:
+    """
+    Inserts rows given as one sequence of values per column, in the order of `query`'s column list, e.g.
+    `INSERT INTO person (id, team_id) VALUES` with `[ids, team_ids]`. Values must already have the column's Python type
+    (UUID, datetime, int, str).
+
+    Columns are sent over the native protocol as typed blocks of `block_size` rows, so no SQL is rendered for the
+    values and ClickHouse doesn't have to parse them. Returns the number of rows inserted.
+    """
+    if TEST and flush:
+        _flush_test_data()
+
+    row_count = len(columns[0]) if columns else 0
+    with ch_pool.get_client() as client:
+        for start in range(0, row_count, block_size):
+            # clickhouse_driver converts values in place, so every block gets its own lists
+            block = [list(column[start : start + block_size]) for column in columns]
+            with _track_execution(client, query, block) as (prepared_sql, prepared_args):
+                client.execute(prepared_sql, prepared_args, columnar=True, types_check=False)
+    return row_count
+
+
+def _to_numpy_column(values, type_name: str) -> np.ndarray:
+    if type_name in _NUMPY_DTYPES:
+        return np.array(values, dtype=_NUMPY_DTYPES[type_name])
+    # Assigned one by one so NumPy doesn't turn equal-length arrays into extra dimensions
+    column = np.empty(len(values), dtype=object)
+    for index, value in enumerate(values):
+        column[index] = value
+    return column
+
+
+def _flush_test_data():
+    try:
+        from posthog.test.base import flush_persons_and_events
+
+        flush_persons_and_events()
+    except ModuleNotFoundError:  # when we run plugin server tests it tries to run above, ignore
+        pass
+
+
+class _ExecutionClock:
+    """
+    Measures how long a query spends executing and raises the slow query notification. Streaming callers pause it
+    while their consumer handles a block, so neither includes time spent outside ClickHouse.
+    """
+
+    def __init__(self) -> None:
+        self.elapsed = 0.0
+        self.tags: Dict[str, Any] = {}
+        self._timed_out = False
+        self._started_at: Optional[float] = None
+        self._timeout_task: Optional[TimerTask] = None
+
+    def start(self) -> None:
+        self._started_at = perf_counter()
+        if not self._timed_out:
+            self._timeout_task = QUERY_TIMEOUT_THREAD.schedule(self._time_out)
+
+    def stop(self) -> None:
+        if self._started_at is None:
+            return
+        if self._timeout_task is not None:
+            QUERY_TIMEOUT_THREAD.cancel(self._timeout_task)
+            self._timeout_task = None
+        self.elapsed += perf_counter() - self._started_at
+        self._started_at = None
+        if self.elapsed * 1000.0 >= SLOW_QUERY_THRESHOLD_MS:
+            # Each stretch of a streamed query can be short of the threshold while their sum isn't
+            self._time_out()
+
+    @contextmanager
+    def paused(self):
+        self.stop()
+        try:
+            yield
         finally:
-            execution_time = perf_counter() - start_time
+            self.start()
 
-            QUERY_TIMEOUT_THREAD.cancel(timeout_task)
-            timing("clickhouse_sync_execution_time", execution_time * 1000.0, tags=tags)
+    def _time_out(self) -> None:
+        if not self._timed_out:
+            self._timed_out = True
+            _notify_of_slow_query_failure(self.tags)
 
-            if app_settings.SHELL_PLUS_PRINT_SQL:
-                print("Execution time: %.6fs" % (execution_time,))
-            if _request_information is not None and _request_information.get("save", False):
-                save_query(prepared_sql, execution_time)
-    return result
+
+@contextmanager
+def _track_execution(client: SyncClient, query: str, args: QueryArgs, clock: Optional[_ExecutionClock] = None):
+    preparation_start_time = perf_counter()
+    prepared_sql, prepared_args, tags = _prepare_query(client=client, query=query, args=args)
+    timing("clickhouse_sync_preparation_time", (perf_counter() - preparation_start_time) * 1000.0, tags=tags)
+
+    clock = clock or _ExecutionClock()
+    clock.tags = tags
+    clock.start()
+
+    try:
+        yield prepared_sql, prepared_args
+    except Exception as err:
+        err = wrap_query_error(err)
+        tags["failed"] = True
+        tags["reason"] = type(err).__name__
+        incr("clickhouse_sync_execution_failure", tags=tags)
+
+        raise err
+    finally:
+        clock.stop()
+        execution_time = clock.elapsed
+
+        timing("clickhouse_sync_execution_time", execution_time * 1000.0, tags=tags)
+
+        if app_settings.SHELL_PLUS_PRINT_SQL:
+            print("Execution time: %.6fs" % (execution_time,))
+        request_information = _request_information.get()
+        if request_information is not None and request_information.get("save", False):
+            save_query(prepared_sql, execution_time)
 
 
 def query_with_columns(query, args=None, columns_to_remove=[]) -> List[Dict]:
-    metrics, types = sync_execute(query, args, with_column_types=True)
-    type_names = [key for key, _type in types]
+    return list(iter_query_with_columns(query, args, columns_to_remove))
+
 
-    rows = []
-    for row in metrics:
-        result = {}
-        for type_name, value in zip(type_names, row):
-            if isinstance(value, list):
-                value = ", ".join(map(str, value))
-            if type_name not in columns_to_remove:
-                result[type_name] = value
+def iter_query_with_columns(query, args=None, columns_to_remove=[]) -> Iterator[Dict]:
+    """Like `query_with_columns`, but builds each row's dict only as it is consumed."""
+    blocks = sync_execute_iter(query, args, with_column_types=True)
+    type_names = [key for key, _type in next(blocks)]
 
-        rows.append(result)
+    for block in blocks:
+        for row in block:
+            result = {}
+            for type_name, value in zip(type_names, row):
+                if isinstance(value, list):
+                    value = ", ".join(map(str, value))
+                if type_name not in columns_to_remove:
+                    result[type_name] = value
 
-    return rows
+            yield result
 
 
 REDIS_STATUS_TTL = 600  # 10 minutes
+# Progress is only published once it has moved by at least this fraction of the total rows to read
+PROGRESS_UPDATE_MIN_FRACTION = 0.01
 
 
 @dataclass_json
@@ -209,6 +475,13 @@ class QueryStatus:
     start_time: Optional[float] = None
     end_time: Optional[float] = None
     task_id: Optional[str] = None
+    estimated_time_remaining: Optional[float] = None
+
+
+@dataclass_json
+@dataclass
+class QueryResults:
+    results: Any = None
 
 
 def generate_redis_results_key(query_id):
@@ -217,103 +490,75 @@ def generate_redis_results_key(query_id):
     return key
 
 
+def generate_redis_query_results_key(query_id):
+    # Kept apart from the status so polling for progress doesn't transfer large results over and over
+    return f"{generate_redis_results_key(query_id)}:results"
+
+
+def _estimate_time_remaining(num_rows: float, total_rows: float, elapsed: float) -> Optional[float]:
+    if num_rows <= 0 or elapsed <= 0 or total_rows < num_rows:
+        return None
+    return (total_rows - num_rows) / (num_rows / elapsed)
+
+
 def execute_with_progress(
     team_id, query_id, query, args=None, settings=None, with_column_types=False, update_freq=0.2, task_id=None
 ):
     """
-    Kick off query with progress reporting
-    Iterate over the progress status
-    Save status to redis
+    Kick off query with progress reporting, on a connection borrowed from the pool
+    Save status to redis when progress changes meaningfully, at most once every `update_freq` seconds
     Once complete save results to redis
     """
 
     key = generate_redis_results_key(query_id)
-    ch_client = SyncClient(
-        host=CLICKHOUSE_HOST,
-        database=CLICKHOUSE_DATABASE,
-        secure=CLICKHOUSE_SECURE,
-        user=CLICKHOUSE_USER,
-        password=CLICKHOUSE_PASSWORD,
-        ca_certs=CLICKHOUSE_CA,
-        verify=CLICKHOUSE_VERIFY,
-        settings={"max_result_rows": "10000"},
-    )
     redis_client = redis.get_client()
 
-    start_time = perf_counter()
-
-    prepared_sql, prepared_args, tags = _prepare_query(client=ch_client, query=query, args=args)
-
-    timeout_task = QUERY_TIMEOUT_THREAD.schedule(_notify_of_slow_query_failure, tags)
-
-    query_status = QueryStatus(team_id, task_id=task_id)
-
     start_time = time.time()
+    query_status = QueryStatus(team_id, start_time=start_time, task_id=task_id)
 
-    try:
-        progress = ch_client.execute_with_progress(
-            prepared_sql, params=prepared_args, settings=settings, with_column_types=with_column_types,
-        )
-        for num_rows, total_rows in progress:
-            query_status = QueryStatus(
-                team_id=team_id,
-                num_rows=num_rows,
-                total_rows=total_rows,
-                complete=False,
-                error=False,
-                error_message="",
-                results=None,
-                start_time=start_time,
-                task_id=task_id,
-            )
-            redis_client.set(key, query_status.to_json(), ex=REDIS_STATUS_TTL)  # type: ignore
-            time.sleep(update_freq)
-        else:
-            rv = progress.get_result()
-            query_status = QueryStatus(
-                team_id=team_id,
-                num_rows=query_status.num_rows,
-                total_rows=query_status.total_rows,
-                complete=True,
-                error=False,
-                start_time=query_status.start_time,
-                end_time=time.time(),
-                error_message="",
-                results=rv,
-                task_id=task_id,
+    with ch_pool.get_client() as ch_client, _track_execution(ch_client, query, args) as (prepared_sql, prepared_args):
+        try:
+            progress = ch_client.execute_with_progress(
+                prepared_sql,
+                params=prepared_args,
+                settings={"max_result_rows": "10000", **(settings or {})},
+                with_column_types=with_column_types,
             )
-            redis_client.set(key, query_status.to_json(), ex=REDIS_STATUS_TTL)  # type: ignore
-
-    except Exception as err:
-        err = wrap_query_error(err)
-        tags["failed"] = True
-        tags["reason"] = type(err).__name__
-        incr("clickhouse_sync_execution_failure", tags=tags)
-        query_status = QueryStatus(
-            team_id=team_id,
-            num_rows=query_status.num_rows,
-            total_rows=query_status.total_rows,
-            complete=False,
-            error=True,
-            start_time=query_status.start_time,
-            end_time=time.time(),
-            error_message=str(err),
-            results=None,
-            task_id=task_id,
-        )
-        redis_client.set(key, query_status.to_json(), ex=REDIS_STATUS_TTL)  # type: ignore
-
-        raise err
-    finally:
-        execution_time = perf_counter() - start_time
+            published_at = 0.0
+            published_rows = 0.0
+            for num_rows, total_rows in progress:
+                now = time.time()
+                if (
+                    now - published_at < update_freq
+                    or num_rows - published_rows < total_rows * PROGRESS_UPDATE_MIN_FRACTION
+                ):
+                    continue
+
+                query_status.num_rows = num_rows
+                query_status.total_rows = total_rows
+                query_status.estimated_time_remaining = _estimate_time_remaining(num_rows, total_rows, now - start_time)
+                redis_client.set(key, query_status.to_json(), ex=REDIS_STATUS_TTL)  # type: ignore
+                published_at, published_rows = now, num_rows
+            else:
+                rv = progress.get_result()
+                redis_client.set(
+                    generate_redis_query_results_key(query_id),
+                    QueryResults(results=rv).to_json(),  # type: ignore
+                    ex=REDIS_STATUS_TTL,
+                )
+                query_status.complete = True
+                query_status.end_time = time.time()
+                query_status.estimated_time_remaining = 0
+                redis_client.set(key, query_status.to_json(), ex=REDIS_STATUS_TTL)  # type: ignore
 
-        QUERY_TIMEOUT_THREAD.cancel(timeout_task)
-        timing("clickhouse_sync_execution_time", execution_time * 1000.0, tags=tags)
+        except Exception as err:
+            query_status.error = True
+            query_status.end_time = time.time()
+            query_status.error_message = str(wrap_query_error(err))
+            query_status.estimated_time_remaining = None
+            redis_client.set(key, query_status.to_json(), ex=REDIS_STATUS_TTL)  # type: ignore
 
-        if app_settings.SHELL_PLUS_PRINT_SQL:
-            print("Execution time: %.6fs" % (execution_time,))
-        if _request_information is not None and _request_information.get("save", False):
-            save_query(prepared_sql, execution_time)
+            raise err
 
 
 def enqueue_execute_with_progress(
@@ -336,7 +581,7 @@ def enqueue_execute_with_progress(
             revoke(query_task.task_id, terminate=True)
             # Then we need to make redis forget about this job entirely
             # and continue as normal. As if we never saw this query before
-            redis_client.delete(key)
+            redis_client.delete(key, generate_redis_query_results_key(query_id))
 
     if redis_client.get(key):
         # If we've seen this query before return the query_id and don't resubmit it.
@@ -374,6 +619,13 @@ def get_status_or_results(team_id, query_id):
         query_status = QueryStatus.from_json(str_results)  # type: ignore
         if query_status.team_id != team_id:
             raise Exception("Requesting team is not executing team")
+        if query_status.complete:
+            byte_query_results = redis_client.get(generate_redis_query_results_key(query_id))
+            if byte_query_results:
+                query_status.results = QueryResults.from_json(byte_query_results.decode("utf-8")).results  # type: ignore
+            elif query_status.results is None:
+                # Statuses written before results were split out carry them inline
+                raise Exception("Query results have expired")
     except Exception as e:
         query_status = QueryStatus(team_id, error=True, error_message=str(e))
     return query_status
@@ -420,24 +672,27 @@ def _prepare_query(client: SyncClient, query: str, args: QueryArgs):
     below predicate.
     """
     prepared_args: Any = QueryArgs
+    # Comments are stripped from the template rather than the rendered query, as tokenizing a query after large arrays
+    # have been substituted into it is slow. Most templates already have team- and filter-specific values formatted
+    # into them, so they are not memoized: the cache would rarely hit and would pin large query strings in memory.
+    stripped_sql = _strip_comments(query)
     if isinstance(args, (list, tuple, types.GeneratorType)):
         # If we get one of these it means we have an insert, let the clickhouse
         # client handle substitution here.
-        rendered_sql = query
+        formatted_sql = stripped_sql
         prepared_args = args
     elif not args:
         # If `args` is not truthy then make prepared_args `None`, which the
         # clickhouse client uses to signal no substitution is desired. Expected
         # args balue are `None` or `{}` for instance
-        rendered_sql = query
+        formatted_sql = stripped_sql
         prepared_args = None
     else:
         # Else perform the substitution so we can perform operations on the raw
         # non-templated SQL
-        rendered_sql = client.substitute_params(query, args)
+        formatted_sql = client.substitute_params(stripped_sql, args)
         prepared_args = None
 
-    formatted_sql = sqlparse.format(rendered_sql, strip_comments=True)
     annotated_sql, tags = _annotate_tagged_query(formatted_sql, args)
 
     if app_settings.SHELL_PLUS_PRINT_SQL:
@@ -447,15 +702,32 @@ def _prepare_query(client: SyncClient, query: str, args: QueryArgs):
     return annotated_sql, prepared_args, tags
 
 
-def _deserialize(result_bytes: bytes) -> List[Tuple]:
-    results = []
-    for x in json.loads(result_bytes):
-        results.append(tuple(x))
-    return results
+def _strip_comments(query: str) -> str:
+    return sqlparse.format(query, strip_comments=True)
 
 
-def _serialize(result: Any) -> bytes:
-    return json.dumps(result).encode("utf-8")
+def _deserialize_entry(entry_bytes: bytes) -> Optional[Tuple[float, Any]]:
+    """
+    Returns the time until which a cached result is fresh, and the result itself. Entries that can't be decoded, e.g.
+    ones pickled against classes that have since moved, are reported and treated as a cache miss.
+    """
+    try:
+        fresh_until, result = pickle.loads(entry_bytes)
+        return float(fresh_until), result
+    except Exception:
+        incr("clickhouse_query_cache_undecodable")
+        return None
+
+
+def _deserialize(entry_bytes: bytes) -> Any:
+    entry = _deserialize_entry(entry_bytes)
+    return entry[1] if entry is not None else None
+
+
+def _serialize(result: Any, fresh_until: float) -> bytes:
+    # Pickle keeps datetimes, UUIDs and tuples intact and is much more compact than JSON for wide results. The cache
+    # is only ever written by our own workers, so it is as trusted as the rest of what we store in Redis.
+    return pickle.dumps((fresh_until, result), protocol=pickle.HIGHEST_PROTOCOL)
 
 
 def _query_hash(query: str, team_id: int, args: Any) -> str:
@@ -474,7 +746,7 @@ def _key_hash(query: str, args: Any) -> bytes:
         key = hashlib.md5(query.encode("utf-8") + json.dumps(args).encode("utf-8")).digest()
     else:
         key = hashlib.md5(query.encode("utf-8")).digest()
-    return key
+    return CACHE_KEY_VERSION + key
 
 
 def _annotate_tagged_query(query, args):
@@ -482,12 +754,13 @@ def _annotate_tagged_query(query, args):
     Adds in a /* */ so we can look in clickhouses `system.query_log`
     to easily marry up to the generating code.
     """
-    tags = {"kind": (_request_information or {}).get("kind"), "id": (_request_information or {}).get("id")}
+    request_information = _request_information.get()
+    tags = {"kind": (request_information or {}).get("kind"), "id": (request_information or {}).get("id")}
     if isinstance(args, dict) and "team_id" in args:
         tags["team_id"] = args["team_id"]
     # Annotate the query with information on the request/task
-    if _request_information is not None:
-        query = f"/* {_request_information['kind']}:{_request_information['id'].replace('/', '_')} */ {query}"
+    if request_information is not None:
+        query = f"/* {request_information['kind']}:{request_information['id'].replace('/', '_')} */ {query}"
 
     return query, tags
 
@@ -518,11 +791,12 @@ def save_query(sql: str, execution_time: float) -> None:
     """
     Save query for debugging purposes
     """
-    if _request_information is None:
+    request_information = _request_information.get()
+    if request_information is None:
         return
 
     try:
-        key = "save_query_{}".format(_request_information["user_id"])
+        key = "save_query_{}".format(request_information["user_id"])
         queries = json.loads(get_safe_cache(key) or "[]")
 
         queries.insert(
@@ -38,6 +38,7 @@ def create_clickhouse_tables(num_tables: int):
     from ee.clickhouse.sql.groups import GROUPS_TABLE_SQL
     from ee.clickhouse.sql.person import (
         PERSON_DISTINCT_ID2_TABLE_SQL,
+        PERSON_DISTINCT_ID_SNAPSHOT_TABLE_SQL,
         PERSON_STATIC_COHORT_TABLE_SQL,
         PERSONS_DISTINCT_ID_TABLE_SQL,
         PERSONS_TABLE_SQL,
@@ -55,6 +56,7 @@ def create_clickhouse_tables(num_tables: int):
         PERSONS_TABLE_SQL(),
         PERSONS_DISTINCT_ID_TABLE_SQL(),
         PERSON_DISTINCT_ID2_TABLE_SQL(),
+        PERSON_DISTINCT_ID_SNAPSHOT_TABLE_SQL(),
         PERSON_STATIC_COHORT_TABLE_SQL(),
         SESSION_RECORDING_EVENTS_TABLE_SQL(),
         PLUGIN_LOG_ENTRIES_TABLE_SQL(),
@@ -96,6 +98,7 @@ def reset_clickhouse_tables():
     from ee.clickhouse.sql.groups import TRUNCATE_GROUPS_TABLE_SQL
     from ee.clickhouse.sql.person import (
         TRUNCATE_PERSON_DISTINCT_ID2_TABLE_SQL,
+        TRUNCATE_PERSON_DISTINCT_ID_SNAPSHOT_TABLE_SQL,
         TRUNCATE_PERSON_DISTINCT_ID_TABLE_SQL,
         TRUNCATE_PERSON_STATIC_COHORT_TABLE_SQL,
         TRUNCATE_PERSON_TABLE_SQL,
@@ -109,6 +112,7 @@ def reset_clickhouse_tables():
         TRUNCATE_PERSON_TABLE_SQL,
         TRUNCATE_PERSON_DISTINCT_ID_TABLE_SQL,
         TRUNCATE_PERSON_DISTINCT_ID2_TABLE_SQL,
+        TRUNCATE_PERSON_DISTINCT_ID_SNAPSHOT_TABLE_SQL,
         TRUNCATE_PERSON_STATIC_COHORT_TABLE_SQL,
         TRUNCATE_SESSION_RECORDING_EVENTS_TABLE_SQL(),
         TRUNCATE_PLUGIN_LOG_ENTRIES_TABLE_SQL,
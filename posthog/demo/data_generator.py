@@ -37,17 +37,10 @@ class DataGenerator:
             for person, distinct_id in zip(self.people, self.distinct_ids)
         ]
         PersonDistinctId.objects.bulk_create(pids)
-        from ee.clickhouse.models.person import create_person, create_person_distinct_id
-
-        for person in self.people:
-            create_person(
-                uuid=str(person.uuid),
-                team_id=person.team.pk,
-                properties=person.properties,
-                is_identified=person.is_identified,
-            )
-        for pid in pids:
-            create_person_distinct_id(pid.team.pk, pid.distinct_id, str(pid.person.uuid))  # use dummy number for id
+        from ee.clickhouse.models.person import bulk_insert_person_distinct_ids, bulk_insert_persons
+
+        bulk_insert_persons(self.people)
+        bulk_insert_person_distinct_ids([(pid.distinct_id, pid.person.uuid, self.team.pk) for pid in pids])
 
     def make_person(self, index):
         return Person(team=self.team, properties={"is_demo": True})
@@ -65,11 +58,10 @@ class DataGenerator:
         pass
 
     def bulk_import_events(self):
-        from ee.clickhouse.models.event import create_event
+        from ee.clickhouse.models.event import bulk_insert_events
         from ee.clickhouse.models.session_recording_event import create_session_recording_event
 
-        for event_data in self.events:
-            create_event(**event_data, team=self.team, event_uuid=uuid4())
+        bulk_insert_events({**event_data, "team": self.team} for event_data in self.events)
         for data in self.snapshots:
             create_session_recording_event(**data, team_id=self.team.pk, uuid=uuid4())
 
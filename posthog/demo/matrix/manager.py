@@ -8,11 +8,12 @@ from .matrix import Matrix
 from .models import SimPerson
 
 
-def save_sim_person(team: Team, subject: SimPerson) -> Optional[Tuple[Person, List[PersonDistinctId]]]:
+def save_sim_person(team: Team, subject: SimPerson) -> Optional[Tuple[Person, List[PersonDistinctId], List[Dict]]]:
+    """
+    Returns the person, their distinct IDs and their events, ready for bulk saving. Nothing is saved here.
+    """
     if not subject.events:
         return None  # Don't save a person who never participated
-    from ee.clickhouse.models.event import create_event
-    from ee.clickhouse.models.person import create_person, create_person_distinct_id
 
     person_uuid_str = str(UUIDT(unix_time_ms=int(subject.events[0].timestamp.timestamp() * 1000)))
     person = Person(team_id=team.pk, properties=subject.properties, uuid=person_uuid_str)
@@ -20,22 +21,18 @@ def save_sim_person(team: Team, subject: SimPerson) -> Optional[Tuple[Person, Li
         PersonDistinctId(team_id=team.pk, person=person, distinct_id=distinct_id)
         for distinct_id in subject.distinct_ids
     ]
-    create_person(
-        uuid=person_uuid_str, team_id=team.pk, properties=subject.properties,
-    )
-    for distinct_id in subject.distinct_ids:
-        create_person_distinct_id(team_id=team.pk, distinct_id=str(distinct_id), person_id=person_uuid_str)
-    for event in subject.events:
-        event_uuid = UUIDT(unix_time_ms=int(event.timestamp.timestamp() * 1000))
-        create_event(
-            event_uuid=event_uuid,
-            event=event.event,
-            team=team,
-            distinct_id=event.properties["$distinct_id"],
-            timestamp=event.timestamp,
-            properties=event.properties,
-        )
-    return (person, person_distinct_ids)
+    events = [
+        {
+            "event_uuid": UUIDT(unix_time_ms=int(event.timestamp.timestamp() * 1000)),
+            "event": event.event,
+            "team_id": team.pk,
+            "distinct_id": event.properties["$distinct_id"],
+            "timestamp": event.timestamp,
+            "properties": event.properties,
+        }
+        for event in subject.events
+    ]
+    return (person, person_distinct_ids, events)
 
 
 def save_sim_group(team: Team, type_index: Literal[0, 1, 2, 3, 4], key: str, properties: Dict[str, Any]) -> Group:
@@ -55,8 +52,12 @@ class MatrixManager:
     @classmethod
     def run_on_team(cls, matrix: Matrix, team: Team, user: User, simulate_journeys: bool = True) -> Team:
         if simulate_journeys:
+            from ee.clickhouse.models.event import bulk_insert_events
+            from ee.clickhouse.models.person import bulk_insert_person_distinct_ids, bulk_insert_persons
+
             persons_to_bulk_save: List[Person] = []
             person_distinct_ids_to_bulk_save: List[PersonDistinctId] = []
+            events_to_bulk_save: List[Dict] = []
             simulation_time = time.time()  # FIXME
             matrix.simulate()
             for group_type_index, groups in enumerate(matrix.groups.values()):
@@ -71,10 +72,16 @@ class MatrixManager:
                     persons_to_bulk_save.append(sim_person_save_result[0])
                     for distinct_id in sim_person_save_result[1]:
                         person_distinct_ids_to_bulk_save.append(distinct_id)
+                    events_to_bulk_save.extend(sim_person_save_result[2])
             print(f"[DEMO] Saved (individual part) {len(sim_persons)} people in {time.time() - individual_time:.2f} s")
             bulk_time = time.time()  # FIXME
             Person.objects.bulk_create(persons_to_bulk_save)
             PersonDistinctId.objects.bulk_create(person_distinct_ids_to_bulk_save)
+            bulk_insert_persons(persons_to_bulk_save)
+            bulk_insert_person_distinct_ids(
+                [(str(pid.distinct_id), pid.person.uuid, team.pk) for pid in person_distinct_ids_to_bulk_save]
+            )
+            bulk_insert_events(events_to_bulk_save)
             print(f"[DEMO] Saved (bulk part) {len(persons_to_bulk_save)} people in {time.time() - bulk_time:.2f} s")
         matrix.set_project_up(team, user)
         set_time = time.time()  # FIXME
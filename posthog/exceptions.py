@@ -1,4 +1,4 @@
-from typing import Optional, TypedDict
+from typing import Any, Dict, Optional, TypedDict
 
 from django.conf import settings
 from django.http.request import HttpRequest
@@ -54,6 +54,7 @@ def generate_exception_response(
     type: str = "validation_error",
     attr: Optional[str] = None,
     status_code: int = status.HTTP_400_BAD_REQUEST,
+    extra: Optional[Dict[str, Any]] = None,
 ) -> JsonResponse:
     """
     Generates a friendly JSON error response in line with drf-exceptions-hog for endpoints not under DRF.
@@ -62,4 +63,6 @@ def generate_exception_response(
     from posthog.internal_metrics import incr
 
     incr(f"posthog_cloud_raw_endpoint_exception", tags={"endpoint": endpoint, "code": code, "type": type, "attr": attr})
-    return JsonResponse({"type": type, "code": code, "detail": detail, "attr": attr}, status=status_code,)
+    return JsonResponse(
+        {"type": type, "code": code, "detail": detail, "attr": attr, **(extra or {})}, status=status_code,
+    )
@@ -1,17 +1,37 @@
 import base64
+import codecs
 import dataclasses
 import gzip
 import json
+import re
+import zlib
 from collections import defaultdict
 from datetime import datetime, timedelta
-from typing import DefaultDict, Dict, Generator, List, Optional
+from typing import (
+    Any,
+    DefaultDict,
+    Dict,
+    Generator,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+)
 
 from sentry_sdk.api import capture_exception, capture_message
 
 from posthog.models import utils
+from posthog.settings import SESSION_RECORDING_CHUNK_COMPRESSION
 
 FULL_SNAPSHOT = 2
 
+# Chunk `compression` values. The original format gzips the JSON encoded as UTF-16, which doubles the size of the
+# (mostly ASCII) input before compressing it. UTF-8 is smaller to compress, store and decompress. Chunks are stored
+# inside JSON, so both need base64.
+COMPRESSION_GZIP_BASE64 = "gzip-base64"
+COMPRESSION_UTF8_GZIP_BASE64 = "utf8-gzip-base64"
+TEXT_ENCODING_BY_COMPRESSION = {COMPRESSION_GZIP_BASE64: "utf-16", COMPRESSION_UTF8_GZIP_BASE64: "utf-8"}
+
 Event = Dict
 SnapshotData = Dict
 WindowId = Optional[str]
@@ -35,6 +55,16 @@ class RecordingSegment:
 class SnapshotDataTaggedWithWindowId:
     window_id: WindowId
     snapshot_data: SnapshotData
+    timestamp: Optional[datetime] = None
+
+
+@dataclasses.dataclass
+class ChunkTimeIndexEntry:
+    window_id: WindowId
+    start_time: Optional[datetime]
+    has_full_snapshot: bool
+    # When the window's last chunk starts
+    window_end_time: Optional[datetime] = None
 
 
 @dataclasses.dataclass
@@ -60,13 +90,15 @@ def preprocess_session_recording_events(events: List[Event]) -> List[Event]:
     return result
 
 
-def compress_and_chunk_snapshots(events: List[Event], chunk_size=512 * 1024) -> Generator[Event, None, None]:
+def compress_and_chunk_snapshots(
+    events: List[Event], chunk_size=512 * 1024, compression: str = SESSION_RECORDING_CHUNK_COMPRESSION
+) -> Generator[Event, None, None]:
     data_list = [event["properties"]["$snapshot_data"] for event in events]
     session_id = events[0]["properties"]["$session_id"]
     has_full_snapshot = any(snapshot_data["type"] == FULL_SNAPSHOT for snapshot_data in data_list)
     window_id = events[0]["properties"].get("$window_id")
 
-    compressed_data = compress_to_string(json.dumps(data_list))
+    compressed_data = compress_to_string(json.dumps(data_list), compression)
 
     id = str(utils.UUIDT())
     chunks = chunk_string(compressed_data, chunk_size)
@@ -82,7 +114,7 @@ def compress_and_chunk_snapshots(events: List[Event], chunk_size=512 * 1024) ->
                     "chunk_index": index,
                     "chunk_count": len(chunks),
                     "data": chunk,
-                    "compression": "gzip-base64",
+                    "compression": compression,
                     "has_full_snapshot": has_full_snapshot,
                 },
             },
@@ -106,14 +138,202 @@ def is_unchunked_snapshot(event: Dict) -> bool:
         raise ValueError('$snapshot events must contain property "$snapshot_data"!')
 
 
-def compress_to_string(json_string: str) -> str:
-    compressed_data = gzip.compress(json_string.encode("utf-16", "surrogatepass"))
+def _text_encoding(compression: str) -> str:
+    try:
+        return TEXT_ENCODING_BY_COMPRESSION[compression]
+    except KeyError:
+        raise ValueError(
+            f"Unknown session recording chunk compression {compression!r}, expected one of "
+            f"{', '.join(TEXT_ENCODING_BY_COMPRESSION)}"
+        )
+
+
+def compress_to_string(json_string: str, compression: str = COMPRESSION_GZIP_BASE64) -> str:
+    text_encoding = _text_encoding(compression)
+    if compression == COMPRESSION_GZIP_BASE64:
+        compressed_data = gzip.compress(json_string.encode(text_encoding, "surrogatepass"))
+    else:
+        # The default level 9 costs a lot more CPU than 6 for a barely smaller result
+        compressed_data = gzip.compress(json_string.encode(text_encoding, "surrogatepass"), compresslevel=6)
     return base64.b64encode(compressed_data).decode("utf-8")
 
 
-def decompress(base64data: str) -> str:
+def decompress(base64data: str, compression: str = COMPRESSION_GZIP_BASE64) -> str:
     compressed_bytes = base64.b64decode(base64data)
-    return gzip.decompress(compressed_bytes).decode("utf-16", "surrogatepass")
+    return gzip.decompress(compressed_bytes).decode(_text_encoding(compression), "surrogatepass")
+
+
+_JSON_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+class _JSONArrayStreamParser:
+    """
+    Incrementally parses a JSON array fed in pieces, yielding each element as soon as it is complete, so the
+    whole array never has to be held as one string or one list.
+    """
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        # Unparsed text is kept as a list of pieces and only joined once there's enough of it to try parsing, so a
+        # large element spanning many pieces isn't copied again for every piece
+        self._pending: List[str] = []
+        self._pending_length = 0
+        self._started = False
+        self._finished = False
+        # After failing to parse an incomplete element, wait for this much unparsed text before trying again. This
+        # keeps large elements (e.g. full snapshots) spanning many pieces from being re-parsed for every piece.
+        self._min_available = 0
+
+    def feed(self, text: str, final: bool = False) -> Iterator[Any]:
+        self._pending.append(text)
+        self._pending_length += len(text)
+        if self._pending_length < self._min_available and not final:
+            return
+
+        buffer = "".join(self._pending)
+        position = 0
+        try:
+            while not self._finished:
+                position = _JSON_WHITESPACE.match(buffer, position).end()  # type: ignore
+                if position == len(buffer):
+                    break
+                if not self._started:
+                    if buffer[position] != "[":
+                        raise ValueError("Expected a JSON array")
+                    self._started = True
+                    position += 1
+                    continue
+                if buffer[position] == "]":
+                    self._finished = True
+                    break
+                if buffer[position] == ",":
+                    position += 1
+                    continue
+                if len(buffer) - position < self._min_available and not final:
+                    break
+
+                try:
+                    element, end = self._decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    if final:
+                        raise
+                    self._min_available = 2 * (len(buffer) - position)
+                    break
+                # A number at the end of the buffer may continue in the next piece
+                if _JSON_WHITESPACE.match(buffer, end).end() == len(buffer) and not final:  # type: ignore
+                    self._min_available = len(buffer) - position + 1
+                    break
+
+                self._min_available = 0
+                position = end
+                yield element
+        finally:
+            rest = buffer[position:]
+            self._pending = [rest]
+            self._pending_length = len(rest)
+
+        if final and not self._finished:
+            raise ValueError("Unterminated JSON array")
+
+
+def iter_decompressed_snapshot_data(
+    b64_compressed_chunks: Iterable[str], compression: str = COMPRESSION_GZIP_BASE64
+) -> Iterator[SnapshotData]:
+    """
+    Streaming version of `json.loads(decompress("".join(b64_compressed_chunks), compression))`: base64 decoding,
+    gunzipping, text decoding and JSON parsing all happen chunk by chunk, yielding rr-web events one at a time.
+    """
+    text_decoder = codecs.getincrementaldecoder(_text_encoding(compression))("surrogatepass")
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    parser = _JSONArrayStreamParser()
+
+    pending = ""
+    for chunk in b64_compressed_chunks:
+        pending += chunk
+        # Base64 can only be decoded in groups of 4 characters
+        decodable_length = len(pending) - len(pending) % 4
+        compressed_bytes = base64.b64decode(pending[:decodable_length])
+        pending = pending[decodable_length:]
+        yield from parser.feed(text_decoder.decode(decompressor.decompress(compressed_bytes)))
+
+    remaining_bytes = decompressor.decompress(base64.b64decode(pending)) + decompressor.flush()
+    if not decompressor.eof:
+        raise EOFError("Compressed snapshot data ended before the end-of-stream marker was reached")
+    yield from parser.feed(text_decoder.decode(remaining_bytes, final=True), final=True)
+
+
+def _group_chunks(
+    all_recording_events: List[SnapshotDataTaggedWithWindowId],
+) -> List[List[SnapshotDataTaggedWithWindowId]]:
+    "Groups chunked snapshot events by chunk_id, in order of first appearance, which is the order of pages."
+    chunks_collector: DefaultDict[str, List[SnapshotDataTaggedWithWindowId]] = defaultdict(list)
+    for event in all_recording_events:
+        chunks_collector[event.snapshot_data["chunk_id"]].append(event)
+    return list(chunks_collector.values())
+
+
+def build_chunk_time_index(all_recording_events: List[SnapshotDataTaggedWithWindowId]) -> List[ChunkTimeIndexEntry]:
+    """
+    Builds an index with an entry per page item of `decompress_chunked_snapshot_data` (chunk groups, or events for
+    unchunked recordings), recording when it starts, whether it contains a full snapshot and when its window's last
+    chunk starts. No decompression needed.
+    """
+    if len(all_recording_events) == 0:
+        return []
+
+    if "chunk_id" not in all_recording_events[0].snapshot_data:
+        time_index = [
+            ChunkTimeIndexEntry(
+                window_id=event.window_id,
+                start_time=event.timestamp,
+                has_full_snapshot=event.snapshot_data.get("type") == FULL_SNAPSHOT,
+            )
+            for event in all_recording_events
+        ]
+    else:
+        time_index = [
+            ChunkTimeIndexEntry(
+                window_id=chunks[0].window_id,
+                start_time=min((chunk.timestamp for chunk in chunks if chunk.timestamp is not None), default=None),
+                has_full_snapshot=bool(chunks[0].snapshot_data.get("has_full_snapshot")),
+            )
+            for chunks in _group_chunks(all_recording_events)
+        ]
+
+    window_end_times: Dict[WindowId, datetime] = {}
+    for entry in time_index:
+        if entry.start_time is not None:
+            window_end_times[entry.window_id] = max(
+                entry.start_time, window_end_times.get(entry.window_id, entry.start_time)
+            )
+    for entry in time_index:
+        entry.window_end_time = window_end_times.get(entry.window_id)
+    return time_index
+
+
+def find_chunk_offset_for_time(time_index: List[ChunkTimeIndexEntry], timestamp: datetime) -> int:
+    """
+    Returns the page offset to start loading snapshots from to play the recording from `timestamp`. Playback has to
+    start from a full snapshot, so for every window that has started by then this is its last chunk with a full
+    snapshot (or its first chunk if it has none), and the earliest of those across windows. Windows whose last chunk
+    starts before `timestamp` have nothing left to play and are left out. Past the end of every window, the windows
+    that ended last are played.
+    """
+    offset_by_window_id: Dict[WindowId, int] = {}
+    end_time_by_window_id: Dict[WindowId, datetime] = {}
+    for offset, entry in enumerate(time_index):
+        if entry.start_time is None or entry.start_time > timestamp:
+            continue
+        if entry.has_full_snapshot or entry.window_id not in offset_by_window_id:
+            offset_by_window_id[entry.window_id] = offset
+        end_time_by_window_id[entry.window_id] = entry.window_end_time or entry.start_time
+
+    if not offset_by_window_id:
+        return 0
+    played_until = min(timestamp, max(end_time_by_window_id.values()))
+    return min(
+        offset for window_id, offset in offset_by_window_id.items() if end_time_by_window_id[window_id] >= played_until
+    )
 
 
 def decompress_chunked_snapshot_data(
@@ -131,9 +351,8 @@ def decompress_chunked_snapshot_data(
     If limit + offset is provided, then it will paginate the decompression by chunks (not by events, because
     you can't decompress an incomplete chunk).
 
-    Depending on the size of the recording, this function can return a lot of data. To decrease the
-    memory used, you should either use the pagination parameters or pass in 'return_only_activity_data' which
-    drastically reduces the size of the data returned if you only want the activity data (used for metadata calculation)
+    Chunks are decompressed as a stream, one event at a time. With 'return_only_activity_data', only the activity
+    data of each event is kept (used for metadata calculation), so the full snapshots are never held in memory.
     """
 
     if len(all_recording_events) == 0:
@@ -150,13 +369,8 @@ def decompress_chunked_snapshot_data(
             has_next=paginated_list.has_next, snapshot_data_by_window_id=snapshot_data_by_window_id
         )
 
-    # Split decompressed recording events into their chunks
-    chunks_collector: DefaultDict[str, List[SnapshotDataTaggedWithWindowId]] = defaultdict(list)
-    for event in all_recording_events:
-        chunks_collector[event.snapshot_data["chunk_id"]].append(event)
-
     # Paginate the list of chunks
-    paginated_chunk_list = paginate_list(list(chunks_collector.values()), limit, offset)
+    paginated_chunk_list = paginate_list(_group_chunks(all_recording_events), limit, offset)
 
     has_next = paginated_chunk_list.has_next
     chunk_list: List[List[SnapshotDataTaggedWithWindowId]] = paginated_chunk_list.paginated_list
@@ -175,18 +389,27 @@ def decompress_chunked_snapshot_data(
             )
             continue
 
-        b64_compressed_data = "".join(
-            chunk.snapshot_data["data"] for chunk in sorted(chunks, key=lambda c: c.snapshot_data["chunk_index"])
+        compression = chunks[0].snapshot_data.get("compression", COMPRESSION_GZIP_BASE64)
+        if compression not in TEXT_ENCODING_BY_COMPRESSION:
+            capture_message(
+                "Unknown session recording chunk compression! Team: {}, Session: {}, Chunk-id: {}. Compression: {}".format(
+                    team_id, session_recording_id, chunks[0].snapshot_data["chunk_id"], compression
+                )
+            )
+            continue
+
+        decompressed_data = iter_decompressed_snapshot_data(
+            (chunk.snapshot_data["data"] for chunk in sorted(chunks, key=lambda c: c.snapshot_data["chunk_index"])),
+            compression,
         )
-        decompressed_data = json.loads(decompress(b64_compressed_data))
 
         # Decompressed data can be large, and in metadata calculations, we only care if the event is "active"
         # This pares down the data returned, so we're not passing around a massive object
         if return_only_activity_data:
-            events_with_only_activity_data = [
+            events_with_only_activity_data = (
                 {"timestamp": recording_event.get("timestamp"), "is_active": is_active_event(recording_event)}
                 for recording_event in decompressed_data
-            ]
+            )
             snapshot_data_by_window_id[chunks[0].window_id].extend(events_with_only_activity_data)
 
         else:
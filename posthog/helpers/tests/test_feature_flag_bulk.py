@@ -0,0 +1,83 @@
+from posthog.helpers.feature_flag_bulk import evaluate_feature_flag_in_bulk, get_hashes
+from posthog.models import FeatureFlag, GroupTypeMapping, Person
+from posthog.models.feature_flag import FeatureFlagMatcher
+from posthog.models.group import Group
+from posthog.test.base import BaseTest
+
+
+class TestFeatureFlagBulk(BaseTest):
+    def _assert_matches_matcher(self, feature_flag, identifiers, groups_for=None):
+        assignments = list(evaluate_feature_flag_in_bulk(feature_flag, identifiers, batch_size=7))
+        self.assertEqual([identifier for identifier, _ in assignments], identifiers)
+
+        for identifier, value in assignments:
+            groups = groups_for(identifier) if groups_for else {}
+            match = FeatureFlagMatcher(feature_flag, identifier, groups).get_match()
+            expected = (match.variant or True) if match else False
+            self.assertEqual(value, expected, identifier)
+
+    def test_hashes_match_matcher(self):
+        feature_flag = FeatureFlag.objects.create(team=self.team, key="beta-feature", created_by=self.user)
+        identifiers = [f"user_{index}" for index in range(500)] + ["", "🦔", "example_id"]
+
+        hashes = get_hashes(feature_flag.key, identifiers)
+        variant_hashes = get_hashes(feature_flag.key, identifiers, salt="variant")
+        for index, identifier in enumerate(identifiers):
+            matcher = FeatureFlagMatcher(feature_flag, identifier)
+            self.assertEqual(hashes[index], matcher.get_hash())
+            self.assertEqual(variant_hashes[index], matcher.get_hash(salt="variant"))
+
+    def test_rollout_and_variants(self):
+        feature_flag = FeatureFlag.objects.create(
+            team=self.team,
+            key="multivariate",
+            created_by=self.user,
+            filters={
+                "groups": [{"rollout_percentage": 70}, {"rollout_percentage": 10}],
+                "multivariate": {
+                    "variants": [
+                        {"key": "control", "rollout_percentage": 33},
+                        {"key": "test-1", "rollout_percentage": 33},
+                        {"key": "test-2", "rollout_percentage": 34},
+                    ]
+                },
+            },
+        )
+        self._assert_matches_matcher(feature_flag, [f"user_{index}" for index in range(300)])
+
+    def test_person_properties(self):
+        Person.objects.create(team=self.team, distinct_ids=["tim", "tim_2"], properties={"email": "tim@posthog.com"})
+        Person.objects.create(team=self.team, distinct_ids=["sam"], properties={"email": "sam@example.com"})
+        feature_flag = FeatureFlag.objects.create(
+            team=self.team,
+            key="property-flag",
+            created_by=self.user,
+            filters={
+                "groups": [
+                    {"properties": [{"key": "email", "value": "posthog.com", "operator": "icontains"}]},
+                    {"properties": [{"key": "email", "value": "sam@example.com"}], "rollout_percentage": 50},
+                    {"rollout_percentage": 20},
+                ]
+            },
+        )
+        self._assert_matches_matcher(feature_flag, ["tim", "sam", "tim_2", "unknown", "tim"])
+
+    def test_group_properties(self):
+        GroupTypeMapping.objects.create(team=self.team, group_type="organization", group_type_index=0)
+        Group.objects.create(
+            team=self.team, group_type_index=0, group_key="foo", group_properties={"name": "foo.inc"}, version=1
+        )
+        feature_flag = FeatureFlag.objects.create(
+            team=self.team,
+            key="group-flag",
+            created_by=self.user,
+            filters={
+                "aggregation_group_type_index": 0,
+                "groups": [
+                    {"properties": [{"key": "name", "value": "foo.inc", "type": "group", "group_type_index": 0}]}
+                ],
+            },
+        )
+        self._assert_matches_matcher(
+            feature_flag, ["foo", "bar"], groups_for=lambda group_key: {"organization": group_key}
+        )
@@ -1,18 +1,27 @@
+import json
 from datetime import datetime, timedelta, timezone
 
 import pytest
 from pytest_mock import MockerFixture
 
 from posthog.helpers.session_recording import (
+    COMPRESSION_GZIP_BASE64,
+    COMPRESSION_UTF8_GZIP_BASE64,
     EventActivityData,
     PaginatedList,
     RecordingSegment,
     SnapshotDataTaggedWithWindowId,
+    build_chunk_time_index,
+    chunk_string,
     compress_and_chunk_snapshots,
+    compress_to_string,
+    decompress,
     decompress_chunked_snapshot_data,
+    find_chunk_offset_for_time,
     generate_inactive_segments_for_range,
     get_active_segments_from_event_list,
     is_active_event,
+    iter_decompressed_snapshot_data,
     paginate_list,
     preprocess_session_recording_events,
 )
@@ -74,7 +83,7 @@ def test_compression_and_chunking(raw_snapshot_events, mocker: MockerFixture):
     mocker.patch("posthog.models.utils.UUIDT", return_value="0178495e-8521-0000-8e1c-2652fa57099b")
     mocker.patch("time.time", return_value=0)
 
-    assert list(compress_and_chunk_snapshots(raw_snapshot_events)) == [
+    assert list(compress_and_chunk_snapshots(raw_snapshot_events, compression=COMPRESSION_GZIP_BASE64)) == [
         {
             "event": "$snapshot",
             "properties": {
@@ -107,6 +116,50 @@ def test_decompression_results_in_same_data(raw_snapshot_events):
     ]
 
 
+def test_compression_defaults_to_gzip_base64(raw_snapshot_events):
+    compressed = list(compress_and_chunk_snapshots(raw_snapshot_events))
+    assert compressed[0]["properties"]["$snapshot_data"]["compression"] == COMPRESSION_GZIP_BASE64
+
+
+def test_compress_to_string_rejects_unknown_compression():
+    with pytest.raises(ValueError, match="Unknown session recording chunk compression 'brotli'"):
+        compress_to_string("[]", "brotli")
+
+
+def test_decompress_skips_chunks_with_unknown_compression(raw_snapshot_events):
+    snapshot_list = []
+    for compression in [COMPRESSION_GZIP_BASE64, "brotli"]:
+        for event in compress_and_chunk_snapshots(raw_snapshot_events, 100, compression=COMPRESSION_GZIP_BASE64):
+            snapshot_data = {**event["properties"]["$snapshot_data"], "compression": compression}
+            snapshot_list.append(SnapshotDataTaggedWithWindowId(window_id="1", snapshot_data=snapshot_data))
+
+    raw_snapshot_data = [event["properties"]["$snapshot_data"] for event in raw_snapshot_events]
+    assert (
+        decompress_chunked_snapshot_data(2, "someid", snapshot_list).snapshot_data_by_window_id["1"]
+        == raw_snapshot_data
+    )
+
+
+def test_decompression_of_mixed_compressions(raw_snapshot_events):
+    snapshot_list = [
+        SnapshotDataTaggedWithWindowId(window_id="1", snapshot_data=event["properties"]["$snapshot_data"])
+        for compression in [COMPRESSION_GZIP_BASE64, COMPRESSION_UTF8_GZIP_BASE64]
+        for event in compress_and_chunk_snapshots(raw_snapshot_events, 100, compression=compression)
+    ]
+
+    raw_snapshot_data = [event["properties"]["$snapshot_data"] for event in raw_snapshot_events]
+    assert (
+        decompress_chunked_snapshot_data(2, "someid", snapshot_list).snapshot_data_by_window_id["1"]
+        == raw_snapshot_data * 2
+    )
+
+
+@pytest.mark.parametrize("compression", [COMPRESSION_GZIP_BASE64, COMPRESSION_UTF8_GZIP_BASE64])
+def test_compress_to_string_round_trip(compression):
+    json_string = json.dumps([{"text": "💻 ϥ \ud83d"}])
+    assert decompress(compress_to_string(json_string, compression), compression) == json_string
+
+
 def test_has_full_snapshot_property(raw_snapshot_events):
     compressed = list(compress_and_chunk_snapshots(raw_snapshot_events))
     assert len(compressed) == 1
@@ -237,6 +290,83 @@ def test_decompress_data_returning_only_activity_info(chunked_and_compressed_sna
     }
 
 
+@pytest.mark.parametrize("chunk_length", [3, 16, 1024, 1_000_000])
+def test_iter_decompressed_snapshot_data_matches_decompress(chunk_length):
+    events = [
+        {"type": 2, "timestamp": 1_600_000_000_000 + index, "data": {"text": "💻 ϥ" * index, "value": 12345.6789}}
+        for index in range(200)
+    ]
+    compressed = compress_to_string(json.dumps(events))
+
+    streamed = list(iter_decompressed_snapshot_data(chunk_string(compressed, chunk_length)))
+
+    assert streamed == json.loads(decompress(compressed)) == events
+
+
+def test_iter_decompressed_snapshot_data_truncated():
+    chunks = chunk_string(compress_to_string(json.dumps([{"type": 2}] * 1000)), 16)
+    with pytest.raises(EOFError):
+        list(iter_decompressed_snapshot_data(chunks[:-1]))
+
+
+def test_find_chunk_offset_for_time():
+    start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    snapshots = []
+    for minute, window_id, has_full_snapshot in [
+        (0, "1", True),
+        (1, "1", False),
+        (2, "2", False),
+        (3, "1", True),
+        (4, "2", False),
+        (5, "1", False),
+    ]:
+        snapshot_data = {"chunk_id": str(minute), "chunk_count": 1, "has_full_snapshot": has_full_snapshot}
+        snapshots.append(
+            SnapshotDataTaggedWithWindowId(
+                window_id=window_id, snapshot_data=snapshot_data, timestamp=start + timedelta(minutes=minute)
+            )
+        )
+    time_index = build_chunk_time_index(snapshots)
+
+    assert find_chunk_offset_for_time(time_index, start - timedelta(minutes=1)) == 0
+    assert find_chunk_offset_for_time(time_index, start + timedelta(minutes=1, seconds=30)) == 0
+    # Window 2 has no full snapshot, so playback starts from its first chunk
+    assert find_chunk_offset_for_time(time_index, start + timedelta(minutes=4)) == 2
+    # Window 2's last chunk started before minute 5, so only window 1 needs playing
+    assert find_chunk_offset_for_time(time_index, start + timedelta(minutes=5)) == 3
+
+    time_index_without_window_2 = build_chunk_time_index([s for s in snapshots if s.window_id == "1"])
+    assert find_chunk_offset_for_time(time_index_without_window_2, start + timedelta(minutes=5)) == 2
+
+
+def test_find_chunk_offset_for_time_skips_windows_that_ended():
+    start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    snapshots = []
+    for minute, window_id, has_full_snapshot in [
+        (0, "1", True),
+        (1, "2", True),
+        (2, "1", False),
+        (10, "2", True),
+        (20, "2", False),
+    ]:
+        snapshot_data = {"chunk_id": str(minute), "chunk_count": 1, "has_full_snapshot": has_full_snapshot}
+        snapshots.append(
+            SnapshotDataTaggedWithWindowId(
+                window_id=window_id, snapshot_data=snapshot_data, timestamp=start + timedelta(minutes=minute)
+            )
+        )
+    time_index = build_chunk_time_index(snapshots)
+
+    assert [entry.window_end_time for entry in time_index] == [
+        start + timedelta(minutes=minute) for minute in [2, 20, 2, 20, 20]
+    ]
+    # Window 1 closed at minute 2, so it doesn't pull playback back to the start
+    assert find_chunk_offset_for_time(time_index, start + timedelta(minutes=1, seconds=30)) == 0
+    assert find_chunk_offset_for_time(time_index, start + timedelta(minutes=15)) == 3
+    # No window is still going, so the one that ended last is played
+    assert find_chunk_offset_for_time(time_index, start + timedelta(minutes=30)) == 3
+
+
 def test_is_active_event():
     assert is_active_event({}) is False
     assert is_active_event({"type": 3}) is False
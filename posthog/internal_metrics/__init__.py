@@ -1,30 +1,44 @@
-from typing import Any, Union
+import atexit
+from typing import Union
 
+from django.conf import settings
+from django.db import close_old_connections
 from django.utils import timezone
 from sentry_sdk.api import capture_exception
 from statshog.client.base import Tags
 from statshog.defaults.django import statsd
 
 from posthog import utils
+from posthog.internal_metrics.aggregation import COUNTER, GAUGE, TIMING, MetricsAggregator, Summaries
 from posthog.internal_metrics.team import get_internal_metrics_team_id
 
 
 def timing(metric_name: str, ms: float, tags: Tags = None):
     statsd.timing(metric_name, ms, tags=tags)
-    _capture(metric_name, ms, tags)
+    _record(TIMING, metric_name, ms, tags)
 
 
 def gauge(metric_name: str, value: Union[int, float], tags: Tags = None):
     statsd.gauge(metric_name, value, tags=tags)
-    _capture(metric_name, value, tags)
+    _record(GAUGE, metric_name, value, tags)
 
 
 def incr(metric_name: str, count: int = 1, tags: Tags = None):
     statsd.incr(metric_name, count, tags=tags)
-    _capture(metric_name, count, tags)
+    _record(COUNTER, metric_name, count, tags)
 
 
-def _capture(metric_name: str, value: Any, tags: Tags):
+def flush():
+    "Captures everything recorded since the last flush right away, rather than at the next interval."
+    _aggregator.flush()
+
+
+def _record(kind: str, metric_name: str, value: Union[int, float], tags: Tags):
+    if settings.CAPTURE_INTERNAL_METRICS:
+        _aggregator.record(kind, metric_name, value, tags)
+
+
+def _capture(summaries: Summaries):
     from posthog.api.capture import capture_internal
 
     try:
@@ -32,8 +46,14 @@ def _capture(metric_name: str, value: Any, tags: Tags):
         if team_id is not None:
             now = timezone.now()
             distinct_id = utils.get_machine_id()
-            event = {"event": f"$${metric_name}", "properties": {"value": value, **(tags or {})}}
-            capture_internal(event, distinct_id, None, None, now, now, team_id)
+            for metric_name, properties in summaries:
+                event = {"event": f"$${metric_name}", "properties": properties}
+                capture_internal(event, distinct_id, None, None, now, now, team_id)
     except Exception as err:
         # Ignore errors, this is not important enough to fail API on
         capture_exception(err)
+
+
+# The flush thread would otherwise hold on to its database connection for good
+_aggregator = MetricsAggregator(settings.INTERNAL_METRICS_FLUSH_INTERVAL_SECONDS, _capture, close_old_connections)
+atexit.register(flush)
@@ -0,0 +1,167 @@
+"""
+In-process aggregation of internal metrics.
+
+Recording a metric only updates a per (metric, tags) summary under a lock. A background thread swaps the summaries out
+every `INTERNAL_METRICS_FLUSH_INTERVAL_SECONDS` and captures one `$$<metric>` event per summary, so the request path
+never does any capturing itself.
+
+Summaries are bounded: at most `MAX_SERIES` metric and tag combinations are kept per interval, and timings are kept
+as a histogram of logarithmic buckets, so percentiles are estimates within about 20% of the real value. Percentiles
+cover a single interval: averaging them over a longer period doesn't give that period's percentile.
+"""
+import math
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from statshog.client.base import Tags
+from statshog.defaults.django import statsd
+
+COUNTER = "counter"
+GAUGE = "gauge"
+TIMING = "timing"
+
+MAX_SERIES = 5_000
+# Timings go into buckets whose bounds grow by a factor of 2 ** (1 / BUCKETS_PER_DOUBLING)
+BUCKETS_PER_DOUBLING = 4
+PERCENTILES = (50, 90, 95, 99)
+
+SeriesKey = Tuple[str, str, Any]
+Summaries = List[Tuple[str, Dict[str, Any]]]
+
+
+class MetricSummary:
+    __slots__ = ("kind", "tags", "count", "sum", "min", "max", "last", "buckets")
+
+    def __init__(self, kind: str, tags: Tags):
+        self.kind = kind
+        self.tags = tags
+        self.count = 0
+        self.sum: float = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self.last: Any = None
+        self.buckets: Dict[int, int] = {}
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        self.last = value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        if self.kind == TIMING:
+            bucket = _bucket(value)
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def percentile(self, percentile: float) -> float:
+        "Upper bound of the bucket holding the percentile, clamped to the values seen."
+        rank = math.ceil(self.count * percentile / 100)
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(max(_bucket_upper_bound(bucket), self.min), self.max)
+        return self.max
+
+    def to_properties(self) -> Dict[str, Any]:
+        if self.kind == COUNTER:
+            summary: Dict[str, Any] = {"value": self.sum, "count": self.count}
+        elif self.kind == GAUGE:
+            summary = {"value": self.last, "count": self.count, "min": self.min, "max": self.max}
+        else:
+            summary = {
+                "value": self.sum / self.count,
+                "count": self.count,
+                "sum": self.sum,
+                "min": self.min,
+                "max": self.max,
+                **{f"p{percentile}": self.percentile(percentile) for percentile in PERCENTILES},
+            }
+        return {**summary, **(self.tags or {})}
+
+
+def _bucket(value: float) -> int:
+    if value <= 0:
+        return -(2 ** 31)
+    return math.ceil(math.log2(value) * BUCKETS_PER_DOUBLING)
+
+
+def _bucket_upper_bound(bucket: int) -> float:
+    return 0.0 if bucket == -(2 ** 31) else 2 ** (bucket / BUCKETS_PER_DOUBLING)
+
+
+def _series_key(kind: str, metric_name: str, tags: Tags) -> SeriesKey:
+    if not tags:
+        return (kind, metric_name, None)
+    try:
+        return (kind, metric_name, frozenset(tags.items()))
+    except TypeError:
+        # Unhashable tag values, e.g. lists
+        return (kind, metric_name, repr(sorted(tags.items())))
+
+
+class MetricsAggregator:
+    def __init__(
+        self,
+        flush_interval: float,
+        capture: Callable[[Summaries], None],
+        after_background_flush: Optional[Callable[[], None]] = None,
+    ):
+        self.flush_interval = flush_interval
+        self.capture = capture
+        self.after_background_flush = after_background_flush
+        self._lock = threading.Lock()
+        self._series: Dict[SeriesKey, MetricSummary] = {}
+        self._dropped = 0
+        self._thread: Optional[threading.Thread] = None
+        self._thread_pid: Optional[int] = None
+        self._stopped = threading.Event()
+
+    def record(self, kind: str, metric_name: str, value: float, tags: Tags) -> None:
+        self._ensure_flush_thread()
+        key = _series_key(kind, metric_name, tags)
+        with self._lock:
+            summary = self._series.get(key)
+            if summary is None:
+                if len(self._series) >= MAX_SERIES:
+                    self._dropped += 1
+                    return
+                summary = self._series[key] = MetricSummary(kind, dict(tags) if tags else None)
+            summary.add(value)
+
+    def collect(self) -> Summaries:
+        "Returns `(metric_name, properties)` for every summary since the last call, and starts over."
+        with self._lock:
+            series, self._series = self._series, {}
+            dropped, self._dropped = self._dropped, 0
+        if dropped:
+            statsd.incr("internal_metrics_dropped", dropped)
+        return [(metric_name, summary.to_properties()) for (_, metric_name, _), summary in series.items()]
+
+    def _ensure_flush_thread(self) -> None:
+        # Threads don't survive forking, so forked workers start their own
+        if self._thread_pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread_pid == os.getpid():
+                return
+            # Summaries inherited from the parent process are the parent's to flush
+            self._series = {}
+            self._thread = threading.Thread(target=self._run, name="internal_metrics_flush", daemon=True)
+            self._thread_pid = os.getpid()
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.flush_interval):
+            try:
+                self.flush()
+            finally:
+                if self.after_background_flush is not None:
+                    self.after_background_flush()
+
+    def flush(self) -> None:
+        summaries = self.collect()
+        if summaries:
+            self.capture(summaries)
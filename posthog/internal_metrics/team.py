@@ -25,6 +25,8 @@ CLICKHOUSE_DASHBOARD = {
                         "type": "event",
                         "order": 0,
                         "properties": [{"key": "success", "type": "event", "value": ["true"], "operator": "exact"}],
+                        "math": "sum",
+                        "math_property": "count",
                     },
                     {
                         "id": "$$insight_load_time",
@@ -32,6 +34,8 @@ CLICKHOUSE_DASHBOARD = {
                         "type": "event",
                         "order": 1,
                         "properties": [{"key": "success", "type": "event", "value": ["false"], "operator": "exact"}],
+                        "math": "sum",
+                        "math_property": "count",
                     },
                 ],
                 "display": "ActionsLineGraph",
@@ -56,21 +60,21 @@ CLICKHOUSE_DASHBOARD = {
                     },
                     {
                         "id": "$$insight_load_time",
-                        "math": "p90",
-                        "name": "Load time (90th percentile)",
+                        "math": "avg",
+                        "name": "Load time (average of per-interval 90th percentiles)",
                         "type": "event",
                         "order": 1,
                         "properties": [],
-                        "math_property": "value",
+                        "math_property": "p90",
                     },
                     {
                         "id": "$$insight_load_time",
-                        "math": "p95",
-                        "name": "Load time (95th percentile)",
+                        "math": "avg",
+                        "name": "Load time (average of per-interval 95th percentiles)",
                         "type": "event",
                         "order": 2,
                         "properties": [],
-                        "math_property": "value",
+                        "math_property": "p95",
                     },
                 ],
                 "display": "ActionsLineGraph",
@@ -90,6 +94,8 @@ CLICKHOUSE_DASHBOARD = {
                         "type": "event",
                         "order": 0,
                         "properties": [],
+                        "math": "sum",
+                        "math_property": "value",
                     },
                 ],
                 "display": "ActionsLineGraph",
@@ -108,7 +114,8 @@ CLICKHOUSE_DASHBOARD = {
                         "name": "$$clickhouse_sync_execution_time",
                         "type": "event",
                         "order": 0,
-                        "math": "total",
+                        "math": "sum",
+                        "math_property": "count",
                     }
                 ],
                 "display": "ActionsLineGraph",
@@ -125,7 +132,7 @@ CLICKHOUSE_DASHBOARD = {
                     {
                         "id": "$$clickhouse_sync_execution_time",
                         "math": "avg",
-                        "name": "$$clickhouse_sync_execution_time",
+                        "name": "Query time (average)",
                         "type": "event",
                         "order": 0,
                         "properties": [],
@@ -133,21 +140,21 @@ CLICKHOUSE_DASHBOARD = {
                     },
                     {
                         "id": "$$clickhouse_sync_execution_time",
-                        "math": "p90",
-                        "name": "$$clickhouse_sync_execution_time",
+                        "math": "avg",
+                        "name": "Query time (average of per-interval 90th percentiles)",
                         "type": "event",
                         "order": 1,
                         "properties": [],
-                        "math_property": "value",
+                        "math_property": "p90",
                     },
                     {
                         "id": "$$clickhouse_sync_execution_time",
-                        "math": "p95",
-                        "name": "$$clickhouse_sync_execution_time",
+                        "math": "avg",
+                        "name": "Query time (average of per-interval 95th percentiles)",
                         "type": "event",
                         "order": 2,
                         "properties": [],
-                        "math_property": "value",
+                        "math_property": "p95",
                     },
                 ],
                 "display": "ActionsLineGraph",
@@ -168,7 +175,7 @@ CLICKHOUSE_DASHBOARD = {
                         "type": "event",
                         "order": 0,
                         "properties": [],
-                        "math_property": "value",
+                        "math_property": "sum",
                     },
                 ],
                 "display": "ActionsLineGraph",
@@ -0,0 +1,79 @@
+import random
+import time
+from unittest import TestCase
+from unittest.mock import patch
+
+from posthog.internal_metrics import aggregation
+from posthog.internal_metrics.aggregation import COUNTER, GAUGE, TIMING, MetricsAggregator
+
+
+class TestMetricsAggregator(TestCase):
+    def setUp(self):
+        self.captured = []
+        self.aggregator = MetricsAggregator(3600, self.captured.extend)
+
+    def test_series_are_kept_per_metric_and_tags(self):
+        self.aggregator.record(COUNTER, "requests", 1, {"route": "a", "status": 200})
+        self.aggregator.record(COUNTER, "requests", 1, {"status": 200, "route": "a"})
+        self.aggregator.record(COUNTER, "requests", 1, {"route": "b", "status": 200})
+        self.aggregator.record(COUNTER, "requests", 1, {"route": "b", "status": [200]})
+        self.aggregator.record(COUNTER, "requests", 5, None)
+
+        self.assertCountEqual(
+            self.aggregator.collect(),
+            [
+                ("requests", {"value": 2, "count": 2, "route": "a", "status": 200}),
+                ("requests", {"value": 1, "count": 1, "route": "b", "status": 200}),
+                ("requests", {"value": 1, "count": 1, "route": "b", "status": [200]}),
+                ("requests", {"value": 5, "count": 1}),
+            ],
+        )
+        self.assertEqual(self.aggregator.collect(), [])
+
+    def test_gauges_report_the_last_value(self):
+        for value in [5, 1, 3]:
+            self.aggregator.record(GAUGE, "queue_depth", value, None)
+
+        self.assertEqual(
+            self.aggregator.collect(), [("queue_depth", {"value": 3, "count": 3, "min": 1, "max": 5})],
+        )
+
+    def test_timing_percentiles_are_within_bucket_precision(self):
+        values = [random.uniform(1, 10_000) for _ in range(5_000)]
+        for value in values:
+            self.aggregator.record(TIMING, "load_time", value, None)
+
+        [(_, properties)] = self.aggregator.collect()
+        values.sort()
+        self.assertEqual(properties["count"], 5_000)
+        self.assertAlmostEqual(properties["sum"], sum(values))
+        self.assertEqual((properties["min"], properties["max"]), (values[0], values[-1]))
+        for percentile in aggregation.PERCENTILES:
+            exact = values[len(values) * percentile // 100 - 1]
+            self.assertLessEqual(abs(properties[f"p{percentile}"] - exact) / exact, 0.2)
+
+    @patch.object(aggregation, "MAX_SERIES", 3)
+    def test_number_of_series_is_bounded(self):
+        for index in range(10):
+            self.aggregator.record(COUNTER, "requests", 1, {"index": index})
+        self.aggregator.record(COUNTER, "requests", 1, {"index": 0})
+
+        with patch.object(aggregation.statsd, "incr") as mock_incr:
+            summaries = self.aggregator.collect()
+
+        self.assertEqual(sorted(properties["index"] for _, properties in summaries), [0, 1, 2])
+        self.assertEqual(summaries[0][1]["count"], 2)
+        mock_incr.assert_called_once_with("internal_metrics_dropped", 7)
+
+    def test_background_thread_flushes(self):
+        flushed = []
+        aggregator = MetricsAggregator(0.01, self.captured.extend, lambda: flushed.append(True))
+
+        aggregator.record(COUNTER, "requests", 1, None)
+        for _ in range(100):
+            if self.captured:
+                break
+            time.sleep(0.01)
+
+        self.assertEqual(self.captured, [("requests", {"value": 1, "count": 1})])
+        self.assertTrue(flushed)
@@ -4,7 +4,7 @@ import pytest
 from django.conf import settings
 from pytest_mock.plugin import MockerFixture
 
-from posthog.internal_metrics import gauge, incr, timing
+from posthog.internal_metrics import flush, gauge, incr, timing
 from posthog.internal_metrics.team import (
     CLICKHOUSE_DASHBOARD,
     NAME,
@@ -20,19 +20,43 @@ def mock_capture_internal(mocker: MockerFixture):
     get_internal_metrics_team_id.cache_clear()
     mocker.patch.object(settings, "CAPTURE_INTERNAL_METRICS", True)
     mocker.patch("posthog.utils.get_machine_id", return_value="machine_id")
+    flush()
     yield mocker.patch("posthog.api.capture.capture_internal")
 
     mocker.patch.object(settings, "CAPTURE_INTERNAL_METRICS", False)
+    flush()
     get_internal_metrics_team_id.cache_clear()
 
 
 def test_methods_capture_enabled(db, mock_capture_internal):
-    timing("foo_metric", 100, tags={"team_id": 15})
+    timing("foo_metric", 128, tags={"team_id": 15})
+    timing("foo_metric", 512, tags={"team_id": 15})
     gauge("bar_metric", 20, tags={"team_id": 15})
     incr("zeta_metric")
+    incr("zeta_metric", 2)
+
+    mock_capture_internal.assert_not_called()
+
+    flush()
+
+    assert mock_capture_internal.call_count == 3
 
     mock_capture_internal.assert_any_call(
-        {"event": "$$foo_metric", "properties": {"value": 100, "team_id": 15}},
+        {
+            "event": "$$foo_metric",
+            "properties": {
+                "value": 320,
+                "count": 2,
+                "sum": 640,
+                "min": 128,
+                "max": 512,
+                "p50": 128,
+                "p90": 512,
+                "p95": 512,
+                "p99": 512,
+                "team_id": 15,
+            },
+        },
         "machine_id",
         None,
         None,
@@ -42,7 +66,7 @@ def test_methods_capture_enabled(db, mock_capture_internal):
     )
 
     mock_capture_internal.assert_any_call(
-        {"event": "$$bar_metric", "properties": {"value": 20, "team_id": 15}},
+        {"event": "$$bar_metric", "properties": {"value": 20, "count": 1, "min": 20, "max": 20, "team_id": 15}},
         "machine_id",
         None,
         None,
@@ -52,7 +76,7 @@ def test_methods_capture_enabled(db, mock_capture_internal):
     )
 
     mock_capture_internal.assert_any_call(
-        {"event": "$$zeta_metric", "properties": {"value": 1}},
+        {"event": "$$zeta_metric", "properties": {"value": 3, "count": 2}},
         "machine_id",
         None,
         None,
@@ -68,6 +92,7 @@ def test_methods_capture_disabled(db, mock_capture_internal, mocker: MockerFixtu
     timing("foo_metric", 100, tags={"team_id": 15})
     gauge("bar_metric", 20, tags={"team_id": 15})
     incr("zeta_metric")
+    flush()
 
     mock_capture_internal.assert_not_called()
 
@@ -0,0 +1,32 @@
+import csv
+import sys
+
+from django.core.management.base import BaseCommand
+
+from posthog.helpers.feature_flag_bulk import DEFAULT_BATCH_SIZE, evaluate_feature_flag_in_bulk
+from posthog.models import FeatureFlag
+
+
+class Command(BaseCommand):
+    help = "Evaluate a feature flag for a list of distinct_ids (or group keys), writing identifier,value CSV rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--team_id", type=int, required=True, help="specify the team id eg. --team_id 1")
+        parser.add_argument("--flag_key", type=str, required=True, help="key of the feature flag to evaluate")
+        parser.add_argument(
+            "--input", type=str, default="-", help="file with one distinct_id or group key per line, - for stdin"
+        )
+        parser.add_argument("--batch_size", type=int, default=DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        feature_flag = FeatureFlag.objects.get(team_id=options["team_id"], key=options["flag_key"], deleted=False)
+
+        input_file = sys.stdin if options["input"] == "-" else open(options["input"])
+        try:
+            identifiers = (line.rstrip("\n") for line in input_file if line.strip())
+            writer = csv.writer(self.stdout, lineterminator="\n")
+            for identifier, value in evaluate_feature_flag_in_bulk(feature_flag, identifiers, options["batch_size"]):
+                writer.writerow([identifier, value])
+        finally:
+            if input_file is not sys.stdin:
+                input_file.close()
@@ -1,3 +1,4 @@
+import io
 import time
 from datetime import datetime
 from typing import Any, Dict, List, Literal, Optional, cast
@@ -9,6 +10,7 @@ from django.db.models import Case, Q, When
 from django.db.models.expressions import F
 from django.utils import timezone
 from sentry_sdk import capture_exception
+from statshog.defaults.django import statsd
 
 from posthog.constants import PropertyOperatorType
 from posthog.models.filters.filter import Filter
@@ -30,6 +32,59 @@ INSERT INTO "posthog_cohortpeople" ("person_id", "cohort_id", "version")
 ON CONFLICT DO NOTHING
 """
 
+# Temporary tables are private to the connection, so concurrent calculations can't see each other's rows
+CREATE_STAGING_TABLES_QUERY = """
+DROP TABLE IF EXISTS cohort_calculation_uuids, cohort_calculation_person_ids;
+CREATE TEMPORARY TABLE cohort_calculation_uuids (uuid uuid NOT NULL);
+CREATE TEMPORARY TABLE cohort_calculation_person_ids (person_id bigint PRIMARY KEY);
+"""
+
+DROP_STAGING_TABLES_QUERY = """
+DROP TABLE IF EXISTS cohort_calculation_uuids, cohort_calculation_person_ids
+"""
+
+COPY_STAGED_UUIDS_QUERY = "COPY cohort_calculation_uuids (uuid) FROM STDIN"
+
+RESOLVE_STAGED_PERSON_IDS_QUERY = """
+INSERT INTO cohort_calculation_person_ids
+SELECT DISTINCT "posthog_person"."id"
+FROM "posthog_person"
+INNER JOIN cohort_calculation_uuids ON "posthog_person"."uuid" = cohort_calculation_uuids.uuid
+WHERE "posthog_person"."team_id" = %(team_id)s
+"""
+
+# Returns how many people would be added to and removed from the current version
+DIFF_STAGED_PERSON_IDS_QUERY = """
+SELECT
+    (
+        SELECT count(*) FROM cohort_calculation_person_ids staged WHERE NOT EXISTS (
+            SELECT 1 FROM "posthog_cohortpeople"
+            WHERE "cohort_id" = %(cohort_id)s AND "version" = %(version)s AND "person_id" = staged.person_id
+        )
+    ),
+    (
+        SELECT count(*) FROM "posthog_cohortpeople"
+        WHERE "cohort_id" = %(cohort_id)s AND "version" = %(version)s AND NOT EXISTS (
+            SELECT 1 FROM cohort_calculation_person_ids staged
+            WHERE staged.person_id = "posthog_cohortpeople"."person_id"
+        )
+    )
+"""
+
+INSERT_STAGED_PERSON_IDS_BATCH_QUERY = """
+WITH batch AS (
+    SELECT person_id FROM cohort_calculation_person_ids
+    WHERE person_id > %(after)s
+    ORDER BY person_id
+    LIMIT %(limit)s
+), inserted AS (
+    INSERT INTO "posthog_cohortpeople" ("person_id", "cohort_id", "version")
+    SELECT person_id, %(cohort_id)s, %(version)s FROM batch
+    ON CONFLICT DO NOTHING
+)
+SELECT max(person_id), count(*) FROM batch
+"""
+
 
 class Group:
     def __init__(
@@ -186,60 +241,111 @@ class Cohort(models.Model):
             "deleted": self.deleted,
         }
 
-    def calculate_people(self, new_version: int, batch_size=10000, pg_batch_size=1000):
+    def calculate_people(self, new_version: int, batch_size=10000, pg_batch_size=1000) -> bool:
+        """
+        Copies the cohort's people from ClickHouse into Postgres as `new_version`.
+
+        Person uuids are streamed out of ClickHouse in blocks of `batch_size` and `COPY`d into a temporary table,
+        which is then diffed against the current version. If nothing changed, nothing is written and False is
+        returned. Otherwise the new version is inserted in batches of `pg_batch_size`, paginating by person id.
+        """
+        from ee.clickhouse.models.cohort import iter_person_ids_by_cohort_id
+
         if self.is_static:
-            return
+            return False
+        start_time = time.monotonic()
         try:
-
-            # Paginate fetch batch_size from clickhouse and paginate insert pg_batch_size into postgres
-            cursor = 0
-            persons = self._clickhouse_persons_query(batch_size=batch_size, offset=cursor)
-            while persons:
-                # TODO: Insert from a subquery instead of pulling retrieving
-                # then sending large lists of data backwards and forwards.
-                to_insert = [
-                    CohortPeople(person_id=person_id, cohort_id=self.pk, version=new_version)
-                    #  Just pull out the person id as we don't need anything
-                    #  else.
-                    for person_id in persons.values_list("id", flat=True)
-                ]
-                #  TODO: make sure this bulk_create doesn't actually return anything
-                CohortPeople.objects.bulk_create(to_insert, batch_size=pg_batch_size)
-
-                cursor += batch_size
-                persons = self._clickhouse_persons_query(batch_size=batch_size, offset=cursor)
-                time.sleep(5)
+            with connection.cursor() as cursor:
+                cursor.execute(CREATE_STAGING_TABLES_QUERY)
+                try:
+                    copied = 0
+                    for uuids in iter_person_ids_by_cohort_id(self.team, self.pk, block_size=batch_size):
+                        cursor.copy_expert(COPY_STAGED_UUIDS_QUERY, io.StringIO("".join(f"{u}\n" for u in uuids)))
+                        copied += len(uuids)
+                        logger.info(
+                            "cohort_people_copy_progress",
+                            id=self.pk,
+                            version=new_version,
+                            copied=copied,
+                            rows_per_second=round(copied / (time.monotonic() - start_time)),
+                        )
+                    statsd.incr("cohort_people_copied", count=copied)
+                    cursor.execute(RESOLVE_STAGED_PERSON_IDS_QUERY, {"team_id": self.team_id})
+
+                    if self.version is not None:
+                        cursor.execute(DIFF_STAGED_PERSON_IDS_QUERY, {"cohort_id": self.pk, "version": self.version})
+                        added, removed = cursor.fetchone()
+                        logger.info(
+                            "cohort_people_diff", id=self.pk, version=self.version, added=added, removed=removed
+                        )
+                        if added == 0 and removed == 0:
+                            statsd.incr("cohort_people_unchanged")
+                            return False
+
+                    inserted = 0
+                    after = 0
+                    while True:
+                        cursor.execute(
+                            INSERT_STAGED_PERSON_IDS_BATCH_QUERY,
+                            {"cohort_id": self.pk, "version": new_version, "after": after, "limit": pg_batch_size},
+                        )
+                        last_person_id, batch_count = cursor.fetchone()
+                        if not batch_count:
+                            break
+                        after = last_person_id
+                        inserted += batch_count
+                    statsd.incr("cohort_people_inserted", count=inserted)
+                finally:
+                    cursor.execute(DROP_STAGING_TABLES_QUERY)
 
         except Exception as err:
             # Clear the pending version people if there's an error
             batch_delete_cohort_people(self.pk, new_version)
 
             raise err
+        finally:
+            statsd.timing("cohort_people_calculation_duration", (time.monotonic() - start_time) * 1000)
+
+        return True
 
-    def calculate_people_ch(self, pending_version):
+    def calculate_people_ch(self, pending_version, incremental=False):
+        """
+        With `incremental`, only persons that changed since the last calculation are re-evaluated where the cohort's
+        filters allow it, except on every COHORT_FULL_RECALCULATION_EVERY_N_RUNS-th version.
+        """
         from ee.clickhouse.models.cohort import recalculate_cohortpeople
         from posthog.tasks.cohorts_in_feature_flag import get_cohort_ids_in_feature_flags
 
-        logger.info("cohort_calculation_started", id=self.pk, current_version=self.version, new_version=pending_version)
+        incremental = incremental and pending_version % settings.COHORT_FULL_RECALCULATION_EVERY_N_RUNS != 0
+        logger.info(
+            "cohort_calculation_started",
+            id=self.pk,
+            current_version=self.version,
+            new_version=pending_version,
+            incremental=incremental,
+        )
         start_time = time.monotonic()
+        # Changes landing while the calculation runs may not be picked up by it, so the next incremental run has to
+        # look at changes since the calculation started rather than since it finished
+        calculation_start = timezone.now()
 
         try:
-            count = recalculate_cohortpeople(self)
+            count = recalculate_cohortpeople(self, incremental=incremental)
 
             # only precalculate if used in feature flag
             ids = get_cohort_ids_in_feature_flags()
 
-            if self.pk in ids:
-                self.calculate_people(new_version=pending_version)
+            if self.pk in ids and self.calculate_people(new_version=pending_version):
                 # Update filter to match pending version if still valid
                 Cohort.objects.filter(pk=self.pk).filter(
                     Q(version__lt=pending_version) | Q(version__isnull=True)
                 ).update(version=pending_version, count=count)
                 self.refresh_from_db()
             else:
+                # Not used in a feature flag, or its people in Postgres are already up to date
                 self.count = count
 
-            self.last_calculation = timezone.now()
+            self.last_calculation = calculation_start
             self.errors_calculating = 0
         except Exception:
             self.errors_calculating = F("errors_calculating") + 1
@@ -339,12 +445,6 @@ class Cohort(models.Model):
     def __str__(self):
         return self.name
 
-    def _clickhouse_persons_query(self, batch_size=10000, offset=0):
-        from ee.clickhouse.models.cohort import get_person_ids_by_cohort_id
-
-        uuids = get_person_ids_by_cohort_id(team=self.team, cohort_id=self.pk, limit=batch_size, offset=offset)
-        return Person.objects.filter(uuid__in=uuids, team=self.team)
-
     __repr__ = sane_repr("id", "name", "last_calculation")
 
 
@@ -127,8 +127,10 @@ class Entity(PropertyMixin):
         if self._action and not settings.TEST:
             return self._action
 
+        from posthog.queries.query_metadata import get_action
+
         try:
-            self._action = Action.objects.get(id=self.id)
+            self._action = get_action(self.id)
             return self._action
         except:
             raise ValidationError(f"Action ID {self.id} does not exist!")
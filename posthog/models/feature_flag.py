@@ -1,13 +1,17 @@
 import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 from django.core.cache import cache
-from django.db import models
+from django.db import models, transaction
 from django.db.models.expressions import ExpressionWrapper, RawSQL, Subquery
 from django.db.models.fields import BooleanField
 from django.db.models.query import QuerySet
-from django.db.models.signals import pre_delete
+from django.db.models.signals import post_delete, post_save, pre_delete
 from django.dispatch.dispatcher import receiver
 from django.utils import timezone
 from sentry_sdk.api import capture_exception
@@ -26,6 +30,11 @@ from .person import Person, PersonDistinctId
 
 __LONG_SCALE__ = float(0xFFFFFFFFFFFFFFF)
 
+# How long a process may serve a team's compiled flags without reloading them, even if they haven't been invalidated.
+# Bounds staleness of group type mappings, which are created outside of Django by the plugin server.
+TEAM_FEATURE_FLAGS_TTL_SECONDS = 60
+TEAM_FEATURE_FLAGS_MAX_CACHED_TEAMS = 5000
+
 
 @dataclass(frozen=True)
 class FeatureFlagMatch:
@@ -125,6 +134,7 @@ class FeatureFlag(models.Model):
 @receiver(pre_delete, sender=Experiment)
 def delete_experiment_flags(sender, instance, **kwargs):
     FeatureFlag.objects.filter(experiment=instance).update(deleted=True)
+    invalidate_team_feature_flags(instance.team_id)
 
 
 class FeatureFlagOverride(models.Model):
@@ -146,12 +156,23 @@ class FeatureFlagOverride(models.Model):
         }
 
 
+@receiver([post_save, post_delete], sender=FeatureFlag)
+@receiver([post_save, post_delete], sender=FeatureFlagOverride)
+def feature_flags_changed(sender, instance, **kwargs):
+    invalidate_team_feature_flags(instance.team_id)
+
+
 class FlagsMatcherCache:
-    def __init__(self, team_id: int):
+    def __init__(self, team_id: int, group_types_to_indexes: Optional[Dict[GroupTypeName, GroupTypeIndex]] = None):
         self.team_id = team_id
+        self._group_types_to_indexes = group_types_to_indexes
+        # Condition results fetched for many flags in one query, by feature flag id
+        self.query_conditions_by_flag: Dict[int, List[List[bool]]] = {}
 
     @cached_property
     def group_types_to_indexes(self) -> Dict[GroupTypeName, GroupTypeIndex]:
+        if self._group_types_to_indexes is not None:
+            return self._group_types_to_indexes
         group_type_mapping_rows = GroupTypeMapping.objects.filter(team_id=self.team_id)
         return {row.group_type: row.group_type_index for row in group_type_mapping_rows}
 
@@ -224,6 +245,9 @@ class FeatureFlagMatcher:
 
     @cached_property
     def query_conditions(self) -> List[List[bool]]:
+        if self.feature_flag.pk in self.cache.query_conditions_by_flag:
+            return self.cache.query_conditions_by_flag[self.feature_flag.pk]
+
         if self.feature_flag.aggregation_group_type_index is None:
             query: QuerySet = Person.objects.filter(
                 team_id=self.feature_flag.team_id,
@@ -240,15 +264,7 @@ class FeatureFlagMatcher:
         fields = []
         for index, condition in enumerate(self.feature_flag.conditions):
             key = f"condition_{index}"
-
-            if len(condition.get("properties", {})) > 0:
-                # Feature Flags don't support OR filtering yet
-                expr: Any = properties_to_Q(
-                    Filter(data=condition).property_groups.flat, team_id=self.feature_flag.team_id, is_direct_query=True
-                )
-            else:
-                expr = RawSQL("true", [])
-
+            expr = condition_expression(self.feature_flag, condition)
             query = query.annotate(**{key: ExpressionWrapper(expr, output_field=BooleanField())})
             fields.append(key)
 
@@ -289,17 +305,185 @@ class FeatureFlagMatcher:
         return self.get_hash(salt="variant")
 
 
+def condition_expression(feature_flag: FeatureFlag, condition: Dict) -> Any:
+    "Django expression for whether a person or group matches one of the flag's conditions."
+    if len(condition.get("properties", {})) > 0:
+        # Feature Flags don't support OR filtering yet
+        return properties_to_Q(
+            Filter(data=condition).property_groups.flat, team_id=feature_flag.team_id, is_direct_query=True
+        )
+    return RawSQL("true", [])
+
+
+def has_property_conditions(feature_flag: FeatureFlag) -> bool:
+    "Whether matching the flag needs a person or group lookup at all."
+    return any(len(condition.get("properties", [])) > 0 for condition in feature_flag.conditions)
+
+
+@dataclass
+class TeamFeatureFlags:
+    "A team's active feature flags, along with everything needed to evaluate them that rarely changes."
+
+    version: str
+    flags: List[FeatureFlag]
+    has_overrides: bool
+    group_types_to_indexes: Optional[Dict[GroupTypeName, GroupTypeIndex]]
+    loaded_at: float
+
+
+_team_feature_flags: "OrderedDict[int, TeamFeatureFlags]" = OrderedDict()
+_team_feature_flags_lock = threading.Lock()
+
+
+def _team_feature_flags_version_key(team_id: int) -> str:
+    return f"feature_flags_version/{team_id}"
+
+
+def invalidate_team_feature_flags(team_id: int) -> None:
+    """
+    Makes every process reload the team's flags on their next evaluation.
+
+    Done both immediately and once the surrounding transaction commits, so that a process which reloads in between
+    can't keep serving what it read before the commit.
+    """
+
+    def bump_version():
+        cache.set(_team_feature_flags_version_key(team_id), uuid.uuid4().hex, timeout=None)
+
+    bump_version()
+    transaction.on_commit(bump_version)
+
+
+def clear_team_feature_flags_cache() -> None:
+    with _team_feature_flags_lock:
+        _team_feature_flags.clear()
+
+
+def get_team_feature_flags(team_id: int) -> TeamFeatureFlags:
+    """
+    Returns the team's active flags from this process' cache, reloading them from Postgres only if they've changed
+    since, as signalled by the version kept in the shared Django cache.
+    """
+    version_key = _team_feature_flags_version_key(team_id)
+    version = cache.get(version_key)
+    if version is None:
+        cache.add(version_key, uuid.uuid4().hex, timeout=None)
+        version = cache.get(version_key)
+
+    with _team_feature_flags_lock:
+        team_flags = _team_feature_flags.get(team_id)
+        if (
+            team_flags is not None
+            and team_flags.version == version
+            and time.monotonic() - team_flags.loaded_at < TEAM_FEATURE_FLAGS_TTL_SECONDS
+        ):
+            _team_feature_flags.move_to_end(team_id)
+            return team_flags
+
+    flags = list(
+        FeatureFlag.objects.filter(team_id=team_id, active=True, deleted=False).only(
+            "id", "team_id", "filters", "key", "rollout_percentage",
+        )
+    )
+    group_types_to_indexes = None
+    if any(flag.aggregation_group_type_index is not None for flag in flags):
+        group_types_to_indexes = FlagsMatcherCache(team_id).group_types_to_indexes
+    team_flags = TeamFeatureFlags(
+        version=version,
+        flags=flags,
+        has_overrides=FeatureFlagOverride.objects.filter(team_id=team_id).exists(),
+        group_types_to_indexes=group_types_to_indexes,
+        loaded_at=time.monotonic(),
+    )
+
+    with _team_feature_flags_lock:
+        _team_feature_flags[team_id] = team_flags
+        _team_feature_flags.move_to_end(team_id)
+        while len(_team_feature_flags) > TEAM_FEATURE_FLAGS_MAX_CACHED_TEAMS:
+            _team_feature_flags.popitem(last=False)
+    return team_flags
+
+
+def _query_conditions_in_bulk(
+    query: QuerySet, feature_flags: List[Tuple[int, FeatureFlag]], cache: FlagsMatcherCache
+) -> None:
+    """
+    Annotates every condition of every given flag onto `query` and runs it once, storing the results in `cache` for
+    FeatureFlagMatcher to pick up. Flags whose conditions can't be built are left out and get queried (and fail) on
+    their own.
+    """
+    fields_by_flag: Dict[int, List[str]] = {}
+    for flag_index, feature_flag in feature_flags:
+        try:
+            annotations = {
+                f"flag_{flag_index}_condition_{index}": ExpressionWrapper(
+                    condition_expression(feature_flag, condition), output_field=BooleanField()
+                )
+                for index, condition in enumerate(feature_flag.conditions)
+            }
+        except Exception as err:
+            capture_exception(err)
+            continue
+        query = query.annotate(**annotations)
+        fields_by_flag[feature_flag.pk] = list(annotations.keys())
+
+    if not fields_by_flag:
+        return
+
+    rows = list(query.values(*[field for fields in fields_by_flag.values() for field in fields]))
+    for flag_id, fields in fields_by_flag.items():
+        cache.query_conditions_by_flag[flag_id] = [[row[field] for field in fields] for row in rows]
+
+
+def _query_conditions(
+    team_id: int,
+    distinct_id: str,
+    groups: Dict[GroupTypeName, str],
+    feature_flags: List[FeatureFlag],
+    cache: FlagsMatcherCache,
+) -> None:
+    """
+    Resolves the property conditions of all flags with one query for person-aggregated flags and one per group type
+    for group-aggregated flags, leaving only hashing to be done per flag.
+    """
+    flags_by_aggregation: Dict[Optional[GroupTypeIndex], List[Tuple[int, FeatureFlag]]] = {}
+    for flag_index, feature_flag in enumerate(feature_flags):
+        if has_property_conditions(feature_flag):
+            flags_by_aggregation.setdefault(feature_flag.aggregation_group_type_index, []).append(
+                (flag_index, feature_flag)
+            )
+
+    for group_type_index, flags in flags_by_aggregation.items():
+        try:
+            if group_type_index is None:
+                query: QuerySet = Person.objects.filter(
+                    team_id=team_id, persondistinctid__distinct_id=distinct_id, persondistinctid__team_id=team_id,
+                )
+            else:
+                group_key = groups.get(cache.group_type_index_to_name.get(group_type_index))  # type: ignore
+                if group_key is None:
+                    # Flags are off without the relevant group, no need to query
+                    continue
+                query = Group.objects.filter(team_id=team_id, group_type_index=group_type_index, group_key=group_key)
+            _query_conditions_in_bulk(query, flags, cache)
+        except Exception as err:
+            capture_exception(err)
+
+
 # Return a Dict with all active flags and their values
 def get_active_feature_flags(
-    team_id: int, distinct_id: str, groups: Dict[GroupTypeName, str] = {},
+    team_id: int,
+    distinct_id: str,
+    groups: Dict[GroupTypeName, str] = {},
+    team_flags: Optional[TeamFeatureFlags] = None,
 ) -> Dict[str, Union[bool, str, None]]:
-    cache = FlagsMatcherCache(team_id)
+    team_flags = team_flags or get_team_feature_flags(team_id)
+    cache = FlagsMatcherCache(team_id, team_flags.group_types_to_indexes)
     flags_enabled: Dict[str, Union[bool, str, None]] = {}
-    feature_flags = FeatureFlag.objects.filter(team_id=team_id, active=True, deleted=False).only(
-        "id", "team_id", "filters", "key", "rollout_percentage",
-    )
 
-    for feature_flag in feature_flags:
+    _query_conditions(team_id, distinct_id, groups, team_flags.flags, cache)
+
+    for feature_flag in team_flags.flags:
         try:
             match = feature_flag.matches(distinct_id, groups, cache)
             if match:
@@ -313,7 +497,11 @@ def get_active_feature_flags(
 def get_overridden_feature_flags(
     team_id: int, distinct_id: str, groups: Dict[GroupTypeName, str] = {},
 ) -> Dict[str, Union[bool, str, None]]:
-    feature_flags = get_active_feature_flags(team_id, distinct_id, groups)
+    team_flags = get_team_feature_flags(team_id)
+    feature_flags = get_active_feature_flags(team_id, distinct_id, groups, team_flags)
+
+    if not team_flags.has_overrides:
+        return feature_flags
 
     # Get a user's feature flag overrides from any distinct_id (not just the canonical one)
     person = PersonDistinctId.objects.filter(distinct_id=distinct_id, team_id=team_id).values_list("person_id")[:1]
@@ -116,9 +116,10 @@ class SimplifyFilterMixin:
         if property.type == "cohort":
             from ee.clickhouse.models.cohort import simplified_cohort_filter_properties
             from posthog.models import Cohort
+            from posthog.queries.query_metadata import get_cohort
 
             try:
-                cohort = Cohort.objects.get(pk=property.value, team_id=team.pk)
+                cohort = get_cohort(property.value, team.pk)
             except Cohort.DoesNotExist:
                 # :TODO: Handle non-existing resource in-query instead
                 return PropertyGroup(type=PropertyOperatorType.AND, values=[property])
@@ -0,0 +1,174 @@
+"""
+Decoding of request payloads sent to the capture endpoints by our SDKs.
+
+Payloads are JSON, optionally base64 encoded (e.g. in the `data` query param), gzipped (`gzip`/`gzip-js`) or
+LZ-string compressed and base64 encoded (`lz64`). Rather than trying each decoding in turn, the encoding is sniffed
+from the first bytes of the payload: gzip has a magic number and JSON payloads start with `{` or `[`.
+"""
+import base64
+import binascii
+import gzip
+import json
+import zlib
+from typing import Any, Optional, Union
+
+from posthog.exceptions import RequestParsingError
+
+GZIP_MAGIC = b"\x1f\x8b"
+_JSON_START = ("{", "[", b"{", b"[")
+
+_LZ64_ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/="
+# Each character carries 6 bits, which lz-string reads most significant first
+_LZ64_BITS = {character: format(value, "06b") for value, character in enumerate(_LZ64_ALPHABET)}
+
+
+def lz64_decompress(compressed: str) -> Optional[str]:
+    """
+    Equivalent to `lzstring.LZString().decompressFromBase64`, returning None or "" for invalid input as it does.
+
+    The whole input is turned into one string of bits up front, so reading a code is a slice and an `int` call rather
+    than a Python-level loop per bit. Reading past the end yields zeros, like the JS implementation.
+    """
+    if compressed == "":
+        return None
+    try:
+        stream = "".join([_LZ64_BITS[character] for character in compressed])
+    except KeyError:
+        return None
+    end = len(stream)
+    stream += "0" * 32
+    offset = 0
+
+    def read(count: int) -> int:
+        nonlocal offset
+        # Codes are stored least significant bit first
+        value = int(stream[offset : offset + count][::-1], 2)
+        offset += count
+        return value
+
+    code = read(2)
+    if code == 0:
+        character = chr(read(8))
+    elif code == 1:
+        character = chr(read(16))
+    elif code == 2:
+        return ""
+    else:
+        return None
+
+    dictionary = ["", "", "", character]
+    enlarge_in = 4
+    num_bits = 3
+    previous = character
+    result = [character]
+
+    while True:
+        if offset >= end:
+            return ""
+
+        code = read(num_bits)
+        if code == 0 or code == 1:
+            dictionary.append(chr(read(8 if code == 0 else 16)))
+            code = len(dictionary) - 1
+            enlarge_in -= 1
+        elif code == 2:
+            return "".join(result)
+
+        if enlarge_in == 0:
+            enlarge_in = 1 << num_bits
+            num_bits += 1
+
+        if code < len(dictionary):
+            entry = dictionary[code]
+        elif code == len(dictionary):
+            entry = previous + previous[0]
+        else:
+            return None
+        result.append(entry)
+
+        dictionary.append(previous + entry[0])
+        enlarge_in -= 1
+        previous = entry
+
+        if enlarge_in == 0:
+            enlarge_in = 1 << num_bits
+            num_bits += 1
+
+
+def gunzip(data: bytes) -> bytes:
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    try:
+        decompressed = decompressor.decompress(data)
+    except zlib.error:
+        decompressed = None
+    if decompressed is None or not decompressor.eof or decompressor.unused_data:
+        # Truncated, corrupt or multi-member: let the gzip module handle it, and raise its (more helpful) errors
+        try:
+            return gzip.decompress(data)
+        except (EOFError, OSError) as error:
+            raise RequestParsingError("Failed to decompress data. %s" % (str(error)))
+    return decompressed
+
+
+def _base64_decode(data: Union[bytes, str]) -> str:
+    """Decodes base64 the way our client libraries encode it: `+` may arrive as a space and padding may be missing."""
+    if isinstance(data, str):
+        data = data.encode("utf-8", "surrogatepass")
+    return base64.b64decode(data.replace(b" ", b"+") + b"===").decode("utf8", "surrogatepass")
+
+
+def _parse_json(data: Union[bytes, str]) -> Any:
+    # parse_constant gets called in case of NaN, Infinity etc
+    # default behaviour is to put those into the DB directly
+    # but we just want it to return None
+    return json.loads(data, parse_constant=lambda x: None)
+
+
+def _decode_uncompressed(data: Union[bytes, str], allow_gzip: bool) -> Any:
+    "Parses JSON that may be base64 encoded, or with `allow_gzip` also gzipped. Bytes are parsed without decoding."
+    stripped = data.lstrip()
+    if stripped[:1] in _JSON_START:
+        try:
+            return _parse_json(stripped)
+        except (json.JSONDecodeError, UnicodeDecodeError) as error:
+            raise RequestParsingError("Invalid JSON: %s" % (str(error)))
+
+    if allow_gzip and isinstance(data, bytes) and data[:2] == GZIP_MAGIC:
+        return _decode_uncompressed(gunzip(data), allow_gzip=False)
+
+    try:
+        return _parse_json(_base64_decode(data))
+    except (binascii.Error, ValueError):
+        pass
+
+    try:
+        return _parse_json(data)
+    except (json.JSONDecodeError, UnicodeDecodeError) as error:
+        raise RequestParsingError("Invalid JSON: %s" % (str(error)))
+
+
+def decode_payload(data: Union[bytes, str, None], compression: str) -> Any:
+    if not data:
+        return None
+
+    if compression == "gzip" or compression == "gzip-js":
+        if data == b"undefined":
+            raise RequestParsingError(
+                "data being loaded from the request body for decompression is the literal string 'undefined'"
+            )
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        return _decode_uncompressed(gunzip(data), allow_gzip=False)
+
+    if compression == "lz64":
+        if not isinstance(data, str):
+            data = data.decode()
+        decompressed = lz64_decompress(data.replace(" ", "+"))
+        if not decompressed:
+            raise RequestParsingError("Failed to decompress data.")
+        # lz-string works on UTF-16 code units, so join up any surrogate pairs
+        decompressed = decompressed.encode("utf-16", "surrogatepass").decode("utf-16")
+        return _decode_uncompressed(decompressed, allow_gzip=False)
+
+    # Some clients gzip the body without telling us, which the sniffing picks up
+    return _decode_uncompressed(data, allow_gzip=True)
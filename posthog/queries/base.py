@@ -19,14 +19,16 @@ def determine_compared_filter(filter) -> Filter:
 
 
 def convert_to_comparison(trend_entity: List[Dict[str, Any]], filter, label: str) -> List[Dict[str, Any]]:
+    interval = filter.interval if filter.interval is not None else "day"
+    # Series of the same length share one labels list
+    labels_by_length: Dict[int, List[str]] = {}
     for entity in trend_entity:
-        labels = [
-            "{} {}".format(filter.interval if filter.interval is not None else "day", i)
-            for i in range(len(entity["labels"]))
-        ]
+        length = len(entity["labels"])
+        if length not in labels_by_length:
+            labels_by_length[length] = ["{} {}".format(interval, i) for i in range(length)]
         entity.update(
             {
-                "labels": labels,
+                "labels": labels_by_length[length],
                 "days": entity["days"],
                 "label": entity["label"],
                 "compare_label": label,
@@ -1,6 +1,6 @@
 from typing import Counter, List, Set, Union, cast
 
-from ee.clickhouse.materialized_columns.columns import ColumnName, get_materialized_columns
+from ee.clickhouse.materialized_columns.columns import ColumnName
 from ee.clickhouse.models.property import box_value, extract_tables_and_properties
 from posthog.constants import TREND_FILTER_TYPE_ACTIONS, FunnelCorrelationType
 from posthog.models.action.util import get_action_tables_and_properties, uses_elements_chain
@@ -13,6 +13,7 @@ from posthog.models.filters.stickiness_filter import StickinessFilter
 from posthog.models.filters.utils import GroupTypeIndex
 from posthog.models.property import PropertyIdentifier, PropertyType, TableWithProperties
 from posthog.queries.property_optimizer import PropertyOptimizer
+from posthog.queries.query_metadata import get_materialized_columns
 
 
 class ColumnOptimizer:
@@ -16,6 +16,7 @@ from posthog.models.utils import PersonPropertiesMode
 from posthog.queries.column_optimizer import ColumnOptimizer
 from posthog.queries.person_distinct_id_query import get_team_distinct_ids_query
 from posthog.queries.person_query import PersonQuery
+from posthog.queries.query_metadata import get_cohort, timed_planning
 from posthog.queries.util import parse_timestamps
 
 
@@ -34,6 +35,12 @@ class EventQuery(metaclass=ABCMeta):
     _extra_event_properties: List[PropertyName]
     _extra_person_fields: List[ColumnName]
 
+    def __init_subclass__(cls, **kwargs) -> None:
+        super().__init_subclass__(**kwargs)
+        if "get_query" in cls.__dict__:
+            cls.get_query = timed_planning()(cls.get_query)  # type: ignore
+
+    @timed_planning()
     def __init__(
         self,
         filter: Union[Filter, PathFilter, RetentionFilter, StickinessFilter, SessionRecordingsFilter],
@@ -84,8 +91,9 @@ class EventQuery(metaclass=ABCMeta):
 
     def _get_distinct_id_query(self) -> str:
         if self._should_join_distinct_ids:
+            distinct_ids_query = get_team_distinct_ids_query(self._team_id, allow_snapshot=True)
             return f"""
-            INNER JOIN ({get_team_distinct_ids_query(self._team_id)}) AS {self.DISTINCT_ID_TABLE_ALIAS}
+            INNER JOIN ({distinct_ids_query}) AS {self.DISTINCT_ID_TABLE_ALIAS}
             ON {self.EVENT_TABLE_ALIAS}.distinct_id = {self.DISTINCT_ID_TABLE_ALIAS}.distinct_id
             """
         else:
@@ -118,7 +126,7 @@ class EventQuery(metaclass=ABCMeta):
 
     def _does_cohort_need_persons(self, prop: Property) -> bool:
         try:
-            cohort: Cohort = Cohort.objects.get(pk=prop.value, team_id=self._team_id)
+            cohort: Cohort = get_cohort(prop.value, self._team_id)
         except Cohort.DoesNotExist:
             return False
         if is_precalculated_query(cohort):
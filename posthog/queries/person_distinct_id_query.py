@@ -1,14 +1,43 @@
+import time
 from datetime import timedelta
+from typing import List, Optional, Tuple
+
+from django.core.cache import cache
 
 from ee.clickhouse.materialized_columns.util import cache_for
-from ee.clickhouse.sql.person import GET_TEAM_PERSON_DISTINCT_IDS, GET_TEAM_PERSON_DISTINCT_IDS_NEW_TABLE
+from ee.clickhouse.replication.utils import clickhouse_is_replicated
+from ee.clickhouse.sql.person import (
+    GET_TEAM_PERSON_DISTINCT_IDS,
+    GET_TEAM_PERSON_DISTINCT_IDS_FROM_SNAPSHOT,
+    GET_TEAM_PERSON_DISTINCT_IDS_NEW_TABLE,
+    INSERT_PERSON_DISTINCT_ID_SNAPSHOT_SQL,
+)
+from posthog import redis
 from posthog.models.async_migration import is_async_migration_complete
-from posthog.settings import BENCHMARK, TEST
+from posthog.settings import (
+    BENCHMARK,
+    CLICKHOUSE_CLUSTER,
+    PERSON_DISTINCT_ID_SNAPSHOT_ENABLED,
+    PERSON_DISTINCT_ID_SNAPSHOT_MAX_AGE_SECONDS,
+    TEST,
+)
 
 using_new_table = TEST or BENCHMARK
 
+# Rows can reach person_distinct_id2 a while after their _timestamp, e.g. when ingestion lags. Changes within this
+# margin before a refresh are always re-resolved from person_distinct_id2 rather than trusted to be in the snapshot.
+SNAPSHOT_WATERMARK_OVERLAP = timedelta(minutes=10)
+# Snapshots are only kept up to date for teams that ran a query that could use one within this period
+SNAPSHOT_ACTIVE_TEAM_PERIOD = timedelta(days=1)
+# Sorted set of the teams whose queries could use a snapshot, scored by when they last ran one
+SNAPSHOT_ACTIVE_TEAMS_KEY = "person_distinct_id_snapshot_active_teams"
+
 
-def get_team_distinct_ids_query(team_id: int) -> str:
+def get_team_distinct_ids_query(team_id: int, allow_snapshot: bool = False) -> str:
+    """
+    Returns a subquery mapping each of the team's distinct_ids to its person_id. With `allow_snapshot`, the team's
+    person_distinct_id_snapshot is used instead of deduplicating person_distinct_id2, as long as it's fresh.
+    """
     from posthog.client import substitute_params
 
     global using_new_table
@@ -16,11 +45,79 @@ def get_team_distinct_ids_query(team_id: int) -> str:
     using_new_table = using_new_table or _fetch_person_distinct_id2_ready()
 
     if using_new_table:
+        snapshot = get_person_distinct_id_snapshot(team_id) if allow_snapshot else None
+        if snapshot is not None:
+            snapshot_version, watermark = snapshot
+            return substitute_params(
+                GET_TEAM_PERSON_DISTINCT_IDS_FROM_SNAPSHOT,
+                {"team_id": team_id, "snapshot_version": snapshot_version, "watermark": watermark},
+            )
         return substitute_params(GET_TEAM_PERSON_DISTINCT_IDS_NEW_TABLE, {"team_id": team_id})
     else:
         return substitute_params(GET_TEAM_PERSON_DISTINCT_IDS, {"team_id": team_id})
 
 
+def _snapshot_cache_key(team_id: int) -> str:
+    return f"person_distinct_id_snapshot_{team_id}"
+
+
+def get_person_distinct_id_snapshot(team_id: int) -> Optional[Tuple[int, int]]:
+    """
+    Returns the `(snapshot_version, watermark)` of the team's latest snapshot, or None if there's no fresh one. Either
+    way the team is marked as active, so its snapshot is refreshed for the next `SNAPSHOT_ACTIVE_TEAM_PERIOD`.
+    """
+    if not PERSON_DISTINCT_ID_SNAPSHOT_ENABLED:
+        return None
+    redis.get_client().zadd(SNAPSHOT_ACTIVE_TEAMS_KEY, {str(team_id): time.time()})
+    snapshot = cache.get(_snapshot_cache_key(team_id))
+    if snapshot is None or time.time() - snapshot[0] > PERSON_DISTINCT_ID_SNAPSHOT_MAX_AGE_SECONDS:
+        return None
+    return snapshot
+
+
+def refresh_person_distinct_id_snapshot(team_id: int) -> None:
+    """
+    Writes a new snapshot of the team's distinct_id -> person_id mapping. Queries only switch over to it once it has
+    been fully written to every replica, until then they keep using the previous snapshot.
+    """
+    from posthog.client import sync_execute
+
+    snapshot_version = int(time.time())
+    watermark = snapshot_version - int(SNAPSHOT_WATERMARK_OVERLAP.total_seconds())
+    insert_quorum = _replica_count()
+    sync_execute(
+        INSERT_PERSON_DISTINCT_ID_SNAPSHOT_SQL,
+        {"team_id": team_id, "snapshot_version": snapshot_version},
+        settings={"insert_quorum": insert_quorum} if insert_quorum > 1 else None,
+    )
+    cache.set(
+        _snapshot_cache_key(team_id), (snapshot_version, watermark), timeout=PERSON_DISTINCT_ID_SNAPSHOT_MAX_AGE_SECONDS
+    )
+
+
+def get_active_snapshot_team_ids() -> List[int]:
+    "Returns the teams that ran a query that could use a snapshot within the last `SNAPSHOT_ACTIVE_TEAM_PERIOD`."
+    redis_client = redis.get_client()
+    cutoff = time.time() - SNAPSHOT_ACTIVE_TEAM_PERIOD.total_seconds()
+    redis_client.zremrangebyscore(SNAPSHOT_ACTIVE_TEAMS_KEY, "-inf", cutoff)
+    return sorted(int(team_id) for team_id in redis_client.zrangebyscore(SNAPSHOT_ACTIVE_TEAMS_KEY, cutoff, "+inf"))
+
+
+@cache_for(timedelta(minutes=10))
+def _replica_count() -> int:
+    """
+    The snapshot table is replicated in full to every node in the cluster, so a snapshot is only complete once all of
+    them have it. Otherwise queries routed to a lagging replica would read a partial snapshot.
+    """
+    from posthog.client import sync_execute
+
+    if not clickhouse_is_replicated():
+        return 1
+    return sync_execute(
+        "SELECT count() FROM system.clusters WHERE cluster = %(cluster)s", {"cluster": CLICKHOUSE_CLUSTER}
+    )[0][0]
+
+
 is_ready = False
 
 # :TRICKY: Avoid overly eagerly checking whether the migration is complete.
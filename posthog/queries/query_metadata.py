@@ -0,0 +1,192 @@
+"""
+Request-scoped cache of the Postgres metadata that query builders look up while planning ClickHouse queries: cohorts,
+actions (with their steps), group type mappings and materialized columns.
+
+Funnels, correlation and dashboard refreshes build several `EventQuery`s per request, each of which used to look up the
+same cohorts and actions again. Within a `query_metadata_scope()` every lookup hits Postgres at most once, and saving
+or deleting any of these models clears the cache. Every lookup returns its own copy of the cached model, so a caller
+mutating it doesn't affect the others. Outside of a scope lookups aren't cached, so behaviour there is unchanged.
+
+Queryset `.update()`, `.bulk_create()` and raw SQL don't send signals, so they bypass the cache: lookups later in the
+same scope keep returning what was loaded before. Code that writes these models that way and then plans a query that
+must see the change should call `clear_query_metadata_cache()` itself.
+
+Time spent planning, i.e. constructing `EventQuery`s and building their SQL, is reported as `query_planning_time`.
+"""
+import copy
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+    Union,
+    cast,
+)
+
+from django.db.models import Model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from statshog.defaults.django import statsd
+
+from posthog.models.action import Action
+from posthog.models.action_step import ActionStep
+from posthog.models.cohort import Cohort
+from posthog.models.group_type_mapping import GroupTypeMapping
+
+if TYPE_CHECKING:
+    from ee.clickhouse.materialized_columns.columns import ColumnName, TablesWithMaterializedColumns
+    from posthog.models.property import PropertyName
+
+T = TypeVar("T")
+M = TypeVar("M", bound=Model)
+
+
+class QueryMetadataCache:
+    def __init__(self):
+        self.planning_time = 0.0
+        self.planning_depth = 0
+        self.clear()
+
+    def clear(self) -> None:
+        self.cohorts: Dict[Tuple[str, Optional[int]], Optional[Cohort]] = {}
+        self.actions: Dict[Tuple[str, Optional[int]], Optional[Action]] = {}
+        self.group_type_mappings: Dict[int, List[GroupTypeMapping]] = {}
+        self.materialized_columns: Dict[str, Dict["PropertyName", "ColumnName"]] = {}
+
+
+_active_cache: ContextVar[Optional[QueryMetadataCache]] = ContextVar("query_metadata_cache", default=None)
+
+
+@contextmanager
+def query_metadata_scope(kind: str) -> Iterator[QueryMetadataCache]:
+    """
+    Caches metadata lookups until the scope exits, then reports the time spent planning queries within it.
+    Nested scopes share the outermost scope's cache.
+    """
+    cache = _active_cache.get()
+    if cache is not None:
+        yield cache
+        return
+
+    cache = QueryMetadataCache()
+    token = _active_cache.set(cache)
+    try:
+        yield cache
+    finally:
+        _active_cache.reset(token)
+        if cache.planning_time > 0:
+            statsd.timing("query_planning_time", cache.planning_time * 1000, tags={"kind": kind})
+
+
+@contextmanager
+def timed_planning() -> Iterator[None]:
+    "Adds the time spent in the block to the scope's planning time. Nested blocks are only counted once."
+    cache = _active_cache.get()
+    if cache is not None and cache.planning_depth > 0:
+        yield
+        return
+
+    start_time = time.perf_counter()
+    if cache is not None:
+        cache.planning_depth += 1
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start_time
+        if cache is not None:
+            cache.planning_depth -= 1
+            cache.planning_time += elapsed
+        else:
+            statsd.timing("query_planning_time", elapsed * 1000, tags={"kind": "unscoped"})
+
+
+def _cached(store: Callable[[QueryMetadataCache], Dict[Any, Any]], key: Any, load: Callable[[], T]) -> T:
+    cache = _active_cache.get()
+    if cache is None:
+        return load()
+    values = store(cache)
+    if key not in values:
+        values[key] = load()
+    return values[key]
+
+
+def _copy(instance: Optional[M]) -> Optional[M]:
+    if instance is None:
+        return None
+    copied = copy.copy(instance)
+    if hasattr(instance, "_prefetched_objects_cache"):
+        copied._prefetched_objects_cache = dict(instance._prefetched_objects_cache)  # type: ignore
+    return copied
+
+
+def get_cohort(cohort_id: Union[str, int], team_id: Optional[int] = None) -> Cohort:
+    "Same as `Cohort.objects.get(pk=cohort_id, team_id=team_id)`, team_id being optional."
+
+    def load() -> Optional[Cohort]:
+        try:
+            if team_id is None:
+                return Cohort.objects.get(pk=cohort_id)
+            return Cohort.objects.get(pk=cohort_id, team_id=team_id)
+        except Cohort.DoesNotExist:
+            return None
+
+    cohort = _copy(_cached(lambda cache: cache.cohorts, (str(cohort_id), team_id), load))
+    if cohort is None:
+        raise Cohort.DoesNotExist(f"Cohort {cohort_id} does not exist")
+    return cohort
+
+
+def get_action(action_id: Union[str, int], team_id: Optional[int] = None) -> Action:
+    "Same as `Action.objects.get(pk=action_id, team_id=team_id)`, team_id being optional. Steps are prefetched."
+
+    def load() -> Optional[Action]:
+        queryset = Action.objects.prefetch_related("steps")
+        try:
+            if team_id is None:
+                return queryset.get(pk=action_id)
+            return queryset.get(pk=action_id, team_id=team_id)
+        except Action.DoesNotExist:
+            return None
+
+    action = _copy(_cached(lambda cache: cache.actions, (str(action_id), team_id), load))
+    if action is None:
+        raise Action.DoesNotExist(f"Action {action_id} does not exist")
+    return action
+
+
+def get_group_type_mappings(team_id: int) -> List[GroupTypeMapping]:
+    mappings = _cached(
+        lambda cache: cache.group_type_mappings,
+        team_id,
+        lambda: list(GroupTypeMapping.objects.filter(team_id=team_id).order_by("group_type_index")),
+    )
+    return [cast(GroupTypeMapping, _copy(mapping)) for mapping in mappings]
+
+
+def get_materialized_columns(table: "TablesWithMaterializedColumns") -> Dict["PropertyName", "ColumnName"]:
+    "Pins the (already process-cached) materialized columns for the scope, so all queries in it agree on them."
+    from ee.clickhouse.materialized_columns.columns import get_materialized_columns
+
+    return dict(_cached(lambda cache: cache.materialized_columns, table, lambda: get_materialized_columns(table)))
+
+
+@receiver(post_save, sender=Cohort)
+@receiver(post_delete, sender=Cohort)
+@receiver(post_save, sender=Action)
+@receiver(post_delete, sender=Action)
+@receiver(post_save, sender=ActionStep)
+@receiver(post_delete, sender=ActionStep)
+@receiver(post_save, sender=GroupTypeMapping)
+@receiver(post_delete, sender=GroupTypeMapping)
+def clear_query_metadata_cache(sender=None, **kwargs) -> None:
+    cache = _active_cache.get()
+    if cache is not None:
+        cache.clear()
@@ -0,0 +1,134 @@
+"""
+Shared, bounded pool for running one insight's ClickHouse queries concurrently, e.g. a trend's entities and both of
+its compare periods, so the insight takes as long as its slowest query rather than the sum of all of them.
+
+Each process has one pool of `CLICKHOUSE_QUERY_POOL_SIZE` threads, of which at most `CLICKHOUSE_QUERY_POOL_TEAM_LIMIT`
+run queries for the same team at any time, so one team's large dashboard can't take up the whole pool. A team's slots
+are dropped once no caller or task is using them.
+
+Tasks run with a copy of the caller's context, so context-scoped state such as the query metadata cache and the query
+tags in `posthog.client._request_information` carries over.
+Tasks should only execute queries: planning does Postgres lookups and belongs in the calling thread.
+"""
+import contextvars
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, TypeVar
+
+from posthog.settings import CLICKHOUSE_QUERY_POOL_SIZE, CLICKHOUSE_QUERY_POOL_TEAM_LIMIT
+
+T = TypeVar("T")
+
+_lock = threading.Lock()
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_pid: Optional[int] = None
+_team_slots: Dict[int, threading.BoundedSemaphore] = {}
+_team_slot_users: Dict[int, int] = {}
+_thread_state = threading.local()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor, _executor_pid
+
+    with _lock:
+        # Threads don't survive forking, so e.g. celery's prefork workers each need their own pool
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=CLICKHOUSE_QUERY_POOL_SIZE, thread_name_prefix="query_pool")
+            _executor_pid = os.getpid()
+            _team_slots.clear()
+            _team_slot_users.clear()
+        return _executor
+
+
+def _get_team_slots(team_id: int) -> threading.BoundedSemaphore:
+    """
+    Returns the team's slots and counts the caller as using them until it calls `_put_team_slots`.
+    """
+    with _lock:
+        if team_id not in _team_slots:
+            _team_slots[team_id] = threading.BoundedSemaphore(CLICKHOUSE_QUERY_POOL_TEAM_LIMIT)
+        _team_slot_users[team_id] = _team_slot_users.get(team_id, 0) + 1
+        return _team_slots[team_id]
+
+
+def _put_team_slots(team_id: int) -> None:
+    with _lock:
+        _team_slot_users[team_id] -= 1
+        # Nothing holds or waits for a slot, so drop them rather than keeping slots for every team ever queried
+        if _team_slot_users[team_id] == 0:
+            del _team_slot_users[team_id]
+            del _team_slots[team_id]
+
+
+def _release_slot(team_id: int, slots: threading.BoundedSemaphore) -> None:
+    slots.release()
+    _put_team_slots(team_id)
+
+
+def _run_holding_slot(task: Callable[[], T], team_id: int, slots: threading.BoundedSemaphore) -> T:
+    previously_holding = getattr(_thread_state, "holds_slot", False)
+    _thread_state.holds_slot = True
+    try:
+        return task()
+    finally:
+        _thread_state.holds_slot = previously_holding
+        _release_slot(team_id, slots)
+
+
+def run_in_parallel(team_id: int, tasks: Sequence[Callable[[], T]]) -> List[T]:
+    """
+    Runs `tasks` in the shared query pool and returns their results in order. Raises the first failed task's error.
+
+    The caller waits for a free team slot before handing each task to the pool. Tasks that are still queued once the
+    caller starts collecting results are taken back and run by the caller itself. Nested calls, from a task holding a
+    slot, never wait for slots: tasks that don't get one straight away run inline, which keeps nesting deadlock free.
+    """
+    if len(tasks) <= 1:
+        return [task() for task in tasks]
+
+    executor = _get_executor()
+    slots = _get_team_slots(team_id)
+    try:
+        return _run_with_slots(executor, team_id, slots, tasks)
+    finally:
+        _put_team_slots(team_id)
+
+
+def _run_with_slots(
+    executor: ThreadPoolExecutor, team_id: int, slots: threading.BoundedSemaphore, tasks: Sequence[Callable[[], T]]
+) -> List[T]:
+    nested = getattr(_thread_state, "holds_slot", False)
+
+    futures: List[Optional[Future]] = []
+    try:
+        for task in tasks:
+            if not slots.acquire(blocking=not nested):
+                futures.append(None)
+                continue
+            # Each held slot counts as a user too, as tasks can outlive a caller that has raised
+            _get_team_slots(team_id)
+            try:
+                context = contextvars.copy_context()
+                futures.append(executor.submit(context.run, _run_holding_slot, task, team_id, slots))
+            except BaseException:
+                _release_slot(team_id, slots)
+                raise
+
+        results = []
+        for index, (task, future) in enumerate(zip(tasks, futures)):
+            # Taken off the list first, so the error handling below doesn't cancel it a second time
+            futures[index] = None
+            if future is None:
+                results.append(task())
+            elif future.cancel():
+                # Still queued: its slot is ours, so run it here rather than waiting for a thread
+                results.append(_run_holding_slot(task, team_id, slots))
+            else:
+                results.append(future.result())
+        return results
+    except BaseException:
+        for future in futures:
+            if future is not None and future.cancel():
+                _release_slot(team_id, slots)
+        raise
@@ -1,5 +1,5 @@
 import dataclasses
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from typing import Dict, List, Optional, Tuple, cast
 
 from rest_framework.request import Request
@@ -10,7 +10,9 @@ from posthog.helpers.session_recording import (
     RecordingSegment,
     SnapshotDataTaggedWithWindowId,
     WindowId,
+    build_chunk_time_index,
     decompress_chunked_snapshot_data,
+    find_chunk_offset_for_time,
     generate_inactive_segments_for_range,
     get_active_segments_from_event_list,
 )
@@ -33,18 +35,40 @@ class SessionRecording:
         self._request = request
         self._session_recording_id = session_recording_id
         self._team = team
+        self._all_snapshots: Optional[List[SnapshotDataTaggedWithWindowId]] = None
 
     def _query_recording_snapshots(self) -> List[SessionRecordingEvent]:
         raise NotImplementedError()
 
+    def _get_all_snapshots(self) -> List[SnapshotDataTaggedWithWindowId]:
+        if self._all_snapshots is None:
+            self._all_snapshots = [
+                SnapshotDataTaggedWithWindowId(
+                    window_id=recording_snapshot.window_id,
+                    snapshot_data=recording_snapshot.snapshot_data,
+                    timestamp=recording_snapshot.timestamp,
+                )
+                for recording_snapshot in self._query_recording_snapshots()
+            ]
+        return self._all_snapshots
+
     def get_snapshots(self, limit, offset) -> DecompressedRecordingData:
-        all_snapshots = [
-            SnapshotDataTaggedWithWindowId(
-                window_id=recording_snapshot.window_id, snapshot_data=recording_snapshot.snapshot_data
-            )
-            for recording_snapshot in self._query_recording_snapshots()
-        ]
-        return decompress_chunked_snapshot_data(self._team.pk, self._session_recording_id, all_snapshots, limit, offset)
+        return decompress_chunked_snapshot_data(
+            self._team.pk, self._session_recording_id, self._get_all_snapshots(), limit, offset
+        )
+
+    def get_snapshots_offset_for_time_offset(self, time_offset_ms: int) -> int:
+        """
+        Returns the `offset` to pass to `get_snapshots` to start playback `time_offset_ms` into the recording, found
+        from the chunks' timestamps without decompressing any of them.
+        """
+        all_snapshots = self._get_all_snapshots()
+        timestamps = [snapshot.timestamp for snapshot in all_snapshots if snapshot.timestamp is not None]
+        if len(timestamps) == 0:
+            return 0
+        return find_chunk_offset_for_time(
+            build_chunk_time_index(all_snapshots), min(timestamps) + timedelta(milliseconds=time_offset_ms)
+        )
 
     def get_metadata(self) -> Optional[RecordingMetadata]:
         all_snapshots: List[SnapshotDataTaggedWithWindowId] = []
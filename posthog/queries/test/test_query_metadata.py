@@ -0,0 +1,55 @@
+from posthog.models import Action, ActionStep, Cohort
+from posthog.queries.query_metadata import get_action, get_cohort, query_metadata_scope
+from posthog.test.base import BaseTest
+
+
+class TestQueryMetadata(BaseTest):
+    def test_lookups_are_cached_within_a_scope(self):
+        cohort = Cohort.objects.create(team=self.team, name="cohort", groups=[{"properties": {"email": "a"}}])
+        action = Action.objects.create(team=self.team, name="action")
+        ActionStep.objects.create(action=action, event="$pageview")
+
+        with query_metadata_scope("test"):
+            with self.assertNumQueries(3):
+                self.assertEqual(get_cohort(cohort.pk, self.team.pk), cohort)
+                self.assertEqual(get_cohort(str(cohort.pk), self.team.pk), cohort)
+                # Action and its prefetched steps
+                self.assertEqual([step.event for step in get_action(action.pk).steps.all()], ["$pageview"])
+                self.assertEqual([step.event for step in get_action(action.pk).steps.all()], ["$pageview"])
+
+    def test_missing_objects_are_cached_within_a_scope(self):
+        with query_metadata_scope("test"):
+            with self.assertNumQueries(1):
+                for _ in range(2):
+                    with self.assertRaises(Cohort.DoesNotExist):
+                        get_cohort(999999, self.team.pk)
+
+    def test_saving_clears_the_cache(self):
+        cohort = Cohort.objects.create(team=self.team, name="cohort", groups=[{"properties": {"email": "a"}}])
+
+        with query_metadata_scope("test"):
+            self.assertEqual(get_cohort(cohort.pk, self.team.pk).name, "cohort")
+
+            cohort.name = "renamed"
+            cohort.save()
+            self.assertEqual(get_cohort(cohort.pk, self.team.pk).name, "renamed")
+
+    def test_callers_get_their_own_copies(self):
+        cohort = Cohort.objects.create(team=self.team, name="cohort", groups=[{"properties": {"email": "a"}}])
+        action = Action.objects.create(team=self.team, name="action")
+
+        with query_metadata_scope("test"):
+            # Cohort, and action with its prefetched steps
+            with self.assertNumQueries(3):
+                get_cohort(cohort.pk, self.team.pk).is_calculating = True
+                get_action(action.pk).name = "changed"
+
+                self.assertFalse(get_cohort(cohort.pk, self.team.pk).is_calculating)
+                self.assertEqual(get_action(action.pk).name, "action")
+
+    def test_lookups_are_not_cached_outside_a_scope(self):
+        cohort = Cohort.objects.create(team=self.team, name="cohort", groups=[{"properties": {"email": "a"}}])
+
+        with self.assertNumQueries(2):
+            get_cohort(cohort.pk, self.team.pk)
+            get_cohort(cohort.pk, self.team.pk)
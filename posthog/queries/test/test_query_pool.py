@@ -0,0 +1,73 @@
+import threading
+import time
+from unittest import TestCase
+from unittest.mock import patch
+
+from posthog import client
+from posthog.queries import query_pool
+from posthog.queries.query_metadata import _active_cache, query_metadata_scope
+from posthog.queries.query_pool import run_in_parallel
+
+
+class TestQueryPool(TestCase):
+    def setUp(self):
+        self.lock = threading.Lock()
+        self.running = 0
+        self.peak = 0
+
+    def _task(self, value, duration=0.05):
+        def task():
+            with self.lock:
+                self.running += 1
+                self.peak = max(self.peak, self.running)
+            time.sleep(duration)
+            with self.lock:
+                self.running -= 1
+            return value
+
+        return task
+
+    def test_results_are_returned_in_order(self):
+        tasks = [self._task(index, 0.01 * (5 - index)) for index in range(5)]
+
+        self.assertEqual(run_in_parallel(1, tasks), list(range(5)))
+
+    @patch.object(query_pool, "CLICKHOUSE_QUERY_POOL_TEAM_LIMIT", 2)
+    def test_team_concurrency_is_limited(self):
+        run_in_parallel(2, [self._task(index) for index in range(6)])
+
+        self.assertEqual(self.peak, 2)
+
+    def test_nested_calls_complete(self):
+        outer = lambda index: lambda: sum(run_in_parallel(3, [self._task(1) for _ in range(3)])) + index
+
+        self.assertEqual(run_in_parallel(3, [outer(index * 10) for index in range(8)]), [3, 13, 23, 33, 43, 53, 63, 73])
+
+    def test_errors_are_raised_and_slots_released(self):
+        def fail():
+            raise ValueError("query failed")
+
+        with self.assertRaises(ValueError):
+            run_in_parallel(4, [self._task(0), fail, self._task(2)])
+
+        time.sleep(0.1)
+        self.assertEqual(run_in_parallel(4, [self._task(index) for index in range(4)]), [0, 1, 2, 3])
+
+    def test_idle_team_slots_are_dropped(self):
+        run_in_parallel(6, [self._task(index) for index in range(3)])
+
+        self.assertNotIn(6, query_pool._team_slots)
+        self.assertNotIn(6, query_pool._team_slot_users)
+
+    def test_tasks_see_the_callers_context(self):
+        with query_metadata_scope("test") as cache:
+            self.assertEqual(run_in_parallel(5, [_active_cache.get, _active_cache.get]), [cache, cache])
+
+    def test_tasks_are_tagged_with_the_callers_request_information(self):
+        token = client._request_information.set({"kind": "request", "id": "insight"})
+        try:
+            tags = run_in_parallel(7, [client._request_information.get, client._request_information.get])
+        finally:
+            client._request_information.reset(token)
+
+        self.assertEqual(tags, [{"kind": "request", "id": "insight"}] * 2)
@@ -38,6 +38,22 @@ from posthog.settings.utils import get_from_env, str_to_bool
 
 USE_PRECALCULATED_CH_COHORT_PEOPLE = not TEST
 CALCULATE_X_COHORTS_PARALLEL = get_from_env("CALCULATE_X_COHORTS_PARALLEL", 2, type_cast=int)
+# Scheduled recalculations only re-evaluate persons that changed since the last run, except every Nth one
+COHORT_FULL_RECALCULATION_EVERY_N_RUNS = get_from_env("COHORT_FULL_RECALCULATION_EVERY_N_RUNS", 12, type_cast=int)
+# Let scheduled recalculations of "performed event" cohorts only scan new events. Persons whose events fall out
+# of the cohort's time window are then only removed on the next full recalculation.
+COHORT_SLIDING_WINDOW_ENABLED = get_from_env("COHORT_SLIDING_WINDOW_ENABLED", False, type_cast=str_to_bool)
+
+# Join persons through a periodically refreshed snapshot of each team's distinct_id -> person_id mapping, rather than
+# deduplicating person_distinct_id2 in every query. Snapshots older than the max age aren't used, and are deleted
+# one refresh interval after that.
+PERSON_DISTINCT_ID_SNAPSHOT_ENABLED = get_from_env("PERSON_DISTINCT_ID_SNAPSHOT_ENABLED", False, type_cast=str_to_bool)
+PERSON_DISTINCT_ID_SNAPSHOT_REFRESH_INTERVAL_SECONDS = get_from_env(
+    "PERSON_DISTINCT_ID_SNAPSHOT_REFRESH_INTERVAL_SECONDS", 30 * 60, type_cast=int
+)
+PERSON_DISTINCT_ID_SNAPSHOT_MAX_AGE_SECONDS = get_from_env(
+    "PERSON_DISTINCT_ID_SNAPSHOT_MAX_AGE_SECONDS", 2 * 60 * 60, type_cast=int
+)
 
 # Instance configuration preferences
 # https://posthog.com/docs/self-host/configure/environment-variables
@@ -89,6 +105,8 @@ UPDATE_CACHED_DASHBOARD_ITEMS_INTERVAL_SECONDS = get_from_env(
 
 # Whether to capture internal metrics
 CAPTURE_INTERNAL_METRICS = get_from_env("CAPTURE_INTERNAL_METRICS", False, type_cast=str_to_bool)
+# How often aggregated internal metrics get captured as events
+INTERNAL_METRICS_FLUSH_INTERVAL_SECONDS = get_from_env("INTERNAL_METRICS_FLUSH_INTERVAL_SECONDS", 60, type_cast=int)
 
 HOOK_EVENTS: Dict[str, str] = {}
 
@@ -102,6 +120,9 @@ MULTI_TENANCY = False
 CACHED_RESULTS_TTL = 7 * 24 * 60 * 60  # how long to keep cached results for
 TEMP_CACHE_RESULTS_TTL = 24 * 60 * 60  # how long to keep non dashboard cached results for
 SESSION_RECORDING_TTL = 30  # how long to keep session recording cache. Relatively short because cached result is used throughout the duration a session recording loads.
+# How new session recording chunks are encoded, see posthog/helpers/session_recording.py. Either is always decodable
+# here, but only opt into "utf8-gzip-base64" once every other reader of the chunks understands it too.
+SESSION_RECORDING_CHUNK_COMPRESSION = get_from_env("SESSION_RECORDING_CHUNK_COMPRESSION", "gzip-base64")
 
 AUTO_LOGIN = get_from_env("AUTO_LOGIN", False, type_cast=str_to_bool)
 
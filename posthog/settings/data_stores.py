@@ -89,6 +89,11 @@ CLICKHOUSE_ASYNC = get_from_env("CLICKHOUSE_ASYNC", False, type_cast=str_to_bool
 CLICKHOUSE_CONN_POOL_MIN = get_from_env("CLICKHOUSE_CONN_POOL_MIN", 20, type_cast=int)
 CLICKHOUSE_CONN_POOL_MAX = get_from_env("CLICKHOUSE_CONN_POOL_MAX", 1000, type_cast=int)
 
+# Threads per process for running one insight's queries (entities, compare periods) concurrently, and how many of
+# those may run one team's queries at the same time
+CLICKHOUSE_QUERY_POOL_SIZE = get_from_env("CLICKHOUSE_QUERY_POOL_SIZE", 16, type_cast=int)
+CLICKHOUSE_QUERY_POOL_TEAM_LIMIT = get_from_env("CLICKHOUSE_QUERY_POOL_TEAM_LIMIT", 4, type_cast=int)
+
 CLICKHOUSE_STABLE_HOST = get_from_env("CLICKHOUSE_STABLE_HOST", CLICKHOUSE_HOST)
 
 # This disables using external schemas like protobuf for clickhouse kafka engine
@@ -120,6 +125,36 @@ KAFKA_SASL_MECHANISM = os.getenv("KAFKA_SASL_MECHANISM", None)
 KAFKA_SASL_USER = os.getenv("KAFKA_SASL_USER", None)
 KAFKA_SASL_PASSWORD = os.getenv("KAFKA_SASL_PASSWORD", None)
 
+# Producer batching and buffering. `send` only ever blocks for up to KAFKA_PRODUCER_MAX_BLOCK_MS waiting for buffer
+# space, and once KAFKA_PRODUCER_MAX_IN_FLIGHT_MESSAGES are waiting on delivery new messages are rejected outright,
+# so a slow broker sheds load instead of tying up web workers.
+KAFKA_PRODUCER_LINGER_MS = get_from_env("KAFKA_PRODUCER_LINGER_MS", 20, type_cast=int)
+KAFKA_PRODUCER_BATCH_SIZE = get_from_env("KAFKA_PRODUCER_BATCH_SIZE", 131072, type_cast=int)
+KAFKA_PRODUCER_BUFFER_MEMORY = get_from_env("KAFKA_PRODUCER_BUFFER_MEMORY", 64 * 1024 * 1024, type_cast=int)
+KAFKA_PRODUCER_MAX_BLOCK_MS = get_from_env("KAFKA_PRODUCER_MAX_BLOCK_MS", 1000, type_cast=int)
+KAFKA_PRODUCER_MAX_IN_FLIGHT_MESSAGES = get_from_env("KAFKA_PRODUCER_MAX_IN_FLIGHT_MESSAGES", 100_000, type_cast=int)
+# How often buffer depth, in-flight count and delivery latency are reported through internal metrics
+KAFKA_PRODUCER_METRICS_INTERVAL_SECONDS = get_from_env("KAFKA_PRODUCER_METRICS_INTERVAL_SECONDS", 10, type_cast=int)
+
+# Local disk queue capture spills events to when Kafka won't take them, replayed in the background once it recovers
+CAPTURE_SPILL_QUEUE_ENABLED = get_from_env("CAPTURE_SPILL_QUEUE_ENABLED", False, type_cast=str_to_bool)
+CAPTURE_SPILL_QUEUE_DIR = os.getenv("CAPTURE_SPILL_QUEUE_DIR", "/tmp/posthog-capture-spill")
+CAPTURE_SPILL_QUEUE_MAX_BYTES = get_from_env("CAPTURE_SPILL_QUEUE_MAX_BYTES", 1024 * 1024 * 1024, type_cast=int)
+CAPTURE_SPILL_QUEUE_SEGMENT_MAX_BYTES = get_from_env(
+    "CAPTURE_SPILL_QUEUE_SEGMENT_MAX_BYTES", 16 * 1024 * 1024, type_cast=int
+)
+CAPTURE_SPILL_QUEUE_SEGMENT_MAX_AGE_SECONDS = get_from_env(
+    "CAPTURE_SPILL_QUEUE_SEGMENT_MAX_AGE_SECONDS", 5, type_cast=int
+)
+CAPTURE_SPILL_QUEUE_FSYNC_INTERVAL_MS = get_from_env("CAPTURE_SPILL_QUEUE_FSYNC_INTERVAL_MS", 200, type_cast=int)
+CAPTURE_SPILL_QUEUE_DRAIN_RATE_PER_SECOND = get_from_env(
+    "CAPTURE_SPILL_QUEUE_DRAIN_RATE_PER_SECOND", 2000, type_cast=int
+)
+# How long the drainer waits for Kafka to acknowledge replayed messages before it gives up and keeps them on disk
+CAPTURE_SPILL_QUEUE_DELIVERY_TIMEOUT_SECONDS = get_from_env(
+    "CAPTURE_SPILL_QUEUE_DELIVERY_TIMEOUT_SECONDS", 30, type_cast=int
+)
+
 # The last case happens when someone upgrades Heroku but doesn't have Redis installed yet. Collectstatic gets called before we can provision Redis.
 if TEST or DEBUG or IS_COLLECT_STATIC:
     REDIS_URL = os.getenv("REDIS_URL", "redis://localhost/")
@@ -7,6 +7,8 @@ import posthog.tasks.check_clickhouse_schema_drift
 import posthog.tasks.delete_clickhouse_data
 import posthog.tasks.delete_old_plugin_logs
 import posthog.tasks.email
+import posthog.tasks.evaluate_feature_flag
+import posthog.tasks.refresh_person_distinct_id_snapshots
 import posthog.tasks.split_person
 import posthog.tasks.status_report
 import posthog.tasks.sync_all_organization_available_features
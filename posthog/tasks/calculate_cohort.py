@@ -31,18 +31,18 @@ def calculate_cohorts() -> None:
     ):
 
         cohort = Cohort.objects.filter(pk=cohort.pk).get()
-        update_cohort(cohort)
+        update_cohort(cohort, incremental=True)
 
 
-def update_cohort(cohort: Cohort) -> None:
+def update_cohort(cohort: Cohort, incremental: bool = False) -> None:
     pending_version = get_and_update_pending_version(cohort)
-    calculate_cohort_ch.delay(cohort.id, pending_version)
+    calculate_cohort_ch.delay(cohort.id, pending_version, incremental)
 
 
 @shared_task(ignore_result=True, max_retries=2)
-def calculate_cohort_ch(cohort_id: int, pending_version: int) -> None:
+def calculate_cohort_ch(cohort_id: int, pending_version: int, incremental: bool = False) -> None:
     cohort: Cohort = Cohort.objects.get(pk=cohort_id)
-    cohort.calculate_people_ch(pending_version)
+    cohort.calculate_people_ch(pending_version, incremental=incremental)
 
 
 @shared_task(ignore_result=True, max_retries=1)
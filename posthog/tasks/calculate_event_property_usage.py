@@ -1,6 +1,8 @@
-from datetime import timedelta
-from typing import List, Tuple
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Sequence, Tuple
 
+from celery import group
 from celery.app import shared_task
 from django.utils.timezone import now
 
@@ -9,49 +11,89 @@ from posthog.models.event_definition import EventDefinition
 from posthog.models.insight import Insight
 from posthog.models.property_definition import PropertyDefinition
 
+# Number of teams handled by one task, and so by one ClickHouse volume query
+TEAMS_PER_TASK = 100
+UPDATE_BATCH_SIZE = 1000
+
+UsageCounts = Dict[Tuple[int, str], int]
+
 
 def calculate_event_property_usage() -> None:
-    for team in Team.objects.all():
-        calculate_event_property_usage_for_team(team_id=team.pk)
+    team_ids = list(Team.objects.order_by("pk").values_list("pk", flat=True))
+    group(
+        calculate_event_property_usage_for_teams.s(team_ids[index : index + TEAMS_PER_TASK])
+        for index in range(0, len(team_ids), TEAMS_PER_TASK)
+    ).apply_async()
 
 
 @shared_task(ignore_result=True, max_retries=1)
 def calculate_event_property_usage_for_team(team_id: int) -> None:
-    team = Team.objects.get(pk=team_id)
-    event_names = {event.name: 0 for event in EventDefinition.objects.filter(team_id=team_id)}
-
-    event_properties = {key.name: 0 for key in PropertyDefinition.objects.filter(team_id=team_id)}
-
-    for item in Insight.objects.filter(team=team, created_at__gt=now() - timedelta(days=30)):
-        for event in item.filters.get("events", []):
-            if event["id"] in event_names:
-                event_names[event["id"]] += 1
-
-        for prop in item.filters.get("properties", []):
-            if isinstance(prop, dict) and prop.get("key") in event_properties:
-                event_properties[prop["key"]] += 1
+    calculate_event_property_usage_for_teams([team_id])
 
-    events_volume = _get_events_volume(team)
-    for event, value in event_names.items():
-        volume = _extract_count(events_volume, event)
-        EventDefinition.objects.filter(name=event, team_id=team_id).update(
-            volume_30_day=volume, query_usage_30_day=value
-        )
 
-    for key, value in event_properties.items():
-        PropertyDefinition.objects.filter(name=key, team_id=team_id).update(query_usage_30_day=value)
-
-
-def _get_events_volume(team: Team) -> List[Tuple[str, int]]:
-    timestamp = now() - timedelta(days=30)
-    from ee.clickhouse.sql.events import GET_EVENTS_VOLUME
+@shared_task(ignore_result=True, max_retries=1)
+def calculate_event_property_usage_for_teams(team_ids: Sequence[int]) -> None:
+    """
+    Updates the 30 day query usage and volume of every event and property definition of `team_ids`. Usage is
+    counted in one pass over the teams' insights and volumes come from one ClickHouse query, and only definitions
+    whose numbers changed get written, in bulk.
+    """
+    if not team_ids:
+        return
+
+    since = now() - timedelta(days=30)
+    event_usage, property_usage = _get_usage(team_ids, since)
+    events_volume = _get_events_volume(team_ids, since)
+
+    event_definitions = []
+    for definition in EventDefinition.objects.filter(team_id__in=team_ids).only(
+        "id", "team_id", "name", "volume_30_day", "query_usage_30_day"
+    ):
+        key = (definition.team_id, definition.name)
+        volume, usage = events_volume.get(key, 0), event_usage.get(key, 0)
+        if (definition.volume_30_day, definition.query_usage_30_day) != (volume, usage):
+            definition.volume_30_day, definition.query_usage_30_day = volume, usage
+            event_definitions.append(definition)
+    EventDefinition.objects.bulk_update(
+        event_definitions, ["volume_30_day", "query_usage_30_day"], batch_size=UPDATE_BATCH_SIZE
+    )
+
+    property_definitions = []
+    for definition in PropertyDefinition.objects.filter(team_id__in=team_ids).only(
+        "id", "team_id", "name", "query_usage_30_day"
+    ):
+        usage = property_usage.get((definition.team_id, definition.name), 0)
+        if definition.query_usage_30_day != usage:
+            definition.query_usage_30_day = usage
+            property_definitions.append(definition)
+    PropertyDefinition.objects.bulk_update(property_definitions, ["query_usage_30_day"], batch_size=UPDATE_BATCH_SIZE)
+
+
+def _get_usage(team_ids: Sequence[int], since: datetime) -> Tuple[UsageCounts, UsageCounts]:
+    "Counts how often each event and property is used by insights created since `since`, by team."
+    event_usage: UsageCounts = Counter()
+    property_usage: UsageCounts = Counter()
+
+    insights = Insight.objects.filter(team_id__in=team_ids, created_at__gt=since).values_list("team_id", "filters")
+    for team_id, filters in insights.iterator():
+        event_usage.update((team_id, name) for name in _names(filters, "events", "id"))
+        property_usage.update((team_id, name) for name in _names(filters, "properties", "key"))
+
+    return event_usage, property_usage
+
+
+def _names(filters: Dict, list_key: str, name_key: str) -> Iterable[str]:
+    items = (filters or {}).get(list_key, [])
+    if not isinstance(items, list):
+        return []
+    return [item[name_key] for item in items if isinstance(item, dict) and isinstance(item.get(name_key), str)]
+
+
+def _get_events_volume(team_ids: Sequence[int], since: datetime) -> Dict[Tuple[int, str], int]:
+    from ee.clickhouse.sql.events import GET_EVENTS_VOLUME_FOR_TEAMS
     from posthog.client import sync_execute
 
-    return sync_execute(GET_EVENTS_VOLUME, {"team_id": team.pk, "timestamp": timestamp},)
-
-
-def _extract_count(events_volume: List[Tuple[str, int]], event: str) -> int:
-    try:
-        return [count[1] for count in events_volume if count[0] == event][0]
-    except IndexError:
-        return 0
+    rows: List[Tuple[int, str, int]] = sync_execute(
+        GET_EVENTS_VOLUME_FOR_TEAMS, {"team_ids": list(team_ids), "timestamp": since}
+    )
+    return {(team_id, event): count for team_id, event, count in rows}
@@ -0,0 +1,16 @@
+from typing import List, Tuple
+
+from celery import shared_task
+
+from posthog.helpers.feature_flag_bulk import FlagValue, evaluate_feature_flag_in_bulk
+from posthog.models import FeatureFlag
+
+
+@shared_task(ignore_result=False, max_retries=1)
+def evaluate_feature_flag_in_bulk_task(feature_flag_id: int, identifiers: List[str]) -> List[Tuple[str, FlagValue]]:
+    """
+    Evaluates a feature flag for one chunk of distinct_ids or group keys. Large backfills should split their
+    identifiers into chunks and fan out one task per chunk.
+    """
+    feature_flag = FeatureFlag.objects.get(pk=feature_flag_id)
+    return list(evaluate_feature_flag_in_bulk(feature_flag, identifiers))
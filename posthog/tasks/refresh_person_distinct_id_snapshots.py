@@ -0,0 +1,28 @@
+from typing import Sequence
+
+from celery import group
+from celery.app import shared_task
+from sentry_sdk.api import capture_exception
+
+from posthog.queries.person_distinct_id_query import get_active_snapshot_team_ids, refresh_person_distinct_id_snapshot
+
+# Number of teams whose snapshots are refreshed by one task
+TEAMS_PER_TASK = 10
+
+
+def refresh_person_distinct_id_snapshots() -> None:
+    "Refreshes the snapshots of every team that recently ran a query that could use one, spread over several tasks."
+    team_ids = get_active_snapshot_team_ids()
+    group(
+        refresh_person_distinct_id_snapshots_for_teams.s(team_ids[index : index + TEAMS_PER_TASK])
+        for index in range(0, len(team_ids), TEAMS_PER_TASK)
+    ).apply_async()
+
+
+@shared_task(ignore_result=True, max_retries=1)
+def refresh_person_distinct_id_snapshots_for_teams(team_ids: Sequence[int]) -> None:
+    for team_id in team_ids:
+        try:
+            refresh_person_distinct_id_snapshot(team_id)
+        except Exception as err:
+            capture_exception(err)
@@ -7,7 +7,10 @@ from posthog.models import Insight, Organization
 from posthog.models.event_definition import EventDefinition
 from posthog.models.property_definition import PropertyDefinition
 from posthog.models.team import Team
-from posthog.tasks.calculate_event_property_usage import calculate_event_property_usage_for_team
+from posthog.tasks.calculate_event_property_usage import (
+    calculate_event_property_usage_for_team,
+    calculate_event_property_usage_for_teams,
+)
 from posthog.test.base import BaseTest
 
 
@@ -167,4 +170,44 @@ def calculate_event_property_usage_test_factory(create_event: Callable) -> Calla
             self.assertEqual(1, PropertyDefinition.objects.get(team=self.team, name="team_id").query_usage_30_day)
             self.assertEqual(0, PropertyDefinition.objects.get(team=self.team, name="value").query_usage_30_day)
 
+        def test_calculate_usage_for_several_teams(self) -> None:
+            team2 = Organization.objects.bootstrap(None)[2]
+            for team in [self.team, team2]:
+                EventDefinition.objects.create(team=team, name="$pageview")
+                PropertyDefinition.objects.create(team=team, name="$current_url")
+            Insight.objects.create(
+                team=self.team,
+                filters={
+                    "events": [{"id": "$pageview"}, {"id": "$pageview"}],
+                    "properties": [{"key": "$current_url", "value": "https://posthog.com"}],
+                },
+            )
+            Insight.objects.create(team=team2, filters={"properties": {"type": "AND", "values": []}})
+            create_event(distinct_id="test", team=self.team, event="$pageview")
+            create_event(distinct_id="test", team=team2, event="$pageview")
+            create_event(distinct_id="test", team=team2, event="$pageview")
+
+            calculate_event_property_usage_for_teams([self.team.pk, team2.pk])
+
+            self.assertEqual(
+                list(
+                    EventDefinition.objects.filter(name="$pageview")
+                    .order_by("team_id")
+                    .values_list("team_id", "volume_30_day", "query_usage_30_day")
+                ),
+                [(self.team.pk, 1, 2), (team2.pk, 2, 0)],
+            )
+            self.assertEqual(
+                list(
+                    PropertyDefinition.objects.filter(name="$current_url")
+                    .order_by("team_id")
+                    .values_list("team_id", "query_usage_30_day")
+                ),
+                [(self.team.pk, 1), (team2.pk, 0)],
+            )
+
+            # Nothing changed, so nothing gets written
+            with self.assertNumQueries(3):
+                calculate_event_property_usage_for_teams([self.team.pk, team2.pk])
+
     return Test
@@ -34,6 +34,7 @@ from posthog.decorators import CacheType
 from posthog.models import Dashboard, DashboardTile, Filter, Insight, Team
 from posthog.models.filters.stickiness_filter import StickinessFilter
 from posthog.models.filters.utils import get_filter
+from posthog.queries.query_metadata import query_metadata_scope
 from posthog.types import FilterType
 from posthog.utils import generate_cache_key
 
@@ -62,8 +63,9 @@ def update_cache_item(key: str, cache_type: CacheType, payload: dict) -> List[Di
         dashboard_tiles_queryset = DashboardTile.objects.filter(insight__team_id=team_id, filters_hash=key)
 
         # at least one must return something, if they both return they will be identical
-        insight_result = _update_cache_for_queryset(cache_type, filter, key, team, insights_queryset)
-        tiles_result = _update_cache_for_queryset(cache_type, filter, key, team, dashboard_tiles_queryset)
+        with query_metadata_scope("update_cache_item"):
+            insight_result = _update_cache_for_queryset(cache_type, filter, key, team, insights_queryset)
+            tiles_result = _update_cache_for_queryset(cache_type, filter, key, team, dashboard_tiles_queryset)
 
         if tiles_result is not None:
             result = tiles_result
@@ -17,6 +17,7 @@ from rest_framework.test import APITestCase as DRFTestCase
 from ee.clickhouse.models.event import bulk_create_events
 from ee.clickhouse.models.person import bulk_create_persons, create_person
 from posthog.models import Organization, Team, User
+from posthog.models.feature_flag import clear_team_feature_flags_cache
 from posthog.models.organization import OrganizationMembership
 from posthog.models.person import Person
 
@@ -120,6 +121,8 @@ class TestMixin:
             _setup_test_data(cls)
 
     def setUp(self):
+        # Flags cached by earlier tests would otherwise skip the queries tests assert on
+        clear_team_feature_flags_cache()
         if not self.CLASS_DATA_LEVEL_SETUP:
             _setup_test_data(self)
 
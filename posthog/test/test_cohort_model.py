@@ -59,6 +59,39 @@ class TestCohort(BaseTest):
         ]
         self.assertCountEqual(uuids, [person1.uuid, person3.uuid])
 
+    @pytest.mark.ee
+    def test_calculate_people_only_writes_changed_versions(self):
+        person1 = Person.objects.create(
+            distinct_ids=["person1"], team_id=self.team.pk, properties={"$some_prop": "something"}
+        )
+        person2 = Person.objects.create(
+            distinct_ids=["person2"], team_id=self.team.pk, properties={"$some_prop": "something"}
+        )
+        Person.objects.create(distinct_ids=["person3"], team_id=self.team.pk, properties={})
+        cohort = Cohort.objects.create(
+            team=self.team,
+            groups=[{"properties": [{"key": "$some_prop", "value": "something", "type": "person"}]}],
+            name="cohort1",
+        )
+
+        self.assertTrue(cohort.calculate_people(new_version=1, batch_size=1, pg_batch_size=1))
+        self.assertCountEqual(
+            CohortPeople.objects.filter(cohort=cohort, version=1).values_list("person_id", flat=True),
+            [person1.pk, person2.pk],
+        )
+        cohort.version = 1
+
+        self.assertFalse(cohort.calculate_people(new_version=2))
+        self.assertEqual(CohortPeople.objects.filter(cohort=cohort, version=2).count(), 0)
+
+        person2.properties = {}
+        person2.save()
+        self.assertTrue(cohort.calculate_people(new_version=2))
+        self.assertEqual(
+            list(CohortPeople.objects.filter(cohort=cohort, version=2).values_list("person_id", flat=True)),
+            [person1.pk],
+        )
+
     def test_empty_query(self):
         cohort2 = Cohort.objects.create(
             team=self.team,
@@ -3,6 +3,7 @@ from posthog.models.feature_flag import (
     FeatureFlagMatch,
     FeatureFlagMatcher,
     FeatureFlagOverride,
+    get_active_feature_flags,
     get_overridden_feature_flags,
 )
 from posthog.models.group import Group
@@ -218,6 +219,88 @@ class TestFeatureFlagMatcher(BaseTest):
         )
 
 
+class TestTeamFeatureFlagsCache(BaseTest):
+    def test_flags_without_properties_evaluated_in_memory_once_cached(self):
+        FeatureFlag.objects.create(
+            team=self.team, key="rollout", created_by=self.user, filters={"groups": [{"rollout_percentage": 100}]}
+        )
+
+        with self.assertNumQueries(2):  # flags and whether the team has overrides
+            self.assertEqual(get_overridden_feature_flags(self.team.pk, "example_id"), {"rollout": True})
+        with self.assertNumQueries(0):
+            self.assertEqual(get_overridden_feature_flags(self.team.pk, "another_id"), {"rollout": True})
+
+    def test_cache_invalidated_on_flag_save(self):
+        feature_flag = FeatureFlag.objects.create(
+            team=self.team, key="rollout", created_by=self.user, filters={"groups": [{"rollout_percentage": 100}]}
+        )
+        self.assertEqual(get_active_feature_flags(self.team.pk, "example_id"), {"rollout": True})
+
+        feature_flag.active = False
+        feature_flag.save()
+        self.assertEqual(get_active_feature_flags(self.team.pk, "example_id"), {})
+
+        FeatureFlag.objects.create(team=self.team, key="another", created_by=self.user, rollout_percentage=100)
+        self.assertEqual(get_active_feature_flags(self.team.pk, "example_id"), {"another": True})
+
+    def test_person_property_flags_resolved_in_one_query(self):
+        Person.objects.create(team=self.team, distinct_ids=["example_id"], properties={"email": "tim@posthog.com"})
+        for index in range(5):
+            FeatureFlag.objects.create(
+                team=self.team,
+                key=f"flag-{index}",
+                created_by=self.user,
+                filters={
+                    "groups": [
+                        {"properties": [{"key": "email", "type": "person", "value": "tim@posthog.com"}]},
+                        {"properties": [{"key": "email", "type": "person", "value": f"{index}@posthog.com"}]},
+                    ]
+                },
+            )
+        get_overridden_feature_flags(self.team.pk, "example_id")
+
+        with self.assertNumQueries(1):
+            flags = get_overridden_feature_flags(self.team.pk, "example_id")
+        self.assertEqual(flags, {f"flag-{index}": True for index in range(5)})
+        with self.assertNumQueries(1):
+            self.assertEqual(get_overridden_feature_flags(self.team.pk, "another_id"), {})
+
+    def test_group_property_flags_resolved_in_one_query_per_group_type(self):
+        GroupTypeMapping.objects.create(team=self.team, group_type="organization", group_type_index=0)
+        GroupTypeMapping.objects.create(team=self.team, group_type="project", group_type_index=1)
+        Group.objects.create(
+            team=self.team, group_type_index=0, group_key="foo", group_properties={"name": "foo.inc"}, version=1
+        )
+        Group.objects.create(
+            team=self.team, group_type_index=1, group_key="bar", group_properties={"name": "bar"}, version=1
+        )
+        for group_type_index, name in [(0, "foo.inc"), (0, "other.inc"), (1, "bar"), (1, "baz")]:
+            FeatureFlag.objects.create(
+                team=self.team,
+                key=f"flag-{group_type_index}-{name}",
+                created_by=self.user,
+                filters={
+                    "aggregation_group_type_index": group_type_index,
+                    "groups": [
+                        {
+                            "properties": [
+                                {"key": "name", "value": name, "type": "group", "group_type_index": group_type_index}
+                            ]
+                        }
+                    ],
+                },
+            )
+        groups = {"organization": "foo", "project": "bar"}
+        get_active_feature_flags(self.team.pk, "example_id", groups)
+
+        with self.assertNumQueries(2):
+            flags = get_active_feature_flags(self.team.pk, "example_id", groups)
+        self.assertEqual(flags, {"flag-0-foo.inc": True, "flag-1-bar": True})
+        with self.assertNumQueries(1):
+            flags = get_active_feature_flags(self.team.pk, "example_id", {"organization": "foo"})
+        self.assertEqual(flags, {"flag-0-foo.inc": True})
+
+
 # Integration + performance tests for get_overridden_feature_flags
 class TestFeatureFlagsWithOverrides(BaseTest, QueryMatchingTest):
     feature_flag: FeatureFlag
@@ -0,0 +1,57 @@
+import base64
+import gzip
+import json
+import random
+
+import lzstring
+from django.test import SimpleTestCase
+
+from posthog.exceptions import RequestParsingError
+from posthog.payload_decoding import decode_payload, lz64_decompress
+
+EVENTS = [
+    {"event": "$pageview", "properties": {"distinct_id": "eeeeeeegϥeeeee", "$current_url": "https://posthog.com/🦔",}},
+    {"event": "$autocapture", "properties": {"distinct_id": "eeeeeeegϥeeeee", "value": 1.5, "nan": float("nan")}},
+]
+
+
+class TestPayloadDecoding(SimpleTestCase):
+    def test_lz64_decompress_matches_lzstring(self):
+        rng = random.Random(42)
+        for _ in range(200):
+            text = "".join(rng.choice('abc{}":, 012éÿ中🦔') for _ in range(rng.randint(1, 300)))
+            compressed = lzstring.LZString().compressToBase64(text)
+            self.assertEqual(lz64_decompress(compressed), lzstring.LZString().decompressFromBase64(compressed))
+
+    def test_lz64_decompress_invalid(self):
+        self.assertEqual(lz64_decompress("foo"), "")
+        self.assertIsNone(lz64_decompress(""))
+        self.assertIsNone(lz64_decompress("not base64!"))
+
+    def test_decodes_each_encoding(self):
+        body = json.dumps(EVENTS)
+        expected = json.loads(body, parse_constant=lambda x: None)
+
+        self.assertEqual(decode_payload(body.encode(), ""), expected)
+        self.assertEqual(decode_payload(body, ""), expected)
+        self.assertEqual(decode_payload(base64.b64encode(body.encode()).rstrip(b"="), ""), expected)
+        self.assertEqual(decode_payload(base64.b64encode(body.encode()).decode().replace("+", " "), ""), expected)
+        self.assertEqual(decode_payload(gzip.compress(body.encode()), "gzip-js"), expected)
+        self.assertEqual(decode_payload(gzip.compress(body.encode()), ""), expected)
+        self.assertEqual(decode_payload(lzstring.LZString().compressToBase64(body).encode(), "lz64"), expected)
+        self.assertEqual(decode_payload(lzstring.LZString().compressToBase64(body).replace("+", " "), "lz64"), expected)
+
+    def test_invalid_payloads(self):
+        for data, compression, message in [
+            (b"undefined", "", "Invalid JSON: Expecting value: line 1 column 1 (char 0)"),
+            (b'{"event": ', "", "Invalid JSON: Expecting value: line 1 column 11 (char 10)"),
+            (
+                b"\x1f\x8b\x08\x00",
+                "gzip",
+                "Failed to decompress data. Compressed file ended before the end-of-stream marker was reached",
+            ),
+            (b"foo", "lz64", "Failed to decompress data."),
+        ]:
+            with self.assertRaises(RequestParsingError) as ctx:
+                decode_payload(data, compression)
+            self.assertEqual(str(ctx.exception), message)
@@ -1,3 +1,4 @@
+import gzip
 from unittest.mock import call, patch
 
 from django.core.handlers.wsgi import WSGIRequest
@@ -216,18 +217,15 @@ class TestLoadDataFromRequest(TestCase):
             str(ctx.exception),
         )
 
-    @patch("posthog.utils.gzip")
-    def test_can_decompress_gzipped_body_received_with_no_compression_flag(self, patched_gzip):
+    def test_can_decompress_gzipped_body_received_with_no_compression_flag(self):
         # see https://sentry.io/organizations/posthog2/issues/3136510367
         # one organization is causing a request parsing error by sending an encoded body
         # but the empty string for the compression value
         # this accounts for a large majority of our Sentry errors
 
-        patched_gzip.decompress.return_value = '{"what is it": "the decompressed value"}'
-
         rf = RequestFactory()
         # a request with no compression set
-        post_request = rf.post("/s/", "the gzip compressed string", "text/plain")
+        post_request = rf.post("/s/", gzip.compress(b'{"what is it": "the decompressed value"}'), "text/plain")
 
         data = load_data_from_request(post_request)
         self.assertEqual({"what is it": "the decompressed value"}, data)
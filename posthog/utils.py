@@ -1,8 +1,6 @@
-import base64
 import dataclasses
 import datetime
 import datetime as dt
-import gzip
 import hashlib
 import json
 import os
@@ -28,7 +26,6 @@ from typing import (
 )
 from urllib.parse import urljoin, urlparse
 
-import lzstring
 import pytz
 from dateutil import parser
 from dateutil.relativedelta import relativedelta
@@ -42,7 +39,7 @@ from rest_framework.request import Request
 from sentry_sdk import configure_scope
 
 from posthog.constants import AvailableFeature
-from posthog.exceptions import RequestParsingError
+from posthog.payload_decoding import decode_payload
 from posthog.redis import get_client
 
 if TYPE_CHECKING:
@@ -389,71 +386,9 @@ def get_celery_heartbeat() -> Union[str, int]:
     return "offline"
 
 
-def base64_decode(data):
-    """
-    Decodes base64 bytes into string taking into account necessary transformations to match client libraries.
-    """
-    if not isinstance(data, str):
-        data = data.decode()
-
-    data = base64.b64decode(data.replace(" ", "+") + "===")
-
-    return data.decode("utf8", "surrogatepass").encode("utf-16", "surrogatepass")
-
-
 def decompress(data: Any, compression: str):
-    if not data:
-        return None
-
-    if compression == "gzip" or compression == "gzip-js":
-        if data == b"undefined":
-            raise RequestParsingError(
-                "data being loaded from the request body for decompression is the literal string 'undefined'"
-            )
-
-        try:
-            data = gzip.decompress(data)
-        except (EOFError, OSError) as error:
-            raise RequestParsingError("Failed to decompress data. %s" % (str(error)))
-
-    if compression == "lz64":
-        if not isinstance(data, str):
-            data = data.decode()
-        data = data.replace(" ", "+")
-
-        data = lzstring.LZString().decompressFromBase64(data)
-
-        if not data:
-            raise RequestParsingError("Failed to decompress data.")
-
-        data = data.encode("utf-16", "surrogatepass").decode("utf-16")
-
-    base64_decoded = None
-    try:
-        base64_decoded = base64_decode(data)
-    except Exception:
-        pass
-
-    if base64_decoded:
-        data = base64_decoded
-
-    try:
-        # parse_constant gets called in case of NaN, Infinity etc
-        # default behaviour is to put those into the DB directly
-        # but we just want it to return None
-        data = json.loads(data, parse_constant=lambda x: None)
-    except (json.JSONDecodeError, UnicodeDecodeError) as error_main:
-        if compression == "":
-            try:
-                return decompress(data, "gzip")
-            except Exception as inner:
-                # re-trying with compression set didn't succeed, throw original error
-                raise RequestParsingError("Invalid JSON: %s" % (str(error_main))) from inner
-        else:
-            raise RequestParsingError("Invalid JSON: %s" % (str(error_main)))
-
     # TODO: data can also be an array, function assumes it's either None or a dictionary.
-    return data
+    return decode_payload(data, compression)
 
 
 # Used by non-DRF endpoints from capture.py and decide.py (/decide, /batch, /capture, etc)